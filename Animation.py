@@ -7,6 +7,7 @@ import datetime
 
 import Utils
 from Utils import fld
+from BitmapCache import BitmapCache
 
 shapes = [ [(math.cos(a), -math.sin(a))
 					for a in (q*(2.0*math.pi/i)+math.pi/2.0+(2.0*math.pi/(i*2.0) if i % 2 == 0 else 0)
@@ -118,6 +119,7 @@ class Animation(wx.Control):
 						self.colours.append( wx.Colour(r, g, b) )
 		random.seed( 1234 )
 		random.shuffle( self.colours )
+		self.brushes = [wx.Brush(c, wx.SOLID) for c in self.colours]
 			 
 		self.topThreeColours = [
 			wx.Colour(255,215,0),
@@ -131,6 +133,9 @@ class Animation(wx.Control):
 		self.timeFont	= None
 		self.highlightFont = None
 		self.rLast = -1
+		
+		# The track is drawn into a cached bitmap.  Only the riders and text are drawn for each frame.
+		self.trackCache = BitmapCache()
 			 
 		self.timer = wx.Timer( self, id=wx.ID_ANY )
 		self.Bind( wx.EVT_TIMER, self.NextFrame, self.timer )
@@ -386,35 +391,13 @@ class Animation(wx.Control):
 		xypt.extend( positionTime )
 		return tuple( xypt )
 	
-	def Draw(self, dc):
-		decimal_point = locale.localeconv()['decimal_point']
-		size = self.GetClientSize()
-		width = size.width
-		height = size.height
+	def drawTrack( self, dc ):
+		r = self.r
 		backColour = self.GetBackgroundColour()
 		backBrush = wx.Brush(backColour, wx.SOLID)
 		dc.SetBackground(backBrush)
 		dc.Clear()
 		
-		if width < 80 or height < 80:
-			return
-
-		self.r = int(width / 4)
-		if self.r * 2 > height:
-			self.r = int(height / 2)
-		self.r -= (self.r & 1)			# Make sure that r is an even number.
-		
-		r = self.r
-		
-		# Get the fonts if needed.
-		if self.rLast != r:
-			tHeight = r / 8.0
-			self.numberFont = wx.Font( (0,int(tHeight)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
-			self.leaderFont = wx.Font( (0,int(tHeight * 0.9)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
-			self.timeFont = self.numberFont
-			self.highlightFont = wx.Font( (0,int(tHeight * 1.6)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
-			self.rLast = r
-			
 		# Draw the track.
 		dc.SetBrush( wx.Brush(self.trackColour, wx.SOLID) )
 		dc.SetPen( wx.Pen(self.trackColour, 0, wx.SOLID) )
@@ -451,6 +434,40 @@ class Animation(wx.Control):
 				dc.SetPen( wx.Pen(wx.Colour(64,64,64), 1, wx.SOLID) )
 			dc.DrawLine( int(x1), int(y1), int(x2), int(y2) )
 		
+	def Draw(self, dc):
+		decimal_point = locale.localeconv()['decimal_point']
+		size = self.GetClientSize()
+		width = size.width
+		height = size.height
+		backColour = self.GetBackgroundColour()
+		backBrush = wx.Brush(backColour, wx.SOLID)
+		dc.SetBackground(backBrush)
+		
+		if width < 80 or height < 80:
+			dc.Clear()
+			return
+
+		self.r = int(width / 4)
+		if self.r * 2 > height:
+			self.r = int(height / 2)
+		self.r -= (self.r & 1)			# Make sure that r is an even number.
+		
+		r = self.r
+		
+		# Get the fonts if needed.
+		if self.rLast != r:
+			tHeight = r / 8.0
+			self.numberFont = wx.Font( (0,int(tHeight)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
+			self.leaderFont = wx.Font( (0,int(tHeight * 0.9)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
+			self.timeFont = self.numberFont
+			self.highlightFont = wx.Font( (0,int(tHeight * 1.6)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
+			self.rLast = r
+			
+		# Draw the track from the cache.  It only changes with the size and the options.
+		laneWidth = (r/2) / self.laneMax
+		key = (width, height, r, self.laneMax, self.reverseDirection, self.finishTop, self.trackColour.Get(), backColour.Get())
+		self.trackCache.Blit( dc, key, width, height, self.drawTrack )
+		
 		# Draw the riders
 		dc.SetFont( self.numberFont )
 		dc.SetPen( wx.BLACK_PEN )
@@ -483,7 +500,7 @@ class Animation(wx.Control):
 				if x is None:
 					continue
 					
-				dc.SetBrush( wx.Brush(self.colours[num % len(self.colours)], wx.SOLID) )
+				dc.SetBrush( self.brushes[num % len(self.brushes)] )
 				try:
 					i = topThree[num]
 					dc.SetPen( wx.Pen(self.topThreeColours[i], thickLine) )
@@ -587,7 +604,7 @@ class Animation(wx.Control):
 				dc.DrawRectangle( int(x - thickLine/4), int(y - thickLine/4), int(tHeight + thickLine/2), int(tHeight  + thickLine/2) )
 				
 				dc.SetPen( wx.Pen(self.topThreeColours[i], thickLine) )
-				dc.SetBrush( wx.Brush(self.colours[num % len(self.colours)], wx.SOLID) )
+				dc.SetBrush( self.brushes[num % len(self.brushes)] )
 				DrawShape( dc, num, int(x + tHeight / 2), int(y + tHeight / 2), riderRadius )
 				
 				s = '{} {}'.format(num, self.getShortName(num))
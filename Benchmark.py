@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import random
+import pickle
+import datetime
+import tempfile
+import platform
+from time import perf_counter
+from argparse import ArgumentParser
+
+import Utils
+import Model
+import Version
+import RaceJournal
+import GetResults
+from Undo import undo
+
+#
+# Headless throughput benchmarks for the core timing pipeline.
+#
+# Builds synthetic races and times the operations that scale with the number of riders and laps.
+# Each result is written as one json line so runs can be compared for regression tracking:
+#
+#	python Benchmark.py --scenario mass-1k --scenario tt-5k --out results.jsonl
+#	python Benchmark.py --list
+#
+
+Scenarios = {
+	#	name				riders	laps	waves	timeTrial	raceMinutes
+	'mass-1k':			(1000,	10,		1,		False,		60),
+	'mass-5k':			(5000,	5,		1,		False,		60),
+	'mass-20k':			(20000,	3,		1,		False,		60),
+	'waves-5k':			(5000,	8,		10,		False,		90),
+	'waves-20k':		(20000,	4,		50,		False,		180),
+	'tt-1k':			(1000,	1,		1,		True,		8*60),
+	'tt-5k':			(5000,	3,		1,		True,		24*60),
+	'ultra-24h':		(1000,	200,	1,		False,		24*60),
+}
+DefaultScenarios = ('mass-1k', 'waves-5k', 'tt-1k')
+
+def makeRace( riders, laps, waves, timeTrial, raceMinutes, seed=10101021 ):
+	'''
+		Build a race with the given number of riders split into waves.
+		Returns the race and the list of (t, num) events in time order.
+		Time trial riders start 15 seconds apart.  Mass start waves start 60 seconds apart.
+	'''
+	rng = random.Random( seed )
+	race = Model.newRace()
+	race.isTimeTrial = timeTrial
+	race.minutes = raceMinutes
+	race.startTime = datetime.datetime.now() - datetime.timedelta( minutes=raceMinutes )
+	race.finishTime = None
+	race.date = race.startTime.strftime( '%Y-%m-%d' )
+	race.scheduledStart = race.startTime.strftime( '%H:%M' )
+
+	numStart = 100
+	perWave = -(-riders // waves)
+	categories = []
+	for w in range(waves):
+		nBegin = numStart + w * perWave
+		nEnd = min( numStart + riders, nBegin + perWave ) - 1
+		categories.append( {
+			'name':			'Wave {}'.format(w+1),
+			'catStr':		'{}-{}'.format(nBegin, nEnd),
+			'startOffset':	'00:00:00' if timeTrial else Utils.SecondsToStr( w * 60 ),
+			'numLaps':		laps,
+			'distance':		1.0,
+			'gender':		'Open',
+		} )
+	race.setCategories( categories )
+
+	# Spread the laps so the leaders finish near the end of the race time.
+	meanLap = raceMinutes * 60.0 / (laps + 1) if not timeTrial else raceMinutes * 60.0 / (laps + 2) / 2.0
+	events = []
+	for i, num in enumerate(range(numStart, numStart + riders)):
+		if timeTrial:
+			t = i * 15.0
+			events.append( (t, num) )		# Start time.
+		else:
+			t = ((num - numStart) // perWave) * 60.0
+		mu = rng.normalvariate( meanLap, meanLap / 20.0 )
+		for lap in range(laps):
+			t += rng.normalvariate( mu, mu / 40.0 )
+			events.append( (t, num) )
+	events.sort()
+	return race, events
+
+class Bench:
+	def __init__( self, out ):
+		self.out = out
+		self.scenario = None
+		self.results = []
+		self.iWritten = 0
+
+	def record( self, bench, seconds, count=None, **kwargs ):
+		result = {'scenario':self.scenario, 'bench':bench, 'seconds':round(seconds, 6)}
+		if count:
+			result['count'] = count
+			result['perItemUs'] = round( seconds / count * 1.0e6, 3 )
+		result.update( kwargs )
+		self.results.append( result )
+		return result
+
+	def write( self ):
+		# Results are written after the scenario so fields can be added to them after timing.
+		for result in self.results[self.iWritten:]:
+			self.out.write( json.dumps(result) + '\n' )
+		self.iWritten = len(self.results)
+		self.out.flush()
+
+	def time( self, bench, func, count=None, **kwargs ):
+		# Time the function.  A failure is recorded rather than stopping the run.
+		try:
+			t = perf_counter()
+			ret = func()
+			return self.record( bench, perf_counter() - t, count, **kwargs ), ret
+		except Exception as e:
+			return self.record( bench, 0.0, error='{}: {}'.format(e.__class__.__name__, e) ), None
+
+def clearCaches():
+	Model.resetCache()
+
+class JournalContext:
+	# Stands in for MainWin so edits are journalled to a file.
+	def __init__( self, fileName ):
+		self.fileName = fileName
+
+def ingestPerRead( race, data ):
+	# The per-read chip ingestion path: each read is converted and added with its own change notification.
+	for d in data:
+		if d[0] != 'data':
+			continue
+		tag, dt = d[1], d[2]
+		if race.rfidRestartTime and dt <= race.rfidRestartTime:
+			continue
+		try:
+			num = race.tagNums[tag]
+		except KeyError:
+			if race.isRunning() and race.startTime <= dt:
+				race.addUnmatchedTag( tag, (dt - race.startTime).total_seconds() )
+			continue
+		if race.isRunning() and race.startTime <= dt:
+			if not race.isTimeTrial or not race.timeTrialNoRFIDStart or race.getRider(num).firstTime is not None:
+				race.addTime( num, (dt - race.startTime).total_seconds() )
+
+def ingestBatch( race, data ):
+	race.addTimes( race.tagReadsToNumTimes(data) )
+
+def benchChipReads( b, race, dirName ):
+	'''
+		A bunch sprint: every rider is read by two mats within a few seconds, plus some unknown tags.
+		Each ingestion path runs on its own copy of the race with the journal enabled.
+	'''
+	rng = random.Random( 1 )
+	nums = sorted( race.riders.keys() )
+	tNow = race.startTime + datetime.timedelta( minutes=race.minutes )
+	data = []
+	for num in nums:
+		dt = tNow + datetime.timedelta( seconds=rng.uniform(0.0, 5.0) )
+		data.append( ('data', '{:06X}'.format(num), dt) )
+		data.append( ('data', '{:06X}'.format(num), dt + datetime.timedelta(seconds=rng.uniform(0.0, 0.3))) )
+	for i in range(len(nums) // 50):
+		data.append( ('data', 'FFFF{:04X}'.format(i), tNow + datetime.timedelta(seconds=rng.uniform(0.0, 5.0))) )
+	data.sort( key=lambda d: d[2] )
+
+	mainWin = getattr( Utils, 'mainWin', None )
+	raceBytes = pickle.dumps( race, 4 )
+	for bench, ingest in (('chip reads per-read', ingestPerRead), ('chip reads batch', ingestBatch)):
+		raceCopy = pickle.loads( raceBytes )
+		raceCopy.tagNums = {'{:06X}'.format(num):num for num in nums}
+		Model.setRace( raceCopy )
+		Utils.mainWin = JournalContext( os.path.join(dirName, '{}-{}.cmn'.format(race.date, bench.replace(' ', '-'))) )
+		result, ret = b.time( bench, lambda: ingest(raceCopy, data), len(data) )
+		if result.get('seconds'):
+			result['readsPerSec'] = round( len(data) / result['seconds'] )
+		RaceJournal.close()
+		try:
+			result['journalBytes'] = sum( os.path.getsize(f) for serial, f in RaceJournal.getJournalFileNames(Utils.mainWin.fileName) )
+		except OSError:
+			pass
+	Utils.mainWin = mainWin
+	Model.setRace( race )
+
+def runScenario( b, name, riders, laps, waves, timeTrial, raceMinutes ):
+	b.scenario = name
+	race, events = makeRace( riders, laps, waves, timeTrial, raceMinutes )
+	Model.setRace( race )
+
+	# Hold back the last 1% of the events to time incremental updates.
+	iSplit = len(events) - max(1, len(events) // 100)
+	events, eventsLate = events[:iSplit], events[iSplit:]
+
+	def addTimes():
+		for t, num in events:
+			race.addTime( num, t, False )
+		race.setChanged()
+	b.time( 'Race.addTime', addTimes, len(events) )
+
+	clearCaches()
+	b.time( 'Race.interpolate', race.interpolate, riders )
+
+	clearCaches()
+	b.time( 'GetResults(All) cold', lambda: GetResults.GetResults(None), riders )
+	b.time( 'GetResults(All) cached', lambda: GetResults.GetResults(None), riders )
+
+	def getResultsCategories():
+		for c in race.getCategories( startWaveOnly=False ):
+			GetResults.GetResults( c )
+	clearCaches()
+	b.time( 'GetResults(categories) cold', getResultsCategories, riders, categories=len(race.getCategories(startWaveOnly=False)) )
+
+	GetResults.ResetVersionRAM()
+	b.time( 'GetResultsRAM baseline', GetResults.GetResultsRAM, riders )
+
+	def addLate():
+		for t, num in eventsLate:
+			race.addTime( num, t, False )
+		race.setChanged( nums=set(num for t, num in eventsLate) )
+	b.time( 'Race.addTime late', addLate, len(eventsLate) )
+	b.time( 'GetResultsRAM incremental', GetResults.GetResultsRAM, len(eventsLate) )
+
+	with tempfile.TemporaryDirectory() as dirName:
+		benchChipReads( b, race, dirName )
+
+	result, data = b.time( 'pickle race', lambda: pickle.dumps(race, 4), riders )
+	if data:
+		result['bytes'] = len(data)
+
+	with tempfile.TemporaryDirectory() as dirName:
+		fname = os.path.join( dirName, '{}-{}-r1-.cmn'.format(race.date, name) )
+		result, ret = b.time( 'writeRace', lambda: RaceJournal.snapshot(race, fname), riders )
+		try:
+			result['bytes'] = os.path.getsize( fname )
+		except OSError:
+			pass
+		RaceJournal.close()
+
+	# Undo only saves the state of a finished race.
+	race.finishTime = race.startTime + datetime.timedelta( minutes=raceMinutes )
+	undo.clear()
+	b.time( 'Undo.pushState', undo.pushState )
+	race.addTime( eventsLate[0][1], eventsLate[-1][0] + 1.0 )
+	b.time( 'Undo.pushState small change', undo.pushState )
+	undo.clear()
+
+	# Html and Excel export need the html templates and the export modules.
+	def renderHtml():
+		import RaceHtml
+		from ResultsWorker import RenderContext
+		class Render( RenderContext, RaceHtml.HtmlRender ):
+			pass
+		return RaceHtml.renderHtml( Render('{}-{}-r1-.cmn'.format(race.date, name)) )
+	clearCaches()
+	result, html = b.time( 'html export', renderHtml, riders )
+	if html:
+		result['bytes'] = len(html.encode())
+
+	def excelExport():
+		import io
+		import xlsxwriter
+		from ExportGrid import ExportGrid
+		bytesIO = io.BytesIO()
+		wb = xlsxwriter.Workbook( bytesIO, {'in_memory': True} )
+		formats = ExportGrid.getExcelFormatsXLSX( wb )
+		ues = Utils.UniqueExcelSheetName()
+		for category in race.getCategories( startWaveOnly=False ):
+			export = ExportGrid()
+			export.setResultsOneList( category, showLapsFrequency=1 )
+			export.toExcelSheetXLSX( formats, wb.add_worksheet(ues.getSheetName(category.fullname)) )
+		wb.close()
+		return bytesIO.getvalue()
+	clearCaches()
+	result, data = b.time( 'excel export', excelExport, riders )
+	if data:
+		result['bytes'] = len(data)
+
+	Model.setRace( None )
+	b.write()
+
+def main():
+	parser = ArgumentParser( prog='Benchmark', description='Headless throughput benchmarks for the CrossMgr timing pipeline.' )
+	parser.add_argument( '--scenario', action='append', default=[], help='scenario to run (repeatable).  Default: {}'.format(', '.join(DefaultScenarios)) )
+	parser.add_argument( '--all', action='store_true', help='run all scenarios' )
+	parser.add_argument( '--list', action='store_true', help='list the scenarios and exit' )
+	parser.add_argument( '--out', default=None, help='append the json lines to this file instead of stdout' )
+	args = parser.parse_args()
+
+	if args.list:
+		for name, (riders, laps, waves, timeTrial, raceMinutes) in Scenarios.items():
+			print( '{:12} riders={:<6} laps={:<4} waves={:<3} timeTrial={!s:<5} raceMinutes={}'.format(name, riders, laps, waves, timeTrial, raceMinutes) )
+		return
+
+	names = list(Scenarios.keys()) if args.all else (args.scenario or DefaultScenarios)
+	for name in names:
+		if name not in Scenarios:
+			parser.error( 'unknown scenario: {}'.format(name) )
+
+	out = open( args.out, 'a', encoding='utf8' ) if args.out else sys.stdout
+	b = Bench( out )
+	b.scenario = 'env'
+	b.record( 'env', 0.0, version=Version.AppVerName, python=platform.python_version(), platform=platform.platform(),
+		timestamp=datetime.datetime.now().isoformat(timespec='seconds') )
+	b.write()
+	for name in names:
+		runScenario( b, name, *Scenarios[name] )
+	if args.out:
+		out.close()
+
+if __name__ == '__main__':
+	main()
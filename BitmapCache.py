@@ -0,0 +1,80 @@
+import wx
+from collections import OrderedDict
+
+'''
+	Off-screen bitmap of the static part of a drawing.
+
+	Charts and animations redraw on every paint, but most of what they draw (the track,
+	the course, the completed Gantt bars, the labels) only changes when the data, size,
+	scroll position or options change.  Draw that part once into a bitmap, then Blit it
+	and draw only the moving parts (riders, cursor) on top.
+
+	The key is any comparable value that captures everything the static drawing depends on.
+'''
+
+class BitmapCache:
+	def __init__( self ):
+		self.bitmap = None
+		self.key = None
+
+	def Invalidate( self ):
+		self.key = None
+
+	def Get( self, key, width, height, draw ):
+		'''
+			Returns the bitmap for this key.  If the key has changed, calls draw(dc) to render it.
+			If draw returns a value, it becomes the key.  This is for drawings that change
+			their own state (eg. adjust their scrollbars) while they draw.
+		'''
+		width, height = max(1, width), max(1, height)
+		if self.bitmap is None or self.bitmap.GetWidth() != width or self.bitmap.GetHeight() != height:
+			self.bitmap = wx.Bitmap( width, height )
+			self.key = None
+		if self.key is None or self.key != key:
+			dc = wx.MemoryDC( self.bitmap )
+			keyNew = draw( dc )
+			dc.SelectObject( wx.NullBitmap )
+			self.key = key if keyNew is None else keyNew
+		return self.bitmap
+
+	def Blit( self, dc, key, width, height, draw ):
+		''' Draw the cached bitmap at the origin of dc. '''
+		dc.DrawBitmap( self.Get(key, width, height, draw), 0, 0 )
+
+class BitmapTiles:
+	'''
+		Off-screen bitmaps of the tiles of a drawing that is bigger than the window (eg. a scrolled chart).
+		
+		The tiles are in the coordinates of the whole drawing, so they don't depend on the scroll position.
+		Scrolling Blits the cached tiles at the scroll offset and only draws the tiles coming into view.
+		The least recently used tiles are dropped to bound the memory.
+	'''
+	maxTiles = 48
+
+	def __init__( self ):
+		self.tiles = OrderedDict()
+		self.key = None
+
+	def Invalidate( self ):
+		self.tiles.clear()
+		self.key = None
+
+	def Get( self, key, tile, width, height, draw ):
+		''' Returns the bitmap of the tile.  If the key has changed, all tiles are redrawn.  Calls draw(dc, tile) to render a tile. '''
+		if self.key is None or self.key != key:
+			self.tiles.clear()
+			self.key = key
+		try:
+			self.tiles.move_to_end( tile )
+			return self.tiles[tile]
+		except KeyError:
+			pass
+		
+		bitmap = wx.Bitmap( max(1, width), max(1, height) )
+		dc = wx.MemoryDC( bitmap )
+		draw( dc, tile )
+		dc.SelectObject( wx.NullBitmap )
+		self.tiles[tile] = bitmap
+		while len(self.tiles) > self.maxTiles:
+			self.tiles.popitem( last=False )
+		return bitmap
@@ -1,13 +1,75 @@
+import os
 import sys
+import time
+import pickle
+import hashlib
+import tempfile
 
 import random
+import Utils
 from Model import Source
 from Excel import GetExcelReader
 
 RegistrationSheet = 'Registration'
 
-def GetCallups( fname, soundalike=True, useUciId=True, useLicense=True, callbackfunc=None, callbackupdate=None, cycleLast=None ):
+#-----------------------------------------------------------------------
+# On-disk cache of the sheets read from a callup spreadsheet.
+# A Source keeps its parsed rows and its indices (uci id, license, normalized names, doublemetaphone codes),
+# so a cache hit skips reading the spreadsheet and building the indices.
+# An entry is valid if the spreadsheet has the same path, modification time and size.
+#
+sourceCacheVersion = 1
+sourceCacheDir = None
+
+def getFileStamp( fname ):
+	# Identify a version of a file by its path, modification time and size.
+	fname = os.path.abspath( fname )
+	try:
+		s = os.stat( fname )
+		return (fname, s.st_mtime_ns, s.st_size)
+	except OSError:
+		return (fname, None, None)
+
+def getSourceCacheDir():
+	global sourceCacheDir
+	if sourceCacheDir is None:
+		try:
+			sourceCacheDir = os.path.join( Utils.getHomeDir(), 'CallupSeedingMgrCache' )
+			os.makedirs( sourceCacheDir, exist_ok=True )
+		except Exception:
+			sourceCacheDir = os.path.join( tempfile.gettempdir(), 'CallupSeedingMgrCache' )
+			os.makedirs( sourceCacheDir, exist_ok=True )
+	return sourceCacheDir
+
+def getSourceCacheFileName( fname ):
+	return os.path.join( getSourceCacheDir(), hashlib.sha1(os.path.abspath(fname).encode()).hexdigest() + '.pkl' )
 
+def ReadSourceCache( fname ):
+	# Returns (registration, registrationErrors, sources, errors) or None.
+	try:
+		with open(getSourceCacheFileName(fname), 'rb') as fp:
+			version, stamp, data = pickle.load( fp )
+	except Exception:
+		return None
+	if version != sourceCacheVersion or stamp != getFileStamp(fname):
+		return None
+	return data
+
+def WriteSourceCache( fname, stamp, data ):
+	if stamp[1] is None:
+		return
+	cacheFileName = getSourceCacheFileName( fname )
+	try:
+		with open(cacheFileName + '.tmp', 'wb') as fp:
+			pickle.dump( (sourceCacheVersion, stamp, data), fp, pickle.HIGHEST_PROTOCOL )
+		os.replace( cacheFileName + '.tmp', cacheFileName )
+	except Exception as e:
+		Utils.writeLog( 'WriteSourceCache: "{}": {}'.format(fname, e) )
+
+def ReadSources( fname, callbackfunc=None, callbackupdate=None ):
+	# Stamp the file before reading it.  If it changes while we read, the cache entry will not match.
+	stamp = getFileStamp( fname )
+	
 	if callbackupdate: callbackupdate( _('Reading spreadsheet...') )
 	reader = GetExcelReader( fname )
 	
@@ -21,8 +83,6 @@ def GetCallups( fname, soundalike=True, useUciId=True, useLicense=True, callback
 	
 	if callbackupdate: callbackupdate( '{}: {}'.format(_('Reading'), RegistrationSheet) )
 	
-	reader = GetExcelReader( fname )
-	
 	registration = Source( fname, RegistrationSheet, False )
 	registrationErrors = registration.read( reader )
 	
@@ -35,11 +95,32 @@ def GetCallups( fname, soundalike=True, useUciId=True, useLicense=True, callback
 			continue
 		if callbackfunc: callbackfunc( sources + [registration], errors + [registrationErrors] )
 		if callbackupdate: callbackupdate( '{}: {}'.format(_('Reading'), sheet) )
-		source = Source( fname, sheet, soundalike=soundalike, useUciId=useUciId, useLicense=useLicense )
+		source = Source( fname, sheet )
 		errs = source.read( reader )
 		sources.append( source )
 		errors.append( errs )
-		
+	
+	data = (registration, registrationErrors, sources, errors)
+	WriteSourceCache( fname, stamp, data )
+	return data
+
+def GetCallups( fname, soundalike=True, useUciId=True, useLicense=True, callbackfunc=None, callbackupdate=None, cycleLast=None ):
+	
+	tStart = time.perf_counter()
+	data = ReadSourceCache( fname )
+	if data:
+		registration, registrationErrors, sources, errors = data
+		for source in sources + [registration]:
+			source.fname = fname
+		if callbackupdate: callbackupdate( '{}: {} ({:.3f}s)'.format(_('Read from cache'), fname, time.perf_counter() - tStart) )
+	else:
+		registration, registrationErrors, sources, errors = ReadSources( fname, callbackfunc, callbackupdate )
+		if callbackupdate: callbackupdate( '{}: {} ({:.3f}s)'.format(_('Read'), fname, time.perf_counter() - tStart) )
+	
+	# The match options are not part of the cache.
+	for source in sources:
+		source.soundalike, source.useUciId, source.useLicense = soundalike, useUciId, useLicense
+	
 	# Add a random sequence as a final sort order.
 	registration.randomize_positions()
 	
@@ -48,8 +129,17 @@ def GetCallups( fname, soundalike=True, useUciId=True, useLicense=True, callback
 	
 	if callbackfunc: callbackfunc( sources, errors )
 	
+	# Match one source at a time so we can report the time for each.
 	for reg in registration.results:
-		reg.result_vector = [source.find(reg) for source in sources]
+		reg.result_vector = []
+	for source in sources:
+		tStart = time.perf_counter()
+		for reg in registration.results:
+			reg.result_vector.append( source.find(reg) )
+		source.match_seconds = time.perf_counter() - tStart
+		if callbackupdate: callbackupdate( '{}: {}: {} rows, {} registrations ({:.3f}s)'.format(
+			_('Matched'), source.sheet_name, len(source.results), len(registration.results), source.match_seconds)
+		)
 	
 	callup_order = sorted(
 		registration.results,
@@ -179,6 +179,7 @@ class MainWin( wx.Frame ):
 		self.sourceList.InsertColumn(2, "Key Fields")
 		self.sourceList.InsertColumn(3, "Rows", wx.LIST_FORMAT_RIGHT)
 		self.sourceList.InsertColumn(4, "Errors/Warnings", wx.LIST_FORMAT_RIGHT)
+		self.sourceList.InsertColumn(5, "Match Time", wx.LIST_FORMAT_RIGHT)
 		self.sourceList.Bind( wx.EVT_LIST_ITEM_SELECTED, self.onItemSelected )
 		
 		instructions = [
@@ -426,6 +427,8 @@ class MainWin( wx.Frame ):
 			self.sourceList.SetItem( idx, 2, ', '.join( make_title(f) for f in match_fields ) )
 			self.sourceList.SetItem( idx, 3, '{}'.format(len(source.results)) )
 			self.sourceList.SetItem( idx, 4, '{}'.format(len(errors)) )
+			if source.match_seconds:
+				self.sourceList.SetItem( idx, 5, '{:.3f}s'.format(source.match_seconds) )
 		
 		insert_source_info( sources[-1], errors[-1], False )
 		for i, source in enumerate(sources[:-1]):
@@ -437,7 +440,7 @@ class MainWin( wx.Frame ):
 		self.sourceList.Refresh()
 
 	def callbackUpdate( self, message ):
-		pass
+		Utils.writeLog( message )
 	
 	def getCycleLast( self ):
 		selection = self.cycle.GetSelection()
@@ -3,6 +3,7 @@ import sys
 import datetime
 import random
 import operator
+from functools import lru_cache
 from metaphone import doublemetaphone
 
 import Utils
@@ -29,9 +30,15 @@ def normalize_name( s ):
 	s = all_stars.sub( "", s )
 	return s.strip()
 	
+@lru_cache( maxsize=65536 )
 def normalize_name_lookup( s ):
 	return Utils.removeDiacritic(normalize_name(s)).upper()
 
+@lru_cache( maxsize=65536 )
+def get_metaphones( s ):
+	# The doublemetaphone codes of a name.  The same names are looked up in every source.
+	return tuple( mp for mp in doublemetaphone(s.replace('-','').encode()) if mp )
+
 def format_uci_id( uci_id ):
 	if not uci_id:
 		return ''
@@ -397,8 +404,8 @@ def scrub_header( h ):
 	return header_sub.get(h, h)
 
 def soundalike_match( s1, s2 ):
-	dmp1 = doublemetaphone( s1.replace('-','').encode() )
-	dmp2 = doublemetaphone( s2.replace('-','').encode() )
+	dmp1 = get_metaphones( s1 )
+	dmp2 = get_metaphones( s2 )
 	return any( v in dmp1 for v in dmp2 )
 	
 class FindResult:
@@ -516,6 +523,7 @@ class Source:
 		self.hasField = set()
 		self.cmp_policy = None
 		self.debug = False
+		self.match_seconds = 0.0
 		for i in self.Indices:
 			setattr( self, i, {} )
 		self._field_from_index = {}
@@ -648,12 +656,11 @@ class Source:
 				continue
 			idx = getattr( self, idx_name )			
 			if idx_name.startswith( 'by_mp_' ):	# Initialize a doublemetaphone (soundalike) index.
-				for mp in doublemetaphone(v.replace('-','').encode()):
-					if mp:
-						try:
-							idx[mp].append( result )
-						except KeyError:
-							idx[mp] = [result]
+				for mp in get_metaphones(v):
+					try:
+						idx[mp].append( result )
+					except KeyError:
+						idx[mp] = [result]
 			else:								# Initialize a regular field index.
 				assert idx_name != 'by_license' or v not in idx, 'Duplicate license: {}'.format(v)
 				try:
@@ -687,15 +694,14 @@ class Source:
 		if self.debug: print( 'match_indices: searchKeys=', indices )
 		
 		soundalike = False
-		setCur = None
+		candidates = []
 		for idx_name in indices:
 			if self.debug: print( "match_indices: matching on key:", idx_name )
 			idx = getattr( self, idx_name )
 			v = getattr( search, self.field_from_index(idx_name), None )
 			if not v or not idx:
-				setCur = None
 				if self.debug: print( 'match_indices: missing attribute' )
-				break
+				return FindResult( search, None, self, soundalike )
 
 			try:
 				v = normalize_name_lookup( v )
@@ -704,26 +710,26 @@ class Source:
 				
 			if self.debug: print( 'match_indices: value=', v )
 			
-			found = set()
 			if idx_name.startswith( 'by_mp_' ):
 				soundalike = True
-				for mp in doublemetaphone(v.replace('-','').encode()):
-					if mp and mp in idx:
-						found |= set(idx[mp])
-			elif v in idx:
-				found = set(idx[v])
-			
-			if setCur is None:
-				setCur = set(found)
+				found = [r for mp in get_metaphones(v) for r in idx.get(mp, ())]
 			else:
-				setCur &= set(found)
+				found = idx.get( v, () )
 			
+			if not found:
+				if self.debug: print( "match_indices: match failed on:", idx_name )
+				return FindResult( search, None, self, soundalike )
+			candidates.append( found )
+		
+		# Intersect starting from the shortest list.  Only the smallest candidate set is copied.
+		candidates.sort( key=len )
+		setCur = set( candidates[0] )
+		for found in candidates[1:]:
+			setCur.intersection_update( found )
 			if not setCur:
-				if self.debug: print( "match_indices: match failed. found=", found )
 				break
-			
-			if self.debug: print( "matched:", setCur )
 		
+		if self.debug: print( "matched:", setCur )
 		return FindResult( search, setCur, self, soundalike )
 	
 	def find( self, search ):
@@ -3,6 +3,7 @@ import datetime
 
 import Utils
 import Model
+import RaceJournal
 from HighPrecisionTimeEdit import HighPrecisionTimeEdit
 from Undo import undo
 
@@ -135,14 +136,14 @@ class ChangeRaceStartTimeDialog( wx.Dialog ):
 				for rider in race.riders.values():
 					# Don't change the start times as they are relative to the old race start.
 					# Increase all the recorded times (if an earlier start), otherwise decrease all the recorded times (if a later start).
-					rider.times[:] = [max(0.0, v - dTime) for v in rider.times]
+					rider.times = [max(0.0, v - dTime) for v in rider.times]
 			else:
 				for rider in race.riders.values():
 					try:
 						rider.firstTime = max( 0.0, rider.firstTime - dTime )
 					except TypeError:
 						pass
-					rider.times[:] = [max(0.0, v - dTime) for v in rider.times]
+					rider.times = [max(0.0, v - dTime) for v in rider.times]
 			
 				race.numTimeInfo.adjustAllTimes( -dTime )
 				
@@ -152,6 +153,12 @@ class ChangeRaceStartTimeDialog( wx.Dialog ):
 					times[:] = [max(0.0, v - dTime) for v in times]
 			
 			race.startTime = startTimeNew
+			
+			# Journal the riders in the new time base with the new start time.
+			with RaceJournal.batch():
+				for rider in race.riders.values():
+					Model.journalRiderState( rider )
+				race.journalStartTime()
 			race.setChanged()
 			Utils.refresh()
 		
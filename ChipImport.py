@@ -89,6 +89,7 @@ def DoChipImport(	fname, parseTagTime, startTime = None,
 			raceStart = tFirst
 			
 		race.startTime = raceStart
+		race.journalStartTime()
 		
 		for num, lapTimes in riderRaceTimes.items():
 			for t in lapTimes:
@@ -3,10 +3,11 @@ import RaceResult
 import Ultra
 import WebReader
 import MyLapsServer
+import MultiReader
 
 class ChipReader:
-	JChip, RaceResult, Ultra, WebReader, MyLaps = tuple( range(5) )	# Add new options at the end.
-	Choices = (_('JChip/Impinj/Alien'), _('RaceResult'), _('Ultra'), _('WebReader'), _('MyLaps'))
+	JChip, RaceResult, Ultra, WebReader, MyLaps, MultiReader = tuple( range(6) )	# Add new options at the end.
+	Choices = (_('JChip/Impinj/Alien'), _('RaceResult'), _('Ultra'), _('WebReader'), _('MyLaps'), _('Multiple Readers'))
 	
 	def __init__( self ):
 		self.chipReaderType = None
@@ -19,6 +20,7 @@ class ChipReader:
 			Ultra.StopListener()
 			WebReader.StopListener()
 			MyLapsServer.StopListener()
+			MultiReader.StopListener()
 		
 		self.chipReaderType = (chipReaderType or ChipReader.JChip)
 		
@@ -50,6 +52,13 @@ class ChipReader:
 			self.CleanupListener = MyLapsServer.CleanupListener
 			self.IsListening = MyLapsServer.IsListening
 
+		elif self.chipReaderType == ChipReader.MultiReader:
+			self.StartListener = MultiReader.StartListener
+			self.GetData = MultiReader.GetData
+			self.StopListener = MultiReader.StopListener
+			self.CleanupListener = MultiReader.CleanupListener
+			self.IsListening = MultiReader.IsListening
+
 		else: # self.chipReaderType == ChipReader.JChip:
 			self.StartListener = JChip.StartListener
 			self.GetData = JChip.GetData
@@ -4,6 +4,33 @@ import copy
 
 #---------------------------------------------------------------------------
 
+class LazyColumn:
+	"""
+	A column of values formatted on demand from a list of items.
+	The grid only asks for the cells it paints, so large grids never format the cells that are not seen.
+	Formatted values are kept so each cell is formatted at most once.
+	"""
+	__slots__ = ('items', 'format', 'values')
+	
+	def __init__( self, items, format ):
+		self.items = items
+		self.format = format
+		self.values = [None] * len(items)
+	
+	def __len__( self ):
+		return len(self.items)
+	
+	def __getitem__( self, i ):
+		v = self.values[i]
+		if v is None:
+			v = self.values[i] = self.format( self.items[i] )
+		return v
+	
+	def __iter__( self ):
+		return (self[i] for i in range(len(self.items)))
+
+#---------------------------------------------------------------------------
+
 class ColTable( Grid.GridTableBase ):
 	"""
 	A custom wx.Grid Table using user supplied data
@@ -259,6 +286,81 @@ class ColGrid(Grid.Grid):
 	def Set( self, data = None, colnames = None, textColour = None, backgroundColour = None ):
 		self._table.Set( self, data, colnames, textColour, backgroundColour )
 	
+	def SetDiff( self, data = None, colnames = None, textColour = None, backgroundColour = None ):
+		"""Set the table, then repaint only the visible rows that changed.
+		Use instead of Set and Reset to refresh a large grid that mostly stays the same.
+		Only the visible cells are compared, so cells in LazyColumns that are not visible are never formatted.
+		"""
+		table = self._table
+		dataOld, colnamesOld = table.data, table.colnames
+		textColourOld, backgroundColourOld = table.textColour, table.backgroundColour
+		shapeOld = (table.GetNumberRows(), table.GetNumberCols())
+		
+		self.Set( data, colnames, textColour, backgroundColour )
+		
+		if shapeOld != (table.GetNumberRows(), table.GetNumberCols()):
+			self.AdjustScrollbars()
+			self.GetGridRowLabelWindow().Refresh()
+		if colnamesOld != table.colnames:
+			self.GetGridColLabelWindow().Refresh()
+		if not table.GetNumberRows() or not table.GetNumberCols():
+			self.ForceRefresh()
+			return
+		
+		def getValue( d, row, col ):
+			try:
+				v = d[col][row]
+			except (TypeError, IndexError):
+				return ''
+			return '' if v is None else v
+		
+		rowFirst, rowLast, colFirst, colLast = self.GetVisibleRowsCols()
+		gridWindow = self.GetGridWindow()
+		for row in range(rowFirst, rowLast+1):
+			for col in range(colFirst, colLast+1):
+				rc = (row, col)
+				if (getValue(dataOld, row, col) != getValue(table.data, row, col) or
+						textColourOld.get(rc) != table.textColour.get(rc) or
+						backgroundColourOld.get(rc) != table.backgroundColour.get(rc)):
+					gridWindow.RefreshRect( self.BlockToDeviceRect((row, colFirst), (row, colLast)) )
+					break
+	
+	def GetVisibleRowsCols( self ):
+		"""Return (rowFirst, rowLast, colFirst, colLast) of the visible cells."""
+		if not self.GetNumberRows() or not self.GetNumberCols():
+			return 0, -1, 0, -1
+		width, height = self.GetGridWindow().GetClientSize()
+		x, y = self.CalcUnscrolledPosition( 0, 0 )
+		return self.YToRow(y, True), self.YToRow(y + height, True), self.XToCol(x, True), self.XToCol(x + width, True)
+	
+	def AutoSizeColumnsLazy( self, setAsMin = True, sampleRows = 100 ):
+		"""Like AutoSizeColumns, but only measure the column labels, the visible rows and the first sampleRows rows.
+		AutoSizeColumns gets the value of every cell which would format every cell of a LazyColumn.
+		"""
+		numRows = self.GetNumberRows()
+		rowFirst, rowLast, colFirst, colLast = self.GetVisibleRowsCols()
+		rows = sorted( set(range(min(numRows, sampleRows))) | set(range(rowFirst, rowLast+1)) )
+		
+		dc = wx.ClientDC( self.GetGridWindow() )
+		dc.SetFont( self.GetDefaultCellFont() )
+		dcLabel = wx.ClientDC( self.GetGridColLabelWindow() )
+		dcLabel.SetFont( self.GetLabelFont() )
+		
+		margin = 8
+		table = self._table
+		self.BeginBatch()
+		for col in range(self.GetNumberCols()):
+			width = dcLabel.GetMultiLineTextExtent( table.GetColLabelValue(col) )[0]
+			for row in rows:
+				value = table.GetValue( row, col )
+				if value:
+					width = max( width, dc.GetMultiLineTextExtent(value)[0] )
+			width += margin
+			self.SetColSize( col, width )
+			if setAsMin:
+				self.SetColMinimalWidth( col, width )
+		self.EndBatch()
+	
 	def SetColumn( self, iCol, colData ):
 		self._table.SetColumn( self, iCol, colData )
 	
@@ -298,10 +400,10 @@ class ColGrid(Grid.Grid):
 		self.Reset()
 		
 	def SetLeftAlignCols( self, cols ):
-		self._table.leftAlignCols = set()
-		for c in cols:
-			self._table.leftAlignCols.add( c )
-		self.Reset()
+		cols = set( cols )
+		if cols != self._table.leftAlignCols:
+			self._table.leftAlignCols = cols
+			self.Reset()
 	
 	def SortByColumn( self, iCol, descending = False ):
 		self._table.SortByColumn( iCol, descending )
@@ -1,2 +1,11 @@
-from MainWin import MainLoop
-MainLoop()
+import sys
+from multiprocessing import freeze_support
+
+if __name__ == '__main__':
+	freeze_support()		# Required for the results worker process.
+	if '--profile-startup' in sys.argv:
+		# Start the profile before importing MainWin so its imports are included.
+		from StartupProfile import startupProfile
+		startupProfile.start()
+	from MainWin import MainLoop
+	MainLoop()
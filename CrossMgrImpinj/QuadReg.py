@@ -1,6 +1,5 @@
 import math
 from math import log
-import operator
 import numpy as np
 import warnings
 try:
@@ -8,20 +7,24 @@ try:
 except Exception as e:
 	warnings.simplefilter('ignore', np.RankWarning)
 
+def toXY( data ):
+	# data is a sequence of (x, y) pairs or an Nx2 array.
+	a = np.asarray( data, dtype=float )
+	return a[:,0], a[:,1]
+
 def QuadReg( data ):
 	lenData = len(data)
 	if lenData < 3:
 		raise ValueError( 'data must have >= 3 values' )
-	return np.polyfit( np.fromiter( (d[0] for d in data), float, lenData), np.fromiter( (d[1] for d in data), float, lenData), 2 )
+	x, y = toXY( data )
+	return np.polyfit( x, y, 2 )
 	
 def QuadRegRSS( data ):
 	lenData = len(data)
 	if lenData < 3:
 		raise ValueError( 'data must have >= 3 values' )
-	x = np.fromiter( (d[0] for d in data), float, lenData )
-	y = np.fromiter( (d[1] for d in data), float, lenData )
-	p = np.poly1d( np.polyfit(x, y, 2) )
-	R = np.fromiter( (y[i] - p(v) for i, v in enumerate(x)), float, lenData )
+	x, y = toXY( data )
+	R = y - np.polyval( np.polyfit(x, y, 2), x )
 	return np.dot( R, R )
 
 def QuadRegRSE( data ):
@@ -33,12 +36,12 @@ def QuadRegFindOutlier( data ):
 	lenData = len(data)
 	if lenData <= 3:
 		raise ValueError( 'data must have >= 3 values' )
-	x = np.fromiter( (d[0] for d in data), float, lenData )
-	y = np.fromiter( (d[1] for d in data), float, lenData )
-	p = np.poly1d( np.polyfit(x, y, 2) )
-	R = np.fromiter( (y[i] - p(v) for i, v in enumerate(x)), float, lenData )
+	x, y = toXY( data )
+	R = y - np.polyval( np.polyfit(x, y, 2), x )
 	rmse = math.sqrt( np.dot(R,R) / (lenData-1) )	# dot(R,R) = sum of squares
-	return max( ((i, abs(r/rmse)) for i, r in enumerate(R)), key=operator.itemgetter(1) )
+	Z = np.abs( R / rmse )
+	i = int( np.argmax(Z) )
+	return i, Z[i]
 	
 def QuadRegRemoveOutliersRobust( data, returnDetails=False ):
 	'''
@@ -71,34 +74,29 @@ def QuadRegRemoveOutliersRobust( data, returnDetails=False ):
 	
 	zThreshold = 1.9
 	
-	x = np.fromiter( (d[0] for d in data), float, lenData )
-	y = np.fromiter( (d[1] for d in data), float, lenData )
+	xData, yData = x, y = toXY( data )
 	
 	abc = np.polyfit(x, y, 2)
-	p = np.poly1d( abc )
 	while len(x) > 3:
-		R = np.fromiter( (y[i] - p(v) for i, v in enumerate(x)), float, len(x) )	# Residuals from Best Fit.
+		R = y - np.polyval( abc, x )		# Residuals from Best Fit.
 
 		# Root mean square error.
 		rmse = math.sqrt( np.dot(R,R) / (len(x)-1) )	# dot(R,R) = sum of squares
-		iBest, zMax = None, zThreshold					# 2.0 = 95% of normal distribution within mean.
-		for i, r in enumerate(R):
-			z = abs(r/rmse)		# Scale residual to standard normal.  Mean is always zero for residuals.
-			if z > zMax:
-				iBest, zMax = i, z
-		if iBest is None:
+		with np.errstate( divide='ignore', invalid='ignore' ):
+			Z = np.abs( R / rmse )			# Scale residual to standard normal.  Mean is always zero for residuals.
+		iBest = int( np.argmax(Z) )
+		if not Z[iBest] > zThreshold:		# 2.0 = 95% of normal distribution within mean.
 			break
 			
 		# Eliminate the maximum outlier found.
 		x = np.delete( x, iBest )
 		y = np.delete( y, iBest )
 		abc = np.polyfit(x, y, 2)
-		p = np.poly1d( abc )
 
 	if returnDetails:
 		inliers = tuple( zip(x, y) )
 		inliersSet = set( inliers )
-		outliers = tuple( d for d in data if d not in inliersSet )
+		outliers = tuple( d for d in zip(xData, yData) if d not in inliersSet )
 		return abc, inliers, outliers
 	
 	return abc
@@ -118,8 +116,9 @@ def QuadRegRemoveOutliersRansac( data, returnDetails=False ):
 	if lenData < 3:
 		raise ValueError( 'data must have >= 3 values' )
 		
-	tMin = min( d[0] for d in data )
-	tMax = max( d[0] for d in data )
+	# Convert input to numpy.
+	x, y = toXY( data )
+	tMin, tMax = x.min(), x.max()
 	
 	def modelValid( model, inliers=None ):
 		if model[0] >= 0:
@@ -144,13 +143,9 @@ def QuadRegRemoveOutliersRansac( data, returnDetails=False ):
 	bestModel = None		# Cooefs of the parabolic
 	bestD = minD			# Best number of points within threshold distance of model.  Initialize to minimum.
 	
-	# Convert input to numpy.
-	x = np.fromiter( (d[0] for d in data), float, lenData )
-	y = np.fromiter( (d[1] for d in data), float, lenData )
-	
 	# Bias the sample to consider the strongest reads.
-	indexes = sorted( list(range(lenData)), key=lambda i: data[i][1], reverse=True )
-	indexes = np.fromiter( (i for i in indexes[:max(int(lenData*0.75), 6)]), int )
+	indexes = sorted( list(range(lenData)), key=lambda i: y[i], reverse=True )
+	indexes = np.array( indexes[:max(int(lenData*0.75), 6)], dtype=int )
 	
 	P = 0.99		# Desired probability that we have found an uncontaminated model.
 	K = lenData*10	# Minimum number of samples required to find an uncontaminated model.
@@ -169,7 +164,7 @@ def QuadRegRemoveOutliersRansac( data, returnDetails=False ):
 		
 		# Get all points within range of model.
 		alsoInliers = np.abs(np.polyval(maybeModel, x)-y) < t
-		curD = sum( alsoInliers )
+		curD = np.count_nonzero( alsoInliers )
 		
 		if curD >= bestD:
 			betterModel = np.polyfit(x[alsoInliers], y[alsoInliers], 2)
@@ -205,7 +200,7 @@ def QuadRegRemoveOutliersRansac( data, returnDetails=False ):
 		inliers = np.abs(np.polyval(bestModel, x)-y) < t
 		inliers = tuple( zip(x[inliers], y[inliers]) )
 		inliersSet = set( inliers )
-		outliers = tuple( d for d in data if d not in inliersSet )
+		outliers = tuple( d for d in zip(x, y) if d not in inliersSet )
 		return bestModel, inliers, outliers
 	
 	return bestModel
@@ -215,6 +210,234 @@ def QuadRegExtreme( data, f=QuadRegRemoveOutliersRansac ):
 	if a >= 0.0:
 		raise ValueError( 'invalid quadratic: cannot open up' )
 	return -b / (2.0 * a)
+
+#-----------------------------------------------------------------------
+# Batch versions.
+#
+# Fit many data sets (eg. all tags that just left the read zone) in one vectorized pass.
+# The data sets are concatenated, and the fits are done with per-set weighted sums (the normal equations),
+# so the cost does not depend on the number of Python calls.
+# To keep the normal equations well conditioned, x is centered on the mean of each data set.
+# Models are returned in uncentered polyfit order (a, b, c) with nan rows for data sets that could not be fit.
+#
+class QuadRegBatchData:
+	def __init__( self, datas ):
+		xy = [toXY(d) for d in datas]
+		self.m = len(xy)
+		self.counts = np.array( [len(x) for x, y in xy], dtype=int )
+		if (self.counts < 3).any():
+			raise ValueError( 'data must have >= 3 values' )
+		self.starts = np.zeros( self.m, dtype=int )
+		np.cumsum( self.counts[:-1], out=self.starts[1:] )
+		self.iSeg = np.repeat( np.arange(self.m), self.counts )		# Data set of each point.
+		x = np.concatenate( [x for x, y in xy] )
+		self.y = np.concatenate( [y for x, y in xy] )
+		self.xMean = np.add.reduceat( x, self.starts ) / self.counts
+		self.x = x - self.xMean[self.iSeg]
+		self.xPowers = [np.ones_like(self.x), self.x]
+		for k in range(2, 5):
+			self.xPowers.append( self.xPowers[-1] * self.x )
+	
+	def subset( self, keep ):
+		# Return the batch data of the data sets in keep.  Points keep their centering.
+		bd = QuadRegBatchData.__new__( QuadRegBatchData )
+		keepPoints = keep[self.iSeg]
+		bd.m = int( keep.sum() )
+		bd.counts = self.counts[keep]
+		bd.starts = np.zeros( bd.m, dtype=int )
+		np.cumsum( bd.counts[:-1], out=bd.starts[1:] )
+		bd.iSeg = np.repeat( np.arange(bd.m), bd.counts )
+		bd.y = self.y[keepPoints]
+		bd.xMean = self.xMean[keep]
+		bd.x = self.x[keepPoints]
+		bd.xPowers = [p[keepPoints] for p in self.xPowers]
+		return bd
+	
+	def sum( self, v ):
+		return np.add.reduceat( v, self.starts )
+	
+	def fit( self, w ):
+		# Weighted least squares fit of all data sets.  w is 0 or 1 for each point.  Returns centered models.
+		# Solve the symmetric 3x3 systems with the adjugate.  Singular systems give nan models.
+		S0, S1, S2, S3, S4 = [self.sum(w * p) for p in self.xPowers]
+		wy = w * self.y
+		T0, T1, T2 = [self.sum(wy * p) for p in self.xPowers[:3]]
+		c00 = S2*S0 - S1*S1
+		c01 = S2*S1 - S3*S0
+		c02 = S3*S1 - S2*S2
+		c11 = S4*S0 - S2*S2
+		c12 = S3*S2 - S4*S1
+		c22 = S4*S2 - S3*S3
+		with np.errstate( divide='ignore', invalid='ignore' ):
+			det = S4*c00 + S3*c01 + S2*c02
+			det = np.where( np.abs(det) > 1.0e-12 * np.abs(S4*S2*S0), det, np.nan )
+			return np.stack( [
+				(c00*T2 + c01*T1 + c02*T0) / det,
+				(c01*T2 + c11*T1 + c12*T0) / det,
+				(c02*T2 + c12*T1 + c22*T0) / det,
+			], axis=-1 )
+	
+	def eval( self, models ):
+		# Evaluate the centered model of each data set at its points.
+		mp = models[self.iSeg]
+		return (mp[:,0] * self.x + mp[:,1]) * self.x + mp[:,2]
+		
+	def uncenter( self, models ):
+		a, b, c = models[:,0], models[:,1], models[:,2]
+		m = self.xMean
+		return np.stack( [a, b - 2.0*a*m, (a*m - b)*m + c], axis=-1 )
+	
+	def isValid( self, models, w ):
+		# Models must open down, have a reasonable db value at the apex, and have the apex within the range of the points.
+		a, b, c = models[:,0], models[:,1], models[:,2]
+		with np.errstate( divide='ignore', invalid='ignore' ):
+			apexX = -b / (2.0 * a)
+			apexY = c - b * b / (4.0 * a)
+		inside = w > 0
+		xMin = np.minimum.reduceat( np.where(inside, self.x, np.inf), self.starts )
+		xMax = np.maximum.reduceat( np.where(inside, self.x, -np.inf), self.starts )
+		return (a < 0.0) & ~(apexY > 0.0) & (xMin <= apexX) & (apexX <= xMax)
+	
+	def firstMaxIndex( self, v, mask ):
+		# Return the index of the first maximum value of v in each data set in mask.
+		vMax = np.maximum.reduceat( v, self.starts )
+		iMax = np.flatnonzero( (v == vMax[self.iSeg]) & mask[self.iSeg] )
+		segs, iFirst = np.unique( self.iSeg[iMax], return_index=True )
+		return iMax[iFirst]
+	
+def QuadRegBatch( datas ):
+	bd = QuadRegBatchData( datas )
+	return bd.uncenter( bd.fit(np.ones_like(bd.x)) )
+
+def QuadRegRemoveOutliersRobustBatch( datas ):
+	# Batch version of QuadRegRemoveOutliersRobust.  Removes the worst outlier of every data set on each pass.
+	bd = QuadRegBatchData( datas )
+	zThreshold = 1.9
+	
+	w = np.ones_like( bd.x )
+	while True:
+		models = bd.fit( w )
+		R = (bd.y - bd.eval(models)) * w
+		n = bd.sum( w )
+		with np.errstate( divide='ignore', invalid='ignore' ):
+			rmse = np.sqrt( bd.sum(R * R) / (n - 1) )
+			Z = np.where( w > 0, np.abs(R / rmse[bd.iSeg]), -1.0 )
+		Z[np.isnan(Z)] = -1.0
+		candidates = (n > 3) & (np.maximum.reduceat(Z, bd.starts) > zThreshold)
+		if not candidates.any():
+			break
+		w[bd.firstMaxIndex(Z, candidates)] = 0.0
+	
+	return bd.uncenter( models )
+
+def QuadRegRemoveOutliersRansacBatch( datas ):
+	# Batch version of QuadRegRemoveOutliersRansac.
+	# Each pass proposes a model for every data set still searching.
+	# When most data sets are done, the remaining ones are compacted so the passes only process the active points.
+	global inliersTotal, samplesTotal
+	
+	bdAll = QuadRegBatchData( datas )
+	
+	np.random.seed( 123456789 )
+	
+	t = 3								# Distance from parabolic curve where a point is considered an inlier.
+	P = 0.99							# Desired probability that we have found an uncontaminated model.
+	
+	modelAll = np.full( (bdAll.m, 3), np.nan )		# Cooefs of the centered parabolic.
+	inliersAll = np.zeros( bdAll.m, dtype=int )
+	
+	bd = bdAll
+	ids = np.arange( bdAll.m )			# Index of each data set in bdAll.
+	counts = bd.counts
+	n = np.maximum( counts // 10, 3 )	# Number of points used to define a proposed model.
+	minD = (counts * 0.75).astype(int)	# Minimum number of points that must be matched to consider the model valid.
+	bestErr = np.full( bd.m, np.inf )	# Best Sum of abs Residuals.
+	bestModel = np.full( (bd.m, 3), np.nan )
+	hasBest = np.zeros( bd.m, dtype=bool )
+	bestD = minD.copy()					# Best number of points within threshold distance of model.  Initialize to minimum.
+	K = counts * 10.0					# Minimum number of samples required to find an uncontaminated model.
+	samples = np.zeros( bd.m, dtype=int )
+	KBad = counts						# Max number of allowed bad samples (invalid models).
+	samplesBad = np.zeros( bd.m, dtype=int )
+	active = np.ones( bd.m, dtype=bool )
+	poolBD = None
+	
+	while True:
+		if not active.all():
+			# Save the finished data sets.
+			done = ~active
+			modelAll[ids[done]] = bestModel[done]
+			inliersAll[ids[done]] = np.where( hasBest[done], bestD[done], 0 )
+			if not active.any():
+				break
+			if active.sum() * 2 < len(active):
+				bd = bd.subset( active )
+				ids, counts, n, bestErr, bestModel, hasBest, bestD, K, samples, KBad, samplesBad = (
+					v[active] for v in (ids, counts, n, bestErr, bestModel, hasBest, bestD, K, samples, KBad, samplesBad)
+				)
+				active = active[active]
+		
+		iSeg = bd.iSeg
+		if bd is not poolBD:
+			# Bias the sample to consider the strongest reads.
+			iSorted = np.lexsort( (np.arange(len(iSeg)), -bd.y, iSeg) )			# By data set, then by decreasing db (stable).
+			rank = np.arange( len(iSeg) ) - bd.starts[iSeg]
+			pool = iSorted[rank < np.maximum( (counts * 0.75).astype(int), 6 )[iSeg]]
+			poolSeg = iSeg[pool]
+			poolRank = np.arange( len(pool) ) - np.searchsorted( poolSeg, np.arange(bd.m) )[poolSeg]
+			allPoints = np.ones_like( bd.x )
+			poolBD = bd
+		
+		# Choose n random points from the pool of each data set.
+		order = np.lexsort( (np.random.random(len(pool)), poolSeg) )
+		w = np.zeros_like( bd.x )
+		w[pool[order][poolRank < n[poolSeg]]] = 1.0
+		
+		maybeModel = bd.fit( w )
+		valid = active & bd.isValid( maybeModel, allPoints )
+		samplesBad += active & ~valid
+		
+		# Get all points within range of model.
+		alsoInliers = (np.abs(bd.eval(maybeModel) - bd.y) < t) & valid[iSeg]
+		curD = bd.sum( alsoInliers.astype(int) )
+		
+		better = valid & (curD >= bestD)
+		betterModel = bd.fit( alsoInliers.astype(float) )
+		betterValid = better & bd.isValid( betterModel, alsoInliers )
+		samplesBad += better & ~betterValid
+		
+		improved = betterValid & ((curD > bestD) | ~hasBest)
+		bestD = np.where( improved, curD, bestD )
+		bestErr = np.where( improved, np.inf, bestErr )	# Ensure we accept this better fitting model.
+		
+		# Use adaptive estimation to update number of samples required to find
+		# a sample model with uncontaminated points.
+		with np.errstate( divide='ignore', invalid='ignore' ):
+			KNew = 2.0 * np.log(1.0 - P) / np.log(1.0 - (curD / counts)**n)	# Multiply by 2 for extra safety.
+		K = np.where( improved, np.where(curD < counts, KNew, samples), K )	# If the model includes all points - time to quit.
+		
+		thisErr = bd.sum( np.where(alsoInliers, np.abs(bd.eval(betterModel) - bd.y), 0.0) )
+		accept = betterValid & (thisErr < bestErr)
+		bestModel[accept] = betterModel[accept]
+		bestErr = np.where( accept, thisErr, bestErr )
+		hasBest |= accept
+		
+		samples += valid & (~better | betterValid)
+		active = (samples < K) & (samplesBad < KBad)
+	
+	samplesTotal += int( bdAll.counts.sum() )
+	inliersTotal += int( inliersAll.sum() )
+	
+	return bdAll.uncenter( modelAll )
+
+def QuadRegExtremeBatch( datas, f=QuadRegRemoveOutliersRansacBatch ):
+	# Return the x of the maximum of each data set, or nan if there is no valid maximum.
+	if not datas:
+		return np.zeros( 0 )
+	models = f( datas )
+	a, b = models[:,0], models[:,1]
+	with np.errstate( divide='ignore', invalid='ignore' ):
+		return np.where( a < 0.0, -b / (2.0 * a), np.nan )
 	
 if __name__ == '__main__':
 	data = '''i	Temperature	Yield
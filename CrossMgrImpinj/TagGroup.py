@@ -5,7 +5,9 @@ import threading
 from time import sleep
 from datetime import datetime, timedelta
 from queue import Queue, Empty
+import numpy as np
 from QuadReg import QuadRegExtreme, QuadRegRemoveOutliersRansac, QuadReg
+from QuadReg import QuadRegExtremeBatch, QuadRegRemoveOutliersRansacBatch, QuadRegBatch
 
 # Use a reference time to convert given times to float seconds.
 tRef = datetime.now()
@@ -26,55 +28,69 @@ MostReadsChoice, DBMaxChoice = 0, 1
 AntennaChoiceNames = ('Most Reads', 'Max Signal dB')
 	
 class AntennaReads:
-	__slots__ = ('firstRead', 'reads', 'trDbMax', 'dbMax')
+	__slots__ = ('firstRead', 'buf', 'n', 'trDbMax', 'dbMax')
 	
 	def __init__( self, tr, db ):
+		# Reads are kept in a preallocated (tr, db) array so they can be passed to the regression without conversion.
 		self.firstRead = tr
-		self.reads = [(tr, db)]
+		self.buf = np.empty( (32, 2) )
+		self.buf[0] = (tr, db)
+		self.n = 1
 		self.trDbMax, self.dbMax = tr, db
 	
+	@property
+	def reads( self ):
+		return self.buf[:self.n]
+	
 	def add( self, tr, db ):
 		if self.isStray:
 			# if a stray, just replace the last entry.
-			if len(self.reads) > 1:
-				del self.reads[:-1]		
-			self.reads[-1] = (tr, db)
+			self.buf[0] = (tr, db)
+			self.n = 1
 		else:
-			self.reads.append( (tr, db) )
+			if self.n == len(self.buf):
+				self.buf = np.concatenate( (self.buf, np.empty_like(self.buf)) )
+			self.buf[self.n] = (tr, db)
+			self.n += 1
 			if db > self.dbMax:
 				self.trDbMax, self.dbMax = tr, db
 	
+	def keepLast( self ):
+		self.buf[0] = self.buf[self.n-1]
+		self.n = 1
+	
 	@property
 	def isStray( self ):
-		return self.reads[-1][0] - self.firstRead > tStray
+		return self.buf[self.n-1,0] - self.firstRead > tStray
 	
 	@property
 	def lastRead( self ):
-		return self.reads[-1][0]
+		return self.buf[self.n-1,0]
 	
 	@property
 	def medianRead( self ):
-		if (len(self.reads) & 1) == 1:
-			return self.reads[len(reads)//2][0]
-		else:
-			iMid = len(self.reads)//2
-			return (self.reads[iMid-1][0] + self.reads[iMid][0]) / 2.0
+		return float( np.median(self.buf[:self.n,0]) )
+	
+	def needsRegression( self, method ):
+		return not self.isStray and method == QuadraticRegressionMethod and self.n >= 3
+	
+	def checkEstimate( self, trEst ):
+		# If the estimate is invalid (nan) or lies outside the data, return the strongest read.
+		if not self.buf[0,0] <= trEst <= self.buf[self.n-1,0]:
+			return self.trDbMax, 1
+		return trEst, self.n
 	
 	def getBestEstimate( self, method=QuadraticRegressionMethod, removeOutliers=True ):
 		if self.isStray:
 			return self.firstRead, 1
 		
-		if method == QuadraticRegressionMethod and len(self.reads) >= 3:
+		if self.needsRegression( method ):
 			try:
-				trEst, sampleSize = QuadRegExtreme(self.reads, QuadRegRemoveOutliersRansac if removeOutliers else QuadReg), len(self.reads)
+				trEst = QuadRegExtreme(self.reads, QuadRegRemoveOutliersRansac if removeOutliers else QuadReg)
 			except Exception as e:
 				# If error, return the strongest read.
-				trEst, sampleSize = self.trDbMax, 1
-			
-			# If the estimate lies outside the data, return the strongest read.
-			if not self.reads[0][0] <= trEst <= self.reads[-1][0]:
-				trEst, sampleSize = self.trDbMax, 1
-			return trEst, sampleSize
+				return self.trDbMax, 1
+			return self.checkEstimate( trEst )
 		
 		else:	# method == StrongestReadMethod or len(self.reads) < 3
 			return self.trDbMax, len(self.reads)
@@ -108,15 +124,18 @@ class TagGroupEntry:
 	def setStray( self ):
 		for ar in self.antennaReads:
 			if ar:
-				del ar.reads[:-1]	# Delete all but last read.
+				ar.keepLast()	# Delete all but last read.
 		self.isStray = True
 	
+	def getBestAntennaReads( self, antennaChoice=MostReadsChoice ):
+		return max( ((a, ar) for a, ar in enumerate(self.antennaReads) if ar), key=self.antennaQRCmp[antennaChoice] )
+	
 	def getBestEstimate( self, method=QuadraticRegressionMethod, antennaChoice=MostReadsChoice, removeOutliers=True ):
 		if self.isStray:
 			return trToDatetime( self.firstReadMin ), 1, 0
 		
 		if method == QuadraticRegressionMethod:
-			a, arBest = max( ((a, ar) for a, ar in enumerate(self.antennaReads) if ar), key=self.antennaQRCmp[antennaChoice] )
+			a, arBest = self.getBestAntennaReads( antennaChoice )
 			tr, sampleSize = arBest.getBestEstimate( method, removeOutliers )
 			return trToDatetime(tr), sampleSize, a+1
 		
@@ -169,13 +188,22 @@ class TagGroup:
 		trNow = datetimeToTr( tNow or datetime.now() )
 		reads, strays = [], []
 		toDelete = []
+		regressions = []	# (tag, antennaReads, antennaID) to estimate in one batch.
 		
 		with self.tagInfoLock:
 			for tag, tge in list(self.tagInfo.items()):				# Make a local copy to avoid updpate conflicts.
 				if trNow - tge.lastReadMax >= tQuiet:				# Tag has left read range.
 					if not tge.isStray:
-						t, sampleSize, antennaID = tge.getBestEstimate(method, antennaChoice, removeOutliers)
-						reads.append( (tag, t, sampleSize, antennaID) )
+						if method == QuadraticRegressionMethod:
+							a, ar = tge.getBestAntennaReads( antennaChoice )
+							if ar.needsRegression( method ):
+								regressions.append( (tag, ar, a+1) )
+							else:
+								tr, sampleSize = ar.getBestEstimate( method, removeOutliers )
+								reads.append( (tag, trToDatetime(tr), sampleSize, a+1) )
+						else:
+							t, sampleSize, antennaID = tge.getBestEstimate(method, antennaChoice, removeOutliers)
+							reads.append( (tag, t, sampleSize, antennaID) )
 					toDelete.append( tag )
 				elif tge.lastReadMax - tge.firstReadMin >= tStray:	# This is a stray.
 					t = trToDatetime( tge.firstReadMin )
@@ -187,6 +215,23 @@ class TagGroup:
 			for tag in toDelete:
 				del self.tagInfo[tag]
 		
+		# Estimate all the tags that left the read range in one vectorized pass.
+		if regressions:
+			try:
+				trEsts = QuadRegExtremeBatch( [ar.reads for tag, ar, antennaID in regressions], QuadRegRemoveOutliersRansacBatch if removeOutliers else QuadRegBatch )
+			except Exception as e:
+				# If error, estimate each tag separately (returns the strongest read on error).
+				trEsts = None
+			
+			if trEsts is None:
+				for tag, ar, antennaID in regressions:
+					tr, sampleSize = ar.getBestEstimate( method, removeOutliers )
+					reads.append( (tag, trToDatetime(tr), sampleSize, antennaID) )
+			else:
+				for (tag, ar, antennaID), trEst in zip(regressions, trEsts):
+					tr, sampleSize = ar.checkEstimate( float(trEst) )
+					reads.append( (tag, trToDatetime(tr), sampleSize, antennaID) )
+		
 		reads.sort( key=operator.itemgetter(1,0))
 		strays.sort( key=operator.itemgetter(1,0) )
 		return reads, strays
@@ -0,0 +1,178 @@
+import sys
+import random
+from math import log
+from time import perf_counter
+from datetime import datetime, timedelta
+import numpy as np
+from TagGroup import TagGroup, QuadraticRegressionMethod, MostReadsChoice, trToDatetime
+
+#
+# Compare the original estimator (lists of (tr, db) tuples converted with np.fromiter) to the
+# per-tag estimator (TagGroupEntry.getBestEstimate) and the batch estimator used by TagGroup.getReadsStrays.
+# Simulates a mass start: many tags pass the antenna in a short interval.
+#
+
+#------------------------------------------------------------------------------------------------
+# Copy of the original estimator, kept as the reference for the speedup.
+#
+def OriginalQuadReg( data ):
+	lenData = len(data)
+	if lenData < 3:
+		raise ValueError( 'data must have >= 3 values' )
+	return np.polyfit( np.fromiter( (d[0] for d in data), float, lenData), np.fromiter( (d[1] for d in data), float, lenData), 2 )
+
+def OriginalQuadRegRemoveOutliersRansac( data ):
+	lenData = len(data)
+	if lenData < 3:
+		raise ValueError( 'data must have >= 3 values' )
+		
+	tMin = min( d[0] for d in data )
+	tMax = max( d[0] for d in data )
+	
+	def modelValid( model, inliers=None ):
+		if model[0] >= 0:
+			return False	# Parabola cannot open up
+		
+		apexX = -model[1] / (2.0 * model[0])
+		if np.polyval(model, apexX) > 0.0:
+			return False	# db value must be reasonable.
+		
+		# Estimated point must be in range of samples.
+		return (tMin <= apexX <= tMax) if inliers is None else (min(x[inliers]) <= apexX <= max(x[inliers]))
+	
+	np.random.seed( 123456789 )
+	
+	n = max( lenData // 10, 3 )
+	t = 3
+	minD = int(lenData * 0.75)
+	bestErr = np.inf
+	bestModel = None
+	bestD = minD
+	
+	x = np.fromiter( (d[0] for d in data), float, lenData )
+	y = np.fromiter( (d[1] for d in data), float, lenData )
+	
+	indexes = sorted( list(range(lenData)), key=lambda i: data[i][1], reverse=True )
+	indexes = np.fromiter( (i for i in indexes[:max(int(lenData*0.75), 6)]), int )
+	
+	P = 0.99
+	K = lenData*10
+	samples = 0
+	
+	KBad = lenData
+	samplesBad = 0
+	
+	while samples < K and samplesBad < KBad:
+		np.random.shuffle( indexes )
+		maybeInliers = indexes[:n]
+		maybeModel = np.polyfit(x[maybeInliers], y[maybeInliers], 2)
+		if not modelValid(maybeModel):
+			samplesBad += 1
+			continue
+		
+		alsoInliers = np.abs(np.polyval(maybeModel, x)-y) < t
+		curD = sum( alsoInliers )
+		
+		if curD >= bestD:
+			betterModel = np.polyfit(x[alsoInliers], y[alsoInliers], 2)
+			if not modelValid(betterModel, alsoInliers):
+				samplesBad += 1
+				continue
+			
+			if curD > bestD or bestModel is None:
+				bestD = curD
+				bestErr = np.inf
+				if curD < lenData:
+					w = float(curD) / float(lenData)
+					K = 2.0 * log(1.0 - P) / log(1.0 - w**n)
+				else:
+					K = samples
+				
+			thisErr = np.sum(np.abs(np.polyval(betterModel, x[alsoInliers])-y[alsoInliers]))
+			if thisErr < bestErr:
+				bestModel = betterModel
+				bestErr = thisErr
+		
+		samples += 1
+	
+	return bestModel
+
+def OriginalBestEstimate( reads, trDbMax, removeOutliers ):
+	# reads is a list of (tr, db) tuples, as in the original AntennaReads.
+	if len(reads) < 3:
+		return trDbMax, len(reads)
+	try:
+		a, b, c = (OriginalQuadRegRemoveOutliersRansac if removeOutliers else OriginalQuadReg)( reads )
+		if a >= 0.0:
+			raise ValueError( 'invalid quadratic: cannot open up' )
+		trEst, sampleSize = -b / (2.0 * a), len(reads)
+	except Exception as e:
+		trEst, sampleSize = trDbMax, 1
+	if not reads[0][0] <= trEst <= reads[-1][0]:
+		trEst, sampleSize = trDbMax, 1
+	return trEst, sampleSize
+
+#------------------------------------------------------------------------------------------------
+
+def genReadProfile( tg, t, tag, antenna=1, yTop=-47, stddev=2.0, pointCount=18 ):
+	xRange = 0.5
+	yRange = 25
+
+	yMult = yRange / ((pointCount/2.0) ** 2)
+	tDelta = xRange / pointCount
+	for i in range(pointCount):
+		x = i - pointCount/2.0
+		noise = random.normalvariate( 0.0, stddev )
+		y = yTop - x * x * yMult
+		# Report integer values, just like the reader would.
+		tg.add( antenna, tag, t + timedelta( seconds=x*tDelta ), round(y+noise) )
+
+def makeTagGroup( tStart, tagCount, stddev ):
+	random.seed( 12345 )
+	tg = TagGroup()
+	tTruth = {}
+	for i in range(tagCount):
+		tag = '{:06d}'.format(i)
+		t = tStart + timedelta( seconds=random.uniform(0.0, 10.0) )
+		tTruth[tag] = t
+		genReadProfile( tg, t, tag, stddev=stddev, pointCount=random.randint(8, 40) )
+	tg.flush()
+	return tg, tTruth
+
+def rmsError( estimates, tTruth ):
+	return (sum( (t - tTruth[tag]).total_seconds() ** 2 for tag, t in estimates ) / len(estimates)) ** 0.5
+
+def Benchmark( tagCount=300, stddev=2.0, removeOutliers=True ):
+	tStart = datetime.now()
+	tNow = tStart + timedelta( seconds=60.0 )
+
+	tg, tTruth = makeTagGroup( tStart, tagCount, stddev )
+	tagReads = []
+	for tag, tge in tg.tagInfo.items():
+		a, ar = tge.getBestAntennaReads( MostReadsChoice )
+		tagReads.append( (tag, [tuple(r) for r in ar.reads.tolist()], ar.trDbMax) )
+	t0 = perf_counter()
+	estimates = [(tag, trToDatetime(OriginalBestEstimate(reads, trDbMax, removeOutliers)[0])) for tag, reads, trDbMax in tagReads]
+	tOriginal = perf_counter() - t0
+	errOriginal = rmsError( estimates, tTruth )
+
+	t0 = perf_counter()
+	estimates = [(tag, tge.getBestEstimate(QuadraticRegressionMethod, MostReadsChoice, removeOutliers)[0]) for tag, tge in tg.tagInfo.items()]
+	tPerTag = perf_counter() - t0
+	errPerTag = rmsError( estimates, tTruth )
+
+	t0 = perf_counter()
+	reads, strays = tg.getReadsStrays( tNow, QuadraticRegressionMethod, MostReadsChoice, removeOutliers )
+	tBatch = perf_counter() - t0
+	errBatch = rmsError( [(tag, t) for tag, t, sampleSize, antennaID in reads], tTruth )
+
+	print( 'tags={} stddev={} removeOutliers={}: original {:.1f}ms (rms {:.4f}s), per-tag {:.1f}ms (rms {:.4f}s), batch {:.1f}ms (rms {:.4f}s), speedup vs original {:.1f}x'.format(
+		tagCount, stddev, removeOutliers,
+		tOriginal*1000.0, errOriginal, tPerTag*1000.0, errPerTag, tBatch*1000.0, errBatch, tOriginal / tBatch,
+	) )
+
+if __name__ == '__main__':
+	tagCount = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+	for removeOutliers in (False, True):
+		for stddev in (1.0, 2.0, 4.0):
+			Benchmark( tagCount, stddev, removeOutliers )
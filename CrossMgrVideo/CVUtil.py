@@ -102,6 +102,22 @@ def jpegToFrame( jpeg ):
 	frame = simplejpeg.decode_jpeg( data=jpeg, colorspace='BGR' )
 	return frame
 
+ThumbWidth = 240
+
+def jpegToThumb( jpeg, width=ThumbWidth ):
+	# Return a small jpeg of the photo for browsing.
+	# Decode at the smallest DCT scale (1/2, 1/4, 1/8) that is still at least width wide.
+	# This is much faster than a full decode and resize.
+	height_jpeg, width_jpeg = simplejpeg.decode_jpeg_header( jpeg )[:2]
+	d = 8
+	while d > 1 and width_jpeg // d < width:
+		d //= 2
+	if d > 1:
+		frame = simplejpeg.decode_jpeg( jpeg, colorspace='BGR', min_height=-(-height_jpeg//d), min_width=-(-width_jpeg//d) )
+	else:
+		frame = simplejpeg.decode_jpeg( jpeg, colorspace='BGR' )
+	return simplejpeg.encode_jpeg( frame, quality=70, colorspace='BGR' )
+
 def jpegToImage( jpeg ):
 	return frameToImage(jpegToFrame(jpeg))
 	
@@ -1,12 +1,14 @@
+import os
 import cv2
 import time
 import queue
 from queue import Empty, Queue
+from concurrent.futures import ThreadPoolExecutor
 
-from threading import Thread, Timer
+from threading import Thread, Timer, Lock
 
 from datetime import datetime, timedelta
-from FrameCircBuf import FrameCircBuf
+from FrameCircBuf import FrameCircBuf, FrameRef
 from FIFOCache import FIFOCacheSet
 import CVUtil
 
@@ -72,6 +74,82 @@ class VideoCaptureManager:
 		self.cap.release()
 
 bufferSeconds = 8
+rawBufferBytes = 1024*1024*1024		# Memory limit of the raw frame buffer.  Limits bufferSeconds for large frames.
+
+class StageTiming:
+	'''
+		Time spent in each stage of the camera loop, accumulated between reports.
+		The encode stage runs in the worker threads.
+	'''
+	stages = ('read', 'buffer', 'process', 'encode')
+	
+	def __init__( self ):
+		self.lock = Lock()
+		self.reset()
+	
+	def reset( self ):
+		with self.lock:
+			self.seconds = {s:0.0 for s in self.stages}
+			self.counts = {s:0 for s in self.stages}
+	
+	def add( self, stage, seconds, count=1 ):
+		with self.lock:
+			self.seconds[stage] += seconds
+			self.counts[stage] += count
+	
+	def getReport( self, elapsed ):
+		# Return the average milliseconds per frame of each stage, and the frames per second of each stage.
+		with self.lock:
+			report = {'{}_ms'.format(s):(self.seconds[s] * 1000.0 / self.counts[s] if self.counts[s] else 0.0) for s in self.stages}
+			report['encode_fps'] = self.counts['encode'] / elapsed if elapsed > 0.0 else 0.0
+		self.reset()
+		return report
+
+class FrameEncoder:
+	'''
+		Encode frames to jpeg in a pool of worker threads, then send them to qOut.
+		Only the frames that will be written to the database are encoded.
+		Frames can be FrameRefs into the frame buffer.  These are encoded in place without a copy.
+		A frame overwritten before it could be encoded is dropped.
+	'''
+	def __init__( self, qOut, timing, workers=None ):
+		self.qOut = qOut
+		self.timing = timing
+		self.pending = 0
+		self.dropped = 0
+		self.lock = Lock()
+		self.workers = workers or max( 1, min(4, (os.cpu_count() or 2) // 2) )
+		self.pool = ThreadPoolExecutor( max_workers=self.workers, thread_name_prefix='FrameEncoder' )
+	
+	def encode( self, ts_frames ):
+		tStart = time.perf_counter()
+		ts_jpgs = []
+		for t, f in ts_frames:
+			if isinstance(f, FrameRef):
+				jpg = CVUtil.toJpeg( f.get() )
+				if not f.isValid():		# Overwritten during the encode.
+					jpg = None
+			else:
+				jpg = CVUtil.toJpeg( f )
+			if jpg is not None:
+				ts_jpgs.append( (t, jpg) )
+		self.timing.add( 'encode', time.perf_counter() - tStart, len(ts_frames) )
+		with self.lock:
+			self.pending -= len(ts_frames)
+			self.dropped += len(ts_frames) - len(ts_jpgs)
+		self.qOut.put( {'cmd':'response', 'ts_frames':ts_jpgs} )
+	
+	def submit( self, ts_frames ):
+		with self.lock:
+			self.pending += len(ts_frames)
+		# Split large requests so they are encoded in parallel.
+		n = max( 1, len(ts_frames) // self.workers )
+		for i in range(0, len(ts_frames), n):
+			self.pool.submit( self.encode, ts_frames[i:i+n] )
+	
+	def shutdown( self ):
+		# Finish encoding all submitted frames.
+		self.pool.shutdown( wait=True )
 
 class TimeInterval:
 	def __init__( self, start, end ):
@@ -96,6 +174,8 @@ def CamServer( qIn, qOut, camInfo=None ):
 	tsSeen = FIFOCacheSet( 60*60 )		# Cache of times that have already been written to the database.
 	camInfo = camInfo or {}
 	backlog = []
+	timing = StageTiming()
+	encoder = FrameEncoder( qOut, timing )
 	
 	#print( 'CamServer: camInfo={}'.format(camInfo) )
 	
@@ -119,19 +199,23 @@ def CamServer( qIn, qOut, camInfo=None ):
 			intervals = []									# Current intervals we are capturing for.
 			captureLatency = timedelta( seconds=0.0 )		# Delay it takes for frame to get from the camera to the computer.
 			
-			fcb = FrameCircBuf( int(camInfo.get('fps', 30) * bufferSeconds) )
+			fcb = FrameCircBuf( int(camInfo.get('fps', 30) * bufferSeconds), rawBufferBytes )
 			
 			# Get the available usb ports.  If the current port succeeded, don't waste time checking it again.
 			backgroundGetCameraUsb( camInfo['usb'] if cap.isOpened() else None, camInfo )
 			
 			while keepCapturing:
 				# Read the frame.  If anything fails, keep going in the loop so we can reset with another camInfo.
+				tRead = time.perf_counter()
 				if not cap.isOpened():
 					ret, frame = False, None
 					time.sleep( 0.5 )		# Keep going so we can get a camInfo to try again.
 				else:						
 					try:
-						ret, frame = cap.read()
+						# Read directly into the next slot of the frame buffer (if available).
+						ret, frame = cap.read( fcb.getWriteBuffer() )
+						if not ret:
+							frame = None
 					except Exception as e:	# Potential out of memory error?
 						ret, frame = False, None
 					except KeyboardInterrupt:
@@ -139,15 +223,20 @@ def CamServer( qIn, qOut, camInfo=None ):
 				
 				# Get the closest time to the read.
 				ts = now()
+				tBuffer = time.perf_counter()
+				timing.add( 'read', tBuffer - tRead )
 				
-				# If the frame is not in jpeg format, encode it now.  This spreads out the CPU per frame rather than when
-				# we send a group of photos for a capture.
-				opencv_frame = frame
-				frame = CVUtil.toJpeg( frame )
-				
-				# Add the frame to the circular buffer.  Adjust for the capture latency.
+				# Keep the raw frame in the circular buffer.
+				# Frames are only encoded to jpeg when they are sent to the database.
+				# Adjust for the capture latency.
 				tsFrame = ts - captureLatency
 				fcb.append( tsFrame, frame )
+				tProcess = time.perf_counter()
+				timing.add( 'buffer', tProcess - tBuffer )
+				
+				# Send references to the frames in the buffer rather than copies.
+				# If the encoder falls behind, copy the frames so they are not overwritten before they are encoded.
+				share = encoder.pending < fcb.bufSize // 2
 				
 				# Process all pending requests.
 				# Do this as quickly as possible so we can keep up with the camera's frame rate.
@@ -168,7 +257,7 @@ def CamServer( qIn, qOut, camInfo=None ):
 						tiCur = TimeInterval( m['tStart'], m['tEnd'] )
 						
 						# Process all frames before the current time.
-						backlog.extend( (t, f) for t, f in zip(*fcb.getTimeFrames(tiCur.start, tiCur.end, tsSeen)) )
+						backlog.extend( (t, f) for t, f in zip(*fcb.getTimeFrames(tiCur.start, tiCur.end, tsSeen, share)) )
 						
 						# Add this query interval to the list, or expand the existing interval if it overlaps.
 						for ti in intervals:
@@ -188,7 +277,7 @@ def CamServer( qIn, qOut, camInfo=None ):
 							Timer( captureLatency.total_seconds() + secondsPerFrame*2.0 - (ts - m['t']).total_seconds(), qIn.put, (m,) ).start()
 							continue
 						
-						backlog.extend( (t, f) for t, f in zip(*fcb.getTimeFramesClosest(m['t'], m['closest_frames'], tsSeen)) )
+						backlog.extend( (t, f) for t, f in zip(*fcb.getTimeFramesClosest(m['t'], m['closest_frames'], tsSeen, share)) )
 										
 					elif cmd == 'start_capture':
 						#-----------------------------------------------
@@ -197,7 +286,7 @@ def CamServer( qIn, qOut, camInfo=None ):
 						#
 						if 'tStart' in m:
 							tiCapture.start, tiCapture.end = m['tStart'], endOfTime
-							backlog.extend( (t, f) for t, f in zip(*fcb.getTimeFrames(tiCapture.start, tiCapture.end, tsSeen)) )
+							backlog.extend( (t, f) for t, f in zip(*fcb.getTimeFrames(tiCapture.start, tiCapture.end, tsSeen, share)) )
 					
 					elif cmd == 'stop_capture':
 						#-----------------------------------------------
@@ -230,6 +319,9 @@ def CamServer( qIn, qOut, camInfo=None ):
 						#-----------------------------------------------
 						# Quit processing frames.
 						#
+						if backlog:
+							encoder.submit( backlog )
+						encoder.shutdown()
 						qOut.put( {'cmd':'terminate'} )
 						return
 					
@@ -246,29 +338,37 @@ def CamServer( qIn, qOut, camInfo=None ):
 				# Check if we need to keep the current photo.
 				if frame is not None and tsFrame not in tsSeen and (tiCapture.contains(tsFrame) or any(i.contains(tsFrame) for i in intervals)):
 					tsSeen.add( tsFrame )
-					backlog.append( (tsFrame, frame) )
+					backlog.append( (tsFrame, fcb.shareAppended(tsFrame, frame) if share else fcb.copyFrame(frame)) )
 
-				# Send the frames to the database for writing.
+				# Encode the frames in the background, then send them to the database for writing.
 				if backlog:
-					qOut.put( { 'cmd':'response', 'ts_frames':backlog.copy() } )
+					encoder.submit( backlog.copy() )
 					backlog.clear()
 						
 				# Send status images.
+				# Pass a reference to the raw frame so we don't have to copy or convert it.
 				for name, freq in sendUpdates.items():
 					if frameCount % freq == 0:
-						qOut.put( {'cmd':'update', 'name':name, 'frame':opencv_frame} )	# Pass the raw frame so we don't have to convert it.
+						qOut.put( {'cmd':'update', 'name':name, 'frame':fcb.shareAppended(tsFrame, frame) if frame is not None else None} )
 				frameCount += 1
 						
 				# Send snapshot message.
 				if doSnapshot:
 					if frame is not None:
-						qOut.put( {'cmd':'snapshot', 'ts':ts, 'frame':frame} )
+						qOut.put( {'cmd':'snapshot', 'ts':ts, 'frame':CVUtil.toJpeg(frame)} )
 					doSnapshot = False
 				
+				timing.add( 'process', time.perf_counter() - tProcess )
+				
 				# Send fps message.
 				fpsFrameCount += bool( frame is not None )
 				if (ts - fpsStart).total_seconds() >= 3.0:
-					qOut.put( {'cmd':'fps', 'fps_actual':fpsFrameCount / (ts - fpsStart).total_seconds()} )
+					elapsed = (ts - fpsStart).total_seconds()
+					timingReport = timing.getReport( elapsed )
+					timingReport['encode_pending'] = encoder.pending
+					timingReport['encode_dropped'] = encoder.dropped
+					timingReport['buffer_frames'] = fcb.bufSize
+					qOut.put( {'cmd':'fps', 'fps_actual':fpsFrameCount / elapsed, 'timing':timingReport} )
 					fpsStart = ts
 					fpsFrameCount = 0
 					
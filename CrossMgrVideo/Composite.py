@@ -2,11 +2,13 @@ import wx
 import os
 import cv2
 import glob
+import threading
 from math import tan, radians
 from datetime import datetime, timedelta
 
 import Utils
 import CVUtil
+import CompositeStrip
 
 def formatTime( ts ):
 	return ts.strftime('%H:%M:%S.%f')[:-3]
@@ -47,6 +49,8 @@ class CompositeCtrl( wx.Control ):
 		self.imageHeight = self.imageWidth = 600
 		self.xVLeft = 0								# left side to show composite image (in image coordinates).
 		
+		self.compositeGeneration = 0				# Incremented on each makeComposite so stale background builds are ignored.
+		
 		self.xClickLeft = 0							# Last left mouse click.
 		self.xVLeftClick = 0
 		
@@ -272,70 +276,59 @@ class CompositeCtrl( wx.Control ):
 			self.imagePixelsPerSecond = bitmapWidth / dt
 			self.compositeVBitmapWidth = round( bitmapWidth / f )
 		
+		# Precompute the x offsets of the images in draw order, with a sentinel at the end.
+		widthDiv2 = self.imageWidth // 2
+		xVFromTS = self.xVFromTS
+		xImages = [round(xVFromTS(ts)) for ts, jpg in reversed(self.tsJpgs)]
+		xImages.append( round(xImages[-1] + (widthDiv2 if self.leftToRight else -widthDiv2)) )
+		
+		# Assembled composites are cached so that resizing back, switching direction or changing the filters doesn't re-decode.
+		key = (
+			self.tsJpgs[0][0], self.tsJpgs[-1][0], len(self.tsJpgs),
+			self.imagePixelsPerSecond, self.leftToRight, bitmapWidth, height,
+		)
+		filters = (self.filterContrast, self.filterSharpen, self.filterGrayscale)
+		
+		self.compositeGeneration += 1
+		generation = self.compositeGeneration
+		
+		composite = CompositeStrip.compositeCache.get( key )
+		if composite is not None:
+			self.compositeBitmap = CVUtil.frameToBitmap( self.filterFrame(composite) if any(filters) else composite )
+			self.adjustScrollbar()
+			return
+		
+		# Show a blank composite of the right size while the frames are decoded in the background.
 		try:
 			self.compositeBitmap = wx.Bitmap( bitmapWidth, height )
 			dc = wx.MemoryDC( self.compositeBitmap )
+			dc.SetBackground( wx.BLACK_BRUSH )
+			dc.Clear()
+			dc.SelectObject( wx.NullBitmap )
 		except Exception as e:
 			print( e )
 			return
+		self.adjustScrollbar()
 		
-		def copyImage(	sourceDC,
-						sourceX, sourceY, sourceW, sourceH,
-						destX,   destY ):
-			# Transform to screen coordinates.
-			dc.StretchBlit(
-				round(destX*f),   round(destY*f),   round(sourceW*f),   round(sourceH*f),
-				sourceDC,
-				sourceX, sourceY, sourceW, sourceH,
-			)
+		jpgs = [jpg for ts, jpg in reversed(self.tsJpgs)]
+		args = (jpgs, xImages, self.leftToRight, self.imageWidth, self.imageHeight, f, bitmapWidth, height)
 		
-		sourceDC = wx.MemoryDC()
-		PS = self.imagePixelsPerSecond
-		widthDiv2 = self.imageWidth // 2
-		xVFromTS = self.xVFromTS
-
-		# Precompute the x offsets of the images.
-		xImages = [round(xVFromTS(ts)) for ts, jpg in reversed(self.tsJpgs)]
-
-		if self.leftToRight:
-			xImages.append( round(xImages[-1] + widthDiv2) )	# Write a sentinel.
-
-			for i, (ts, jpg) in enumerate(reversed(self.tsJpgs)):
-				try:
-					sourceDC.SelectObject(CVUtil.jpegToBitmap(jpg))
-				except Exception as e:
-					continue
-				
-				x = xImages[i]
-				w = xImages[i+1] - xImages[i] + 1
-				
-				copyImage( sourceDC,
-					self.imageWidth - w, 0, w, self.imageHeight,
-					x, 0,
-				)
-				sourceDC.SelectObject(wx.NullBitmap)
-		else:
-			xImages.append( round(xImages[-1] - widthDiv2) )	# Write a sentinel.
-
-			for i, (ts, jpg) in enumerate(reversed(self.tsJpgs)):
-				try:
-					sourceDC.SelectObject(CVUtil.jpegToBitmap(jpg))
-				except Exception as e:
-					continue
-				
-				x = xImages[i]
-				w = xImages[i] - xImages[i+1] + 1
-								
-				copyImage( sourceDC,
-					0, 0, w, self.imageHeight,
-					x - w, 0,
-				)
-				sourceDC.SelectObject(wx.NullBitmap)
-
-		if self.filterContrast or self.filterSharpen or self.filterGrayscale:
-			self.compositeBitmap = CVUtil.frameToBitmap( self.filterFrame(CVUtil.bitmapToFrame( self.compositeBitmap )) )
-
-		self.adjustScrollbar()
+		def build():
+			composite = CompositeStrip.buildComposite( *args )
+			CompositeStrip.compositeCache.put( key, composite )
+			if generation != self.compositeGeneration:
+				return
+			frame = self.filterFrame( composite ) if any(filters) else composite
+			wx.CallAfter( self.setComposite, generation, frame )
+		
+		threading.Thread( target=build, name='makeComposite', daemon=True ).start()
+		
+	def setComposite( self, generation, frame ):
+		# Called on the UI thread when a background composite is ready.
+		if not self or generation != self.compositeGeneration:
+			return
+		self.compositeBitmap = CVUtil.frameToBitmap( frame )
+		self.Refresh()
 		
 	def filterFrame( self, frame ):
 		if self.filterContrast:
@@ -0,0 +1,139 @@
+import cv2
+import math
+import threading
+import numpy as np
+import simplejpeg
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+	Build a finish-strip composite as a numpy BGR buffer.
+
+	Only a narrow vertical strip of each frame contributes to the composite.
+	JPEG can't decode a column range by itself, but it can decode at 1/2, 1/4 or 1/8 scale in the DCT.
+	We decode each frame at the smallest of these scales that still covers the screen height,
+	crop the strip and resize only the strip.
+	The frames are decoded in parallel (simplejpeg releases the GIL).
+'''
+
+executor = ThreadPoolExecutor( max_workers=4, thread_name_prefix='CompositeStrip' )
+
+def decodeStrip( jpg, sourceX, sourceW, imageWidth, imageHeight, destW, destH ):
+	''' Return the column strip (sourceX, sourceW) of a jpeg scaled to (destW, destH). '''
+	if destW <= 0 or destH <= 0:
+		return None
+	# Only use the power-of-two DCT scales - the other M/8 scales are slower than a full decode.
+	d = 8
+	while d > 1 and imageHeight // d < destH:
+		d //= 2
+	try:
+		if d > 1:
+			frame = simplejpeg.decode_jpeg( jpg, colorspace='BGR', min_height=math.ceil(imageHeight/d), min_width=math.ceil(imageWidth/d) )
+		else:
+			frame = simplejpeg.decode_jpeg( jpg, colorspace='BGR' )
+	except Exception as e:
+		return None
+
+	# Map the strip to the decoded (possibly reduced) frame coordinates.
+	hD, wD = frame.shape[:2]
+	s = wD / imageWidth
+	x0 = max( 0, min(wD-1, math.floor(sourceX * s)) )
+	x1 = max( x0+1, min(wD, math.ceil((sourceX + sourceW) * s)) )
+	return cv2.resize( frame[:, x0:x1], (destW, destH), interpolation=cv2.INTER_LINEAR )
+
+def stripGeometry( xImages, leftToRight, imageWidth, imageHeight, f ):
+	'''
+		Returns a list of (sourceX, sourceW, destX, destW, destH) in screen coordinates for each frame.
+		xImages must be in draw order with the sentinel at the end.
+		This matches the StretchBlit geometry of the original wx composite.
+	'''
+	destH = round( imageHeight * f )
+	geometry = []
+	for i in range(len(xImages) - 1):
+		x = xImages[i]
+		if leftToRight:
+			w = xImages[i+1] - x + 1
+			geometry.append( (imageWidth - w, w, round(x*f), round(w*f), destH) )
+		else:
+			w = x - xImages[i+1] + 1
+			geometry.append( (0, w, round((x-w)*f), round(w*f), destH) )
+	return geometry
+
+def buildComposite( jpgs, xImages, leftToRight, imageWidth, imageHeight, f, bitmapWidth, bitmapHeight ):
+	'''
+		Return a (bitmapHeight, bitmapWidth, 3) BGR composite.
+		jpgs and xImages are in draw order (later frames overwrite earlier ones).
+	'''
+	composite = np.zeros( (bitmapHeight, bitmapWidth, 3), dtype=np.uint8 )
+	geometry = stripGeometry( xImages, leftToRight, imageWidth, imageHeight, f )
+
+	# Decode in parallel, but paste in draw order so overlaps resolve the same way.
+	def decode( i ):
+		sourceX, sourceW, destX, destW, destH = geometry[i]
+		if destX >= bitmapWidth or destX + destW <= 0:
+			return None
+		return decodeStrip( jpgs[i], sourceX, sourceW, imageWidth, imageHeight, destW, destH )
+
+	for (sourceX, sourceW, destX, destW, destH), strip in zip(geometry, executor.map(decode, range(len(geometry)))):
+		if strip is None:
+			continue
+		xLeft, xRight = max(0, destX), min(bitmapWidth, destX + destW)
+		h = min( bitmapHeight, destH )
+		composite[:h, xLeft:xRight] = strip[:h, xLeft-destX:xRight-destX]
+	return composite
+
+class CompositeCache:
+	''' LRU cache of assembled composites, bounded by total bytes. '''
+	def __init__( self, maxBytes=512*1024*1024 ):
+		self.maxBytes = maxBytes
+		self.totalBytes = 0
+		self.cache = OrderedDict()
+		self.lock = threading.Lock()
+
+	def get( self, key ):
+		with self.lock:
+			composite = self.cache.get( key )
+			if composite is not None:
+				self.cache.move_to_end( key )
+			return composite
+
+	def put( self, key, composite ):
+		with self.lock:
+			if key in self.cache:
+				self.totalBytes -= self.cache.pop(key).nbytes
+			self.cache[key] = composite
+			self.totalBytes += composite.nbytes
+			while self.totalBytes > self.maxBytes and len(self.cache) > 1:
+				self.totalBytes -= self.cache.popitem(last=False)[1].nbytes
+
+	def clear( self ):
+		with self.lock:
+			self.cache.clear()
+			self.totalBytes = 0
+
+compositeCache = CompositeCache()
+
+if __name__ == '__main__':
+	import time
+
+	imageWidth, imageHeight = 1920, 1080
+	frame = np.zeros( (imageHeight, imageWidth, 3), dtype=np.uint8 )
+	for x in range(0, imageWidth, 64):
+		frame[:, x:x+32] = (x % 256, 255 - x % 256, 128)
+	jpg = simplejpeg.encode_jpeg( frame, colorspace='BGR' )
+
+	fps, seconds, pps = 60, 10, 400
+	jpgs = [jpg] * (fps * seconds)
+	xImages = [round(i * pps / fps) for i in range(len(jpgs))]
+	xImages.append( xImages[-1] + imageWidth // 2 )
+
+	f = 600 / imageHeight
+	bitmapWidth = round( xImages[-2] * f )
+	t = time.perf_counter()
+	composite = buildComposite( jpgs, xImages, True, imageWidth, imageHeight, f, bitmapWidth, 600 )
+	print( 'buildComposite: {} frames {:.3f}s shape={}'.format(len(jpgs), time.perf_counter() - t, composite.shape) )
+
+	t = time.perf_counter()
+	for j in jpgs:
+		simplejpeg.decode_jpeg( j, colorspace='BGR' )
+	print( 'full decode:    {} frames {:.3f}s'.format(len(jpgs), time.perf_counter() - t) )
@@ -4,6 +4,12 @@ function GetScaleRatio( wBitmap, hBitmap, width, height ) {
 	return Math.min( width / wBitmap, height / hBitmap );
 }
 
+function GetImageSize( image ) {
+	// Size of the image in photo pixel coordinates.
+	// A thumbnail standing in for a photo has the photo size in fullWidth and fullHeight.
+	return [image.fullWidth || image.width, image.fullHeight || image.height];
+}
+
 function intervalsOverlap( a0, a1, b0, b1 ) {
 	return a0 <= b1 && b0 <= a1;
 }
@@ -149,7 +155,7 @@ class ScaledBitmap {
 		}
 			
 		let sourceImage = this.image;
-		const sourceWidth = sourceImage.width, sourceHeight = sourceImage.height;
+		const [sourceWidth, sourceHeight] = GetImageSize( sourceImage );
 		const ratio = GetScaleRatio( sourceWidth, sourceHeight, this.canvas.width, this.canvas.height );
 		const destWidth = sourceWidth * ratio, destHeight = sourceHeight * ratio;
 
@@ -178,14 +184,14 @@ class ScaledBitmap {
 		
 		// Draw the image in the canvas.
 		let sourceImage = this.image;
-		const sourceWidth = sourceImage.width, sourceHeight = sourceImage.height;
+		const [sourceWidth, sourceHeight] = GetImageSize( sourceImage );
 		const ratio = GetScaleRatio( sourceWidth, sourceHeight, width, height );
 		const destWidth = sourceWidth * ratio, destHeight = sourceHeight * ratio;
 
 		const xLeft = Math.max(0, (width - destWidth)/2);
 		const yTop = Math.max(0, (height - destHeight)/2);
 		if( sourceWidth > 0 && sourceHeight > 0 && destWidth > 0 && destHeight > 0 )
-			dc.drawImage( sourceImage, 0, 0, sourceWidth, sourceHeight, xLeft, yTop, destWidth, destHeight );
+			dc.drawImage( sourceImage, 0, 0, sourceImage.width, sourceImage.height, xLeft, yTop, destWidth, destHeight );
 		
 		if( this.drawFinishLine ) {
 			dc.strokeStyle = contrastColour;
@@ -212,7 +218,7 @@ class ScaledBitmap {
 		this.sourceRect = sourceRect;
 			
 		const xCenter = sourceRect[0] + sourceRect[2] / 2, yCenter = sourceRect[1] + sourceRect[3] / 2;
-		const isWest = xCenter < this.image.width/2, isNorth = yCenter < this.image.width/2;
+		const isWest = xCenter < sourceWidth/2, isNorth = yCenter < sourceWidth/2;
 		let insetRect = this.getInsetRect( width, height, isWest, isNorth );
 		
 		const magRatio = GetScaleRatio( sourceRect[2], sourceRect[3], insetRect[2], insetRect[3] );
@@ -223,7 +229,9 @@ class ScaledBitmap {
 			iWidth, iHeight
 		];
 		
-		dc.drawImage( sourceImage, ...sourceRect, ...insetRect );
+		// Convert the photo pixel coordinates to the image (which may be a thumbnail).
+		const s = sourceImage.width / sourceWidth;
+		dc.drawImage( sourceImage, ...sourceRect.map( v => v*s ), ...insetRect );
 
 		// Draw the outlines.
 		dc.strokeStyle = 'rgb(200,200,0)';
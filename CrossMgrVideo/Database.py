@@ -3,7 +3,9 @@ import sys
 from datetime import datetime, timedelta, date, time
 import sqlite3
 from collections import namedtuple, defaultdict
-from threading import RLock, Timer
+from threading import RLock
+from queue import Empty
+from time import perf_counter
 
 import CVUtil
 from FIFOCache import FIFOCacheSet
@@ -20,23 +22,32 @@ now = datetime.now
 def _sharedRep( item ):
 	return item
 	
+def _rowBytes( row ):
+	# Estimate the size of a row.  Blobs and strings dominate.
+	return sum( len(v) if isinstance(v, (bytes, str, memoryview)) else 8 for v in row )
+
 class BulkInsertDBRows:
-	def __init__( self, table, fields, toDB, maxlen=2000 ):
+	# Insert rows in transactions limited by row count and total bytes (eg. photos).
+	def __init__( self, table, fields, toDB, maxlen=2000, maxBytes=32*1024*1024 ):
 		self.toDB = toDB
 		self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format( table, ','.join(fields), ','.join('?'*len(fields)) )
 		self.rows = []
-		#self.maxlen = maxlen
-		self.maxlen = 1
+		self.maxlen = maxlen
+		self.maxBytes = maxBytes
+		self.rowBytes = 0
 				
 	def append( self, row ):
 		self.rows.append( row )
-		if len(self.rows) > self.maxlen:
+		self.rowBytes += _rowBytes( row )
+		if len(self.rows) >= self.maxlen or self.rowBytes >= self.maxBytes:
 			self.flush()
 			
 	def flush( self ):
-		with self.toDB.dbLock, self.toDB.conn:
-			self.toDB.conn.executemany( self.sql, self.rows )
+		if self.rows:
+			with self.toDB.dbLock, self.toDB.conn:
+				self.toDB.conn.executemany( self.sql, self.rows )
 		self.rows.clear()
+		self.rowBytes = 0
 				
 	def __enter__(self):
 		return self
@@ -186,6 +197,17 @@ pragma mmap_size = 30000000000;'''
 						('zoom_height', 'INTEGER', False, 0),		# Zoom height
 					)
 				)
+				# Covering index for the trigger interval queries (counts, deletes) so they don't read the whole trigger row.
+				self.conn.execute( 'CREATE INDEX IF NOT EXISTS trigger_ts_span_idx on trigger (ts ASC,s_before,s_after,closest_frames)' )
+				
+				# Small jpegs for browsing, keyed by the photo id.
+				# Written with the photos.  Photos without a thumbnail get one on demand (see getThumbById).
+				_createTable( self.conn, 'thumb', (
+						('id', 'INTEGER PRIMARY KEY', False, None),
+						('jpg', 'BLOB', False, None),
+					)
+				)
+				self.conn.execute( 'CREATE TRIGGER IF NOT EXISTS photo_delete_thumb AFTER DELETE ON photo BEGIN DELETE FROM thumb WHERE id=old.id; END' )
 				
 				# Initialize the duplicate time cache to the last photos.
 				for row in self.conn.execute( 'SELECT ts FROM photo WHERE ts BETWEEN ? AND ?', (now() - timedelta(seconds=UpdateSeconds), now()) ):
@@ -240,14 +262,24 @@ pragma mmap_size = 30000000000;'''
 				if tsJpgs:
 					# Purge photos with the same timestamp.
 					tsJpgsUnique = []
-					for ts, jpg in tsJpgs:
+					for tsJpg in tsJpgs:
+						ts, jpg = tsJpg[:2]
 						if ts and jpg and ts not in self.lastTsPhotos:
 							self.lastTsPhotos.add( ts )
-							tsJpgsUnique.append( (ts, jpg) )
+							tsJpgsUnique.append( tsJpg )
 					tsJpgs = tsJpgsUnique
 				
 				if tsJpgs:
-					self.conn.executemany( 'INSERT INTO photo (ts,jpg) VALUES (?,?)', tsJpgs )
+					# tsJpgs are (ts, jpg) or (ts, jpg, thumb).
+					# Write the thumbnails with the id of their photo.
+					cur = self.conn.cursor()
+					idThumbs = []
+					for tsJpg in tsJpgs:
+						cur.execute( 'INSERT INTO photo (ts,jpg) VALUES (?,?)', tsJpg[:2] )
+						if len(tsJpg) > 2 and tsJpg[2]:
+							idThumbs.append( (cur.lastrowid, tsJpg[2]) )
+					if idThumbs:
+						self.conn.executemany( 'INSERT OR REPLACE INTO thumb (id,jpg) VALUES (?,?)', idThumbs )
 			
 			# print( 'Database: write tsTriggers={}, tsJpgs={}'.format( tsTriggers, len(tsJpgs) if tsJpgs else 0) )
 	
@@ -472,6 +504,17 @@ pragma mmap_size = 30000000000;'''
 				raise ValueError( 'Nonexistent photo id={}'.format(id) )
 			return _sharedRep(row[1])
 	
+	def getThumbById( self, id ):
+		# Return the thumbnail of a photo.  Does not read the full photo if the thumbnail exists.
+		with self.dbLock, self.conn:
+			row = self.conn.execute( 'SELECT jpg FROM thumb WHERE id=?', (id,) ).fetchone()
+			if row is not None:
+				return row[0]
+			# Photo written before thumbnails.  Make the thumbnail and save it for next time.
+			thumb = CVUtil.jpegToThumb( self.getPhotoById(id) )
+			self.conn.execute( 'INSERT OR IGNORE INTO thumb (id,jpg) VALUES (?,?)', (id, sqlite3.Binary(thumb)) )
+			return thumb
+	
 	def getBestTriggerPhoto( self, id ):
 		'''
 			Return the photo closest to the trigger time, unless the zoom_frame is specified.
@@ -729,37 +772,82 @@ def GlobalDatabase( fname=None ):
 		dbGlobal = Database( fname=fname )
 	return dbGlobal
 
-def DBWriter( q, queueEmptyCB=None, fname=None ):
-	db = GlobalDatabase( fname=fname )
+class DBWriterStats:
+	# Statistics of the DBWriter.  Written by the writer thread, read by the UI.
+	def __init__( self ):
+		self.reset()
+		
+	def reset( self ):
+		self.queueDepth = 0
+		self.queueDepthMax = 0
+		self.commits = 0
+		self.rows = 0
+		self.bytes = 0
+		self.commitSecondsLast = 0.0
+		self.commitSecondsMax = 0.0
+		self.commitSecondsTotal = 0.0
+	
+	def setQueueDepth( self, queueDepth ):
+		self.queueDepth = queueDepth
+		self.queueDepthMax = max( self.queueDepthMax, queueDepth )
+	
+	def addCommit( self, rows, bytes, seconds ):
+		self.commits += 1
+		self.rows += rows
+		self.bytes += bytes
+		self.commitSecondsLast = seconds
+		self.commitSecondsMax = max( self.commitSecondsMax, seconds )
+		self.commitSecondsTotal += seconds
+	
+	def getCommitSecondsAvg( self ):
+		return self.commitSecondsTotal / self.commits if self.commits else 0.0
+	
+	def __repr__( self ):
+		return 'queue={} (max {}) commit={:.0f}ms (avg {:.0f}ms, max {:.0f}ms)'.format(
+			self.queueDepth, self.queueDepthMax,
+			self.commitSecondsLast*1000.0, self.getCommitSecondsAvg()*1000.0, self.commitSecondsMax*1000.0,
+		)
+
+def DBWriter( q, queueEmptyCB=None, fname=None, stats=None, maxBytes=16*1024*1024, maxLatencySeconds=1.0 ):
+	# Photos and triggers are written in one transaction when the pending bytes exceed maxBytes,
+	# the oldest pending write is older than maxLatencySeconds, or the queue goes inactive.
+	# This keeps the number of commits independent of the camera fps and resolution.
+	dbShared = GlobalDatabase( fname=fname )
+	db = dbShared.clone()							# Dedicated writer connection so the UI is not blocked by commits.
+	db.lastTsPhotos = dbShared.lastTsPhotos
+	if stats is None:
+		stats = DBWriterStats()
 	
 	tsTriggers, tsJpgs = [], []
+	pendingBytes = 0
+	tPending = None			# Time of the oldest pending write.
+	
 	def flush():
 		# Write all outstanding triggers and photos to the database.
 		# Clear the buffers afterwards.
-		db.write( tsTriggers, tsJpgs )
+		nonlocal pendingBytes, tPending
+		if tsTriggers or tsJpgs:
+			rows = len(tsTriggers) + len(tsJpgs)
+			tStart = perf_counter()
+			db.write( tsTriggers, tsJpgs )
+			stats.addCommit( rows, pendingBytes, perf_counter() - tStart )
 		tsTriggers.clear()
 		tsJpgs.clear()
+		pendingBytes = 0
+		tPending = None
+
+	def addPending( nBytes ):
+		nonlocal pendingBytes, tPending
+		pendingBytes += nBytes
+		if tPending is None:
+			tPending = perf_counter()
 
 	keepGoing = True
 	
-	isTimerRunning = []		# Flag indicating that the timer is running.  Use a list so we can change it from inside the lowActivity function.
-	
-	if queueEmptyCB:
-		def lowActivity():
-			# print( 'lowActivity: called' )
-			isTimerRunning.clear()
-			flush()
-			queueEmptyCB()
-	else:
-		def lowActivity():
-			# print( 'lowActivity: called' )
-			isTimerRunning.clear()
-			flush()
-
 	inactivitySeconds = 0.2
-	inactivityTimer = None
+	tLastMessage = perf_counter()
 	
-	# If syncWhenEmpty is True, the lowActivity timer is started when the queue is empty.
+	# If syncWhenEmpty is True, flush the database and call queueEmptyCB when the queue goes inactive.
 	# Set to True when doing buffered writes (eg. photos or triggers).
 	syncWhenEmpty = False
 	
@@ -767,58 +855,78 @@ def DBWriter( q, queueEmptyCB=None, fname=None ):
 		if f is not None and not db.isDup( t ):
 			# If the photo is "bytes" assume it is already in jpeg encoding.  This should always be the case.
 			# Otherwise it is a numpy array and needs to be jpeg encoded before writing to the database.
-			tsJpgs.append( (t, sqlite3.Binary(f if isinstance(f, bytes) else CVUtil.frameToJPeg(f))) )
+			jpg = f if isinstance(f, bytes) else CVUtil.frameToJPeg(f)
+			# Make the thumbnail here so browsing never has to read the full photo.
+			try:
+				thumb = CVUtil.jpegToThumb( jpg )
+			except Exception:
+				thumb = None		# Made on demand later.
+			tsJpgs.append( (t, sqlite3.Binary(jpg), sqlite3.Binary(thumb) if thumb else None) )
+			addPending( len(jpg) + len(thumb or b'') )
 			return True
 		return False
 
 	while keepGoing:
-		v = q.get()
-		
-		if v[0] == 'photo':
-			syncWhenEmpty = True
-			appendPhoto( v[1], v[2] )
-		elif v[0] == 'ts_frames':
-			lenSave = len( tsJpgs )
-			for t, f in v[1]:
-				appendPhoto( t, f )
-			syncWhenEmpty = (lenSave != len(tsJpgs))
-		elif v[0] == 'trigger':
-			syncWhenEmpty = True
-			tsTriggers.append( v[1] )
-		elif v[0] == 'kmh':
-			db.updateTriggerKMH( v[1], v[2] )			# id, kmh
-		elif v[0] == 'photoCount':
-			db.updateTriggerPhotoCount( v[1], v[2] )	# id, count
-		elif v[0] == 'flush':
-			flush()
-		elif v[0] == 'terminate':
-			keepGoing = False
+		# Wait for the next message, but not past the latency deadline or the inactivity time.
+		tNow = perf_counter()
+		timeout = None
+		if tPending is not None:
+			timeout = tPending + maxLatencySeconds - tNow
+		if syncWhenEmpty:
+			tIdle = tLastMessage + inactivitySeconds - tNow
+			timeout = tIdle if timeout is None else min( timeout, tIdle )
 		
-		if len(tsJpgs) >= 30*4:	# Sync about 4 seconds of frames at a 
+		try:
+			v = q.get( timeout=None if timeout is None else max(0.0, timeout) )
+		except Empty:
+			v = None
+		tNow = perf_counter()
+		
+		if v is not None:
+			tLastMessage = tNow
+			stats.setQueueDepth( q.qsize() + 1 )
+			
+			if v[0] == 'photo':
+				syncWhenEmpty = True
+				appendPhoto( v[1], v[2] )
+			elif v[0] == 'ts_frames':
+				lenSave = len( tsJpgs )
+				for t, f in v[1]:
+					appendPhoto( t, f )
+				if lenSave != len(tsJpgs):
+					syncWhenEmpty = True
+			elif v[0] == 'trigger':
+				syncWhenEmpty = True
+				tsTriggers.append( v[1] )
+				addPending( 0 )
+			elif v[0] == 'kmh':
+				db.updateTriggerKMH( v[1], v[2] )			# id, kmh
+			elif v[0] == 'photoCount':
+				db.updateTriggerPhotoCount( v[1], v[2] )	# id, count
+			elif v[0] == 'flush':
+				flush()
+			elif v[0] == 'terminate':
+				keepGoing = False
+		
+		if tPending is not None and (pendingBytes >= maxBytes or tNow - tPending >= maxLatencySeconds):
 			flush()
 		
-		q.task_done()
-		
-		if keepGoing and syncWhenEmpty and q.empty():
-			# Detect database inactivity after writing photos or triggers.
-			#
-			# When we have an empty queue, start a timer.
-			# If we get more photos or triggers, reset the timer.
-			# When the timer goes off, flush the database and call the application callback.
-			if isTimerRunning:
-				inactivityTimer.cancel()
-				isTimerRunning.clear()
-			inactivityTimer = Timer( inactivitySeconds, lowActivity )
-			inactivityTimer.start()
-			isTimerRunning.append( True )
+		if v is not None:
+			q.task_done()
+		
+		if keepGoing and syncWhenEmpty and tNow - tLastMessage >= inactivitySeconds and q.empty():
+			# The queue has been inactive after writing photos or triggers.
+			# Flush the database and call the application callback.
 			syncWhenEmpty = False
+			flush()
+			stats.setQueueDepth( 0 )
+			if queueEmptyCB:
+				queueEmptyCB()
 		
 	flush()
-	if isTimerRunning:
-		inactivityTimer.cancel()
-		isTimerRunning.clear()
-		if queueEmptyCB:
-			queueEmptyCB()
+	db.conn.close()
+	if syncWhenEmpty and queueEmptyCB:
+		queueEmptyCB()
 	
 if __name__ == '__main__':
 	if False:
@@ -1,14 +1,51 @@
 import datetime
+import itertools
+import numpy as np
+
+class FrameRef:
+	'''
+		Reference to a frame in the ring of a FrameCircBuf.
+		Passing the reference instead of a copy of the frame avoids copying every frame sent to a consumer.
+		The reference is valid until the camera overwrites the ring slot.
+		Consumers must check isValid() after using the frame, as the slot may be overwritten while it is being read.
+	'''
+	__slots__ = ('fcb', 'k', 'seq')
+	
+	def __init__( self, fcb, k ):
+		self.fcb, self.k, self.seq = fcb, k, fcb.seqs[k]
+	
+	def isValid( self ):
+		try:
+			return self.fcb.seqs[self.k] == self.seq
+		except IndexError:		# The ring was reallocated smaller.
+			return False
+	
+	def get( self ):
+		# Returns the frame in the ring (not a copy), or None if it was overwritten.
+		return self.fcb.ringViews[self.k] if self.isValid() else None
 
 class FrameCircBuf:
-	def __init__( self, bufSize = 75 ):
-		self.bufSize = bufSize
+	'''
+		Circular buffer of the most recent frames.
+		
+		Raw frames (height x width x colors) are copied into a preallocated numpy ring to avoid an allocation per frame.
+		The ring is limited to maxBytes, which may make the buffer shorter than bufSize for large frames.
+		Frames returned by the get functions are copies, so they remain valid after the ring wraps around,
+		unless share=True, in which case ring frames are returned as FrameRefs.
+	'''
+	seqNext = itertools.count( 1 )		# Slot write sequence numbers.  Never reused, so stale references never match.
+	
+	def __init__( self, bufSize = 75, maxBytes = None ):
+		self.bufSize = self.bufSizeRequest = bufSize
+		self.maxBytes = maxBytes
 		self.tSet = set()		# Times in the circular buffer.
+		self.ring = None
 		self.reset( bufSize )
 		
 	def reset( self, bufSize = None ):
 		if bufSize is not None:
-			self.bufSize = bufSize
+			self.bufSize = self.bufSizeRequest = bufSize
+		self.ring = None
 		self.clear()
 
 	def clear( self ):
@@ -16,8 +53,46 @@ class FrameCircBuf:
 		dt = datetime.timedelta( seconds = 0.001 )
 		self.times = [t + dt*i for i in range(self.bufSize)]
 		self.frames = [None] * self.bufSize
+		self.seqs = [0] * self.bufSize		# Sequence number of the frame in each slot.  0 means no valid frame.
 		self.tSet.clear()
 		self.iStart = 0
+	
+	def isRawFrame( self, frame ):
+		return isinstance(frame, np.ndarray) and frame.ndim == 3
+	
+	def allocRing( self, frame ):
+		# Size the ring for this frame shape.  This clears the buffer.
+		bufSize = self.bufSizeRequest
+		if self.maxBytes:
+			bufSize = max( 2, min(bufSize, self.maxBytes // frame.nbytes) )
+		self.bufSize = bufSize
+		self.ring = np.empty( (bufSize,) + frame.shape, dtype=frame.dtype )
+		self.ringViews = [self.ring[i] for i in range(bufSize)]
+		self.clear()
+	
+	def getWriteBuffer( self ):
+		# Return the ring slot the next frame will be written into (or None).
+		# Reading the camera directly into it saves a copy.
+		if self.ring is None:
+			return None
+		self.seqs[self.iStart] = 0		# Invalidate references before the slot is overwritten.
+		return self.ringViews[self.iStart]
+	
+	def copyFrame( self, frame ):
+		return frame.copy() if self.ring is not None and isinstance(frame, np.ndarray) else frame
+	
+	def shareFrame( self, k ):
+		# Return a reference to the frame in slot k if it is in the ring, otherwise the frame itself.
+		frame = self.frames[k]
+		return FrameRef( self, k ) if self.ring is not None and frame is self.ringViews[k] and self.seqs[k] else frame
+	
+	def getFrameOut( self, k, share ):
+		return self.shareFrame( k ) if share else self.copyFrame( self.frames[k] )
+	
+	def shareAppended( self, t, frame ):
+		# Reference to the frame just appended at time t, or a copy if it was not appended.
+		k = (self.iStart - 1) % self.bufSize
+		return self.shareFrame( k ) if self.times[k] == t else self.copyFrame( frame )
 		
 	def getT( self, i ):
 		return self.times[(i+self.iStart)%self.bufSize]
@@ -28,12 +103,24 @@ class FrameCircBuf:
 	def append( self, t, frame ):
 		''' Replace the oldest frame and time. Ignore frames with a time we already have. '''
 		if t not in self.tSet and frame is not None:
+			if self.isRawFrame(frame) and (self.ring is None or self.ring.shape[1:] != frame.shape or self.ring.dtype != frame.dtype):
+				self.allocRing( frame )
+			
 			iStart = self.iStart
 			self.tSet.discard( self.times[iStart] )
 			self.tSet.add( t )
 			
 			self.times[iStart] = t
-			self.frames[iStart] = frame
+			if self.ring is not None and self.isRawFrame(frame):
+				slot = self.ringViews[iStart]
+				if frame is not slot:
+					self.seqs[iStart] = 0
+					np.copyto( slot, frame )
+				self.frames[iStart] = slot
+				self.seqs[iStart] = next( self.seqNext )
+			else:
+				self.frames[iStart] = frame
+				self.seqs[iStart] = 0
 			
 			self.iStart = (iStart + 1) % self.bufSize
 
@@ -50,7 +137,7 @@ class FrameCircBuf:
 				iLeft = iMid
 		return iLeft
 		
-	def getTimeFrames( self, tStart, tEnd, tsSeen ):
+	def getTimeFrames( self, tStart, tEnd, tsSeen, share=False ):
 		bufSize = self.bufSize
 		iStart = self.iStart
 		
@@ -65,7 +152,7 @@ class FrameCircBuf:
 					break
 				if t not in tsSeen:
 					times.append( t )
-					frames.append( self.frames[k] )
+					frames.append( self.getFrameOut(k, share) )
 					tsSeen.add( t )
 			
 			times.reverse()		
@@ -82,28 +169,28 @@ class FrameCircBuf:
 						break
 					if t not in tsSeen:
 						times.append( t )
-						frames.append( self.frames[k] )
+						frames.append( self.getFrameOut(k, share) )
 						tsSeen.add( t )
 		
 		return times, frames
 		
-	def getTimeFramesClosest( self, t, closestFrames, tsSeen ):
+	def getTimeFramesClosest( self, t, closestFrames, tsSeen, share=False ):
 		i = self.bisect_left( t )
 		
 		iStart = self.iStart
 		bufSize = self.bufSize
-		times, frames = [], []
+		times, ks = [], []
 		for j in range(max(0, i-2), min(bufSize, i+2)):
 			k = (j+iStart)%bufSize
 			times.append( self.times[k] )
-			frames.append( self.frames[k] )
+			ks.append( k )
 		
 		tsClosest = set( sorted(times, key=lambda tFrame: abs(t-tFrame))[:closestFrames] )
 		timesRet, framesRet = [], []
-		for time, frame in zip(times, frames):
+		for time, k in zip(times, ks):
 			if time in tsClosest and time not in tsSeen:
 				timesRet.append( time )
-				framesRet.append( frame )
+				framesRet.append( self.getFrameOut(k, share) )
 				tsSeen.add( time )
 		
 		return timesRet, framesRet
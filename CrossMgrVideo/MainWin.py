@@ -28,11 +28,12 @@ now = datetime.now
 
 import Utils
 import CVUtil
+from FrameCircBuf import FrameRef
 import CamServer
 from Clock import Clock
 from SocketListener import SocketListener
 from MultiCast import multicast_group, multicast_port
-from Database import GlobalDatabase, DBWriter, Database, BulkInsertDBRows
+from Database import GlobalDatabase, DBWriter, DBWriterStats, Database, BulkInsertDBRows
 from ScaledBitmap import ScaledBitmap
 from Composite import CompositePanel
 from ManageDatabase import ManageDatabase
@@ -402,6 +403,7 @@ class MainWin( wx.Frame ):
 		
 		self.requestQ = Queue()		# Select photos from photobuf.
 		self.dbWriterQ = Queue()	# Photos waiting to be written
+		self.dbWriterStats = DBWriterStats()
 		self.messageQ = Queue()		# Collection point for all status/failure messages.
 		
 		#-------------------------------------------
@@ -490,10 +492,11 @@ class MainWin( wx.Frame ):
 		self.targetFPS = wx.StaticText( self, label='30.0 fps' )
 		self.actualFPS = wx.StaticText( self, label='30.0 fps' )
 		self.fourcc = wx.StaticText( self, label=FOURCC_DEFAULT )
+		self.dbWriterStatus = wx.StaticText( self, label='queue=0 commit=0ms' )
 		
 		boldFont = self.usb.GetFont()
 		boldFont.SetWeight( wx.BOLD )
-		for w in (self.usb, self.cameraResolution, self.targetFPS, self.actualFPS, self.fourcc):
+		for w in (self.usb, self.cameraResolution, self.targetFPS, self.actualFPS, self.fourcc, self.dbWriterStatus):
 			w.SetFont( boldFont )
 		
 		fgs = wx.FlexGridSizer( 2, 2, 2 )	# 2 Cols
@@ -512,6 +515,9 @@ class MainWin( wx.Frame ):
 		fgs.Add( wx.StaticText(self, label='Actual:'), flag=wx.ALIGN_RIGHT )
 		fgs.Add( self.actualFPS, flag=wx.EXPAND|wx.ALIGN_RIGHT )
 		
+		fgs.Add( wx.StaticText(self, label='DB Writer:'), flag=wx.ALIGN_RIGHT )
+		fgs.Add( self.dbWriterStatus, flag=wx.EXPAND|wx.ALIGN_RIGHT )
+		
 		self.focus = wx.Button( self, label="Monitor/Focus" )
 		self.focus.Bind( wx.EVT_BUTTON, self.onFocus )
 		
@@ -915,13 +921,32 @@ class MainWin( wx.Frame ):
 		self.setFPS( fps )
 		self.targetFPS.SetLabel( '{:.1f} fps'.format(float(self.fps)) )
 
-	def updateActualFPS( self, actualFPS ):
+	def updateActualFPS( self, actualFPS, timing=None ):
 		oldLabel = self.actualFPS.GetLabel()
 		newLabel = '{:.1f} fps'.format(actualFPS)
 		if oldLabel != newLabel:
 			self.actualFPS.SetLabel( '{:.1f} fps'.format(actualFPS) )
 			self.GetSizer().Layout()
+		if timing:
+			# Show the time per frame of each stage of the camera loop.  Encoding is done in background threads.
+			self.actualFPS.SetToolTip( '\n'.join( [
+				'read: {:.1f}ms'.format( timing['read_ms'] ),
+				'buffer: {:.1f}ms'.format( timing['buffer_ms'] ),
+				'process: {:.1f}ms'.format( timing['process_ms'] ),
+				'encode: {:.1f}ms/frame, {:.1f} frames/sec, {} pending, {} dropped'.format(
+					timing['encode_ms'], timing['encode_fps'], timing['encode_pending'], timing.get('encode_dropped', 0) ),
+				'buffered frames: {}'.format( timing['buffer_frames'] ),
+			] ) )
 		self.curFPS = actualFPS
+		self.updateDBWriterStats()
+		
+	def updateDBWriterStats( self ):
+		s = self.dbWriterStats
+		newLabel = 'queue={} commit={:.0f}ms'.format( s.queueDepth, s.commitSecondsLast*1000.0 )
+		if self.dbWriterStatus.GetLabel() != newLabel:
+			self.dbWriterStatus.SetLabel( newLabel )
+			self.dbWriterStatus.SetToolTip( '{}\n{} commits, {} rows, {:.1f}MB'.format(s, s.commits, s.rows, s.bytes/(1024.0*1024.0)) )
+			self.GetSizer().Layout()
 		
 	def updateCameraUsb( self, availableCameraUsb ):
 		self.availableCameraUsb = availableCameraUsb
@@ -1654,7 +1679,7 @@ class MainWin( wx.Frame ):
 		# This functions updates the trigger list, we don't need to worry about updating the UI.
 		self.dbWriterThread = threading.Thread(
 			target=DBWriter,
-			args=(self.dbWriterQ, lambda: wx.CallAfter(self.dbInactivityUpdate), GlobalDatabase().fname),
+			args=(self.dbWriterQ, lambda: wx.CallAfter(self.dbInactivityUpdate), GlobalDatabase().fname, self.dbWriterStats),
 			daemon=True
 		)
 		
@@ -1679,34 +1704,51 @@ class MainWin( wx.Frame ):
 		def responseHandler( msg ):
 			self.dbWriterQ.put( ('ts_frames', msg['ts_frames']) )
 		
+		#---------------------------------------------------------------
+		def getBitmap( frame ):
+			# Returns the bitmap of the frame, None if there is no frame, or False if the frame is stale.
+			# Frames in the camera buffer are converted directly from the buffer without a copy.
+			if isinstance(frame, FrameRef):
+				f = frame.get()
+				if f is None:
+					return False
+				bitmap = CVUtil.frameToBitmap( f )
+				return bitmap if frame.isValid() else False	# Overwritten during the conversion.
+			frame = CVUtil.toFrame( frame )
+			return CVUtil.frameToBitmap( frame ) if frame is not None else None
+		
 		#---------------------------------------------------------------
 		def updateHandler( msg ):
-			name, lastFrame = msg['name'], CVUtil.toFrame(msg['frame'])
+			name, bitmap = msg['name'], getBitmap( msg['frame'] )
+			if bitmap is False:
+				return		# The next update will replace it.
 			
 			if name == 'primary':
-				if lastFrame is None:
+				if bitmap is None:
 					wx.CallAfter( self.primaryBitmap.SetTestBitmap )
 				else:
-					wx.CallAfter( self.primaryBitmap.SetBitmap, CVUtil.frameToBitmap(lastFrame) )
+					wx.CallAfter( self.primaryBitmap.SetBitmap, bitmap )
 					
 			elif name == 'focus':
 				if self.focusDialog.IsShown():
-					if lastFrame is None:
+					if bitmap is None:
 						wx.CallAfter( self.focusDialog.SetTestBitmap )
 					else:
-						wx.CallAfter( self.focusDialog.SetBitmap, CVUtil.frameToBitmap(lastFrame) )
+						wx.CallAfter( self.focusDialog.SetBitmap, bitmap )
 				else:
 					self.camInQ.put( {'cmd':'cancel_update', 'name':'focus'} )
 
 		#---------------------------------------------------------------
 		def focusHandler( msg ):
-			name, lastFrame = msg['name'], CVUtil.toFrame(msg['frame'])
+			name, bitmap = msg['name'], getBitmap( msg['frame'] )
+			if bitmap is False:
+				return
 
 			if self.focusDialog.IsShown():
-				if lastFrame is None:
+				if bitmap is None:
 					wx.CallAfter( self.focusDialog.SetTestBitmap )
 				else:
-					wx.CallAfter( self.focusDialog.SetBitmap, CVUtil.frameToBitmap(lastFrame) )
+					wx.CallAfter( self.focusDialog.SetBitmap, bitmap )
 			else:
 				self.camInQ.put( {'cmd':'cancel_update', 'name':'focus'} )
 
@@ -1722,7 +1764,7 @@ class MainWin( wx.Frame ):
 			
 		#---------------------------------------------------------------
 		def fpsHandler( msg ):
-			wx.CallAfter( self.updateActualFPS, msg['fps_actual'] )
+			wx.CallAfter( self.updateActualFPS, msg['fps_actual'], msg.get('timing', None) )
 
 		handlers = {
 			'response':		responseHandler,
@@ -1823,9 +1865,10 @@ class MainWin( wx.Frame ):
 				GlobalDatabase()
 			
 			self.dbWriterQ = Queue()
+			self.dbWriterStats.reset()
 			self.dbWriterThread = threading.Thread(
 				target=DBWriter,
-				args=(self.dbWriterQ, lambda: wx.CallAfter(self.dbInactivityUpdate), GlobalDatabase().fname),
+				args=(self.dbWriterQ, lambda: wx.CallAfter(self.dbInactivityUpdate), GlobalDatabase().fname, self.dbWriterStats),
 				daemon=True
 			)
 			self.dbWriterThread.start()
@@ -116,6 +116,7 @@ class CrossMgrVideoHandler( BaseHTTPRequestHandler ):
 	jpeg_content	= 'image/jpeg'
 	png_content		= 'image/png'
 	re_jpeg_request = re.compile( r'^\/img([0-9]+)c?s?g?\.jpeg$' )
+	re_thumb_request = re.compile( r'^\/thumb([0-9]+)\.jpeg$' )
 	
 	def parse_POST( self ):
 		ctype, pdict = parse_header(self.headers['content-type'])
@@ -158,6 +159,10 @@ class CrossMgrVideoHandler( BaseHTTPRequestHandler ):
 					content = CVUtil.frameToJPeg( frame )
 				content_type = self.jpeg_content
 				
+			elif self.re_thumb_request.match( up.path ):		# Thumbnails for browsing.
+				content = GlobalDatabase().getThumbById( int(self.re_thumb_request.match(up.path).group(1)) )
+				content_type = self.jpeg_content
+				
 			elif up.path=='/triggers.js':
 				# Get all triggers for a given day.  Also support seaching for a bib.
 				query = { k:v[0] for k,v in parse_qs( up.query, keep_blank_values=True ).items() }
@@ -98,7 +98,7 @@ class DNSManager( wx.Panel, listmix.ColumnSorterMixin ):
 		with Model.LockRace() as race:
 			for n in nums:
 				if n > 0:
-					race.getRider(n).status = DNS
+					race.getRider(n).setStatus( DNS )
 			race.setChanged()
 			race.resetAllCaches()
 		
@@ -137,6 +137,7 @@ class CorrectNumberDialog( wx.Dialog ):
 					firstTime = rider.riderTimeToRaceTime(t)							# Set firstTime (in race time).
 					race.numTimeInfo.change( self.entry.num, rider.firstTime, firstTime  )
 					rider.firstTime = firstTime
+					Model.journalRider( rider, 'first', num, firstTime )
 					
 			race.setChanged()
 			Utils.refresh()
@@ -213,6 +214,7 @@ class ShiftNumberDialog( wx.Dialog ):
 				else:
 					race.numTimeInfo.change( self.entry.num, rider.firstTime, t )
 					rider.firstTime = t
+					Model.journalRider( rider, 'first', num, t )
 					race.setChanged()
 			Utils.refresh()
 		self.EndModal( wx.ID_OK )
@@ -2,7 +2,6 @@ import os
 import re
 import math
 import xlrd
-import openpyxl
 import datetime
 import unicodedata
 import xml.etree.ElementTree
@@ -137,6 +136,7 @@ class ReadExcelXlsx:
 	def __init__(self, filename):
 		if not os.path.isfile(filename):
 			raise ValueError( "{} is not a valid filename".format(filename) )
+		import openpyxl		# Slow to import.  Only import it when needed.
 		self.book = openpyxl.load_workbook( filename, data_only=True )
 		
 	def is_nonempty_row(self, sheet, i):
@@ -1,16 +1,14 @@
 import wx
 import os
 import re
-import xlwt
 import uuid
 import datetime
 import Utils
 import Model
 import math
-from GetResults import GetResults, GetCategoryDetails
+from GetResults import GetResults, GetCategoryDetails, UnstartedRaceWrapper
 from ReadSignOnSheet import ReportFields
 from FitSheetWrapper import FitSheetWrapper, FitSheetWrapperXLSX
-import qrcode
 from urllib.parse import quote
 import Flags
 import ImageIO
@@ -70,6 +68,7 @@ def getHeaderBitmap():
 	return bitmap
 
 def drawQRCode( url, dc, x, y, size ):
+	import qrcode
 	qr = qrcode.QRCode()
 	qr.add_data( 'http://' + url )
 	qr.make()
@@ -540,6 +539,7 @@ class ExportGrid:
 			
 	def toExcelSheet( self, sheet ):
 		''' Write the contents of the grid to an xlwt excel sheet. '''
+		import xlwt
 		titleStyle = xlwt.XFStyle()
 		titleStyle.font.bold = True
 		titleStyle.font.height += titleStyle.font.height // 2
@@ -1016,5 +1016,48 @@ class ExportGrid:
 						
 		self.colnames = [Utils.translate(n) if n in infoFieldsPresent else n for n in self.colnames]
 
+def getRaceCategories():
+	# Get all the categories available to print.
+	with UnstartedRaceWrapper():
+		with Model.LockRace() as race:
+			if race is None:
+				return []
+			categories = [ (c.fullname, c) for c in race.getCategories(startWaveOnly=False, publishOnly=True) if race.hasCategory(c) ]
+		categories.append( ('All', None) )
+	return categories
+
+def ExportResultsExcel( xlFName ):
+	# Write the results of Model.race to an Excel file, one sheet per category.
+	# Does not use the gui, so it can run in the results worker.
+	import xlsxwriter
+	from AddExcelInfo import AddExcelInfo
+	
+	wb = xlsxwriter.Workbook( xlFName )
+	formats = ExportGrid.getExcelFormatsXLSX( wb )
+	with UnstartedRaceWrapper():
+		raceCategories = getRaceCategories()
+		
+		ues = Utils.UniqueExcelSheetName()
+		for catName, category in raceCategories:
+		
+			if catName == 'All' and len(raceCategories) > 1:
+				continue
+							
+			sheetCur = wb.add_worksheet( ues.getSheetName(catName) )
+			export = ExportGrid()
+			export.setResultsOneList( category, showLapsFrequency = 1 )
+			export.toExcelSheetXLSX( formats, sheetCur )
+			
+		race = Model.race
+		if race and getattr(race, 'primes', None):
+			from Primes import GetGrid
+			sheetCur = wb.add_worksheet( Utils.RemoveDisallowedSheetChars('Primes') )
+			export = ExportGrid( **GetGrid() )
+			export.toExcelSheetXLSX( formats, sheetCur )
+
+	AddExcelInfo( wb )
+	wb.close()
+	return xlFName
+
 if __name__ == '__main__':
 	pass
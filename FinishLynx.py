@@ -123,6 +123,7 @@ def ReadLIF( fname ):
 				# Get the race start time from the header.
 				raceStart = strToSeconds( row[-1] )
 				race.startTime = datetime.datetime( *(tuple(int(v) for v in race.date.split('-')) + hhmmssmsFromSeconds(raceStart)) )
+				race.journalStartTime()
 				continue
 			
 			try:
@@ -144,6 +145,7 @@ def ImportLIF( fname ):
 		rider.times = []
 		if not race.isTimeTrial:
 			rider.firstTime = None
+		Model.journalRiderState( rider )
 		for t in r['race_times']:
 			race.addTime( r['id'], t, False )
 		rider.setStatus( r['status'] )
@@ -365,6 +365,7 @@ class Gantt( wx.Panel ):
 		if rider.autocorrectLaps:
 			if Utils.MessageOKCancel( self, _('Turn off Autocorrect first?'), _('Turn off Autocorrect') ):
 				rider.autocorrectLaps = False
+				Model.journalRiderState( rider )
 				
 		waveCategory = race.getCategory( num )
 		if waveCategory:
@@ -5,6 +5,7 @@ import sys
 import bisect
 import Utils
 from PhotoFinish import hasPhoto
+from BitmapCache import BitmapCache, BitmapTiles
 
 def SetScrollbarParameters( sb, thumbSize, rng, pageSize ):
 	thumbSize = int(thumbSize)
@@ -84,6 +85,16 @@ class GanttChartPanel(wx.Panel):
 		self.labelsWidthLeft = 8000
 		self.xFactor = 1
 		
+		# The bars and labels are drawn into cached tiles, and the visible part of the chart is composed from them into a cached bitmap.
+		# Only the cursor is drawn on each paint.
+		self.chartCache = BitmapCache()
+		self.chartGeometry = None
+		self.barTiles = BitmapTiles()
+		self.labelTiles = BitmapTiles()
+		self.dataVersion = 0
+		self.labelExtents = {}
+		self.tCursor = None
+		
 		self.yellowColour = wx.Colour(220,220,0)
 		self.orangeColour = wx.Colour(255,165,0)
 		
@@ -156,6 +167,8 @@ class GanttChartPanel(wx.Panel):
 		* data is a list of lists.  Each list is a list of times.
 		* labels are the names of the series.  Optional.
 		"""
+		self.dataVersion += 1
+		self.labelExtents = {}
 		self.data = None
 		self.labels = None
 		self.status = status
@@ -282,28 +295,68 @@ class GanttChartPanel(wx.Panel):
 			xPos, yPos = event.GetPosition()
 			rClickCallback( xPos, yPos, self.numSelect, iRider, iLap )
 
+	tileWidth = 512		# Pixels of time in a cached tile of bars.
+	tileRows = 16		# Riders in a cached tile of bars or labels.
+	
 	intervals = [1, 2, 5, 10, 15, 20, 30, 1*60, 2*60, 5*60, 10*60, 15*60, 20*60, 30*60, 1*60*60, 2*60*60, 4*60*60, 6*60*60, 8*60*60, 12*60*60] + [24*60*60*k for k in range(1,200)]
 	
+	def getChartKey( self ):
+		# Everything the visible chart depends on.
+		# Changing the scroll position only composes the chart again from the cached tiles.
+		sbv, sbh = self.verticalSB, self.horizontalSB
+		return (
+			tuple(self.GetClientSize()), self.dataVersion, self.nowTime, '{}'.format(self.numSelect), self.minimizeLabels,
+			self.GetBackgroundColour().Get(),
+			sbv.IsShown(), sbv.GetThumbPosition(), sbh.IsShown(), sbh.GetThumbPosition(),
+		)
+	
+	def getLabelExtents( self, dc, fontHeight ):
+		# Measuring every label is slow for big fields.  The widths only change with the data and the font.
+		try:
+			return self.labelExtents[fontHeight]
+		except KeyError:
+			pass
+		
+		maxBibWidth = dc.GetTextExtent( '999999' )[0]
+		spaceWidth = dc.GetTextExtent( ' ' )[0]
+		statusWidthMax = max( (dc.GetTextExtent(s)[0] for s in self.status), default=0 ) if self.status else 0
+		labelWidths = [dc.GetTextExtent(label)[0] for label in self.labels]
+		labelWidthMax = numWidthMax = None
+		for label, labelWidth in zip(self.labels, labelWidths):
+			if label not in self.headerSet:
+				labelWidthMax = labelWidth if labelWidthMax is None else max( labelWidthMax, labelWidth )
+				num = numFromLabel(label)
+				if num is not None:
+					numWidthMax = max( numWidthMax or 0, dc.GetTextExtent('{}'.format(num))[0] )
+		
+		self.labelExtents[fontHeight] = extents = (maxBibWidth, spaceWidth, statusWidthMax, labelWidthMax, numWidthMax or 0, labelWidths)
+		return extents
+	
 	def Draw( self, dc ):
+		size = self.GetClientSize()
+		self.chartCache.Blit( dc, self.getChartKey(), size.width, size.height, self.drawChartKey )
+		self.drawCursor( dc )
+	
+	def drawChartKey( self, dc ):
+		self.drawChart( dc )
+		return self.getChartKey()		# Drawing may show, hide or adjust the scrollbars.
+	
+	def drawChart( self, dc ):
 		size = self.GetClientSize()
 		width = size.width
 		height = size.height
 		
-		maxBib = '999999'
-		
 		minBarWidth = 48
 		minBarHeight = 18
 		maxBarHeight = 28
 		
 		backColour = self.GetBackgroundColour()
 		backBrush = wx.Brush(backColour, wx.SOLID)
-		greyBrush = wx.Brush( wx.Colour(196,196,196), wx.SOLID )
-		lightGreyBrush = wx.Brush( wx.Colour(220,220,220), wx.SOLID )
 		dc.SetBackground(backBrush)
 		dc.Clear()
 		
 		tooSmall = (width < 50 or height < 24)
-		self.tCursor = None
+		self.chartGeometry = None
 		
 		if not self.data or self.dataMax == 0 or tooSmall:
 			self.empty = True
@@ -319,29 +372,22 @@ class GanttChartPanel(wx.Panel):
 		barHeight = int(float(height) / float(len(self.data) + 2))
 		barHeight = max( barHeight, minBarHeight )
 		barHeight = min( barHeight, maxBarHeight )
-		fontBarLabel = wx.Font( (0,int(min(barHeight-2, barHeight*0.9))), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
+		fontBarLabelHeight = int(min(barHeight-2, barHeight*0.9))
+		fontBarLabel = wx.Font( (0,fontBarLabelHeight), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
 		dc.SetFont( fontBarLabel )
-		textWidthLeftMax, textHeightMax = dc.GetTextExtent( maxBib )
+		maxBibWidth, statusTextSpace, statusTextWidth, labelWidthMax, numWidthMax, labelWidths = self.getLabelExtents( dc, fontBarLabelHeight )
 		
-		statusTextSpace = dc.GetTextExtent(' ')[0]
 		if self.status:
-			statusTextWidth = max( dc.GetTextExtent(s)[0] for s in self.status )
 			if statusTextWidth:
 				statusTextWidth += statusTextSpace
 		else:
 			statusTextWidth = 0
 			self.status = [''] * len(self.data)
 			
-		textWidthLeftMax += statusTextWidth
-		
-		textWidthRightMax = 0
-		for label in self.labels:
-			if label not in self.headerSet:
-				textWidthLeftMax = max( textWidthLeftMax, dc.GetTextExtent(label)[0] + statusTextWidth )
-				num = numFromLabel(label)
-				if num is not None:
-					textWidthRightMax = max( textWidthRightMax, dc.GetTextExtent('{}'.format(num))[0] )
-		textWidthRightMax += statusTextWidth
+		textWidthLeftMax = maxBibWidth + statusTextWidth
+		if labelWidthMax is not None:
+			textWidthLeftMax = max( textWidthLeftMax, labelWidthMax + statusTextWidth )
+		textWidthRightMax = numWidthMax + statusTextWidth
 				
 		if textWidthLeftMax + textWidthRightMax > width:
 			self.horizontalSB.Show( False )
@@ -379,15 +425,10 @@ class GanttChartPanel(wx.Panel):
 
 		dc.SetFont( fontBarLabel )
 
-		textWidthLeftMax, textHeightMax = dc.GetTextExtent( maxBib )
-		textWidthRightMax = 0
-		for label in self.labels:
-			if label not in self.headerSet:
-				textWidthLeftMax = max( textWidthLeftMax, dc.GetTextExtent(label)[0] + statusTextWidth )
-				num = numFromLabel(label)
-				if num is not None:
-					textWidthRightMax = max( textWidthRightMax, dc.GetTextExtent( '{}'.format(num) )[0] )
-		textWidthRightMax += statusTextWidth
+		textWidthLeftMax = maxBibWidth
+		if labelWidthMax is not None:
+			textWidthLeftMax = max( textWidthLeftMax, labelWidthMax + statusTextWidth )
+		textWidthRightMax = numWidthMax + statusTextWidth
 				
 		if textWidthLeftMax + textWidthRightMax > width:
 			self.horizontalSB.Show( False )
@@ -488,10 +529,110 @@ class GanttChartPanel(wx.Panel):
 			dc.DrawText( s, xText, yBottom + 4)
 			dc.DrawLine( x, yBottom+3, x, yTop-3 )
 		
-		# Draw the Gantt chart.
+		# Draw the Gantt chart from the cached tiles.
+		# The tiles are in the coordinates of the whole chart (not the scroll position), so scrolling only draws the tiles coming into view.
+		xFactor = dFactor
+		iDataShowEnd = min( iDataShowEnd, len(self.data) )
+		yLast = barHeight * (1 + iDataShowEnd - iDataShowStart)
+		rowsHeight = yLast - barHeight + 1
+		xScroll = int(tAdjust * xFactor)
+		
+		tileWidth, tileRows = self.tileWidth, self.tileRows
+		tileHeight = barHeight * tileRows + 1
+		iTileRows = range( iDataShowStart // tileRows, (iDataShowEnd - 1) // tileRows + 1 )
+		iTileCols = range( xScroll // tileWidth, (xScroll + xRight - xLeft) // tileWidth + 1 )
+		
+		def drawBarTile( dc, tile ):
+			self.drawBarTile( dc, tile, barHeight, xFactor, fontNote )
+		
+		barKey = (self.dataVersion, barHeight, xFactor, backColour.Get())
+		dc.SetClippingRegion( xLeft, barHeight, xRight - xLeft + 1, rowsHeight )
+		for iRow in iTileRows:
+			y = barHeight * (1 + iRow * tileRows - iDataShowStart)
+			for iCol in iTileCols:
+				dc.DrawBitmap( self.barTiles.Get(barKey, (iRow, iCol), tileWidth, tileHeight, drawBarTile), xLeft + iCol * tileWidth - xScroll, y )
+		dc.DestroyClippingRegion()
+		
+		# The label tiles have the left labels, then the right labels.
+		def drawLabelTile( dc, iRow ):
+			self.drawLabelTile( dc, iRow, barHeight, fontBarLabel, textWidthLeftMax, statusTextWidth, statusTextSpace, labelWidths, labelsWidthLeft, labelsWidthRight )
+		
+		labelKey = (self.dataVersion, barHeight, textWidthLeftMax, statusTextWidth, labelsWidthLeft, labelsWidthRight, self.minimizeLabels, backColour.Get())
+		for iRow in iTileRows:
+			y = barHeight * (1 + iRow * tileRows - iDataShowStart)
+			bitmap = self.labelTiles.Get( labelKey, iRow, labelsWidthLeft + labelsWidthRight, tileHeight, drawLabelTile )
+			dc.SetClippingRegion( 0, barHeight, xLeft, rowsHeight )
+			dc.DrawBitmap( bitmap, 0, y )
+			dc.DestroyClippingRegion()
+			dc.SetClippingRegion( xRight, barHeight, width - xRight, rowsHeight )
+			dc.DrawBitmap( bitmap, xRight - xLeft, y )
+			dc.DestroyClippingRegion()
+		
+		# Draw the category labels and find the selected rider.
 		dc.SetFont( fontBarLabel )
-		textWidth, textHeight = dc.GetTextExtent( maxBib )
+		numSelect = '{}'.format( self.numSelect )
+		yHighlight = None
+		for i in range(iDataShowStart, iDataShowEnd):
+			y = barHeight * (1 + i - iDataShowStart)
+			if self.labels[i] in self.headerSet:
+				dc.DrawText( self.labels[i], labelsWidthLeft + 4, y )    # This is a Category Label.
+			if numSelect == '{}'.format(numFromLabel(self.labels[i])):
+				yHighlight = y + barHeight
+				
+		if yHighlight is not None and len(self.data) > 1:
+			dc.SetPen( wx.Pen(wx.BLACK, 2) )
+			dc.SetBrush( wx.TRANSPARENT_BRUSH )
+			dc.DrawLine( 0, yHighlight, width, yHighlight )
+			yHighlight -= barHeight
+			dc.DrawLine( 0, yHighlight, width, yHighlight )
+		
+		# Record the leader's last x position.
+		tLeaderLast = self.data[0][-1] if self.data[0] else 0.0
+		
+		# Draw the now timeline.
+		timeLineTime = self.nowTime if self.nowTime and self.nowTime < self.dataMax else tLeaderLast
+		nowTimeStr = Utils.formatTime( timeLineTime )
+		labelWidth, labelHeight = dc.GetTextExtent( nowTimeStr )
+		x = int(labelsWidthLeft + (timeLineTime - tAdjust) * xFactor)
+		if xLeft <= x < xRight:			
+			ntColour = '#339966'
+			dc.SetPen( wx.Pen(ntColour, 3) )
+			dc.DrawLine( x, barHeight - 4, x, yLast + 4 )
+			dc.SetPen( wx.Pen(wx.WHITE, 1) )
+			dc.DrawLine( x, barHeight - 4, x, yLast + 4 )
+			
+			dc.SetBrush( wx.Brush(ntColour) )
+			dc.SetPen( wx.Pen(ntColour,1) )
+			rect = wx.Rect( x - labelWidth//2-2, 0, labelWidth+4, labelHeight )
+			dc.DrawRectangle( rect )
+			if not self.minimizeLabels:
+				rect.SetY( yLast+2 )
+				dc.DrawRectangle( rect )
 
+			dc.SetTextForeground( wx.WHITE )
+			dc.DrawText( nowTimeStr, x - labelWidth // 2, 0 )
+			if not self.minimizeLabels:
+				dc.DrawText( nowTimeStr, x - labelWidth // 2, yLast + 2 )
+		
+		# Store the drawing scale parameters.
+		self.xFactor = xFactor
+		self.barHeight = barHeight
+		self.labelsWidthLeft = labelsWidthLeft
+		self.chartGeometry = (xLeft, xRight, yLast, tAdjust, iDataShowStart, iDataShowEnd, fontBarLabel, nowTimeStr)
+	
+	def drawBarTile( self, dc, tile, barHeight, xFactor, fontNote ):
+		# Draw the bars of tileRows riders starting at row iRow * tileRows and tileWidth pixels of time starting at iCol * tileWidth.
+		# Bars and indicators in the rows and times next to the tile are drawn too so they line up across the tile edges.
+		iRow, iCol = tile
+		dc.SetBackground( wx.Brush(self.GetBackgroundColour(), wx.SOLID) )
+		dc.Clear()
+		
+		xTile = iCol * self.tileWidth
+		iDataStart = iRow * self.tileRows
+		xMin = -barHeight
+		xMax = self.tileWidth + barHeight
+		tToX = lambda t: int(t * xFactor) - xTile
+		
 		penBar = wx.Pen( wx.Colour(128,128,128), 1 )
 		penBar.SetCap( wx.CAP_BUTT )
 		penBar.SetJoin( wx.JOIN_MITER )
@@ -510,68 +651,55 @@ class GanttChartPanel(wx.Panel):
 		xyNumTimeInfo = []
 		xyDuplicate = []
 		
-		xFactor = dFactor
-		yLast = barHeight
-		yHighlight = None
-		
-		tLeaderLast = None
-		dy = 0
-
-		tToX = lambda t: int(labelsWidthLeft + (t-tAdjust) * xFactor)
-		# Set inverse function to get from screen x coords to time.
-		xToT = lambda x: (x-labelsWidthLeft) / xFactor + tAdjust
+		dy = barHeight + 1
+		dd = int(dy * 0.3)
+		tTooShort = 9.0	# If a lap is shorter than 9 seconds, consider it a duplicate entry.
 		
-		for i, s in enumerate(self.data):
-			# Record the leader's last x position.
-			if tLeaderLast is None:
-				tLeaderLast = s[-1] if s else 0.0
-			if not ( iDataShowStart <= i < iDataShowEnd ):
-				continue
-			
+		for i in range(max(0, iDataStart - 1), min(len(self.data), iDataStart + self.tileRows + 1)):
+			s = self.data[i]
 			try:
 				num = numFromLabel(self.labels[i])
 			except (TypeError, IndexError):
 				num = -1
-				
+			
+			yLast = barHeight * (i - iDataStart)
 			yCur = yLast + barHeight
-			xLast = labelsWidthLeft
-			xCur = xLast
-			tTooShort = 9.0	# If a lap is shorter than 9 seconds, consider it a duplicate entry.
 			
-			# Quickly find the first visible gantt chart rectangle.
-			for j in range(max(0, bisect.bisect_left(KeyWrapper(s, tToX), labelsWidthLeft)-1), len(s)):
-				if xLast >= xRight:
+			# Quickly find the first gantt chart rectangle in the tile.
+			jStart = max(0, bisect.bisect_left(KeyWrapper(s, tToX), xMin)-1)
+			xLast = tToX( s[jStart-1] if jStart else 0.0 )
+			for j in range(jStart, len(s)):
+				if xLast >= xMax:
 					break
 				t = s[j]
-				xCur = xOriginal = tToX( t )
-				if xCur < labelsWidthLeft:
-					continue
-					
-				if xCur > xRight:
-					xCur = xRight
-				if j == 0:
+				xCur = tToX( t )
+				if xCur < xMin:
+					pass
+				elif j == 0:
 					brushBar.SetColour( wx.WHITE )
 					dc.SetBrush( brushBar )
-					dc.DrawRectangle( xLast, yLast, xCur - xLast + 1, yCur - yLast + 1 )
+					xBar = max( xLast, xMin )
+					dc.DrawRectangle( xBar, yLast, min(xCur, xMax) - xBar + 1, yCur - yLast + 1 )
 				else:
+					xBar = max( xLast, xMin )
+					wBar = min( xCur, xMax ) - xBar + 1
 					ctx.SetPen( wx.Pen(wx.WHITE, 1, style=wx.TRANSPARENT ) )
-					dy = yCur - yLast + 1
-					dd = int(dy * 0.3)
 					ic = j % len(self.colours)
 					
 					ctx.SetBrush( ctx.CreateLinearGradientBrush(0, yLast, 0, yLast + dd + 1, self.colours[ic], self.lighterColours[ic]) )
-					ctx.DrawRectangle(xLast, yLast, xCur - xLast + 1, dd + 1)
+					ctx.DrawRectangle(xBar, yLast, wBar, dd + 1)
 					
 					ctx.SetBrush( ctx.CreateLinearGradientBrush(0, yLast + dd, 0, yLast + dy, self.lighterColours[ic], self.colours[ic]) )
-					ctx.DrawRectangle(xLast, yLast + dd, xCur - xLast + 1, dy-dd )
+					ctx.DrawRectangle(xBar, yLast + dd, wBar, dy-dd )
 					
 					dc.SetBrush( transparentBrush )
 					dc.SetPen( penBar )
-					dc.DrawRectangle( xLast, yLast, xCur - xLast + 1, dy )
+					dc.DrawRectangle( xBar, yLast, wBar, dy )
 					
 					if self.lapNote:
 						note = self.lapNote.get( (num, j), None )
 						if note:
+							# Fit the note to the whole bar so it lines up across the tiles.
 							dc.SetFont( fontNote )
 							noteWidth, noteHeight = dc.GetTextExtent( note )
 							noteBorderWidth = int(dc.GetTextExtent( '   ' )[0] / 2)
@@ -593,40 +721,28 @@ class GanttChartPanel(wx.Panel):
 								note = note[:lenLeft].strip() + '...'
 								noteWidth, noteHeight = dc.GetTextExtent( note )
 							dc.DrawText( note, round(xLast + noteBorderWidth), round(yLast + (dy - noteHeight) / 2) )
-							dc.SetFont( fontBarLabel )
-					
-					if j == self.moveLap and self.moveIRider == i:
-						if hasPhoto(num, t):
-							# Draw a little camera icon.
-							cameraHeight = int(dy * 0.75)
-							cameraWidth = int(cameraHeight * 1.5)
-							dc.SetBrush( wx.BLACK_BRUSH )
-							dc.DrawRoundedRectangle( round(xCur - 2 - cameraWidth), round(yLast + (dy - cameraHeight) / 2), cameraWidth, cameraHeight, round(cameraHeight/5) )
-							dc.SetPen( wx.WHITE_PEN )
-							dc.SetBrush( transparentBrush )
-							dc.DrawCircle( round(xCur - 2 - cameraWidth / 2), round(yLast + dy / 2), round(cameraHeight * (0.6 / 2)) ) 
 					
-					if xOriginal <= xRight:
+					if xMin <= xCur <= xMax:
 						try:
 							if self.interp[i][j]:
-								xyInterp.append( (xOriginal, yLast) )
+								xyInterp.append( (xCur, yLast) )
 						except (TypeError, ValueError, IndexError):
 							pass
 						if self.numTimeInfo and self.numTimeInfo.getInfo(num, t) is not None:
-							xyNumTimeInfo.append( (xOriginal, yLast) )
+							xyNumTimeInfo.append( (xCur, yLast) )
 						if t - s[j-1] < tTooShort:
-							xyDuplicate.append( (xOriginal, yLast) )
+							xyDuplicate.append( (xCur, yLast) )
 
 				xLast = xCur
-			
-			# Draw the last empty bar.
-			xCur = int(labelsWidthLeft + self.dataMax * xFactor)
-			if xCur > xRight:
-				xCur = xRight
-			dc.SetPen( penBar )
-			brushBar.SetColour( wx.WHITE )
-			dc.SetBrush( brushBar )
-			dc.DrawRectangle( xLast, yLast, xCur - xLast + 1, yCur - yLast + 1 )
+			else:
+				# Draw the last empty bar.
+				xCur = min( tToX(self.dataMax), xMax )
+				if xCur >= xMin:
+					xBar = max( xLast, xMin )
+					dc.SetPen( penBar )
+					brushBar.SetColour( wx.WHITE )
+					dc.SetBrush( brushBar )
+					dc.DrawRectangle( xBar, yLast, xCur - xBar + 1, yCur - yLast + 1 )
 			
 			# Draw the early bell line.
 			if self.earlyBellTimes and self.earlyBellTimes[i]:
@@ -634,46 +750,6 @@ class GanttChartPanel(wx.Panel):
 				dc.SetPen( penEBT )
 				dc.DrawLine( ebtX, yLast, ebtX, yLast+dy )
 				dc.SetPen( penBar )
-			
-			# Draw the label on both ends.
-			if self.greyOutSet and i in self.greyOutSet:
-				dc.SetPen( wx.TRANSPARENT_PEN )
-				dc.SetBrush( greyBrush )
-				dc.DrawRectangle( 0, yLast, textWidthLeftMax, yCur - yLast + 1 )
-				dc.SetBrush( backBrush )
-			if self.status[i] == _('PUL'):
-				dc.SetPen( wx.TRANSPARENT_PEN )
-				dc.SetBrush( lightGreyBrush )
-				dc.DrawRectangle( 0, yLast, textWidthLeftMax, yCur - yLast + 1 )
-				dc.SetBrush( backBrush )
-			if self.labels[i] in self.headerSet:
-				dc.DrawText( self.labels[i], labelsWidthLeft + 4, yLast )    # This is a Category Label.
-			else:
-				labelWidth = dc.GetTextExtent( self.labels[i] )[0]
-				dc.DrawText( self.labels[i], textWidthLeftMax - labelWidth - statusTextWidth, yLast )
-				if statusTextWidth and self.status[i]:
-					dc.DrawText( self.status[i], textWidthLeftMax - statusTextWidth + statusTextSpace, yLast )
-				if not self.minimizeLabels:
-					label = self.labels[i]
-					lastSpace = label.rfind( ' ' )
-					if lastSpace > 0:
-						label = label[lastSpace+1:]
-					labelWidth = dc.GetTextExtent( label )[0]
-					dc.DrawText( label, width - labelsWidthRight + legendSep, yLast )
-					if statusTextWidth and self.status[i]:
-						dc.DrawText( self.status[i], width - statusTextWidth + statusTextSpace, yLast )
-
-			if f'{self.numSelect}' == f'{numFromLabel(self.labels[i])}':
-				yHighlight = yCur
-
-			yLast = yCur
-				
-		if yHighlight is not None and len(self.data) > 1:
-			dc.SetPen( wx.Pen(wx.BLACK, 2) )
-			dc.SetBrush( wx.TRANSPARENT_BRUSH )
-			dc.DrawLine( 0, yHighlight, width, yHighlight )
-			yHighlight -= barHeight
-			dc.DrawLine( 0, yHighlight, width, yHighlight )
 		
 		# Draw indicators for interpolated values.
 		radius = (dy/2) * 0.9
@@ -724,31 +800,79 @@ class GanttChartPanel(wx.Panel):
 		ctx.SetBrush( wx.TRANSPARENT_BRUSH )
 		for xCur, yCur in xyDuplicate:
 			ctx.DrawEllipse( xCur - radius, yCur + dy/2.0 - radius, radius*2, radius*2 )
+	
+	def drawLabelTile( self, dc, iRow, barHeight, fontBarLabel, textWidthLeftMax, statusTextWidth, statusTextSpace, labelWidths, labelsWidthLeft, labelsWidthRight ):
+		# Draw the labels of tileRows riders starting at row iRow * tileRows.
+		# The left labels are at x < labelsWidthLeft, the right labels follow.
+		backBrush = wx.Brush( self.GetBackgroundColour(), wx.SOLID )
+		greyBrush = wx.Brush( wx.Colour(196,196,196), wx.SOLID )
+		lightGreyBrush = wx.Brush( wx.Colour(220,220,220), wx.SOLID )
+		dc.SetBackground( backBrush )
+		dc.Clear()
+		dc.SetFont( fontBarLabel )
 		
-		# Draw the now timeline.
-		timeLineTime = self.nowTime if self.nowTime and self.nowTime < self.dataMax else tLeaderLast
-		nowTimeStr = Utils.formatTime( timeLineTime )
-		labelWidth, labelHeight = dc.GetTextExtent( nowTimeStr )
-		x = int(labelsWidthLeft + (timeLineTime - tAdjust) * xFactor)
-		if xLeft <= x < xRight:			
-			ntColour = '#339966'
-			dc.SetPen( wx.Pen(ntColour, 3) )
-			dc.DrawLine( x, barHeight - 4, x, yLast + 4 )
-			dc.SetPen( wx.Pen(wx.WHITE, 1) )
-			dc.DrawLine( x, barHeight - 4, x, yLast + 4 )
-			
-			dc.SetBrush( wx.Brush(ntColour) )
-			dc.SetPen( wx.Pen(ntColour,1) )
-			rect = wx.Rect( x - labelWidth//2-2, 0, labelWidth+4, labelHeight )
-			dc.DrawRectangle( rect )
+		legendSep = 4
+		width = labelsWidthLeft + labelsWidthRight
+		iDataStart = iRow * self.tileRows
+		for i in range(iDataStart, min(len(self.data), iDataStart + self.tileRows)):
+			yLast = barHeight * (i - iDataStart)
+			yCur = yLast + barHeight
+			if self.greyOutSet and i in self.greyOutSet:
+				dc.SetPen( wx.TRANSPARENT_PEN )
+				dc.SetBrush( greyBrush )
+				dc.DrawRectangle( 0, yLast, textWidthLeftMax, yCur - yLast + 1 )
+				dc.SetBrush( backBrush )
+			if self.status[i] == _('PUL'):
+				dc.SetPen( wx.TRANSPARENT_PEN )
+				dc.SetBrush( lightGreyBrush )
+				dc.DrawRectangle( 0, yLast, textWidthLeftMax, yCur - yLast + 1 )
+				dc.SetBrush( backBrush )
+			if self.labels[i] in self.headerSet:
+				continue	# Category labels are drawn over the bars.
+			dc.DrawText( self.labels[i], textWidthLeftMax - labelWidths[i] - statusTextWidth, yLast )
+			if statusTextWidth and self.status[i]:
+				dc.DrawText( self.status[i], textWidthLeftMax - statusTextWidth + statusTextSpace, yLast )
 			if not self.minimizeLabels:
-				rect.SetY( yLast+2 )
-				dc.DrawRectangle( rect )
+				label = self.labels[i]
+				lastSpace = label.rfind( ' ' )
+				if lastSpace > 0:
+					label = label[lastSpace+1:]
+				dc.DrawText( label, width - labelsWidthRight + legendSep, yLast )
+				if statusTextWidth and self.status[i]:
+					dc.DrawText( self.status[i], width - statusTextWidth + statusTextSpace, yLast )
+	
 
-			dc.SetTextForeground( wx.WHITE )
-			dc.DrawText( nowTimeStr, x - labelWidth // 2, 0 )
-			if not self.minimizeLabels:
-				dc.DrawText( nowTimeStr, x - labelWidth // 2, yLast + 2 )
+	def drawCursor( self, dc ):
+		self.tCursor = None
+		if not self.chartGeometry or self.empty:
+			return
+		xLeft, xRight, yLast, tAdjust, iDataShowStart, iDataShowEnd, fontBarLabel, nowTimeStr = self.chartGeometry
+		barHeight, xFactor, labelsWidthLeft = self.barHeight, self.xFactor, self.labelsWidthLeft
+		tToX = lambda t: int(labelsWidthLeft + (t-tAdjust) * xFactor)
+		# Set inverse function to get from screen x coords to time.
+		xToT = lambda x: (x-labelsWidthLeft) / xFactor + tAdjust
+		
+		dc.SetFont( fontBarLabel )
+		
+		# Draw a little camera icon on the lap under the cursor.
+		i, j = self.moveIRider, self.moveLap
+		try:
+			s = self.data[i] if iDataShowStart <= i < iDataShowEnd and j else []
+			t = s[j] if s else None
+		except (TypeError, IndexError):
+			t = None
+		if t is not None and labelsWidthLeft <= tToX(t) and tToX(s[j-1]) < xRight and hasPhoto(numFromLabel(self.labels[i]), t):
+			xCur = min( tToX(t), xRight )
+			yBar = barHeight * (1 + i - iDataShowStart)
+			dy = barHeight + 1
+			cameraHeight = int(dy * 0.75)
+			cameraWidth = int(cameraHeight * 1.5)
+			dc.SetPen( wx.Pen(wx.Colour(128,128,128), 1) )
+			dc.SetBrush( wx.BLACK_BRUSH )
+			dc.DrawRoundedRectangle( round(xCur - 2 - cameraWidth), round(yBar + (dy - cameraHeight) / 2), cameraWidth, cameraHeight, round(cameraHeight/5) )
+			dc.SetPen( wx.WHITE_PEN )
+			dc.SetBrush( wx.TRANSPARENT_BRUSH )
+			dc.DrawCircle( round(xCur - 2 - cameraWidth / 2), round(yBar + dy / 2), round(cameraHeight * (0.6 / 2)) ) 
 		
 		# Draw the cursor crosshair.
 		if self.moveIRider is not None and xLeft <= self.xMove < xRight:
@@ -783,11 +907,6 @@ class GanttChartPanel(wx.Panel):
 			dc.DrawText( tStr, x - labelWidth // 2, 0 )
 			if not self.minimizeLabels:
 				dc.DrawText( tStr, x - labelWidth // 2, yLast + 2 )			
-		
-		# Store the drawing scale parameters.
-		self.xFactor = xFactor
-		self.barHeight = barHeight
-		self.labelsWidthLeft = labelsWidthLeft
 			
 	def OnEraseBackground(self, event):
 		# This is intentionally empty.
@@ -20,6 +20,7 @@ import collections
 from getuser import lookup_username
 import zipfile
 from GpxParse import GpxParse
+from BitmapCache import BitmapCache
 
 def LineNormal( x1, y1, x2, y2, normLen ):
 	''' Returns the coords of a normal line passing through x1, y1 of length normLen. '''
@@ -701,8 +702,9 @@ class GeoAnimation(wx.Control):
 		
 		self.geoTrack = None
 		self.compassLocation = ''
-		self.widthLast = -1
-		self.heightLast = -1
+		
+		# The course is drawn into a cached bitmap.  Only the riders and text are drawn for each frame.
+		self.courseCache = BitmapCache()
 		
 		self.xBanner = 300
 		self.tBannerLast = None
@@ -735,6 +737,7 @@ class GeoAnimation(wx.Control):
 						self.colours.append( wx.Colour(r, g, b) )
 		random.seed( 1234 )
 		random.shuffle( self.colours )
+		self.brushes = [wx.Brush(c, wx.SOLID) for c in self.colours]
 			 
 		self.topFewColours = [
 			wx.Colour(255,215,0),
@@ -1003,73 +1006,32 @@ class GeoAnimation(wx.Control):
 		self.xBanner -= 64.0 * (tBanner - self.tBannerLast).total_seconds()
 		self.tBannerLast = tBanner
 	
-	def Draw(self, dc):
-		size = self.GetClientSize()
-		width = size.width
-		height = size.height
-		backColour = self.GetBackgroundColour()
-		backBrush = wx.Brush(backColour, wx.SOLID)
-		dc.SetBackground(backBrush)
-		dc.Clear()
-		
-		if width < 80 or height < 80 or not self.geoTrack:
-			return
-			
+	def drawCourse( self, dc, width, height, laneWidth, isPointToPoint ):
+		# Requires that setDisplayRect has already been called on the geoTrack.
 		avePoints = 1
-		isPointToPoint = getattr(self.geoTrack, 'isPointToPoint', False)
-		
-		self.r = int(width / 4)
-		if self.r * 2 > height:
-			self.r = int(height / 2)
-		self.r -= (self.r & 1)			# Make sure that r is an even number.
-		
-		r = self.r
-		
-		# Get the fonts if needed.
-		if self.rLast != r:
-			tHeight = int(r / 8.0)
-			self.numberFont	= wx.Font( (0,int(tHeight)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
-			self.timeFont = self.numberFont
-			self.highlightFont = wx.Font( (0,int(tHeight * 1.6)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
-			
-			self.positionFont = wx.Font( (0,int(tHeight*0.85*0.7)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
-			self.bibFont = wx.Font( (0,int(tHeight*0.85)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_ITALIC, wx.FONTWEIGHT_BOLD )
-			self.nameFont = wx.Font((0,int(tHeight*0.85)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD )
-			
-			self.rLast = r
-			
-		tHeight = int(r / 8.0)
-		textVSpace = tHeight*0.2
-		laneWidth = (r/2) / self.laneMax
-		
-		border = laneWidth * 1.5 / 2
-		trackWidth = width - border * 2
-		topMargin = border + tHeight + textVSpace
-		trackHeight = height - topMargin - border
-		self.geoTrack.setDisplayRect( int(border), int(topMargin), int(trackWidth), int(trackHeight) )
+		dc.SetBackground( wx.Brush(self.GetBackgroundColour(), wx.SOLID) )
+		dc.Clear()
 		
 		# Draw the course.
 		dc.SetBrush( wx.TRANSPARENT_BRUSH )
 		
 		drawPoints = self.geoTrack.getXYTrack()
 		drawPointsInt = [(int(p[0]), int(p[1])) for p in drawPoints]
-		if width != self.widthLast or height != self.heightLast:
-			self.widthLast, self.heightLast = width, height
-			locations = ['NE', 'SE', 'NW', 'SW', ]
-			compassWidth, compassHeight = width * 0.25, height * 0.25
-			inCountBest = len(drawPoints) + 1
-			self.compassLocation = locations[0]
-			for loc in locations:
-				xCompass = 0 if 'W' in loc else width - compassWidth
-				yCompass = 0 if 'S' in loc else height - compassHeight
-				inCount = sum( 1 for x, y in drawPoints
-								if	xCompass <= x < xCompass + compassWidth and
-									yCompass <= y < yCompass + compassHeight )
-				if inCount < inCountBest:
-					inCountBest = inCount
-					self.compassLocation = loc
-					if inCount == 0:
-						break
+		locations = ['NE', 'SE', 'NW', 'SW', ]
+		compassWidth, compassHeight = width * 0.25, height * 0.25
+		inCountBest = len(drawPoints) + 1
+		self.compassLocation = locations[0]
+		for loc in locations:
+			xCompass = 0 if 'W' in loc else width - compassWidth
+			yCompass = 0 if 'S' in loc else height - compassHeight
+			inCount = sum( 1 for x, y in drawPoints
+							if	xCompass <= x < xCompass + compassWidth and
+								yCompass <= y < yCompass + compassHeight )
+			if inCount < inCountBest:
+				inCountBest = inCount
+				self.compassLocation = loc
+				if inCount == 0:
+					break
 		
 		dc.SetPen( wx.Pen(wx.Colour(128,128,128), int(laneWidth * 1.25 + 2), wx.SOLID) )
 		if isPointToPoint:
@@ -1124,7 +1086,55 @@ class GeoAnimation(wx.Control):
 			x2 = int(x1 + cos(a-arrowAngle) * laneWidth*arrowLength)
 			y2 = int(y1 + sin(a-arrowAngle) * laneWidth*arrowLength)
 			dc.DrawLine( x1, y1, x2, y2 )
+		
+	def Draw(self, dc):
+		size = self.GetClientSize()
+		width = size.width
+		height = size.height
+		backColour = self.GetBackgroundColour()
+		backBrush = wx.Brush(backColour, wx.SOLID)
+		dc.SetBackground(backBrush)
+		
+		if width < 80 or height < 80 or not self.geoTrack:
+			dc.Clear()
+			return
 			
+		isPointToPoint = getattr(self.geoTrack, 'isPointToPoint', False)
+		
+		self.r = int(width / 4)
+		if self.r * 2 > height:
+			self.r = int(height / 2)
+		self.r -= (self.r & 1)			# Make sure that r is an even number.
+		
+		r = self.r
+		
+		# Get the fonts if needed.
+		if self.rLast != r:
+			tHeight = int(r / 8.0)
+			self.numberFont	= wx.Font( (0,int(tHeight)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
+			self.timeFont = self.numberFont
+			self.highlightFont = wx.Font( (0,int(tHeight * 1.6)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
+			
+			self.positionFont = wx.Font( (0,int(tHeight*0.85*0.7)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL )
+			self.bibFont = wx.Font( (0,int(tHeight*0.85)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_ITALIC, wx.FONTWEIGHT_BOLD )
+			self.nameFont = wx.Font((0,int(tHeight*0.85)), wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD )
+			
+			self.rLast = r
+			
+		tHeight = int(r / 8.0)
+		textVSpace = tHeight*0.2
+		laneWidth = (r/2) / self.laneMax
+		
+		border = laneWidth * 1.5 / 2
+		trackWidth = width - border * 2
+		topMargin = border + tHeight + textVSpace
+		trackHeight = height - topMargin - border
+		self.geoTrack.setDisplayRect( int(border), int(topMargin), int(trackWidth), int(trackHeight) )
+		
+		# Draw the course from the cache.  It only changes with the size, the track and the options.
+		key = (width, height, self.geoTrack, self.geoTrack.gpsPoints, isPointToPoint, not self.data, self.trackColour.Get(), backColour.Get())
+		self.courseCache.Blit( dc, key, width, height, lambda dcCourse: self.drawCourse(dcCourse, width, height, laneWidth, isPointToPoint) )
+		
 		# Draw the riders
 		dc.SetFont( self.numberFont )
 		dc.SetPen( wx.BLACK_PEN )
@@ -1157,7 +1167,7 @@ class GeoAnimation(wx.Control):
 				if x is None:
 					continue
 					
-				dc.SetBrush( wx.Brush(self.colours[num % len(self.colours)], wx.SOLID) )
+				dc.SetBrush( self.brushes[num % len(self.brushes)] )
 				try:
 					i = topFew[num]
 					dc.SetPen( wx.Pen(self.topFewColours[i], int(thickLine)) )
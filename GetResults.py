@@ -251,52 +251,29 @@ def FixPulled( riderResults, race, category ):
 	
 	riderResults[:] = riderResultsNew
 
-def _GetResultsCore( category ):
-	Finisher = Model.Rider.Finisher
-	PUL = Model.Rider.Pulled
-	NP = Model.Rider.NP
-	rankStatus = { Finisher, PUL }
-	
-	riderResults = []
-	race = Model.race
-	if not race:
-		return tuple()
-	
-	isRunning = race.isRunning()
-	isTimeTrial = race.isTimeTrial
-	
-	SetNoDataDNS()
-	
-	roadRaceFinishTimes = race.roadRaceFinishTimes
-	estimateLapsDownFinishTime = race.estimateLapsDownFinishTime
-	allCategoriesFinishAfterFastestRidersLastLap = race.allCategoriesFinishAfterFastestRidersLastLap
-	winAndOut = race.winAndOut
-	riders = race.riders
-	raceStartSeconds = (
+class _ResultsContext:
+	# Race and category values shared by all the RiderResults of one results computation.
+	pass
+
+def _GetResultsContext( race, category, categoryTimesNums ):
+	ctx = _ResultsContext()
+	ctx.isRunning = race.isRunning()
+	ctx.isTimeTrial = isTimeTrial = race.isTimeTrial
+	ctx.roadRaceFinishTimes = race.roadRaceFinishTimes
+	ctx.estimateLapsDownFinishTime = race.estimateLapsDownFinishTime
+	ctx.winAndOut = race.winAndOut
+	ctx.raceStartSeconds = (
 		race.startTime.hour*60.0*60.0 + race.startTime.minute*60.0 + race.startTime.second + race.startTime.microsecond / 1000000.0 if race.startTime
 		else Utils.StrToSeconds(race.scheduledStart) * 60.0
 	)
-	
-	entries = race.interpolate()
-	
-	# Group finish times are defined as times which are separated from the previous time by at least 1 second.
-	groupFinishTimes = [0 if not entries else floor(entries[0].t)]
-	if roadRaceFinishTimes and not isTimeTrial:
-		groupFinishTimes.extend( [floor(entries[i].t) for i in range(1, len(entries)) if entries[i].t - entries[i-1].t >= 1.0] )
-		groupFinishTimes.extend( [sys.float_info.max] * 5 )
-	
-	allRiderTimes = defaultdict( list )
-	for e in entries:
-		allRiderTimes[e.num].append( e )
-	
-	startOffset = category.getStartOffsetSecs() if category else 0.0
-	raceSeconds = race.minutes * 60.0
+	ctx.raceSeconds = raceSeconds = race.minutes * 60.0
+	riders = race.riders
 	
 	# Enforce All Categories Finish After Fastest Rider's Last Lap
 	fastestRidersLastLapTime = None
-	if allCategoriesFinishAfterFastestRidersLastLap and not isTimeTrial:
+	if race.allCategoriesFinishAfterFastestRidersLastLap and not isTimeTrial:
 		resultBest = (0, sys.float_info.max)
-		for c, (times, nums) in race.getCategoryTimesNums().items():
+		for c, (times, nums) in categoryTimesNums.items():
 			if not times:
 				continue
 			try:
@@ -311,8 +288,8 @@ def _GetResultsCore( category ):
 		fastestRidersLastLapTime = resultBest[1] if resultBest[0] != 0 else None
 				
 	# Get the number of race laps for each category.
-	categoryWinningTime, categoryWinningLaps = {}, {}
-	for c, (times, nums) in race.getCategoryTimesNums().items():
+	ctx.categoryWinningTime, ctx.categoryWinningLaps = categoryWinningTime, categoryWinningLaps = {}, {}
+	for c, (times, nums) in categoryTimesNums.items():
 		if category and c != category:
 			continue
 		
@@ -342,114 +319,117 @@ def _GetResultsCore( category ):
 				categoryWinningTime[c] = raceSeconds
 				categoryWinningLaps[c] = None
 	
-	highPrecision = Model.highPrecisionTimes()
-	getCategory = race.getCategory
+	ctx.highPrecision = Model.highPrecisionTimes()
 	
 	# Cache the startOffsetSecs for all required categories.
-	offsetSeconds = {cat: cat.getStartOffsetSecs() for cat in ([category] if category else race.getCategories())}
+	ctx.offsetSeconds = offsetSeconds = {cat: cat.getStartOffsetSecs() for cat in ([category] if category else race.getCategories())}
 	offsetSeconds[None] = 0.0
+	return ctx
+
+def _GetRiderResult( race, rider, riderCategory, riderTimes, ctx ):
+	# Create the RiderResult for one rider from the rider's interpolated entries.
+	Finisher = Model.Rider.Finisher
+	isTimeTrial = ctx.isTimeTrial
+	categoryWinningLaps = ctx.categoryWinningLaps
+	cutoffTime = ctx.categoryWinningTime.get(riderCategory, ctx.raceSeconds)
 	
-	for rider in (race.groupRidersByCategory()[category].copy() if category else list(race.riders.values())):
-		if category:
-			riderCategory = category
+	times = [e.t for e in riderTimes]
+	interp = [e.interp for e in riderTimes]
+	
+	if len(times) >= 2:
+		times[0] = min( ctx.offsetSeconds[riderCategory], times[1] )
+		if isTimeTrial or riderCategory and categoryWinningLaps.get(riderCategory, None) and riderCategory.lappedRidersMustContinue:
+			laps = min( categoryWinningLaps[riderCategory], len(times)-1 )
 		else:
-			riderCategory = getCategory( rider.num )			
-			if not riderCategory:
-				continue
-		
-		cutoffTime = categoryWinningTime.get(riderCategory, raceSeconds)
-		
-		riderTimes = allRiderTimes[rider.num]
-		times = [e.t for e in riderTimes]
-		interp = [e.interp for e in riderTimes]
+			laps = bisect_left( times, cutoffTime, hi=len(times)-1 )
 		
-		if len(times) >= 2:
-			times[0] = min( offsetSeconds[riderCategory], times[1] )
-			if isTimeTrial or riderCategory and categoryWinningLaps.get(riderCategory, None) and riderCategory.lappedRidersMustContinue:
-				laps = min( categoryWinningLaps[riderCategory], len(times)-1 )
-			else:
-				laps = bisect_left( times, cutoffTime, hi=len(times)-1 )
-			
-			del times[laps+1:]
-			del interp[laps+1:]
-		else:
-			laps = 0
-			times.clear()
-			interp.clear()
+		del times[laps+1:]
+		del interp[laps+1:]
+	else:
+		laps = 0
+		times.clear()
+		interp.clear()
 
-		# Apply the early bell time.  Early bell time signifies the beginning of the last lap for all riders.
-		if riderCategory.earlyBellTime and not race.isTimeTrial and times:
-			try:
-				# While a not-last lap starts after earlyBellTime, delete the last lap.
-				while times[-3] >= riderCategory.earlyBellTime:	# This is confusing.  Don't change it!
-					times.pop()
-					interp.pop()
-					laps -= 1
-			except IndexError:
-				pass
-		
-		# Get the last time on record for the rider.
-		lastTime = rider.tStatus
-		if not lastTime:
-			lastTime = times[-1] if times else 0.0
-		
-		status = Finisher if rider.status in rankStatus else rider.status
-		if isTimeTrial and not lastTime and rider.status == Finisher:
-			status = NP
-		rr = RiderResult(
-			rider.num, status, lastTime,
-			riderCategory.fullname,
-			[times[i] - times[i-1] for i in range(1, len(times))],
-			times,
-			interp
-		)
-		
-		if isTimeTrial:
-			rr.startTime = rider.firstTime
-			rr.clockStartTime = rr.startTime + raceStartSeconds if rr.startTime is not None else None
-			if rr.status == Finisher:
-				try:
-					if rr.lastTime > 0:
-						rr.finishTime = rr.startTime + rr.lastTime
-				except (TypeError, AttributeError):
-					pass
-					
+	# Apply the early bell time.  Early bell time signifies the beginning of the last lap for all riders.
+	if riderCategory.earlyBellTime and not race.isTimeTrial and times:
+		try:
+			# While a not-last lap starts after earlyBellTime, delete the last lap.
+			while times[-3] >= riderCategory.earlyBellTime:	# This is confusing.  Don't change it!
+				times.pop()
+				interp.pop()
+				laps -= 1
+		except IndexError:
+			pass
+	
+	# Get the last time on record for the rider.
+	lastTime = rider.tStatus
+	if not lastTime:
+		lastTime = times[-1] if times else 0.0
+	
+	status = Finisher if rider.status in (Finisher, Model.Rider.Pulled) else rider.status
+	if isTimeTrial and not lastTime and rider.status == Finisher:
+		status = Model.Rider.NP
+	rr = RiderResult(
+		rider.num, status, lastTime,
+		riderCategory.fullname,
+		[times[i] - times[i-1] for i in range(1, len(times))],
+		times,
+		interp
+	)
+	
+	if isTimeTrial:
+		rr.startTime = rider.firstTime
+		rr.clockStartTime = rr.startTime + ctx.raceStartSeconds if rr.startTime is not None else None
+		if rr.status == Finisher:
 			try:
-				rr.lastTime += getattr(rider, 'ttPenalty', 0.0)
+				if rr.lastTime > 0:
+					rr.finishTime = rr.startTime + rr.lastTime
 			except (TypeError, AttributeError):
 				pass
-		
-		# Compute the speeds for the rider.
-		if riderCategory.distance:
-			distance = riderCategory.distance
-			if riderCategory.distanceIsByLap:
-				riderDistance = riderCategory.getDistanceAtLap(len(rr.lapTimes))
-				rr.lapSpeeds = [DefaultSpeed if t <= 0.0 else (riderCategory.getLapDistance(i+1) / (t / (60.0*60.0))) for i, t in enumerate(rr.lapTimes)]
-				# Ensure that the race speeds are always consistent with the lap times.
-				raceSpeeds = []
-				if rr.lapSpeeds:
-					tCur = 0.0
-					for i, t in enumerate(rr.lapTimes):
-						tCur += t
-						raceSpeeds.append( DefaultSpeed if tCur <= 0.0 else (riderCategory.getDistanceAtLap(i+1) / (tCur / (60.0*60.0))) )
-					rr.speed = '{:.2f} {}'.format(raceSpeeds[-1], ['km/h', 'mph'][race.distanceUnit] )
-				rr.raceSpeeds = raceSpeeds
-			else:	# Distance is by entire race.
-				if rider.status == Finisher and rr.raceTimes:
-					riderDistance = distance
-					try:
-						tCur = rr.raceTimes[-1] - rr.raceTimes[0]
-						speed = DefaultSpeed if tCur <= 0.0 else riderDistance / (tCur / (60.0*60.0))
-					except IndexError as e:
-						speed = DefaultSpeed
-					rr.speed = '{:.2f} {}'.format(speed, ['km/h', 'mph'][race.distanceUnit] )
-					
-		riderResults.append( rr )
+				
+		try:
+			rr.lastTime += getattr(rider, 'ttPenalty', 0.0)
+		except (TypeError, AttributeError):
+			pass
 	
-	if not riderResults:
-		return tuple()
+	# Compute the speeds for the rider.
+	if riderCategory.distance:
+		distance = riderCategory.distance
+		if riderCategory.distanceIsByLap:
+			riderDistance = riderCategory.getDistanceAtLap(len(rr.lapTimes))
+			rr.lapSpeeds = [DefaultSpeed if t <= 0.0 else (riderCategory.getLapDistance(i+1) / (t / (60.0*60.0))) for i, t in enumerate(rr.lapTimes)]
+			# Ensure that the race speeds are always consistent with the lap times.
+			raceSpeeds = []
+			if rr.lapSpeeds:
+				tCur = 0.0
+				for i, t in enumerate(rr.lapTimes):
+					tCur += t
+					raceSpeeds.append( DefaultSpeed if tCur <= 0.0 else (riderCategory.getDistanceAtLap(i+1) / (tCur / (60.0*60.0))) )
+				rr.speed = '{:.2f} {}'.format(raceSpeeds[-1], ['km/h', 'mph'][race.distanceUnit] )
+			rr.raceSpeeds = raceSpeeds
+		else:	# Distance is by entire race.
+			if rider.status == Finisher and rr.raceTimes:
+				riderDistance = distance
+				try:
+					tCur = rr.raceTimes[-1] - rr.raceTimes[0]
+					speed = DefaultSpeed if tCur <= 0.0 else riderDistance / (tCur / (60.0*60.0))
+				except IndexError as e:
+					speed = DefaultSpeed
+				rr.speed = '{:.2f} {}'.format(speed, ['km/h', 'mph'][race.distanceUnit] )
+	
+	return rr
+
+def _RankRiderResults( race, category, riderResults, ctx, groupFinishTimes ):
+	# Sort the RiderResults, then assign the positions and gaps.
+	Finisher = Model.Rider.Finisher
+	isTimeTrial = ctx.isTimeTrial
+	winAndOut = ctx.winAndOut
+	highPrecision = ctx.highPrecision
+	roadRaceFinishTimes = ctx.roadRaceFinishTimes
+	estimateLapsDownFinishTime = ctx.estimateLapsDownFinishTime
+	riders = race.riders
 	
-	if isRunning:
+	if ctx.isRunning:
 		# Sequence the riders based on the last lap time, not the projected winner of the race.
 		t = race.curRaceTime()
 		statusLapsTimeBest = (999, 0, 24*60*60*200)
@@ -481,7 +461,7 @@ def _GetResultsCore( category ):
 					rr.lastTime = rr.raceTimes[iT]
 					rr.lastTimeOrig = rr.lastTime
 	
-	riderResults.sort( key=RiderResult._getRunningKey if isRunning else RiderResult._getKey )
+	riderResults.sort( key=RiderResult._getRunningKey if ctx.isRunning else RiderResult._getKey )
 	
 	relegatedNums = { rr.num for rr in riderResults if race.riders[rr.num].isRelegated() }
 	if relegatedNums:
@@ -578,7 +558,252 @@ def _GetResultsCore( category ):
 			del rr.roadRaceGapValue
 	
 	return tuple(riderResults)
+
+def _GetResultsBatch( category ):
+	# Compute the results from scratch.  This is the reference implementation for the incremental results.
+	race = Model.race
+	if not race:
+		return tuple()
+	
+	SetNoDataDNS()
+	
+	isTimeTrial = race.isTimeTrial
+	
+	# If the results of this category do not depend on other categories, only interpolate the riders in this category.
+	hasCrossCategoryResults = race.hasCrossCategoryResults()
+	entries = race.interpolateCategory( category ) if category and not hasCrossCategoryResults else race.interpolate()
+	
+	# Group finish times are defined as times which are separated from the previous time by at least 1 second.
+	groupFinishTimes = [0 if not entries else floor(entries[0].t)]
+	if race.roadRaceFinishTimes and not isTimeTrial:
+		groupFinishTimes.extend( [floor(entries[i].t) for i in range(1, len(entries)) if entries[i].t - entries[i-1].t >= 1.0] )
+		groupFinishTimes.extend( [sys.float_info.max] * 5 )
+	
+	allRiderTimes = defaultdict( list )
+	for e in entries:
+		allRiderTimes[e.num].append( e )
+	
+	if category and not hasCrossCategoryResults:
+		times, nums = race.getStartWaveTimesNums( category )
+		categoryTimesNums = {category: (times, nums)} if len(times) > 1 else {}
+	else:
+		categoryTimesNums = race.getCategoryTimesNums()
+	
+	ctx = _GetResultsContext( race, category, categoryTimesNums )
 	
+	riderResults = []
+	getCategory = race.getCategory
+	for rider in (race.groupRidersByCategory()[category].copy() if category else list(race.riders.values())):
+		if category:
+			riderCategory = category
+		else:
+			riderCategory = getCategory( rider.num )			
+			if not riderCategory:
+				continue
+		riderResults.append( _GetRiderResult(race, rider, riderCategory, allRiderTimes[rider.num], ctx) )
+	
+	if not riderResults:
+		return tuple()
+	
+	return _RankRiderResults( race, category, riderResults, ctx, groupFinishTimes )
+
+#------------------------------------------------------------------------------------------------
+# Incremental results.
+# Keep the interpolated entries and unranked RiderResults of each start wave.
+# When new times arrive, only re-interpolate the changed riders, then re-rank the cached RiderResults.
+# The ranked results are identical to _GetResultsBatch.
+#
+useIncrementalResults = True
+
+def _CopyRiderResult( rr ):
+	# Ranking changes the RiderResult, so rank a copy.
+	rrCopy = copy.copy( rr )
+	rrCopy.raceTimes = rr.raceTimes[:]
+	rrCopy.lapTimes = rr.lapTimes[:]
+	rrCopy.interp = rr.interp[:]
+	return rrCopy
+
+def _GetMinTimeGap( race, rider ):
+	# Smallest gap between the rider's recorded times (including the start offset).
+	# If the mustBeRepeatInterval stays below this gap, the rider's interpolation cannot change.
+	times = rider.times
+	if not times:
+		return sys.float_info.max
+	tLast = race.getStartOffset( rider.num )
+	gapMin = sys.float_info.max
+	for t in times:
+		gapMin = min( gapMin, t - tLast )
+		tLast = t
+	return gapMin
+
+class CategoryResultsState:
+	def __init__( self, race, category ):
+		self.race = race
+		self.category = category
+		self.riderEntries = {}				# Interpolated entries by rider num.
+		self.riderResults = {}				# Unranked RiderResults by rider num.
+		self.riderMinTimeGap = {}			# Smallest time gap by rider num.
+		self.mustBeRepeatInterval = None
+		self.lapLeaders = []				# Entry of the leader of each lap (starting with lap 1).
+		self.winningTimeLaps = None
+		self.ctx = None
+		self.order = []						# Rider nums in the last ranked order.
+
+class IncrementalResults:
+	def __init__( self ):
+		self.reset()
+		
+	def reset( self ):
+		self.generation = None
+		self.categoryState = {}
+	
+	@staticmethod
+	def isEligible( race, category ):
+		# Only start waves whose results do not depend on other categories can be updated incrementally.
+		return (
+			useIncrementalResults and category is not None and
+			category.catType == Model.Category.CatWave and
+			not race.hasCrossCategoryResults()
+		)
+	
+	def getResults( self, category ):
+		race = Model.race
+		SetNoDataDNS()
+		
+		if self.generation != Model.memoize.generation:
+			self.reset()
+			self.generation = Model.memoize.generation
+		
+		changedNums = Model.memoizeCategory.popChangedNums( category )
+		state = self.categoryState.pop( category, None )
+		if state is None or state.race is not race or not self._update( state, changedNums ):
+			state = self._build( race, category )
+		if state is None:
+			return tuple()
+		
+		self.categoryState[category] = state
+		return self._rank( state )
+	
+	def _getMustBeRepeatInterval( self, race, category ):
+		riders = race.groupRidersByCategory()[category]
+		return riders[0].getMustBeRepeatInterval() if riders else None
+	
+	def _setRider( self, state, rider ):
+		state.riderEntries[rider.num] = sorted( rider.interpolate(), key=Model.Entry.key )
+		state.riderMinTimeGap[rider.num] = _GetMinTimeGap( state.race, rider )
+	
+	def _setContext( self, state ):
+		# Returns True if the category winning time or laps changed.
+		race, category = state.race, state.category
+		if state.lapLeaders:
+			categoryTimesNums = {category: ([0.0] + [e.t for e in state.lapLeaders], [None] + [e.num for e in state.lapLeaders])}
+		else:
+			categoryTimesNums = {}
+		state.ctx = _GetResultsContext( race, category, categoryTimesNums )
+		winningTimeLaps = (state.ctx.categoryWinningTime.get(category, None), state.ctx.categoryWinningLaps.get(category, None))
+		changed = (winningTimeLaps != state.winningTimeLaps)
+		state.winningTimeLaps = winningTimeLaps
+		return changed
+	
+	def _setRiderResult( self, state, num ):
+		state.riderResults[num] = _GetRiderResult( state.race, state.race.riders[num], state.category, state.riderEntries[num], state.ctx )
+	
+	def _build( self, race, category ):
+		riders = race.groupRidersByCategory()[category]
+		if not riders:
+			return None
+		
+		state = CategoryResultsState( race, category )
+		state.mustBeRepeatInterval = self._getMustBeRepeatInterval( race, category )
+		for rider in riders:
+			self._setRider( state, rider )
+		
+		times, nums = race.getStartWaveTimesNums( category )
+		riderEntries = state.riderEntries
+		state.lapLeaders = [riderEntries[num][lap] for lap, num in enumerate(nums[1:], 1)]
+		
+		self._setContext( state )
+		for rider in riders:
+			self._setRiderResult( state, rider.num )
+		state.order = [rider.num for rider in riders]
+		return state
+	
+	def _update( self, state, changedNums ):
+		# Returns False if the state cannot be updated and must be rebuilt.
+		race, category = state.race, state.category
+		riders = race.groupRidersByCategory()[category]
+		riderNums = {rider.num for rider in riders}
+		riderEntries = state.riderEntries
+		if len(riderNums) < len(riderEntries) or any( num not in riderNums for num in riderEntries.keys() ):
+			return False	# Riders were removed from the category.
+		
+		changed = {num for num in changedNums if num in riderNums}
+		changed.update( num for num in riderNums if num not in riderEntries )
+		
+		# If the mustBeRepeatInterval changed, riders with close times may interpolate differently.
+		mustBeRepeatInterval = self._getMustBeRepeatInterval( race, category )
+		if mustBeRepeatInterval != state.mustBeRepeatInterval:
+			if mustBeRepeatInterval is None or state.mustBeRepeatInterval is None:
+				return False
+			intervalMax = max( mustBeRepeatInterval, state.mustBeRepeatInterval )
+			changed.update( num for num, gapMin in state.riderMinTimeGap.items() if gapMin <= intervalMax )
+			state.mustBeRepeatInterval = mustBeRepeatInterval
+		
+		riderLookup = race.riders
+		for num in changed:
+			self._setRider( state, riderLookup[num] )
+		
+		# Update the lap leaders.  Only search all riders for a lap if the leader of that lap changed.
+		key = Model.Entry.key
+		lapsMax = max( (len(entries) for entries in riderEntries.values()), default=0 )
+		lapLeaders = state.lapLeaders
+		lapLeadersNew = []
+		for lap in range(1, lapsMax):
+			leader = lapLeaders[lap-1] if lap-1 < len(lapLeaders) else None
+			if leader is None or leader.num in changed:
+				leader = min( (entries[lap] for entries in riderEntries.values() if len(entries) > lap), key=key )
+			else:
+				for num in changed:
+					entries = riderEntries[num]
+					if len(entries) > lap and key(entries[lap]) < key(leader):
+						leader = entries[lap]
+			# The leader sequence must be increasing (see getStartWaveTimesNums).  If not, rebuild.
+			if lapLeadersNew and not key(lapLeadersNew[-1]) < key(leader):
+				return False
+			lapLeadersNew.append( leader )
+		state.lapLeaders = lapLeadersNew
+		
+		# If the winning time or laps changed, recompute all the RiderResults.  Otherwise, only the changed riders.
+		if self._setContext( state ):
+			changed = riderNums
+		for num in changed:
+			self._setRiderResult( state, num )
+		
+		seen = set( state.order )
+		state.order.extend( num for num in changed if num not in seen )
+		return True
+	
+	def _rank( self, state ):
+		# Rank in the previous order so the sort has little to do.
+		riderResults = state.riderResults
+		results = _RankRiderResults(
+			state.race, state.category,
+			[_CopyRiderResult(riderResults[num]) for num in state.order],
+			state.ctx, None
+		)
+		state.order = [rr.num for rr in results]
+		return results
+
+incrementalResults = IncrementalResults()
+
+def _GetResultsCore( category ):
+	race = Model.race
+	if not race:
+		return tuple()
+	if IncrementalResults.isEligible( race, category ):
+		return incrementalResults.getResults( category )
+	return _GetResultsBatch( category )
+
 def GetNonWaveCategoryResults( category ):
 	race = Model.race
 	if not race:
@@ -658,7 +883,7 @@ def GetNonWaveCategoryResults( category ):
 	
 	return tuple(riderResults)
 
-@Model.memoize
+@Model.memoizeCategory
 def GetResultsWithData( category ):
 	CatWave =  Model.Category.CatWave
 	if category and category.catType != CatWave:
@@ -755,7 +980,7 @@ def GetResults( category ):
 		
 	return GetResultsWithData( category )
 
-@Model.memoize
+@Model.memoizeCategory
 def GetEntries( category ):
 	results = GetResultsWithData( category )
 	Entry = Model.Entry
@@ -775,7 +1000,7 @@ def GetEntriesForNum( category, num ):
 			return [Entry(r.num, lap, t, r.interp[lap]) for lap, t in enumerate(r.raceTimes)]
 	return []
 	
-@Model.memoize
+@Model.memoizeCategory
 def GetLastRider( category ):
 	race = Model.race
 	if not race or race.isUnstarted() or race.isTimeTrial:
@@ -996,17 +1221,37 @@ def GetCategoryDetails( ignoreEmptyCategories=True, publishOnly=False ):
 
 	return catDetails
 
-def GetAnimationData( category=None, getExternalData=False ):
+animationDataCache = {}		# category: (results, {num:info}).  Only used when changedNums is given.
+animationDataRace = None
+
+def GetAnimationData( category=None, getExternalData=False, changedNums=None ):
+	# If changedNums is given, categories with unchanged results are reused from the last call, and
+	# the nums of the riders in the recomputed categories are added to changedNums.
+	global animationDataCache, animationDataRace
 	animationData = {}
 	ignoreFields = {'pos', 'num', 'gap', 'gapValue', 'laps', 'lapTimes', 'full_name', 'short_name'}
 	statusNames = Model.Rider.statusNames
 	
 	with UnstartedRaceWrapper( getExternalData ):
 		with Model.LockRace() as race:
+			if changedNums is not None and animationDataRace is not race:
+				animationDataCache = {}
+				animationDataRace = race
+			
 			riders = race.riders
 			for cat in ([category] if category else race.getCategories()):
 				results = GetResults( cat )
 				
+				if changedNums is not None:
+					try:
+						resultsCache, infoCache = animationDataCache[cat]
+						if resultsCache is results:
+							animationData.update( infoCache )
+							continue
+					except KeyError:
+						pass
+				
+				infoCat = {}
 				for rr in results:
 					info = {
 						'flr': race.getCategory(rr.num).firstLapRatio,
@@ -1032,7 +1277,12 @@ def GetAnimationData( category=None, getExternalData=False ):
 					
 					if race.isTimeTrial:
 						info['startTime'] = race.riders[rr.num].firstTime
-					animationData[rr.num] = info
+					infoCat[rr.num] = info
+				
+				if changedNums is not None:
+					animationDataCache[cat] = (results, infoCat)
+					changedNums.update( infoCat.keys() )
+				animationData.update( infoCat )
 		
 	return animationData
 
@@ -1042,6 +1292,8 @@ def GetRaceName():
 versionCountStart = 10000
 versionCount = versionCountStart
 resultsBaseline = { 'cmd': 'baseline', 'categoryDetails':{}, 'info':{}, 'reference':{} }
+resultsBaselineCategoryDetails = None		# Last GetCategoryDetails result (it is memoized, so unchanged if it is the same object).
+ramHistory = deque( maxlen=100 )			# Recent ram messages.  Allows a client to resume from its version without a new baseline.
 
 def getReferenceInfo():
 	global versionCount
@@ -1069,20 +1321,40 @@ def ResetVersionRAM():
 	if versionCountStart <= 0:
 		versionCountStart = 10000
 	versionCount = versionCountStart
-	
+	ramHistory.clear()
+
 def GetResultsRAM():
-	global versionCount, resultsBaseline
+	'''
+		Return the changes since the last call in RAM format (Remove, Add, Modify), or None if nothing changed.
+		Only the riders in categories with changed results are compared.
+	'''
+	global versionCount, resultsBaseline, resultsBaselineCategoryDetails
 	
 	race = Model.race
 	if not race:
 		return None
 	
-	categoryDetails = { c['name']:c for c in GetCategoryDetails(True, True) }
-	info = GetAnimationData( None, True )
+	categoryDetailsList = GetCategoryDetails( True, True )
+	if categoryDetailsList is resultsBaselineCategoryDetails:
+		categoryRAM = {'r':[], 'a':{}, 'm':{}}
+		categoryDetails = resultsBaseline['categoryDetails']
+	else:
+		categoryDetails = { c['name']:c for c in categoryDetailsList }
+		categoryRAM = Utils.dict_compare( categoryDetails, resultsBaseline['categoryDetails'] )
+	
+	changedNums = set()
+	info = GetAnimationData( None, True, changedNums )
+	infoBaseline = resultsBaseline['info']
+	infoRAM = {
+		'r':list(infoBaseline.keys() - info.keys()),
+		'a':{num:info[num] for num in info.keys() - infoBaseline.keys()},
+		'm':{num:info[num] for num in changedNums if num in infoBaseline and info[num] != infoBaseline[num]},
+	}
 	raceName = GetRaceName()
 	
-	if (	resultsBaseline['info'] == info and
-			resultsBaseline['categoryDetails'] == categoryDetails and
+	resultsBaselineCategoryDetails = categoryDetailsList
+	if (	not any( infoRAM.values() ) and
+			not any( categoryRAM.values() ) and
 			resultsBaseline['reference'].get('raceIsRunning',None) == race.isRunning() and
 			resultsBaseline['reference'].get('raceIsUnstarted',None) == race.isUnstarted() and
 			resultsBaseline['reference'].get('raceName',None) == raceName and
@@ -1095,20 +1367,84 @@ def GetResultsRAM():
 
 	ram = {
 		'cmd':			'ram',
-		'categoryRAM':	Utils.dict_compare( categoryDetails, resultsBaseline['categoryDetails'] ),
-		'infoRAM':		Utils.dict_compare( info, resultsBaseline['info'] ),
+		'categoryRAM':	categoryRAM,
+		'infoRAM':		infoRAM,
 		'reference':    resultsBaseline['reference'],
 	}
 	
 	resultsBaseline['categoryDetails'] = categoryDetails
 	resultsBaseline['info'] = info	
+	ramHistory.append( ram )
 	return ram
-	
+
+def GetResultsRAMSince( raceName, versionCountClient ):
+	# Return the ram messages after the client's versionCount, or None if the client needs a new baseline.
+	if not ramHistory or ramHistory[-1]['reference']['raceName'] != raceName:
+		return None
+	if versionCountClient == ramHistory[-1]['reference']['versionCount']:
+		return []
+	rams = [ram for ram in ramHistory if ram['reference']['versionCount'] > versionCountClient]
+	if not rams or rams[0]['reference']['versionCount'] != versionCountClient + 1 or any(ram['reference']['raceName'] != raceName for ram in rams):
+		return None
+	return rams
+
+#-----------------------------------------------------------------------
+# Compact ram encoding.
+# The infoRAM adds and modifies are sent as columns (field names are only sent once),
+# and raceTimes are sent as integer millisecond differences.
+#
+def EncodeRaceTimes( raceTimes ):
+	tLast, encoded = 0, []
+	for t in raceTimes:
+		t = round( t * 1000.0 )
+		encoded.append( t - tLast )
+		tLast = t
+	return encoded
+
+def DecodeRaceTimes( encoded ):
+	return [t / 1000.0 for t in itertools.accumulate(encoded)]
+
+def EncodeColumns( d ):
+	keys = list( d.keys() )
+	values = [d[k] for k in keys]
+	fields = set.intersection( *[set(v.keys()) for v in values] ) if values else set()
+	columns = {f:[v[f] for v in values] for f in fields}
+	if 'raceTimes' in columns:
+		columns['raceTimes'] = [EncodeRaceTimes(rt) if rt else rt for rt in columns['raceTimes']]
+	extra = {k:{f:fv for f, fv in v.items() if f not in fields} for k, v in zip(keys, values)}
+	return {'k':keys, 'c':columns, 'x':{k:e for k, e in extra.items() if e}}
+
+def DecodeColumns( e ):
+	# Keys are returned as strings, the same as a json-decoded ram.
+	d = {}
+	columns = e['c']
+	if 'raceTimes' in columns:
+		columns = dict( columns, raceTimes=[DecodeRaceTimes(rt) if rt else rt for rt in columns['raceTimes']] )
+	extra = e['x']
+	for i, k in enumerate(e['k']):
+		k = str(k)
+		v = {f:c[i] for f, c in columns.items()}
+		v.update( extra.get(k, {}) )
+		d[k] = v
+	return d
+
+def EncodeRAMCompact( ram ):
+	infoRAM = ram['infoRAM']
+	return dict( ram, enc='c', infoRAM={'r':infoRAM['r'], 'a':EncodeColumns(infoRAM['a']), 'm':EncodeColumns(infoRAM['m'])} )
+
+def DecodeRAMCompact( ram ):
+	if ram.get('enc', None) != 'c':
+		return ram
+	infoRAM = ram['infoRAM']
+	ram = dict( ram, infoRAM={'r':infoRAM['r'], 'a':DecodeColumns(infoRAM['a']), 'm':DecodeColumns(infoRAM['m'])} )
+	del ram['enc']
+	return ram
+
 def GetResultsBaseline():
 	resultsBaseline['reference'] = getReferenceInfo()
 	return resultsBaseline
 	
-@Model.memoize
+@Model.memoizeCategory
 def GetResultMap( category ):
 	return {rr.num:rr for rr in GetResults(category)} 
 	
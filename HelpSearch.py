@@ -9,8 +9,6 @@ from io import StringIO
 
 from urllib.request import url2pathname
 from urllib.parse import urlparse
-from whoosh.index import open_dir
-from whoosh.qparser import QueryParser
 import wx.html as html
 import wx.lib.wxpTag
 from http.server import BaseHTTPRequestHandler, HTTPServer
@@ -98,6 +96,8 @@ class HelpSearch( wx.Panel ):
 		showHelp( href )
 		
 	def doSearch( self, event = None ):
+		from whoosh.index import open_dir
+		from whoosh.qparser import QueryParser
 		with wx.BusyCursor():
 			text = self.search.GetValue()
 			
@@ -361,8 +361,7 @@ class History( wx.Panel ):
 	
 	def showNumSelect( self ):
 		self.updateColours()
-		self.grid.Set( textColour = self.textColour, backgroundColour = self.backgroundColour )
-		self.grid.Reset()
+		self.grid.SetDiff( textColour = self.textColour, backgroundColour = self.backgroundColour )
 	
 	def doNumDrilldown( self, event ):
 		self.doNumSelect( event )
@@ -371,6 +370,12 @@ class History( wx.Panel ):
 			ShowRiderDetailDialog( self, self.numSelect )
 	
 	def getCellNum( self, row, col ):
+		# Get the number from the entry so we don't format the cell.
+		try:
+			return '{}'.format( self.history[col][row].num )
+		except (TypeError, IndexError):
+			pass
+		
 		numSelect = None
 		if row < self.grid.GetNumberRows() and col < self.grid.GetNumberCols():
 			value = self.grid.GetCellValue( row, col )
@@ -576,6 +581,21 @@ class History( wx.Panel ):
 			d = info.get(num, {})
 			return ', '.join( v for v in [d.get('LastName',None), d.get('FirstName',None)] if v )
 		
+		def getFormat( col, template ):
+			# The cells are only formatted when the grid shows them.
+			def formatEntry( e ):
+				return template.safe_substitute(
+				{
+					'num':		e.num,
+					'pos':		Utils.ordinal(position.get(e.num, '')),
+					'lapsDown':	' ({})'.format(lapsDown[e.num]) if e.num in lapsDown else '',
+					'raceTime':	formatTime(e.t) if self.showTimes else '',
+					'lapTime':	formatTime(e.t - numTimes[(e.num,e.lap-1)]) if self.showLapTimes and (e.num,e.lap-1) in numTimes else '',
+					'downTime':	formatTimeDiff(e.t, leaderTimes[col]) if self.showTimeDown and col < len(leaderTimes) else '',
+					'riderName': getName(e.num) if self.showRiderName else '',
+				} )
+			return formatEntry
+		
 		templateSave = template
 		data = []
 		for col, h in enumerate(self.history):
@@ -585,24 +605,13 @@ class History( wx.Panel ):
 					formatStr.insert(0, '$pos$lapsDown: ')
 				template = Template( ''.join(formatStr) )
 			
-			data.append( [ template.safe_substitute(
-				{
-					'num':		e.num,
-					'pos':		Utils.ordinal(position.get(e.num, '')),
-					'lapsDown':	' ({})'.format(lapsDown[e.num]) if e.num in lapsDown else '',
-					'raceTime':	formatTime(e.t) if self.showTimes else '',
-					'lapTime':	formatTime(e.t - numTimes[(e.num,e.lap-1)]) if self.showLapTimes and (e.num,e.lap-1) in numTimes else '',
-					'downTime':	formatTimeDiff(e.t, leaderTimes[col]) if self.showTimeDown and col < len(leaderTimes) else '',
-					'riderName': getName(e.num) if self.showRiderName else '',
-				} ) for e in h] )
+			data.append( ColGrid.LazyColumn(h, getFormat(col, template)) )
 			self.rcInterp.update( (row, col) for row, e in enumerate(h) if e.interp )
 			self.rcNumTime.update( (row, col) for row, e in enumerate(h) if numTimeInfo.getInfo(e.num, e.t) is not None )
 
-		self.grid.Set( data = data, colnames = colnames )
-		self.grid.AutoSizeColumns( True )
-		self.grid.Reset()
 		self.updateColours()
-		self.grid.Set( textColour = self.textColour, backgroundColour = self.backgroundColour )
+		self.grid.SetDiff( data = data, colnames = colnames, textColour = self.textColour, backgroundColour = self.backgroundColour )
+		self.grid.AutoSizeColumnsLazy( True )
 		
 		# Fix the grid's scrollbars.
 		self.grid.FitInside()
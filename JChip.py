@@ -78,6 +78,70 @@ def parseTime( tStr, day = 0 ):
 	
 	return t + tSmall * tSameCount if tSameCount > 0 else t
 
+def parseDataLine( line ):
+	'''
+		Parse a JChip data line, eg. "DJ413A35 10:11:16.4433 10  10000      C7 date=20240101".
+		Returns (tag, t) in reader time, or None if the line is malformed.
+	'''
+	# The tag and time are always separated by at least one space.
+	iSpace = line.find( ' ' )
+	if iSpace < 0:
+		return None
+	tag = line[2:iSpace]	# Skip the D and first initial letter (always the same).
+	
+	# Find the first colon of the time and parse the time working backwards.
+	iColon = line.find( ':' )
+	if iColon < 0:
+		return None
+		
+	m = reTimeChars.match( line[iColon-2:] )
+	if not m:
+		return None
+	tStr = m.group(0)
+	
+	# Find the second field separated by a space after the time.
+	# The second character of the field is the day count.
+	day = 0
+	iSecondField = line.find( ' ', iColon ) + 1
+	if iSecondField >= 0:
+		try:
+			day = int(line[iSecondField+1:iSecondField+2])
+		except Exception:
+			day = 0
+	
+	try:
+		iDate = line.index( 'date=' ) + 5
+		YYYY, MM, DD = int(line[iDate:iDate+4]), int(line[iDate+4:iDate+6]), int(line[iDate+6:iDate+8])
+		if Model.race and Model.race.isRunning():
+			raceStartTime = Model.race.startTime
+			startDate = datetime.date( raceStartTime.year, raceStartTime.month, raceStartTime.day )
+			tagDate = datetime.date( YYYY, MM, DD )
+			day = (tagDate - startDate).days
+	except ValueError:
+		pass
+	
+	return stripLeadingZeros(tag), parseTime( tStr, day )
+
+def parseGetTime( line, tNow ):
+	''' Parse the reader's reply to the GT command.  Returns the reader time. '''
+	iStart = 3
+	hh, mm, ss, hs = [int(line[i:i+2]) for i in range(iStart, iStart + 4 * 2, 2)]
+	try:
+		iDate = line.index( 'date=' ) + 5
+		YYYY, MM, DD = int(line[iDate:iDate+4]), int(line[iDate+4:iDate+6]), int(line[iDate+6:iDate+8])
+		return datetime.datetime( YYYY, MM, DD, hh, mm, ss, hs * 10000 )
+	except Exception:
+		return datetime.datetime.combine( tNow.date(), datetime.time(hh, mm, ss, hs * 10000) )
+
+def formatTimeAdjustment( readerName, timeDiff ):
+	rtAdjust = timeDiff.total_seconds()
+	if rtAdjust > 0:
+		behindAhead = 'Behind'
+	else:
+		behindAhead = 'Ahead'
+		rtAdjust *= -1
+	return '"{}" is: {} {} (relative to computer)'.format( readerName, behindAhead, Utils.formatTime(rtAdjust, True) )
+
 def safeRemove( lst, x ):
 	while True:
 		try:
@@ -210,49 +274,13 @@ def Server( q, shutdownQ, HOST, PORT, startTime ):
 					continue
 				try:
 					if line.startswith( 'D' ):
-						# The tag and time are always separated by at least one space.
-						iSpace = line.find( ' ' )
-						if iSpace < 0:
+						tagTime = parseDataLine( line )
+						if not tagTime:
 							qLog( 'error', line.strip() )
 							continue
-						tag = line[2:iSpace]	# Skip the D and first initial letter (always the same).
-						
-						# Find the first colon of the time and parse the time working backwards.
-						iColon = line.find( ':' )
-						if iColon < 0:
-							qLog( 'error', line.strip() )
-							continue
-							
-						m = reTimeChars.match( line[iColon-2:] )
-						if not m:
-							qLog( 'error', line.strip() )
-							continue
-						tStr = m.group(0)
-						
-						# Find the second field separated by a space after the time.
-						# The second character of the field is the day count.
-						iSecondField = line.find( ' ', iColon ) + 1
-						if iSecondField >= 0:
-							try:
-								day = int(line[iSecondField+1:iSecondField+2])
-							except Exception:
-								day = 0
-						
-						try:
-							iDate = line.index( 'date=' ) + 5
-							YYYY, MM, DD = int(line[iDate:iDate+4]), int(line[iDate+4:iDate+6]), int(line[iDate+6:iDate+8])
-							if Model.race and Model.race.isRunning():
-								raceStartTime = Model.race.startTime
-								startDate = datetime.date( raceStartTime.year, raceStartTime.month, raceStartTime.day )
-								tagDate = datetime.date( YYYY, MM, DD )
-								day = (tagDate - startDate).days
-						except ValueError:
-							pass
-						
-						t = parseTime( tStr, day )
+						tag, t = tagTime
 						t += readerComputerTimeDiff.get(s, datetime.timedelta())
 						
-						tag = stripLeadingZeros(tag)
 						q.put( ('data', tag, t) )
 						tagTimes.append( (tag, t) )
 						
@@ -278,33 +306,12 @@ def Server( q, shutdownQ, HOST, PORT, startTime ):
 					
 					elif line.startswith( 'GT' ):
 						tNow = datetime.datetime.now()
-						
-						iStart = 3
-						hh, mm, ss, hs = [int(line[i:i+2]) for i in range(iStart, iStart + 4 * 2, 2)]
-						try:
-							iDate = line.index( 'date=' ) + 5
-							YYYY, MM, DD = int(line[iDate:iDate+4]), int(line[iDate+4:iDate+6]), int(line[iDate+6:iDate+8])
-							tJChip = datetime.datetime( YYYY, MM, DD, hh, mm, ss, hs * 10000 )
-						except ValueError:
-							tJChip = datetime.datetime.combine( tNow.date(), datetime.time(hh, mm, ss, hs * 10000) )
-						except Exception:
-							tJChip = datetime.datetime.combine( tNow.date(), datetime.time(hh, mm, ss, hs * 10000) )
-							
+						tJChip = parseGetTime( line, tNow )
 						readerComputerTimeDiff[s] = tNow - tJChip
 						
-						qLog( 'getTime', '({})={:02d}:{:02d}:{:02d}.{:02d}'.format(line[2:].strip(), hh,mm,ss,hs) )
-						rtAdjust = readerComputerTimeDiff[s].total_seconds()
-						if rtAdjust > 0:
-							behindAhead = 'Behind'
-						else:
-							behindAhead = 'Ahead'
-							rtAdjust *= -1
-						qLog( 'timeAdjustment', 
-								'"{}" is: {} {} (relative to computer)'.format(
-									readerName.get(s, '<<unknown>>'),
-									behindAhead,
-									Utils.formatTime(rtAdjust, True)
-								) )
+						qLog( 'getTime', '({})={:02d}:{:02d}:{:02d}.{:02d}'.format(
+							line[2:].strip(), tJChip.hour, tJChip.minute, tJChip.second, tJChip.microsecond // 10000) )
+						qLog( 'timeAdjustment', formatTimeAdjustment(readerName.get(s, '<<unknown>>'), readerComputerTimeDiff[s]) )
 						
 						# Send command to start sending data.
 						cmd = 'S0000'
@@ -95,7 +95,7 @@ class JChipFake( threading.Thread ):
 		
 	def run( self ):
 		while 1:
-			tag, t = q.get()
+			tag, t = self.q.get()
 			while 1:
 				if not self.sock:
 					try:
@@ -12,6 +12,7 @@ from JChip import EVT_CHIP_READER
 import RaceResult
 import Ultra
 import MyLapsServer
+import MultiReader
 import HelpSearch
 from ReadSignOnSheet import GetTagNums
 
@@ -166,6 +167,8 @@ class JChipSetupDialog( wx.Dialog ):
 			Utils.writeConfig( 'RaceResultHost', race.chipReaderIpAddr )
 		elif race.chipReaderType == 2:
 			Utils.writeConfig( 'UltraHost', race.chipReaderIpAddr )
+		elif race.chipReaderType == 5:
+			Utils.writeConfig( 'MultiReaderSpec', race.chipReaderIpAddr )
 		race.chipReaderPort = self.port.GetValue()
 		race.enableJChipIntegration = bool(self.enableJChipCheckBox.GetValue())
 		ChipReader.chipReaderCur.reset( race.chipReaderType )
@@ -236,6 +239,16 @@ class JChipSetupDialog( wx.Dialog ):
 				self.ipaddr.SetValue( Utils.GetDefaultHost() )
 			self.autoDetect.Show( False )
 		
+		elif selection == 5:	# Multiple readers - the address is the reader spec, eg. "JChip:53135, JChip:53136, RaceResult:192.168.1.10"
+			self.port.SetValue( JChip.DEFAULT_PORT )
+			self.port.SetEditable( False )
+			self.ipaddr.SetEditable( True )
+			try:
+				MultiReader.parseReaderSpec( self.ipaddr.GetValue() )
+			except ValueError:
+				self.ipaddr.SetValue( Utils.readConfig('MultiReaderSpec', MultiReader.DEFAULT_SPEC) )
+			self.autoDetect.Show( False )
+		
 		self.Layout()
 		self.Refresh()
 	
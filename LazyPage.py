@@ -0,0 +1,63 @@
+import wx
+import importlib
+from StartupProfile import startupProfile
+
+'''
+	Deferred page construction for faster startup.
+
+	LazyClass stands in for a page class.  The module is only imported when the class is first called.
+
+	LazyPage is an empty notebook page.  The real page is built inside it the first time it is shown
+	or any of its attributes are used.  refresh() builds the page as it is only called for the page being shown.
+	commit() does nothing until the page is built.
+'''
+
+class LazyClass:
+	def __init__( self, moduleName, className=None ):
+		self.moduleName = moduleName
+		self.className = className or moduleName
+
+	def getClass( self ):
+		return getattr( importlib.import_module(self.moduleName), self.className )
+
+	def __call__( self, *args, **kwargs ):
+		cls = self.getClass()
+		with startupProfile.timer( self.className ):
+			return cls( *args, **kwargs )
+
+class LazyPage( wx.Panel ):
+	def __init__( self, parent, pageClass, onCreate=None ):
+		super().__init__( parent )
+		self.page = None
+		self.pageClass = pageClass
+		self.onCreate = onCreate
+		self.SetSizer( wx.BoxSizer(wx.VERTICAL) )
+
+	def isCreated( self ):
+		return self.page is not None
+
+	def getPage( self ):
+		if self.page is None:
+			with wx.BusyCursor():
+				self.page = self.pageClass( self )
+			self.GetSizer().Add( self.page, 1, flag=wx.EXPAND )
+			self.Layout()
+			if self.onCreate:
+				self.onCreate( self.page )
+		return self.page
+
+	def refresh( self ):
+		self.getPage().refresh()
+
+	def commit( self ):
+		if self.page is not None:
+			self.page.commit()
+
+	def __getattr__( self, name ):
+		# Everything else goes to the real page.
+		if name.startswith('__') or name in ('page', 'pageClass', 'onCreate'):
+			raise AttributeError( name )
+		return getattr( self.getPage(), name )
+
+def getRealPage( page ):
+	return page.getPage() if isinstance(page, LazyPage) else page
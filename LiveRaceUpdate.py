@@ -2,6 +2,7 @@ import json
 import time
 import datetime
 import operator
+import itertools
 import websocket
 
 #-----------------------------------------------------------------------
@@ -53,6 +54,24 @@ def applyRAM( dest, ram ):
 	for k in ram['r']:
 		dest.pop( k, None )	# Use pop instead of del (safer).
 
+def decodeColumns( e ):
+	# Decode the compact encoding of adds and modifies: fields are sent as columns, raceTimes as integer millisecond differences.
+	d = {}
+	for i, k in enumerate(e['k']):
+		v = {f:c[i] for f, c in e['c'].items()}
+		if v.get('raceTimes', None):
+			v['raceTimes'] = [t / 1000.0 for t in itertools.accumulate(v['raceTimes'])]
+		v.update( e['x'].get(str(k), {}) )
+		d[str(k)] = v
+	return d
+
+def decodeRAM( message ):
+	if message.get('enc', None) == 'c':
+		infoRAM = message['infoRAM']
+		message['infoRAM'] = {'r':infoRAM['r'], 'a':decodeColumns(infoRAM['a']), 'm':decodeColumns(infoRAM['m'])}
+		del message['enc']
+	return message
+
 class SynchronizedRaceData:
 	def __init__( self, hostname='localhost', port=PORT_NUMBER ):
 		self.info = {}					# Reference data accessed by bib number.
@@ -60,6 +79,7 @@ class SynchronizedRaceData:
 		
 		self.raceName = ''				# Name of current race.
 		self.versionCount = -1			# Current version of the local race.
+		self.baselinePending = False
 
 		self.wsurl = 'ws://' + hostname + ':' + str(PORT_NUMBER) + '/'
 	
@@ -74,6 +94,7 @@ class SynchronizedRaceData:
 		self.baselinePending = False
 	
 	def processRAM( self, message ):
+		decodeRAM( message )
 		applyRAM( self.info, message['infoRAM'] )
 		applyRAM( self.categoryDetails, message['categoryRAM'] )
 		self.setRaceState( message )
@@ -105,10 +126,15 @@ class SynchronizedRaceData:
 			return
 		
 		if message['cmd'] == 'ram':
+			inSync = (self.versionCount + 1 == message['reference']['versionCount'] and self.raceName == message['reference']['raceName'])
+			if inSync and self.baselinePending:
+				# CrossMgr resumed from our versionCount with the missed updates rather than a baseline.
+				self.baselinePending = False
 			if not self.baselinePending:
 				# If the versionCount or raceName is out of sync.  Request a full update.
-				if self.versionCount + 1 != message['reference']['versionCount'] or self.raceName != message['reference']['raceName']:
-					ws.send( json.dumps({'cmd':'send_baseline', 'raceName':message['reference']['raceName']}).encode() )
+				if not inSync:
+					# Send our versionCount so CrossMgr can send the missed updates instead of a full baseline if it still has them.
+					ws.send( json.dumps({'cmd':'send_baseline', 'raceName':message['reference']['raceName'], 'versionCount':self.versionCount, 'encoding':'compact'}).encode() )
 					self.baselinePending = True	# Set flag to ignore incremental updates until we get the new baseline.
 				else:
 					# Otherwise, it is safe to apply this update.
@@ -127,7 +153,7 @@ class SynchronizedRaceData:
 		while True:
 			try:
 				ws = websocket.create_connection( self.wsurl )
-				ws.send( json.dumps({'cmd':'send_baseline', 'raceName':'CurrentResults'}).encode() )
+				ws.send( json.dumps({'cmd':'send_baseline', 'raceName':'CurrentResults', 'versionCount':self.versionCount, 'encoding':'compact'}).encode() )
 				while True:
 					self.onMessage( ws, ws.recv() )
 			except Exception as e:
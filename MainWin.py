@@ -8,6 +8,7 @@ import glob
 import shutil
 import random
 import zipfile
+import threading
 import hashlib
 import datetime
 import operator
@@ -22,18 +23,8 @@ from html import escape
 from urllib.parse import quote
 from collections import defaultdict
 
-import locale
-try:
-	localDateFormat = locale.nl_langinfo( locale.D_FMT )
-	localTimeFormat = locale.nl_langinfo( locale.T_FMT )
-except Exception:
-	localDateFormat = '%b %d, %Y'
-	localTimeFormat = '%I:%M%p'
-
 import pickle
 from argparse import ArgumentParser
-import xlwt
-import xlsxwriter
 
 import Utils
 
@@ -42,80 +33,48 @@ from LogPrintStackStderr import LogPrintStackStderr
 from ForecastHistory	import ForecastHistory
 from NumKeypad			import NumKeypad
 from Actions			import Actions
-from Gantt				import Gantt
-from History			import History
-from RiderDetail		import RiderDetail
-from Results			import Results
-from Categories			import Categories, PrintCategories
-from Properties			import Properties, PropertiesDialog, ChangeProperties, HasDefaultTemplate, ApplyDefaultTemplate, BatchPublishPropertiesDialog, doBatchPublish
-from Recommendations	import Recommendations
-from RaceAnimation		import RaceAnimation
-from Search				import SearchDialog
+from Properties			import PropertiesDialog, ChangeProperties, HasDefaultTemplate, ApplyDefaultTemplate, BatchPublishPropertiesDialog, doBatchPublish
 #from Situation			import Situation
-from GapChart			import GapChart
 from LapCounter			import LapCounter
-from Announcer			import Announcer
-from Primes				import Primes, GetGrid
-from Prizes				import Prizes
-from HistogramPanel		import HistogramPanel
-from UnmatchedTagsGantt	import UnmatchedTagsGantt
 import FtpWriteFile
 from FtpWriteFile		import realTimeFtpPublish
-from SetAutoCorrect		import SetAutoCorrectDialog
-from DNSManager			import DNSManagerDialog
-from USACExport			import USACExport
-from UCIExcel			import UCIExcel
-from VTTAExport			import VTTAExport
-from JPResultsExport	import JPResultsExport
-from CrossResultsExport	import CrossResultsExport
-from WebScorerExport	import WebScorerExport
-from HelpSearch			import HelpSearchDialog, getHelpURL
+from HelpSearch			import getHelpURL
 from Utils				import logCall, logException
 from FileDrop			import FileDrop
 from RaceDB				import RaceDB, RaceDBUpload
-from SimulateData		import SimulateData
 from NonBusyCall		import NonBusyCall
 from Playback			import Playback
-from Pulled				import Pulled
-from TeamResults		import TeamResults
 from BibEnter			import BibEnter
 from BackgroundJobMgr	import BackgroundJobMgr
 from Restart			import Restart
-from ReissueBibs	 	import ReissueBibsDialog
-from FinishLynx			import FinishLynxDialog
 import BatchPublishAttrs
 import Model
-import JChipSetup
-import JChipImport
-import RaceResultImport
 import JChip
-import OrionImport
-import AlienImport
-import ImpinjImport
-import IpicoImport
 import OutputStreamer
-import GpxImport
+import RaceJournal
 from Undo import undo
-from Printing			import CrossMgrPrintout, CrossMgrPrintoutPNG, CrossMgrPrintoutPDF, CrossMgrPodiumPrintout, getRaceCategories
+from Printing			import CrossMgrPrintout, CrossMgrPrintoutPNG, CrossMgrPrintoutPDF, CrossMgrPodiumPrintout
 from Printing			import ChoosePrintCategoriesDialog, ChoosePrintCategoriesPodiumDialog
-from ExportGrid			import ExportGrid
-import SimulationLapTimes
+from ExportGrid			import ExportGrid, ExportResultsExcel, getRaceCategories
 import Version
-from ReadSignOnSheet	import GetExcelLink, ResetExcelLinkCache, ExcelLink, ReportFields, SyncExcelLink, IsValidRaceDBExcel, GetTagNums
+from ReadSignOnSheet	import GetExcelLink, ResetExcelLinkCache, ExcelLink, SyncExcelLink, IsValidRaceDBExcel, GetTagNums
 from SetGraphic			import SetGraphicDialog
-from GetResults			import GetCategoryDetails, UnstartedRaceWrapper, GetLapDetails, GetAnimationData, ResetVersionRAM
+from GetResults			import ResetVersionRAM
 from PhotoFinish		import okTakePhoto
 from SendPhotoRequests	import SendPhotoRequests
 from ReadTTStartTimesSheet import ImportTTStartTimes, AutoImportTTStartTimes
-from TemplateSubstitute import TemplateSubstitute
 from GetMatchingExcelFile import GetMatchingExcelFile
-import ChangeRaceStartTime
 from PageDialog			import PageDialog
 import ChipReader
 import Flags
+import RaceHtml
+from RaceHtml import HtmlRender, replaceJsonVar, localDateFormat, localTimeFormat
+from ResultsWorker import resultsWorker
 import WebServer
 import ImageIO
 from ModuleUnpickler import ModuleUnpickler
+from LazyPage import LazyPage, LazyClass, getRealPage
+from StartupProfile import startupProfile
 
 now = datetime.datetime.now
 
@@ -291,24 +250,6 @@ class SimulateDialog(wx.Dialog):
 		self.SetSizer(sizer)
 		sizer.Fit(self)
 
-def replaceJsonVar( s, varName, value ):
-	return s.replace( '{} = null'.format(varName), '{} = {}'.format(varName, Utils.ToJson(value, separators=(',',':'))), 1 )
-
-# Code on web page required by Google Analytics.
-gaSnippet = '''
-<script>
-var gaNow = 1*new Date();
-setTimeout( function() {
-		(function(i,s,o,g,r,a,m){i['GoogleAnalyticsObject']=r;i[r]=i[r]||function(){
-		(i[r].q=i[r].q||[]).push(arguments)},i[r].l=gaNow;a=s.createElement(o),
-		m=s.getElementsByTagName(o)[0];a.async=1;a.src=g;m.parentNode.insertBefore(a,m)
-		})(window,document,'script','//www.google-analytics.com/analytics.js','ga');
-		ga('create', 'UA-XXXX-Y', 'auto'); ga('send', 'pageview');
-		console.log( 'Google Analytics: initialized' );
-	}, 3000 );
-</script>
-'''
-
 #----------------------------------------------------------------------------------
 def AppendMenuItemBitmap( menu, id, name, help, bitmap ):
 	mi = wx.MenuItem( menu, id, name, help )
@@ -316,7 +257,7 @@ def AppendMenuItemBitmap( menu, id, name, help, bitmap ):
 	menu.Append( mi )
 	return mi
 		
-class MainWin( wx.Frame ):
+class MainWin( wx.Frame, HtmlRender ):
 	def __init__( self, parent, id = wx.ID_ANY, title='', size=(200,200) ):
 		super().__init__(parent, id, title, size=size)
 
@@ -339,6 +280,7 @@ class MainWin( wx.Frame ):
 		
 		self.fileName = None
 		self.numSelect = None
+		self.lapCounterLabels = []
 		
 		# Setup the objects for the race clock.
 		self.timer = wx.Timer( self, id=wx.ID_ANY )
@@ -676,31 +618,37 @@ class MainWin( wx.Frame ):
 			self.notebook.AddPage( page, name )
 			self.pages.append( page )
 			
+		# Pages in LazyClass are imported and built the first time they are shown or used.
 		self.attrClassName = [
-			[ 'actions',		Actions,			_('Actions') ],
-			[ 'record',			NumKeypad,			_('Record') ],
-			[ 'results',		Results,			_('Results') ],
-			[ 'pulled',			Pulled,				_('Pulled') ],
-			[ 'history',		History,			_('Passings') ],
-			[ 'riderDetail',	RiderDetail,		_('RiderDetail') ],
-			[ 'gantt', 			Gantt,				_('Chart') ],
-			[ 'recommendations',Recommendations,	_('Recommendations') ],
-			[ 'categories', 	Categories,			_('Categories') ],
-			[ 'properties',		Properties,			_('Properties') ],
-			[ 'prizes',			Prizes,				_('Prizes') ],
-			[ 'primes',			Primes,				_('Primes') ],
-			[ 'raceAnimation',	RaceAnimation,		_('Animation') ],
-			#[ 'situation',		Situation,			_('Situation') ],
-			[ 'gapChart',		GapChart,			_('GapChart') ],
-			[ 'lapCounter',		LapCounter,			_('LapCounter') ],
-			[ 'announcer',		Announcer,			_('Announcer') ],
-			[ 'histogram',		HistogramPanel,		_('Histogram') ],
-			[ 'teamResults',	TeamResults,		_('Team Results') ],
+			[ 'actions',		Actions,						_('Actions') ],
+			[ 'record',			NumKeypad,						_('Record') ],
+			[ 'results',		LazyClass('Results'),			_('Results') ],
+			[ 'pulled',			LazyClass('Pulled'),			_('Pulled') ],
+			[ 'history',		LazyClass('History'),			_('Passings') ],
+			[ 'riderDetail',	LazyClass('RiderDetail'),		_('RiderDetail') ],
+			[ 'gantt',			LazyClass('Gantt'),				_('Chart') ],
+			[ 'recommendations',LazyClass('Recommendations'),	_('Recommendations') ],
+			[ 'categories',		LazyClass('Categories'),		_('Categories') ],
+			[ 'properties',		LazyClass('Properties'),		_('Properties') ],
+			[ 'prizes',			LazyClass('Prizes'),			_('Prizes') ],
+			[ 'primes',			LazyClass('Primes'),			_('Primes') ],
+			[ 'raceAnimation',	LazyClass('RaceAnimation'),		_('Animation') ],
+			#[ 'situation',		Situation,						_('Situation') ],
+			[ 'gapChart',		LazyClass('GapChart'),			_('GapChart') ],
+			[ 'lapCounter',		LapCounter,						_('LapCounter') ],
+			[ 'announcer',		LazyClass('Announcer'),			_('Announcer') ],
+			[ 'histogram',		LazyClass('HistogramPanel'),	_('Histogram') ],
+			[ 'teamResults',	LazyClass('TeamResults'),		_('Team Results') ],
 		]
 		self.attrWindowSet = {'results', 'history', 'gantt', 'raceAnimation', 'gapChart', 'announcer', 'lapCounter', 'teamResults'}
 		
 		for i, (a, c, n) in enumerate(self.attrClassName):
-			setattr( self, a, c(self.notebook) )
+			if isinstance(c, LazyClass):
+				page = LazyPage( self.notebook, c, self.onPageCreate )
+			else:
+				with startupProfile.timer( c.__name__ ):
+					page = c( self.notebook )
+			setattr( self, a, page )
 			getattr( self, a ).SetDropTarget( self.fileDrop )
 			addPage( getattr(self, a), '{}. {}'.format(i+1, n) )
 			setattr( self, 'i' + a[0].upper() + a[1:] + 'Page', i )
@@ -847,6 +795,7 @@ class MainWin( wx.Frame ):
 			self.Bind( wx.EVT_MENU, self.menuWindow, menuItem )
 			pageDialog = PageDialog(self, cls, closeCallback=lambda idIn=menuItem.GetId(): self.windowCloseCallback(idIn), title=name)
 			if attr == 'lapCounter':
+				pageDialog.createCallback = lambda page: page.SetLabels( self.lapCounterLabels )
 				self.lapCounterDialog = pageDialog
 			self.menuIdToWindowInfo[menuItem.GetId()] = [
 				attr, name, menuItem,
@@ -857,7 +806,7 @@ class MainWin( wx.Frame ):
 			if attr not in self.attrWindowSet:
 				continue
 			addMenuWindow( attr, cls, name )
-		addMenuWindow( None, UnmatchedTagsGantt, _('Unmatched RFID Tags') )
+		addMenuWindow( None, LazyClass('UnmatchedTagsGantt'), _('Unmatched RFID Tags') )
 			
 		self.menuBar.Append( self.windowMenu, _("&Windows") )
 		
@@ -877,7 +826,7 @@ class MainWin( wx.Frame ):
 
 		item = self.helpMenu.Append( wx.ID_ANY, _("Help &Search..."), _("Search Help...") )
 		self.Bind(wx.EVT_MENU, self.menuHelpSearch, item )
-		self.helpSearch = HelpSearchDialog( self, title=_('Help Search') )
+		self.helpSearch = None		# Created on first use.
 		item = self.helpMenu.Append( wx.ID_HELP, _("&Help..."), _("Help about CrossMgr...") )
 		self.Bind(wx.EVT_MENU, self.menuHelp, item )
 
@@ -952,8 +901,10 @@ class MainWin( wx.Frame ):
 	
 	def updateLapCounter( self, labels=None ):
 		labels = labels or []
+		self.lapCounterLabels = labels
 		self.lapCounter.SetLabels( labels )
-		self.lapCounterDialog.page.SetLabels( labels )
+		if self.lapCounterDialog.page is not None:
+			self.lapCounterDialog.page.SetLabels( labels )
 		WebServer.WsLapCounterRefresh()
 
 	def getValidNum( self, message, mustBeInRace=True, exclude=[] ):
@@ -1081,6 +1032,7 @@ class MainWin( wx.Frame ):
 		
 	@logCall
 	def menuDNS( self, event ):
+		from DNSManager import DNSManagerDialog
 		with DNSManagerDialog(self) as dns:
 			dns.ShowModal()
 		
@@ -1102,6 +1054,7 @@ class MainWin( wx.Frame ):
 		
 	@logCall
 	def menuFind( self, event = None ):
+		from Search import SearchDialog
 		if not getattr(self, 'findDialog', None):
 			self.findDialog = SearchDialog( self )
 		if not self.findDialog.IsShown():
@@ -1118,6 +1071,7 @@ class MainWin( wx.Frame ):
 		
 	@logCall
 	def menuAutocorrect( self, event ):
+		from SetAutoCorrect import SetAutoCorrectDialog
 		undo.pushState()
 		with Model.LockRace() as race:
 			if not race:
@@ -1129,6 +1083,7 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuReissueBibs( self, event ):
+		from ReissueBibs import ReissueBibsDialog
 		with Model.LockRace() as race:
 			if not race:
 				return
@@ -1151,6 +1106,7 @@ class MainWin( wx.Frame ):
 				
 	@logCall
 	def menuChangeRaceStartTime( self, event ):
+		import ChangeRaceStartTime
 		race = Model.race
 		if not race:
 			return
@@ -1232,11 +1188,13 @@ class MainWin( wx.Frame ):
 			if race.isTimeTrial:
 				AutoImportTTStartTimes()
 			race.startTime = startTime
+			race.journalStartTime()
 			
 			for num, t in numTimes:
 				rider = race.getRider( num )
 				if rider.status == DNS:
 					rider.status = Finisher
+					Model.journalRiderState( rider )
 				race.addTime( num, t )
 			
 			race.finishTime = finishTime
@@ -1253,6 +1211,7 @@ class MainWin( wx.Frame ):
 		ChangeProperties( self )
 		
 	def menuJChip( self, event ):
+		import JChipSetup
 		if not Model.race:
 			Utils.MessageOK(self, _("You must have a valid race.  Open or New a race first."), _("No Valid Race"), iconMask=wx.ICON_ERROR)
 			return
@@ -1264,6 +1223,8 @@ class MainWin( wx.Frame ):
 			dlg.ShowModal()
 
 	def menuJChipImport( self, event ):
+		import JChipSetup
+		import JChipImport
 		correct, reason = JChipSetup.CheckExcelLink()
 		explain = '{}\n\n{}'.format(
 			_('You must have a valid Excel sheet with associated tags and Bib numbers.'),
@@ -1279,6 +1240,8 @@ class MainWin( wx.Frame ):
 		wx.CallAfter( self.refresh )
 		
 	def menuAlienImport( self, event ):
+		import JChipSetup
+		import AlienImport
 		correct, reason = JChipSetup.CheckExcelLink()
 		explain = '{}\n\n{}'.format(
 			_('You must have a valid Excel sheet with associated tags and Bib numbers.'),
@@ -1294,6 +1257,8 @@ class MainWin( wx.Frame ):
 		wx.CallAfter( self.refresh )
 		
 	def menuIpicoImport( self, event ):
+		import JChipSetup
+		import IpicoImport
 		correct, reason = JChipSetup.CheckExcelLink()
 		explain = '{}\n\n{}'.format(
 			_('You must have a valid Excel sheet with associated tags and Bib numbers.'),
@@ -1309,6 +1274,8 @@ class MainWin( wx.Frame ):
 		wx.CallAfter( self.refresh )
 		
 	def menuImpinjImport( self, event ):
+		import JChipSetup
+		import ImpinjImport
 		correct, reason = JChipSetup.CheckExcelLink()
 		explain = '{}\n\n{}'.format(
 			_('You must have a valid Excel sheet with associated tags and Bib numbers.'),
@@ -1324,6 +1291,8 @@ class MainWin( wx.Frame ):
 		wx.CallAfter( self.refresh )
 		
 	def menuOrionImport( self, event ):
+		import JChipSetup
+		import OrionImport
 		correct, reason = JChipSetup.CheckExcelLink()
 		explain = '{}\n\n{}'.format(
 			_('You must have a valid Excel sheet with associated tags and Bib numbers.'),
@@ -1339,6 +1308,8 @@ class MainWin( wx.Frame ):
 		wx.CallAfter( self.refresh )
 		
 	def menuRaceResultImport( self, event ):
+		import JChipSetup
+		import RaceResultImport
 		correct, reason = JChipSetup.CheckExcelLink()
 		explain = '{}\n\n{}'.format(
 			_('You must have a valid Excel sheet with associated tags and Bib numbers.'),
@@ -1465,7 +1436,7 @@ class MainWin( wx.Frame ):
 		Finisher = Model.Rider.Finisher
 		for rider in race.riders.values():
 			rider.firstTime = None
-			rider.times.clear()
+			del rider.times[:]
 			rider.clearCache()
 			rider.status = Finisher
 		
@@ -1772,6 +1743,7 @@ class MainWin( wx.Frame ):
 
 	@logCall
 	def menuPrintCategories( self, event ):
+		from Categories import PrintCategories
 		self.commit()
 		PrintCategories()
 
@@ -1819,38 +1791,26 @@ class MainWin( wx.Frame ):
 
 		xlFName = self.getFormatFilename('excel')
 
-		wb = xlsxwriter.Workbook( xlFName )
-		formats = ExportGrid.getExcelFormatsXLSX( wb )
-		with UnstartedRaceWrapper():
-			raceCategories = getRaceCategories()
-			
-			ues = Utils.UniqueExcelSheetName()
-			for catName, category in raceCategories:
-			
-				if catName == 'All' and len(raceCategories) > 1:
-					continue
-								
-				sheetCur = wb.add_worksheet( ues.getSheetName(catName) )
-				export = ExportGrid()
-				export.setResultsOneList( category, showLapsFrequency = 1 )
-				export.toExcelSheetXLSX( formats, sheetCur )
-				
-			race = Model.race
-			if race and getattr(race, 'primes', None):
-				sheetCur = wb.add_worksheet( Utils.RemoveDisallowedSheetChars('Primes') )
-				export = ExportGrid( **GetGrid() )
-				export.toExcelSheetXLSX( formats, sheetCur )
-
-		AddExcelInfo( wb )
 		if silent:
 			try:
-				wb.close()
+				ExportResultsExcel( xlFName )
 			except Exception as e:
 				logException( e, sys.exc_info() )
 			return
-			
+		
+		# Write the file in the results worker so the UI stays responsive.
+		# The UI thread only pays for the race snapshot.
+		def export():
+			version, fname = resultsWorker.exportExcel( RaceHtml.getSnapshot, xlFName )
+			wx.CallAfter( self.onPublishAsExcel, xlFName, fname is not None )
+		threading.Thread( target=export, name='ExportExcel', daemon=True ).start()
+	
+	def onPublishAsExcel( self, xlFName, success ):
 		try:
-			wb.close()
+			if not success:
+				# The worker failed.  Write the file here.
+				with Utils.UIBusy():
+					ExportResultsExcel( xlFName )
 			if self.launchExcelAfterPublishingResults:
 				Utils.LaunchApplication( xlFName )
 			Utils.MessageOK(self, '{}:\n\n   {}'.format(_('Excel file written to'), xlFName), _('Excel Write'))
@@ -1870,218 +1830,6 @@ class MainWin( wx.Frame ):
 			return Model.race.email
 		return self.config.Read('email', '')
 	
-	reLeadingWhitespace = re.compile( '^[ \t]+', re.MULTILINE )
-	reComments = re.compile( '// .*$', re.MULTILINE )
-	reBlankLines = re.compile( '\n+' )
-	reTestCode = re.compile( r'/\*\(-\*/.*?/\*-\)\*/', re.MULTILINE )	# Use non-greedy match.
-	reRemoveTags = re.compile( r'\<html\>|\</html\>|\<body\>|\</body\>|\<head\>|\</head\>', re.I )
-	reFloatList = re.compile( r'([+-]?[0-9]+\.[0-9]+,\s*)+([+-]?[0-9]+\.[0-9]+)', re.MULTILINE )
-	reBoolList = re.compile( r'((true|false),\s*)+(true|false)', re.MULTILINE )
-	reTagTrailingWhitespace = re.compile( r'>\s+', re.MULTILINE|re.UNICODE )
-	
-	def cleanHtml( self, html ):
-		# Remove leading whitespace, comments, consecutive blank lines and test code to save space.
-		html = self.reLeadingWhitespace.sub( '', html )
-		html = self.reComments.sub( '', html )
-		html = self.reBlankLines.sub( '\n', html )
-		html = self.reTestCode.sub( '', html )
-		return html
-	
-	def getBasePayload( self, publishOnly=True ):
-		race = Model.race
-		
-		payload = {}
-		payload['raceName'] = os.path.basename(self.fileName or '')[:-4]
-		iTeam = ReportFields.index('Team')
-		payload['infoFields'] = ReportFields[:iTeam] + ['Name'] + ReportFields[iTeam:]
-		
-		payload['organizer']		= getattr(race, 'organizer', '')
-		payload['reverseDirection']	= getattr(race, 'reverseDirection', False)
-		payload['finishTop']		= getattr(race, 'finishTop', False)
-		payload['isTimeTrial']		= race.isTimeTrial
-		payload['winAndOut']		= race.winAndOut
-		payload['rfid']				= race.enableJChipIntegration
-		payload['primes']			= getattr(race, 'primes', [])
-		payload['raceNameText']		= race.name
-		payload['raceDate']			= race.date
-		payload['raceScheduledStart']= race.date + ' ' + race.scheduledStart
-		payload['raceTimeZone']		= race.timezone
-		payload['raceAddress']      = ', '.join( n for n in [race.city, race.stateProv, race.country] if n )
-		payload['raceIsRunning']	= race.isRunning()
-		payload['raceIsUnstarted']	= race.isUnstarted()
-		payload['raceIsFinished']	= race.isFinished()
-		payload['lapDetails']		= GetLapDetails() if not race.hideDetails else {}
-		payload['hideDetails']		= race.hideDetails
-		payload['showCourseAnimation'] = race.showCourseAnimationInHtml
-		payload['licenseLinkTemplate'] = race.licenseLinkTemplate
-		payload['roadRaceFinishTimes'] = race.roadRaceFinishTimes
-		payload['estimateLapsDownFinishTime'] = race.estimateLapsDownFinishTime
-		payload['email']				= self.getEmail()
-		payload['version']				= Version.AppVerName
-		
-		notes = race.notes
-		if notes.lstrip()[:6].lower().startswith( '<html>' ):
-			notes = TemplateSubstitute( notes, race.getTemplateValues() )
-			notes = self.reRemoveTags.sub( '', notes )
-			notes = notes.replace('<', '{-{').replace( '>', '}-}' )
-			payload['raceNotes']	= notes
-		else:
-			notes = TemplateSubstitute( escape(notes), race.getTemplateValues() )
-			notes = self.reTagTrailingWhitespace.sub( '>', notes ).replace( '</table>', '</table><br/>' )
-			notes = notes.replace('<', '{-{').replace( '>', '}-}' ).replace('\n','{-{br/}-}')	# Replace angle brackets so they don't interfere with the regular html.
-			payload['raceNotes']	= notes
-		if race.startTime:
-			raceStartTime = (race.startTime - race.startTime.replace( hour=0, minute=0, second=0 )).total_seconds()
-			payload['raceStartTime']= raceStartTime
-		
-		tLastRaceTime = race.lastRaceTime()
-		tNow = now()
-		payload['timestamp']			= [tNow.ctime(), tLastRaceTime]
-		
-		payload['data']					= GetAnimationData( None, True )
-		payload['catDetails']			= GetCategoryDetails( True, publishOnly )
-		
-		return payload
-	
-	def addResultsToHtmlStr( self, html ):
-		html = self.cleanHtml( html )
-		
-		payload = self.getBasePayload()		
-		race = Model.race
-		
-		year, month, day = [int(v) for v in race.date.split('-')]
-		timeComponents = [int(v) for v in race.scheduledStart.split(':')]
-		if len(timeComponents) < 3:
-			timeComponents.append( 0 )
-		hour, minute, second = timeComponents
-		raceTime = datetime.datetime( year, month, day, hour, minute, second )
-		
-		#------------------------------------------------------------------------
-		title = '{} - {} {} {}'.format( race.title, _('Starting'), raceTime.strftime(localTimeFormat), raceTime.strftime(localDateFormat) )
-		html = html.replace( 'CrossMgr Competition Results by Edward Sitarski', escape(title) )
-		if getattr(race, 'gaTrackingID', None):
-			html = html.replace( '<!-- Google Analytics -->', gaSnippet.replace('UA-XXXX-Y', race.gaTrackingID) )
-		if race.isRunning():
-			html = html.replace( '<!-- Meta -->', '''
-<meta http-equiv="Cache-Control" content="no-cache, no-store, must-revalidate"/>
-<meta http-equiv="Pragma" content="no-cache"/>
-<meta http-equiv="Expires" content="0"/>''' )
-		
-		#------------------------------------------------------------------------
-		courseCoordinates, gpsPoints, gpsAltigraph, totalElevationGain, isPointToPoint, lengthKm = None, None, None, None, None, None
-		geoTrack = getattr(race, 'geoTrack', None)
-		if geoTrack is not None:
-			courseCoordinates = geoTrack.asCoordinates()
-			gpsPoints = geoTrack.asExportJson()
-			gpsAltigraph = geoTrack.getAltigraph()
-			totalElevationGain = geoTrack.totalElevationGainM
-			isPointToPoint = getattr( geoTrack, 'isPointToPoint', False )
-			lengthKm = geoTrack.lengthKm
-		
-		#------------------------------------------------------------------------
-		codes = []
-		if 'UCICode' in payload['infoFields']:
-			codes.extend( r['UCICode'] for r in payload['data'].values() if r.get('UCICode',None) )
-		if 'NatCode' in payload['infoFields']:
-			codes.extend( r['NatCode'] for r in payload['data'].values() if r.get('NatCode',None) )
-		payload['flags']				= Flags.GetFlagBase64ForUCI( codes )
-		if gpsPoints:
-			payload['gpsPoints']		= gpsPoints
-		
-		def sanitize( template ):
-			# Sanitize the template into a safe json string.
-			template = template.replace( '{{api_key}}', race.googleMapsApiKey )
-			template = self.reLeadingWhitespace.sub( '', template )
-			template = self.reComments.sub( '', template )
-			template = self.reBlankLines.sub( '\n', template )
-			template = template.replace( '<', '{-{' ).replace( '>', '}-}' )
-			return template
-		
-		# If a map is defined, add the course viewers.
-		if courseCoordinates:
-			payload['courseCoordinates'] = courseCoordinates
-			
-			if race.googleMapsApiKey:
-				# Add the course viewer template.
-				templateFile = os.path.join(Utils.getHtmlFolder(), 'CourseViewerTemplate.html')
-				try:
-					with open(templateFile, encoding='utf8') as fp:
-						template = fp.read()
-					payload['courseViewerTemplate'] = sanitize( template )
-				except Exception:
-					pass
-	
-		# Add the rider dashboard.
-		templateFile = os.path.join(Utils.getHtmlFolder(), 'RiderDashboard.html')
-		try:
-			with open(templateFile, encoding='utf8') as fp:
-				template = fp.read()
-			payload['riderDashboard'] = sanitize( template )
-		except Exception:
-			pass
-	
-		# Add the travel map if the riders have locations.
-		if race.googleMapsApiKey:
-			try:
-				excelLink = race.excelLink
-				if excelLink.hasField('City') and any(excelLink.hasField(f) for f in ('Prov','State','StateProv')):
-					templateFile = os.path.join(Utils.getHtmlFolder(), 'TravelMap.html')
-					try:
-						with open(templateFile, encoding='utf8') as fp:
-							template = fp.read()
-						payload['travelMap'] = sanitize( template )
-					except Exception:
-						pass
-			except Exception as e:
-				pass
-		
-		if totalElevationGain:
-			payload['gpsTotalElevationGain'] = totalElevationGain
-		if gpsAltigraph:
-			payload['gpsAltigraph'] = gpsAltigraph
-		if isPointToPoint:
-			payload['gpsIsPointToPoint'] = isPointToPoint
-		if lengthKm:
-			payload['lengthKm'] = lengthKm
-
-		html = replaceJsonVar( html, 'payload', payload )
-		graphicBase64 = self.getGraphicBase64()
-		if graphicBase64:
-			try:
-				iStart = html.index( 'src="data:image/png' )
-				iEnd = html.index( '"/>', iStart )
-				html = ''.join( [html[:iStart], 'src="{}"'.format(graphicBase64), html[iEnd+1:]] )
-			except ValueError:
-				pass
-				
-		# Clean up spurious decimal points.
-		def fixBigFloat( f ):
-			if len(f) > 6:
-				try:
-					d = f.split('.')[1]					# Get decimal part of the number.
-					max_precision = 5
-					if len(d) > max_precision:
-						f = '{val:.{pr}f}'.format(pr=max_precision, val=float(f)).rstrip('0')	# Reformat with a shorter decimal and remove trailing zeros.
-						if f.endswith('.'):
-							f += '0'		# Ensure a zero follows the decimal point (json format spec).
-				except IndexError:
-					# Number does not have a decimal point.
-					pass
-			return f
-			
-		def floatListRepl( m ):
-			return ','.join([fixBigFloat(f) for f in m.group().replace(',',' ').split()])
-			
-		html = self.reFloatList.sub( floatListRepl, html )
-		
-		# Convert true/false lists to 0/1.
-		def boolListRepl( m ):
-			return ','.join(['0' if f[:1] == 'f' else '1' for f in m.group().replace(',',' ').split() ])
-			
-		html = self.reBoolList.sub( boolListRepl, html )
-		
-		return html
-	
 	def addCourseToHtmlStr( self, html ):
 		# Remove leading whitespace, comments and consecutive blank lines to save space.
 		html = self.reLeadingWhitespace.sub( '', html )
@@ -2190,20 +1938,14 @@ class MainWin( wx.Frame ):
 				_('Set Email Contact'), wx.ICON_EXCLAMATION ):
 				self.menuSetContactEmail()
 	
-		# Read the html template.
-		htmlFile = os.path.join(Utils.getHtmlFolder(), 'RaceAnimation.html')
-		try:
-			with open(htmlFile, encoding='utf8') as fp:
-				html = fp.read()
-		except Exception as e:
-			logException( e, sys.exc_info() )
+		# Get the rendered html.  This is shared with the web server and ftp publish.
+		html = RaceHtml.getCurrentHtml()
+		if not html:
 			if not silent:
 				Utils.MessageOK(self, _('Cannot read HTML template file.  Check program installation.'),
 								_('Html Template Read Error'), iconMask=wx.ICON_ERROR )
 			return
 			
-		html = self.addResultsToHtmlStr( html )
-			
 		# Write out the results.
 		fname = self.getFormatFilename('html')
 		try:
@@ -2405,6 +2147,7 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuImportGpx( self, event ):
+		import GpxImport
 		if self.fileName is None or len(self.fileName) < 4:
 			return
 		
@@ -2644,6 +2387,7 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuFinishLynx( self, event ):
+		from FinishLynx import FinishLynxDialog
 		with FinishLynxDialog( self ) as fld:
 			fld.ShowModal()
 		
@@ -2655,6 +2399,7 @@ class MainWin( wx.Frame ):
 			try:
 				race.resetAllCaches()
 				self.writeRace()
+				RaceJournal.close()
 				Model.writeModelUpdate()
 				self.config.Flush()
 			except Exception as e:
@@ -2692,10 +2437,15 @@ class MainWin( wx.Frame ):
 			self.commit()
 		with Model.LockRace() as race:
 			if race is not None:
-				with open(self.fileName, 'wb') as fp:
-					pickle.dump( race, fp, 2 )
+				RaceJournal.snapshot( race, self.fileName )
 				race.setChanged( False )
 
+	def compactRace( self ):
+		# Write the race file in the background.  Edits are in the journal until then.
+		if self.fileName:
+			self.commit()
+			RaceJournal.compactInBackground( Model.race, self.fileName )
+
 	def setActiveCategories( self ):
 		with Model.LockRace() as race:
 			if race is None:
@@ -3082,6 +2832,10 @@ class MainWin( wx.Frame ):
 				race.tagNums = None
 				race.resetAllCaches()
 				race.lastOpened = now()
+				
+				# Recover edits made after the race file was last written.
+				RaceJournal.close()
+				journalCount = RaceJournal.replay( race, fileName )
 				Model.setRace( race )
 			
 			ChipReader.chipReaderCur.reset( race.chipReaderType )
@@ -3097,6 +2851,9 @@ class MainWin( wx.Frame ):
 			self.refreshAll()
 			Utils.writeLog( '{}: {} {}'.format(Version.AppVerName, platform.system(), platform.release()) )
 			Utils.writeLog( 'call: openRace: "{}"'.format(fileName) )
+			if journalCount:
+				Utils.writeLog( 'openRace: recovered {} edits from journal'.format(journalCount) )
+				self.writeRace( False )
 			
 			eventFileName = os.path.join( os.path.dirname(self.fileName), race.getFileName() )
 			if self.fileName != eventFileName:
@@ -3264,6 +3021,8 @@ class MainWin( wx.Frame ):
 		self.onCloseWindow( event )
 
 	def genTimes( self, regen=False ):
+		from SimulateData import SimulateData
+		import SimulationLapTimes
 		if regen:
 			for k, v in SimulateData(200, 40).items():
 				setattr( self, k, v )
@@ -3285,6 +3044,7 @@ class MainWin( wx.Frame ):
 		
 	@logCall
 	def menuSimulate( self, event=None, userConfirm=True, isTimeTrial=False ):
+		import xlsxwriter
 		# Put simulation in user's home directory.
 		simulationDir = os.path.join( os.path.expanduser('~'), 'CrossMgrSimulation' )
 		
@@ -3596,6 +3356,7 @@ class MainWin( wx.Frame ):
 		
 	@logCall
 	def menuExportHistory( self, event ):
+		import xlsxwriter
 		self.commit()
 		if self.fileName is None or len(self.fileName) < 4 or not Model.race:
 			return
@@ -3636,6 +3397,8 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuExportUSAC( self, event=None, silent=False ):
+		import xlwt
+		from USACExport import USACExport
 		self.commit()
 		if self.fileName is None or len(self.fileName) < 4 or not Model.race:
 			return
@@ -3661,6 +3424,8 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuExportVTTA( self, event=None, silent=False ):
+		import xlsxwriter
+		from VTTAExport import VTTAExport
 		self.commit()
 		if self.fileName is None or len(self.fileName) < 4 or not Model.race:
 			return
@@ -3687,6 +3452,8 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuExportJPResults( self, event=None, silent=False ):
+		import xlsxwriter
+		from JPResultsExport import JPResultsExport
 		self.commit()
 		if self.fileName is None or len(self.fileName) < 4 or not Model.race:
 			return
@@ -3713,6 +3480,7 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuUploadUCI( self, event=None, silent=False ):
+		from UCIExcel import UCIExcel
 		self.commit()
 		if self.fileName is None or len(self.fileName) < 4:
 			return
@@ -3774,6 +3542,7 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuExportCrossResults( self, event=None, isRoadResults=False, silent=False ):
+		from CrossResultsExport import CrossResultsExport
 		destination = 'Road-Results' if isRoadResults else 'CrossResults'
 	
 		self.commit()
@@ -3828,6 +3597,7 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuExportWebScorer( self, event=None, silent=False ):
+		from WebScorerExport import WebScorerExport
 		self.commit()
 		if self.fileName is None or len(self.fileName) < 4 or not Model.race:
 			return
@@ -3901,6 +3671,9 @@ class MainWin( wx.Frame ):
 	
 	@logCall
 	def menuHelpSearch( self, event ):
+		if not self.helpSearch:
+			from HelpSearch import HelpSearchDialog
+			self.helpSearch = HelpSearchDialog( self, title=_('Help Search') )
 		self.helpSearch.Show()
 	
 	@logCall
@@ -3990,7 +3763,14 @@ Computers fail, screw-ups happen.  Always use a manual backup.
 		return self.pages[self.notebook.GetSelection()]
 		
 	def isShowingPage( self, page ):
-		return page == self.pages[self.notebook.GetSelection()]
+		pageCur = self.pages[self.notebook.GetSelection()]
+		return page == pageCur or (isinstance(pageCur, LazyPage) and page == pageCur.page)
+	
+	def onPageCreate( self, page ):
+		# Called when a lazy page is first built.
+		page.SetDropTarget( self.fileDrop )
+		if self.numSelect is not None and hasattr(page, 'setNumSelect'):
+			page.setNumSelect( self.numSelect )
 	
 	def showPage( self, iPage, commitFirst=True ):
 		if commitFirst:
@@ -4082,7 +3862,7 @@ Computers fail, screw-ups happen.  Always use a manual backup.
 			self.callPageCommit( event.GetOldSelection() )
 			self.callPageRefresh( event.GetSelection() )
 		try:
-			Utils.writeLog( 'page: {}\n'.format(notebook.GetPage(event.GetSelection()).__class__.__name__) )
+			Utils.writeLog( 'page: {}\n'.format(getRealPage(notebook.GetPage(event.GetSelection())).__class__.__name__) )
 		except IndexError:
 			pass
 		event.Skip()	# Required to properly repaint the screen.
@@ -4095,7 +3875,7 @@ Computers fail, screw-ups happen.  Always use a manual backup.
 		self.refresh()
 		iSelect = self.notebook.GetSelection()
 		for i, p in enumerate(self.pages):
-			if i != iSelect:
+			if i != iSelect and not (isinstance(p, LazyPage) and not p.isCreated()):
 				self.callPageRefresh( i )
 
 	def setNumSelect( self, num ):
@@ -4105,11 +3885,10 @@ Computers fail, screw-ups happen.  Always use a manual backup.
 			num = None
 			
 		if num is None or num != self.numSelect:
-			self.history.setNumSelect( num )
-			self.results.setNumSelect( num )
-			self.riderDetail.setNumSelect( num )
-			self.gantt.setNumSelect( num )
-			self.raceAnimation.setNumSelect( num )
+			for page in (self.history, self.results, self.riderDetail, self.gantt, self.raceAnimation):
+				# Pages that haven't been built yet get the numSelect when they are built.
+				if not isinstance(page, LazyPage) or page.isCreated():
+					page.setNumSelect( num )
 			self.numSelect = num
 
 	#-------------------------------------------------------------
@@ -4120,9 +3899,8 @@ Computers fail, screw-ups happen.  Always use a manual backup.
 		
 		race = Model.race
 		
-		for num, t in self.numTimes:
-			race.addTime( num, t, doSetChanged=False )
-		race.setChanged()
+		# One journal flush and one change notification for the whole batch.
+		race.addTimes( self.numTimes )
 		
 		OutputStreamer.writeNumTimes( self.numTimes )
 		
@@ -4161,40 +3939,13 @@ Computers fail, screw-ups happen.  Always use a manual backup.
 	
 		data = ChipReader.chipReaderCur.GetData()
 		
-		if not getattr(race, 'tagNums', None):
-			GetTagNums( True )
+		# The tag index is only updated when the sign-on sheet changes, so this is cheap.
+		GetTagNums()
 		if not race.tagNums:
 			return False
 		
-		for d in data:
-			if d[0] != 'data':
-				continue
-			tag, dt = d[1], d[2]
-			
-			# Ignore unrecorded reads that happened before the restart time.
-			if race.rfidRestartTime and dt <= race.rfidRestartTime:
-				continue
-			
-			try:
-				num = race.tagNums[tag]
-			except KeyError:
-				if race.isRunning() and race.startTime <= dt:
-					race.addUnmatchedTag( tag, (dt - race.startTime).total_seconds() )
-				continue
-			except (TypeError, ValueError):
-				race.missingTags.add( tag )
-				continue
-				
-			# Only process times after the start of the race.
-			if race.isRunning() and race.startTime <= dt:
-				# Always process times for mass start races and when timeTrialNoRFIDStart unset.
-				if not race.isTimeTrial or not race.timeTrialNoRFIDStart:
-					self.numTimes.append( (num, (dt - race.startTime).total_seconds()) )
-				else:
-					#Only process the time if the rider has already started
-					rider = race.getRider( num )
-					if rider.firstTime is not None:
-						self.numTimes.append( (num, (dt - race.startTime).total_seconds()) )
+		# Convert and filter the whole batch of reads in one pass.
+		self.numTimes.extend( race.tagReadsToNumTimes(data) )
 		
 		# Ensure that we don't update too often if riders arrive in a bunch.
 		if not self.callLaterProcessRfidRefresh:
@@ -4272,7 +4023,7 @@ Computers fail, screw-ups happen.  Always use a manual backup.
 
 		self.secondCount += 1
 		if self.secondCount % 45 == 0 and race.isChanged():
-			self.writeRace()
+			self.compactRace()
 			
 		if doRefresh:
 			self.nonBusyRefresh()
@@ -4302,6 +4053,7 @@ def MainLoop():
 	parser.add_argument("-t", "--tt", action="store_true", dest="timetrial", default=False, help='run time trial simulation')
 	parser.add_argument("-b", "--batchpublish", action="store_true", dest="batchpublish", default=False, help="do batch publish and exit")
 	parser.add_argument("-p", "--page", dest="page", default=None, nargs='?', help="page to show after launching")
+	parser.add_argument("--profile-startup", action="store_true", dest="profileStartup", default=False, help="log the import and construction time of each module")
 	parser.add_argument(dest="filename", default=None, nargs='?', help="CrossMgr race file, or Excel generated by RaceDB", metavar="RaceFile.cmn or .xls, .xlsx, .xlsm file")
 	args = parser.parse_args()
 	
@@ -4334,8 +4086,12 @@ def MainLoop():
 	Utils.writeLog( 'start: {}'.format(Version.AppVerName) )
 	Utils.writeLog( 'lang: "{}"'.format(Utils.lang) )
 	
+	if args.profileStartup:
+		startupProfile.start()	# Only times the imports from here on if not started by CrossMgr.pyw.
+	
 	# Configure the main window.
-	mainWin = MainWin( None, title=Version.AppVerName, size=(1128,600) )
+	with startupProfile.timer( 'MainWin' ):
+		mainWin = MainWin( None, title=Version.AppVerName, size=(1128,600) )
 	
 	# Try to open a specified filename.
 	fileName = args.filename
@@ -4346,7 +4102,8 @@ def MainLoop():
 		try:
 			ext = os.path.splitext( fileName )[1]
 			if ext == '.cmn':
-				mainWin.openRace( fileName )
+				with startupProfile.timer( 'openRace' ):
+					mainWin.openRace( fileName )
 				raceLoaded = True
 			elif ext in ('.xls', '.xlsx', '.xlsm') and IsValidRaceDBExcel(fileName):
 				mainWin.openRaceDBExcel( fileName )
@@ -4390,6 +4147,9 @@ def MainLoop():
 	if args.page:
 		wx.CallAfter( mainWin.showPageName, args.page )
 	
+	# Report the startup profile once the window is up and processing events.
+	wx.CallAfter( startupProfile.report )
+	
 	# Start processing events.
 	app.MainLoop()
 
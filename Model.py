@@ -13,9 +13,11 @@ import operator
 import threading
 from os.path import commonprefix
 from collections import defaultdict
+from array import array
 
 import Utils
 import Version
+import RaceJournal
 from BatchPublishAttrs import setDefaultRaceAttr
 import SetRangeMerge
 from InSortedIntervalList import InSortedIntervalList
@@ -47,11 +49,34 @@ class memoize:
     # Class-level cache and reentrant lock.    
 	cache = {}
 	rlock = threading.RLock()	# Recursive lock so we don't lock up if cached functions call each other.
+	generation = 0				# Incremented on every full clear.
 	
 	@classmethod
 	def clear( cls ):
 		with cls.rlock:
 			cls.cache.clear()
+			memoizeCategory.categoryCache.clear()
+			memoizeCategory.changedNums.clear()
+			memoize.generation += 1
+	
+	@classmethod
+	def invalidate( cls, categories, maxAge=None, nums=() ):
+		"""
+		Clear all race-wide cached values, but only the category-scoped values for the given categories.
+		If maxAge is given, also clear category-scoped values older than maxAge seconds.
+		The changed rider nums are recorded for each category (see memoizeCategory.popChangedNums).
+		"""
+		with cls.rlock:
+			cls.cache.clear()
+			categoryCache = memoizeCategory.categoryCache
+			changedNums = memoizeCategory.changedNums
+			for c in categories:
+				categoryCache.pop( c, None )
+				changedNums.setdefault( c, set() ).update( nums )
+			if maxAge is not None:
+				tOldest = time.time() - maxAge
+				for c in [c for c, (tCreated, cache) in categoryCache.items() if tCreated < tOldest]:
+					del categoryCache[c]
    
 	def __init__(self, func):
 		# print( 'memoize:', func.__name__ )
@@ -81,6 +106,45 @@ class memoize:
 		""" Support instance methods. """
 		return functools.partial(self.__call__, obj)
 
+class memoizeCategory( memoize ):
+	"""
+	Memoize decorator for functions whose value depends only on the riders in one category.
+	
+	The first Category in the positional arguments scopes the cached value.
+	Category-scoped values survive memoize.invalidate() unless their category is invalidated.
+	If there is no Category argument (eg. category=None for the whole race), the value is cached race-wide.
+	"""
+	
+	categoryCache = {}		# category: (time created, {key: value})
+	changedNums = {}		# category: set of rider nums changed since the last full clear.
+	
+	@classmethod
+	def popChangedNums( cls, category ):
+		# Return the riders changed in this category since the last call, or since the last full clear.
+		with cls.rlock:
+			return cls.changedNums.pop( category, set() )
+	
+	def __call__(self, *args):
+		category = next( (a for a in args if isinstance(a, Category)), None )
+		if category is None:
+			return super().__call__( *args )
+		
+		key = (self.func.__name__, *args)
+		with self.rlock:
+			try:
+				cache = memoizeCategory.categoryCache[category][1]
+			except KeyError:
+				cache = memoizeCategory.categoryCache.setdefault( category, (time.time(), {}) )[1]
+			try:
+				return cache[key]
+			except KeyError:
+				value = cache[key] = self.func(*args)
+				return value
+			except TypeError:
+				pass
+			
+		return self.func(*args)
+
 #------------------------------------------------------------------------------
 # Define a global current race.
 race = None
@@ -105,6 +169,33 @@ def setRace( r ):
 def resetCache():
 	memoize.clear()
 
+# Riders changed since the last undo state.  None means any rider may have changed.
+# This lets undo pickle only the changed riders.
+changedNums = None
+
+def addChangedNums( nums ):
+	global changedNums
+	if nums is None:
+		changedNums = None
+	elif changedNums is not None:
+		changedNums.update( nums )
+
+def journalRace( r, *record ):
+	# Only journal edits to the current race.
+	if r is not None and r is race:
+		RaceJournal.write( r, *record )
+
+def journalRider( rider, *record ):
+	# Only journal edits to riders in the current race.
+	if race is not None and race.riders.get(rider.num, None) is rider:
+		RaceJournal.write( race, *record )
+		if changedNums is not None:
+			changedNums.add( rider.num )
+
+def journalRiderState( rider ):
+	# Journal the whole rider.  For edits that change more than one time or the status.
+	journalRider( rider, 'rider', rider.num, dict(rider.__getstate__(), times=rider.times.tolist()) )
+
 class LockRace:
 	def __enter__(self):
 		lock.acquire()
@@ -619,8 +710,18 @@ class Rider:
 		self.status = Rider.Finisher
 		self.tStatus = None
 	
+	@property
+	def times( self ):
+		return self._times
+	
+	@times.setter
+	def times( self, times ):
+		# The recorded times are kept in a compact array of doubles (for long races with many laps).
+		# Any sequence of times can be assigned.
+		self._times = times if isinstance(times, array) and times.typecode == 'd' else array( 'd', times )
+	
 	def clearCache( self ):
-		for attr in ('_iTimesLast', '_entriesLast'):
+		for attr in ('_iTimesLast', '_interpLast', '_entriesLast'):
 			try:
 				delattr( self, attr )
 			except AttributeError:
@@ -639,10 +740,24 @@ class Rider:
 	
 	def __getstate__( self ):
 		# Don't pickle cached entries.
+		# Pickle the times as bytes - much faster than a list of floats.
 		state = self.__dict__.copy()		
 		state.pop( '_iTimesLast', None )
+		state.pop( '_interpLast', None )
 		state.pop( '_entriesLast', None )
+		state['times'] = state.pop('_times').tobytes()
 		return state
+	
+	def __setstate__( self, state ):
+		# Accept the times as bytes, or as a list (older race files).
+		state = state.copy()
+		times = state.pop( 'times', () )
+		self.__dict__.update( state )
+		if isinstance(times, bytes):
+			self._times = array( 'd' )
+			self._times.frombytes( times )
+		else:
+			self.times = times
 
 	def __repr__( self ):
 		return '{} ({})'.format( self.num, self.statusNames[self.status] )
@@ -654,7 +769,8 @@ class Rider:
 		# All times in race time seconds.
 		if t < 0.0:		# Don't add negative race times.
 			return
-			
+		
+		journalRider( self, 'add', self.num, t )
 		try:
 			if t > self.times[-1]:
 				self.times.append( t )
@@ -669,6 +785,7 @@ class Rider:
 
 	def deleteTime( self, t ):
 		# Expecting t in riderTime.
+		journalRider( self, 'del', self.num, t )
 		try:
 			self.times.remove( t )
 		except ValueError:
@@ -728,6 +845,7 @@ class Rider:
 				tStatus = race.lastRaceTime() if race else None
 		self.status = status
 		self.tStatus = tStatus
+		journalRider( self, 'status', self.num, status, tStatus )
 	
 	def getMustBeRepeatInterval( self ):
 		minPossibleLapTime = race.minPossibleLapTime
@@ -741,17 +859,19 @@ class Rider:
 		if not self.times or self.status in (Rider.DNS, Rider.DQ) or not race:
 			return None
 
-		# Create a separate working list.
+		# Create a separate working array.
 		# Add the start offset for the beginning of the start wave.
 		# This avoids special cases later.
-		iTimes = [race.getStartOffset(self.num)]
+		tLast = race.getStartOffset(self.num)
+		iTimes = array( 'd', [tLast] )
 		
 		# Clean up spurious reads based on minumum possible lap time.
 		# Also removes early times.
 		mustBeRepeatInterval = self.getMustBeRepeatInterval()
 		for t in self.times:
-			if t - iTimes[-1] > mustBeRepeatInterval:
+			if t - tLast > mustBeRepeatInterval:
 				iTimes.append( t )
+				tLast = t
 		
 		try:
 			numLaps = min( race.getCategory(self.num)._numLaps or 999999, len(iTimes) )
@@ -789,9 +909,9 @@ class Rider:
 		'''
 		
 		# Ensure that there are no more times after the deleted ones.
-		iTimes = iTimes[:numLaps+1]
+		del iTimes[numLaps+1:]
 
-		return iTimes if len(iTimes) >= 2 else []
+		return iTimes if len(iTimes) >= 2 else array( 'd' )
 		
 	def getExpectedLapTime( self, iTimes = None ):
 		if iTimes is None:
@@ -806,7 +926,7 @@ class Rider:
 			return d / category.firstLapRatio if category else d
 		
 		# Return the median of the lap times ignoring the first lap.
-		dTimes = sorted( b-a for b, a in zip(iTimes[2:], iTimes[1:]) )
+		dTimes = sorted( map(operator.sub, itertools.islice(iTimes, 2, None), itertools.islice(iTimes, 1, None)) )
 		if not dTimes:
 			return None
 			
@@ -825,16 +945,14 @@ class Rider:
 		assert len(times) == 0 or len(times) >= 2
 		return times
 	
-	def removeLateTimes( self, iTimes, dnfPulledTime ):
+	def removeLateTimes( self, iTimes, interp, dnfPulledTime ):
 		if iTimes and dnfPulledTime is not None:
-			i = bisect.bisect_right( iTimes, (dnfPulledTime,True) )
-			if i < len(iTimes):
-				while i > 1 and iTimes[i-1][0] > dnfPulledTime:
-					i -= 1
+			i = bisect.bisect_right( iTimes, dnfPulledTime )
 			del iTimes[i:]
+			del interp[i:]
 		if len(iTimes) < 2:
-			iTimes = []
-		return iTimes
+			return array( 'd' ), bytearray()
+		return iTimes, interp
 
 	def countEarlyTimes( self ):
 		count = 0
@@ -848,21 +966,23 @@ class Rider:
 			pass
 		return count
 	
-	def getEntries( self, iTimes ):
+	def getEntries( self, iTimes, interp ):
+		# iTimes is an array of times, interp is a bytearray of interpolated flags.
 		try:
-			if self._iTimesLast == iTimes:
+			if self._iTimesLast == iTimes and self._interpLast == interp:
 				return self._entriesLast
 		except AttributeError:
 			pass
 			
 		num = self.num
-		self._entriesLast = tuple(Entry(num, lap, it[0], it[1]) for lap, it in enumerate(iTimes))
+		self._entriesLast = tuple( map(Entry, itertools.repeat(num), itertools.count(), iTimes, map(bool, interp)) )
 		self._iTimesLast = iTimes
+		self._interpLast = interp
 		return self._entriesLast
 			
 	def interpolate( self, stopTime = maxInterpolateTime ):
 		if not self.times or self.status in (Rider.DNS, Rider.DQ):
-			return self.getEntries( [] )
+			return self.getEntries( array('d'), bytearray() )
 		
 		# Adjust the stop time.
 		st = stopTime
@@ -875,63 +995,77 @@ class Rider:
 		# Check if we need to do any interpolation or if the user wants the raw data.
 		if not self.autocorrectLaps:
 			if not self.times:
-				return self.getEntries( [] )
+				return self.getEntries( array('d'), bytearray() )
 			# Add the start time for the beginning of the rider.
 			# This avoids a whole lot of special cases later.
-			iTimes = [race.getStartOffset(self.num) if race else 0.0]
+			tLast = race.getStartOffset(self.num) if race else 0.0
+			iTimes = array( 'd', [tLast] )
 			mustBeRepeatInterval = self.getMustBeRepeatInterval() if self.alwaysFilterMinPossibleLapTime else 0.0
 			for t in self.times:
-				if t - iTimes[-1] > mustBeRepeatInterval:
-					iTimes.append( t )		
-			iTimes = [(t, False) for t in iTimes]
+				if t - tLast > mustBeRepeatInterval:
+					iTimes.append( t )
+					tLast = t
+			interp = bytearray( len(iTimes) )
 			if dnfPulledTime is not None:
-				iTimes = self.removeLateTimes( iTimes, dnfPulledTime )
-			return self.getEntries( iTimes )
+				iTimes, interp = self.removeLateTimes( iTimes, interp, dnfPulledTime )
+			return self.getEntries( iTimes, interp )
 
 		iTimes = self.getCleanLapTimes()
 		
 		if not iTimes:
-			return self.getEntries( [] )
+			return self.getEntries( array('d'), bytearray() )
 
-		# lapTimes = [tb-ta for tb, ta in (zip(iTimes[2:], iTimes[1:]) if len(iTimes) > 1 else zip(iTimes[1:], iTimes))]
-		
 		# Flag that these are not interpolated times.
 		expected = self.getExpectedLapTime( iTimes )
 		
-		iTimes = [(t, False) for t in iTimes]
+		interp = bytearray( len(iTimes) )
 
 		if len(iTimes) > 2:
 			# Check for missing lap data and fill it in.
 			pDown, pUp = 1.0-Rider.pMin, Rider.pMax-1.0
 			missingMinMax = [(missing, expected * (missing-pDown), expected * (missing+pUp)) for missing in range(2, 5)]
+			mMinFirst = missingMinMax[0][1]
 			
-			for j in range(len(iTimes)-1, 0, -1):	# Traverse backwards so we can add missing times as we go.
-				tDur = iTimes[j][0] - iTimes[j-1][0]
-				for missing, mMin, mMax in missingMinMax:
-					if tDur < mMin:
-						break
-					if mMin <= tDur < mMax:					
-						tStart = iTimes[j-1][0]
-						interp = float(iTimes[j][0] - tStart) / float(missing)
-						iTimes[j:j] = [(tStart + interp * m, True) for m in range(1, missing)]
-						break
+			# Find the gaps big enough to be missing laps, then copy the times between them into new arrays.
+			gaps = [j for j, tDur in enumerate(map(operator.sub, itertools.islice(iTimes, 1, None), iTimes), 1) if tDur >= mMinFirst]
+			if gaps:
+				iTimesNew, interpNew = array( 'd' ), bytearray()
+				jLast = 0
+				for j in gaps:
+					iTimesNew.extend( iTimes[jLast:j] )
+					interpNew.extend( bytes(j - jLast) )
+					jLast = j
+					tStart = iTimes[j-1]
+					tDur = iTimes[j] - tStart
+					for missing, mMin, mMax in missingMinMax:
+						if tDur < mMin:
+							break
+						if mMin <= tDur < mMax:
+							tInterp = float(tDur) / float(missing)
+							iTimesNew.extend( tStart + tInterp * m for m in range(1, missing) )
+							interpNew.extend( b'\x01' * (missing - 1) )
+							break
+				iTimesNew.extend( iTimes[jLast:] )
+				interpNew.extend( bytes(len(iTimes) - jLast) )
+				iTimes, interp = iTimesNew, interpNew
 			
 		# Pad out to one entry exceeding stop time if we are less than it.
-		tBegin = iTimes[-1][0]
+		tBegin = iTimes[-1]
 		if tBegin < st and len(iTimes) < Rider.entriesMax:
-			expected = self.getExpectedLapTime( [t for t, i in iTimes] )
+			expected = self.getExpectedLapTime( iTimes )
 			tBegin += expected
 			iMax = max( 1, int(math.ceil(st - tBegin) / expected) if expected > 0 else 1 )
 			iMax = min( iMax, Rider.entriesMax - len(iTimes) )
-			iTimes.extend( [(tBegin + expected * i, True) for i in range(iMax)] )
+			iTimes.extend( tBegin + expected * i for i in range(iMax) )
+			interp.extend( b'\x01' * iMax )
 
 		# Remove any entries exceeding the dnfPulledTime.
 		if dnfPulledTime is not None:
-			iTimes = self.removeLateTimes( iTimes, dnfPulledTime )
+			iTimes, interp = self.removeLateTimes( iTimes, interp, dnfPulledTime )
 		
 		if len(iTimes) <= 1:
-			iTimes = []
-		return self.getEntries( iTimes )
+			iTimes, interp = array( 'd' ), bytearray()
+		return self.getEntries( iTimes, interp )
 		
 	def hasInterpolatedTime( self, tMax ):
 		interpolate = self.interpolate()
@@ -1201,6 +1335,8 @@ class Race:
 
 	#--------------------------------------
 	rfidRestartTime = None		# Restart time (used to ignore intervening tag reads)
+	
+	journalSerial = 0			# Edits after this race was written are in journals with this serial and later (see RaceJournal).
 	#--------------------------------------
 	
 	googleMapsApiKey = ''
@@ -1343,11 +1479,44 @@ class Race:
 	def isChanged( self ):
 		return self.isChangedFlag
 
-	def setChanged( self, changed = True ):
+	# Maximum age (seconds) of category-scoped cached results while the race is running.
+	# Running results depend on the race clock, so unaffected categories are still refreshed periodically.
+	maxCategoryCacheAge = 5.0
+	
+	def setChanged( self, changed = True, nums = None ):
+		# If nums is given, only invalidate the cached results of the categories affected by those riders.
 		self.isChangedFlag = changed
 		if changed:
-			memoize.clear()
+			addChangedNums( nums )
+			if nums is None or self.hasCrossCategoryResults():
+				memoize.clear()
+			else:
+				memoize.invalidate( self.getAffectedCategories(nums), self.maxCategoryCacheAge if self.isRunning() else None, nums )
 			self.lastChangedTime = time.time()
+	
+	def hasCrossCategoryResults( self ):
+		# If True, the results of each category depend on the times of riders in other categories.
+		return self.allCategoriesFinishAfterFastestRidersLastLap or (self.roadRaceFinishTimes and not self.isTimeTrial)
+	
+	def getAffectedCategories( self, nums ):
+		# Return the categories whose results may change if the times of the given riders change.
+		# This includes the start waves of the riders and all other categories sharing riders with those waves.
+		if getattr(self, 'categoryCache', None) is None:
+			self._buildCategoryCache()
+		
+		waves = set()
+		for num in nums:
+			category = self.categoryCache.get( num, None )
+			if category:
+				waves.add( category )
+		if not waves:
+			return waves
+		
+		affected = set( waves )
+		for c in self.categories.values():
+			if c not in affected and any( not getattr(c, 'bibSet', set()).isdisjoint(w.bibSet) for w in waves ):
+				affected.add( c )
+		return affected
 			
 	def raceTimeToClockTime( self, t=None ):
 		if self.startTime is None:
@@ -1368,7 +1537,12 @@ class Race:
 		self.startTime = datetime.datetime.now()
 		self.tagNums = None
 		self.missingTags = set()
+		self.journalStartTime()
 		self.setChanged()
+	
+	def journalStartTime( self ):
+		# The recorded times are relative to the start time, so journal it before any times that depend on it.
+		journalRace( self, 'start', RaceJournal.dtToStr(self.startTime), RaceJournal.dtToStr(self.firstRecordedTime) )
 
 	def finishRaceNow( self ):
 		self.finishTime = datetime.datetime.now()
@@ -1427,10 +1601,12 @@ class Race:
 		if t is None:
 			t = self.curRaceTime()
 		
+		startTime, firstRecordedTime = self.startTime, self.firstRecordedTime
 		if self.isTimeTrial:
 			r = self.getRider(num)
 			if r.firstTime is None:
 				r.firstTime = t
+				journalRider( r, 'first', num, t )
 			else:
 				r.addTime( t - r.firstTime )
 		else:
@@ -1443,6 +1619,7 @@ class Race:
 					r = self.getRider(num)
 					if r.firstTime is None:
 						r.firstTime = t
+						journalRider( r, 'first', num, t )
 					else:
 						r.addTime( t )
 						
@@ -1452,6 +1629,7 @@ class Race:
 					r = self.getRider(num)
 					if r.firstTime is None:
 						r.firstTime = t
+						journalRider( r, 'first', num, t )
 					else:
 						r.addTime( t )
 						
@@ -1460,10 +1638,79 @@ class Race:
 			else:
 				self.getRider(num).addTime( t )
 		
+		if self.startTime != startTime or self.firstRecordedTime != firstRecordedTime:
+			self.journalStartTime()
+		
 		if doSetChanged:
-			self.setChanged()
+			# If the first tag read reset the start time, all results are affected.
+			self.setChanged( nums=(num,) if self.startTime == startTime else None )
 		return t
 
+	def addTimes( self, numTimes ):
+		'''
+			Add a batch of (num, race time) with one change notification.
+			Returns the set of nums in the batch.
+		'''
+		if not numTimes:
+			return set()
+		
+		startTime = self.startTime
+		nums = set()
+		with RaceJournal.batch():
+			if self.isTimeTrial or (self.enableJChipIntegration and (self.resetStartClockOnFirstTag or self.skipFirstTagRead)):
+				# The first read of a rider is special.
+				for num, t in numTimes:
+					self.addTime( num, t, doSetChanged=False )
+					nums.add( num )
+			else:
+				riders = self.riders
+				for num, t in numTimes:
+					try:
+						riders[num].addTime( t )
+					except KeyError:
+						self.getRider(num).addTime( t )
+					nums.add( num )
+		
+		# If the first tag read reset the start time, all results are affected.
+		self.setChanged( nums=nums if self.startTime == startTime else None )
+		return nums
+	
+	def tagReadsToNumTimes( self, data ):
+		'''
+			Convert a batch of chip reader messages to a list of (num, race time).
+			Skips other messages, reads before the restart time or the race start, and records unmatched tags.
+		'''
+		tagNums = self.tagNums
+		if not tagNums or not self.isRunning():
+			return []
+		
+		startTime, rfidRestartTime = self.startTime, self.rfidRestartTime
+		# Only take the time if the rider has already started.
+		checkStarted = self.isTimeTrial and self.timeTrialNoRFIDStart
+		
+		numTimes = []
+		for d in data:
+			if d[0] != 'data':
+				continue
+			tag, dt = d[1], d[2]
+			# Ignore reads before the start and unrecorded reads that happened before the restart time.
+			if dt < startTime or (rfidRestartTime and dt <= rfidRestartTime):
+				continue
+			
+			try:
+				num = tagNums[tag]
+			except KeyError:
+				self.addUnmatchedTag( tag, (dt - startTime).total_seconds() )
+				continue
+			except (TypeError, ValueError):
+				self.missingTags.add( tag )
+				continue
+			
+			if checkStarted and self.getRider(num).firstTime is None:
+				continue
+			numTimes.append( (num, (dt - startTime).total_seconds()) )
+		return numTimes
+	
 	def importTime( self, num, t ):
 		self.getRider(num).addTime( t )
 		
@@ -1475,13 +1722,16 @@ class Race:
 		rider.times = []
 		rider.firstTime = None
 		rider.clearCache()
+		journalRiderState( rider )
 			
 	def clearAllRiderTimes( self ):
-		for num in self.riders.keys():
-			self.deleteRiderTimes( num )
-		self.firstRecordedTime = None
-		self.startTime = None
-		self.finishTime = None
+		with RaceJournal.batch():
+			for num in self.riders.keys():
+				self.deleteRiderTimes( num )
+			self.firstRecordedTime = None
+			self.startTime = None
+			self.finishTime = None
+			self.journalStartTime()
 		self.setChanged()
 
 	def deleteRider( self, num ):
@@ -1489,10 +1739,14 @@ class Race:
 			del self.riders[num]
 		except KeyError:
 			return
+		journalRace( self, 'norider', num )
 		self.resetAllCaches()
 		self.setChanged()
 			
 	def deleteAllRiders( self ):
+		with RaceJournal.batch():
+			for num in self.riders.keys():
+				journalRace( self, 'norider', num )
 		self.riders = {}
 		self.resetAllCaches()
 		self.setChanged()
@@ -1509,6 +1763,8 @@ class Race:
 		del self.riders[rider.num]
 		rider.num = newNum
 		self.riders[rider.num] = rider
+		journalRace( self, 'norider', num )
+		journalRiderState( rider )
 		
 		self.resetAllCaches()
 		self.setChanged()
@@ -1522,6 +1778,8 @@ class Race:
 			return False
 		
 		a.swap( b )
+		journalRiderState( a )
+		journalRiderState( b )
 		self.resetAllCaches()
 		self.setChanged()
 		return True
@@ -1540,6 +1798,7 @@ class Race:
 		r2.tStatus = None
 		r2.autocorrectLaps = True
 		r2.firstTime = getattr(r1, 'firstTime', None)
+		journalRiderState( r2 )
 		
 		self.resetAllCaches()
 		self.setChanged()
@@ -1550,7 +1809,7 @@ class Race:
 			return
 		rider = self.riders[num]
 		rider.deleteTime( t )
-		self.setChanged()
+		self.setChanged( nums=(num,) )
 		
 	def hasRiderTimes( self ):
 		return any( r.hasTimes() for r in self.riders.values() )
@@ -1598,7 +1857,7 @@ class Race:
 			averageLapTime = 8.0 * 60.0	# Default to 8 minutes.
 		return averageLapTime
 		
-	@memoize
+	@memoizeCategory
 	def getMedianLapTime( self, category=None ):
 		Finisher = Rider.Finisher
 		lapTimes = sorted( itertools.chain.from_iterable( r.getLapTimesForMedian()
@@ -1616,12 +1875,16 @@ class Race:
 			key=Entry.key
 		)
 
-	@memoize
+	@memoizeCategory
 	def interpolateCategory( self, category ):
 		if category is None:
 			return self.interpolate()
+		# Only interpolate the riders in the category.  This gives the same sequence as filtering self.interpolate().
 		inCategory = self.inCategory
-		return [e for e in self.interpolate() if inCategory(e.num, category)]
+		return sorted(
+			itertools.chain.from_iterable( rider.interpolate() for rider in self.riders.values() if inCategory(rider.num, category) ),
+			key=Entry.key
+		)
 
 	def getLastRecordedTime( self ):
 		try:
@@ -1674,21 +1937,20 @@ class Race:
 		finisher = Rider.Finisher
 		return [e for e in entries if e.t > 0 and self.riders[e.num].status == finisher]
 	
-	@memoize
+	@memoizeCategory
 	def getRule80LapTime( self, category = None ):
 		if not category:
 			return None
-		entries = self.interpolate()
+		entries = self.interpolateCategory( category )
 		if not entries:
 			return None
 			
-		inCategory = self.inCategory
 		rule80MinLapCount = self.rule80MinLapCount
 		
 		categoryTimes = [self.categoryStartOffset(category)]
 		lapCur = 1
 		for e in entries:
-			if e.lap == lapCur and inCategory(e.num, category):
+			if e.lap == lapCur:
 				categoryTimes.append( e.t )
 				if len(categoryTimes) > rule80MinLapCount:
 					return categoryTimes[-1] - categoryTimes[-2]
@@ -1701,10 +1963,10 @@ class Race:
 		except Exception:
 			return None
 
-	@memoize
+	@memoizeCategory
 	def getMaxLap( self, category = None ):
 		try:
-			return max( e.lap for e in self.interpolate() if not e.interp and self.inCategory(e.num, category) )
+			return max( e.lap for e in self.interpolateCategory(category) if not e.interp )
 		except ValueError:
 			return 0
 
@@ -1723,7 +1985,7 @@ class Race:
 			maxAnyLap = max( e.lap for e in entries )
 		return maxAnyLap
 
-	@memoize
+	@memoizeCategory
 	def getLeaderTimesNums( self, category=None ):
 		entries = self.interpolate()
 		if not entries:
@@ -1842,6 +2104,16 @@ class Race:
 
 		ctn.pop( None, None )	# Remove unmatched categories.
 		return ctn
+	
+	@memoizeCategory
+	def getStartWaveTimesNums( self, category ):
+		# Return times and nums for the leaders of one start wave.  Same as getCategoryTimesNums()[category].
+		times, nums = [0.0], [None]
+		for e in self.interpolateCategory( category ):
+			if e.lap == len(times):
+				times.append( e.t )
+				nums.append( e.num )
+		return times, nums
 		
 	@memoize
 	def getCategoryRaceLaps( self ):
@@ -2722,16 +2994,9 @@ def setCategoryChoice( iSelection, categoryAttribute = None ):
 	setCategoryChoice( iSelection, categoryAttribute )
 
 def getCurrentHtml():
-	if not race:
-		return None
-	htmlFile = os.path.join(Utils.getHtmlFolder(), 'RaceAnimation.html')
-	try:
-		with open(htmlFile, 'r', encoding='utf8') as fp:
-			html = fp.read()
-		return Utils.mainWin.addResultsToHtmlStr( html )
-	except Exception as e:
-		Utils.logException( e, sys.exc_info() )
-		return None
+	# The html is rendered at most once per race version and shared by all publishers.
+	import RaceHtml
+	return RaceHtml.getCurrentHtml()
 
 def getCurrentTTCountdownHtml():
 	if not race or not race.isTimeTrial:
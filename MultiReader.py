@@ -0,0 +1,437 @@
+import wx
+import time
+import atexit
+import asyncio
+import datetime
+import threading
+from collections import deque
+
+import Utils
+import Model
+import JChip
+import RaceResult
+import Ultra
+import WebReader
+import MyLapsServer
+
+'''
+	Run several chip readers at once and merge their reads into one timestamp-ordered stream.
+
+	Large events use more than one timing mat, often with mixed hardware.
+	JChip readers (including the CrossMgrImpinj and CrossMgrAlien bridges) are served natively on an asyncio
+	event loop - each configured port is one mat and any number of readers can connect to it.
+	The other reader types keep their own listener threads and are polled from the event loop.
+
+	Reads are held briefly so that reads from slower connections can be put in time order,
+	then a read of the same tag within dedupSeconds of the last accepted read (from any mat) is dropped.
+
+	The module has the same StartListener/GetData/StopListener/CleanupListener/IsListening interface
+	as the single reader modules.
+	The readers are configured with a spec string, eg. "JChip:53135, JChip:53136, RaceResult:192.168.1.10:3601".
+'''
+
+CRByte = JChip.CRByte
+DEFAULT_SPEC = 'JChip:{}'.format( JChip.DEFAULT_PORT )
+
+# Readers served by a single-instance listener module.
+ModuleReaders = {
+	'RaceResult':	RaceResult,
+	'Ultra':		Ultra,
+	'WebReader':	WebReader,
+	'MyLaps':		MyLapsServer,
+}
+
+def parseReaderSpec( spec ):
+	'''
+		Returns a list of (kind, host, port) from a comma separated reader spec.
+		JChip entries are "JChip:port" (listen on all interfaces) or "JChip:host:port".
+		Other entries are "Kind", "Kind:host" or "Kind:host:port".
+	'''
+	readers = []
+	for entry in (spec or '').split(','):
+		fields = [f.strip() for f in entry.strip().split(':')]
+		if not fields[0]:
+			continue
+		kind = fields[0]
+		if kind == 'JChip':
+			if len(fields) == 2:
+				host, port = JChip.DEFAULT_HOST, int(fields[1])
+			else:
+				host, port = (fields[1] if len(fields) > 1 else JChip.DEFAULT_HOST), int(fields[2] if len(fields) > 2 else JChip.DEFAULT_PORT)
+		elif kind in ModuleReaders:
+			if any( k == kind for k, h, p in readers ):
+				raise ValueError( '{}: only one {} reader is supported'.format(entry.strip(), kind) )
+			host = fields[1] if len(fields) > 1 else None
+			port = int(fields[2]) if len(fields) > 2 else None
+		else:
+			raise ValueError( '{}: unknown reader type'.format(entry.strip()) )
+		readers.append( (kind, host, port) )
+	if not readers:
+		raise ValueError( 'no readers' )
+	return readers
+
+class ReaderStats:
+	''' Read rate and latency counters for one reader. '''
+	rateWindow = 10.0		# Seconds.
+
+	def __init__( self, name ):
+		self.name = name
+		self.reads = 0
+		self.duplicates = 0
+		self.errors = 0
+		self.connections = 0
+		self.connected = 0
+		self.latencySum = 0.0
+		self.latencyMax = 0.0
+		self.lastRead = None
+		self.recent = deque()	# Arrival times in the rate window.
+
+	def addRead( self, latency, arrival ):
+		self.reads += 1
+		self.latencySum += latency
+		self.latencyMax = max( self.latencyMax, latency )
+		self.lastRead = arrival
+		self.recent.append( arrival )
+
+	def rate( self, tNow ):
+		while self.recent and self.recent[0] < tNow - self.rateWindow:
+			self.recent.popleft()
+		return len(self.recent) / self.rateWindow
+
+	def summary( self, tNow ):
+		return {
+			'reads':		self.reads,
+			'duplicates':	self.duplicates,
+			'errors':		self.errors,
+			'connections':	self.connections,
+			'connected':	self.connected,
+			'readsPerSec':	self.rate( tNow ),
+			'latencyAvg':	self.latencySum / self.reads if self.reads else None,
+			'latencyMax':	self.latencyMax if self.reads else None,
+		}
+
+class MultiReader:
+	reorderDelay = 0.25		# Seconds to hold a read so later arrivals can be put in time order.
+	dedupSeconds = 1.0		# Reads of the same tag closer than this are the same passing.
+	pollInterval = 0.1		# Seconds between polls of the listener modules.
+
+	def __init__( self ):
+		self.lock = threading.Lock()
+		self.loop = None
+		self.thread = None
+		self.servers = []
+		self.writers = set()
+		self.tasks = []
+		self.modules = []
+		self.readerEventWindow = None
+		self.reset()
+
+	def reset( self ):
+		with self.lock:
+			self.pending = []			# [(t, arrival, tag, stats)] not yet released.
+			self.messages = []			# Non-data messages in arrival order.
+			self.lastAccepted = {}		# tag: t of the last released read.
+			self.lastSeen = {}			# tag: t of the last arrival, used to filter reader events.
+			self.stats = {}
+
+	def getStats( self, name ):
+		with self.lock:
+			if name not in self.stats:
+				self.stats[name] = ReaderStats( name )
+			return self.stats[name]
+
+	def log( self, stats, category, message ):
+		with self.lock:
+			self.messages.append( (category, '{}: {}'.format(stats.name, message)) )
+		Utils.writeLog( 'MultiReader: {}: {}: {}'.format(stats.name, category, message) )
+
+	def addRead( self, stats, tag, t ):
+		# Called on the event loop thread.
+		arrival = datetime.datetime.now()
+		with self.lock:
+			stats.addRead( (arrival - t).total_seconds(), time.monotonic() )
+			self.pending.append( (t, time.monotonic(), tag, stats) )
+			tLast = self.lastSeen.get( tag )
+			self.lastSeen[tag] = t
+		if tLast is None or abs((t - tLast).total_seconds()) >= self.dedupSeconds:
+			return (tag, t)
+		return None
+
+	def sendReaderEvent( self, tagTimes ):
+		if tagTimes and self.readerEventWindow:
+			wx.PostEvent( self.readerEventWindow, JChip.ChipReaderEvent(tagTimes=tagTimes) )
+
+	def getData( self, flush=False ):
+		'''
+			Return the messages and the de-duplicated reads that are ready, in time order.
+			Reads are ('data', tag, t), the same as the single reader modules.
+		'''
+		cutoff = time.monotonic() - self.reorderDelay
+		with self.lock:
+			messages, self.messages = self.messages, []
+			if flush:
+				ready, held = self.pending, []
+			else:
+				ready = [p for p in self.pending if p[1] <= cutoff]
+				held = [p for p in self.pending if p[1] > cutoff]
+				if held:
+					# Keep any ready read later than a held one so the output stays in time order.
+					tHeld = min( p[0] for p in held )
+					held.extend( p for p in ready if p[0] >= tHeld )
+					ready = [p for p in ready if p[0] < tHeld]
+			self.pending = held
+
+			ready.sort( key=lambda p: p[0] )
+			for t, arrival, tag, stats in ready:
+				tLast = self.lastAccepted.get( tag )
+				if tLast is not None and abs((t - tLast).total_seconds()) < self.dedupSeconds:
+					stats.duplicates += 1
+					continue
+				self.lastAccepted[tag] = t
+				messages.append( ('data', tag, t) )
+		return messages
+
+	def getSummary( self ):
+		''' Returns {readerName: counters} for all readers. '''
+		tNow = time.monotonic()
+		with self.lock:
+			return {name: stats.summary(tNow) for name, stats in self.stats.items()}
+
+	#-----------------------------------------------------------------------
+	# JChip protocol.
+	#
+	async def handleJChip( self, reader, writer, stats, nameWriter ):
+		peer = writer.get_extra_info( 'peername' )
+		stats.connections += 1
+		stats.connected += 1
+		self.writers.add( writer )
+		self.log( stats, 'connection', 'established {}'.format(peer) )
+		name = None
+		timeDiff = datetime.timedelta()
+
+		def transmit( cmd, what ):
+			self.log( stats, 'transmitting', '{} command to "{}" ({})'.format(cmd, name, what) )
+			writer.write( '{}{}'.format(cmd, JChip.CR).encode() )
+
+		try:
+			while True:
+				try:
+					buf = await reader.readuntil( CRByte )
+				except asyncio.IncompleteReadError:
+					break
+				except asyncio.LimitOverrunError as e:
+					await reader.readexactly( e.consumed )
+					stats.errors += 1
+					continue
+
+				tagTimes = []
+				for line in buf.decode( errors='replace' ).split( JChip.CR ):
+					line = line.strip()
+					if not line:
+						continue
+					try:
+						if line.startswith( 'D' ):
+							tagTime = JChip.parseDataLine( line )
+							if not tagTime:
+								stats.errors += 1
+								self.log( stats, 'error', line )
+								continue
+							tag, t = tagTime
+							tagTime = self.addRead( stats, tag, t + timeDiff )
+							if tagTime:
+								tagTimes.append( tagTime )
+
+						elif line.startswith( 'N' ):
+							name = line[5:].strip()		# Skip the cmd and current number of recorded times.
+							# If this reader is already connected, it is reconnecting.  Close the previous connection.
+							writerPrev = nameWriter.get( name )
+							if writerPrev and writerPrev is not writer:
+								self.log( stats, 'transmitting', '"{}" is reconnecting'.format(name) )
+								writerPrev.close()
+							nameWriter[name] = writer
+							with self.lock:
+								self.messages.append( ('name', name) )
+							transmit( 'GT', 'gettime' )
+
+						elif line.startswith( 'GT' ):
+							tNow = datetime.datetime.now()
+							timeDiff = tNow - JChip.parseGetTime( line, tNow )
+							self.log( stats, 'timeAdjustment', JChip.formatTimeAdjustment(name or '<<unknown>>', timeDiff) )
+							transmit( 'S0000', 'start transmission' )
+
+						else:
+							with self.lock:
+								self.messages.append( ('unknown', line) )
+
+					except (ValueError, KeyError, IndexError) as e:
+						stats.errors += 1
+						self.log( stats, 'exception', '{}: {}'.format(line, e) )
+
+				self.sendReaderEvent( tagTimes )
+				await writer.drain()
+		except (ConnectionError, OSError) as e:
+			self.log( stats, 'connection', 'error: {}'.format(e) )
+		finally:
+			stats.connected -= 1
+			self.writers.discard( writer )
+			if name and nameWriter.get(name) is writer:
+				del nameWriter[name]
+			self.log( stats, 'connection', 'disconnected: {}'.format(name or '<unknown>') )
+			writer.close()
+
+	async def startJChip( self, host, port ):
+		stats = self.getStats( 'JChip:{}'.format(port) )
+		nameWriter = {}
+		server = await asyncio.start_server(
+			lambda reader, writer: self.handleJChip(reader, writer, stats, nameWriter),
+			host, port, reuse_address=True,
+		)
+		self.servers.append( server )
+		self.log( stats, 'listening', '{}:{}'.format(host, port) )
+
+	#-----------------------------------------------------------------------
+	# Readers with their own listener threads.
+	#
+	async def pollModule( self, kind, module ):
+		stats = self.getStats( kind )
+		stats.connected += 1
+		try:
+			while True:
+				tagTimes = []
+				for m in module.GetData():
+					if m[0] == 'data':
+						tagTime = self.addRead( stats, m[1], m[2] )
+						if tagTime:
+							tagTimes.append( tagTime )
+					else:
+						with self.lock:
+							self.messages.append( (m[0], '{}: {}'.format(kind, ', '.join('{}'.format(v) for v in m[1:]))) )
+				self.sendReaderEvent( tagTimes )
+				await asyncio.sleep( self.pollInterval )
+		finally:
+			stats.connected -= 1
+
+	#-----------------------------------------------------------------------
+	# Event loop management.
+	#
+	def start( self, readers, startTime=None ):
+		''' Start the readers from a list of (kind, host, port). '''
+		self.stop()
+		self.reset()
+		self.readerEventWindow = self.readerEventWindow or Utils.mainWin
+
+		self.loop = asyncio.new_event_loop()
+		started = threading.Event()
+		def run():
+			asyncio.set_event_loop( self.loop )
+			self.loop.call_soon( started.set )
+			self.loop.run_forever()
+			self.loop.close()
+		self.thread = threading.Thread( target=run, name='MultiReader Listener', daemon=True )
+		self.thread.start()
+		started.wait()
+
+		for kind, host, port in readers:
+			if kind == 'JChip':
+				future = asyncio.run_coroutine_threadsafe( self.startJChip(host, port), self.loop )
+				try:
+					future.result()
+				except OSError as e:
+					self.log( self.getStats('JChip:{}'.format(port)), 'error', e )
+			else:
+				module = ModuleReaders[kind]
+				module.StartListener( startTime or datetime.datetime.now(), HOST=host, PORT=port )
+				self.modules.append( module )
+				self.tasks.append( asyncio.run_coroutine_threadsafe(self.pollModule(kind, module), self.loop) )
+
+	def stop( self ):
+		for module in self.modules:
+			module.StopListener()
+		self.modules = []
+
+		if self.loop:
+			async def shutdown():
+				# Closing the connections lets the handlers finish normally.
+				for server in self.servers:
+					server.close()
+				for writer in list(self.writers):
+					writer.close()
+				for server in self.servers:
+					await server.wait_closed()
+			for task in self.tasks:
+				task.cancel()
+			try:
+				asyncio.run_coroutine_threadsafe( shutdown(), self.loop ).result( 5.0 )
+			except Exception:
+				pass
+			self.loop.call_soon_threadsafe( self.loop.stop )
+			self.thread.join( 5.0 )
+		self.loop = self.thread = None
+		self.servers = []
+		self.writers = set()
+		self.tasks = []
+
+	def isListening( self ):
+		return self.thread is not None
+
+multiReader = MultiReader()
+
+def GetData():
+	return multiReader.getData()
+
+def GetStats():
+	return multiReader.getSummary()
+
+def StopListener():
+	multiReader.stop()
+
+def StartListener( startTime=datetime.datetime.now(), HOST=None, PORT=None, test=False ):
+	# The reader spec is kept in the race's reader address.
+	spec = HOST or (Model.race.chipReaderIpAddr if Model.race else None)
+	try:
+		readers = parseReaderSpec( spec )
+	except ValueError as e:
+		Utils.writeLog( 'MultiReader: reader spec "{}": {}.  Using "{}"'.format(spec, e, DEFAULT_SPEC) )
+		readers = parseReaderSpec( DEFAULT_SPEC )
+	multiReader.start( readers, startTime )
+
+def IsListening():
+	return multiReader.isListening()
+
+@atexit.register
+def CleanupListener():
+	multiReader.stop()
+
+if __name__ == '__main__':
+	# Two mats, each with a fake JChip reader.  Every rider is read by both mats.
+	import random
+	from queue import Queue
+	from JChipFake import JChipFake
+
+	ports = (JChip.DEFAULT_PORT + 10, JChip.DEFAULT_PORT + 11)
+	multiReader.readerEventWindow = None
+	StartListener( HOST=', '.join('JChip:127.0.0.1:{}'.format(p) for p in ports) )
+
+	queues = [Queue() for p in ports]
+	for i, (q, port) in enumerate(zip(queues, ports)):
+		JChipFake( q, port=port, connectionName='Mat{}'.format(i+1) ).start()
+
+	rng = random.Random( 1 )
+	riders = 200
+	for tag in range(100, 100 + riders):
+		t = datetime.datetime.now()
+		for q in queues:
+			q.put( (tag, t - datetime.timedelta(seconds=rng.uniform(0.0, 0.3))) )
+
+	reads = []
+	tEnd = time.monotonic() + 10.0
+	while len(reads) < riders and time.monotonic() < tEnd:
+		time.sleep( 0.5 )
+		reads.extend( d for d in GetData() if d[0] == 'data' )
+	StopListener()
+
+	print()
+	print( 'reads: {}  in order: {}  unique: {}'.format(
+		len(reads), all(reads[i][2] <= reads[i+1][2] for i in range(len(reads)-1)), len(set(d[1] for d in reads)) == len(reads) ) )
+	for name, summary in GetStats().items():
+		print( name, summary )
@@ -271,6 +271,7 @@ def Server( q, shutdownQ, HOST, PORT, startTime, test ):
 								race = Model.race
 								if not test and race and not race.isFinished():
 									race.startTime = startTimeNew
+									race.journalStartTime()
 									race.setChanged()
 									wx.CallLater( 1, Utils.refresh )
 						
@@ -4,7 +4,7 @@ import Utils
 
 class PageDialog( wx.Dialog ):
 	def __init__(
-			self, parent, pageClass, closeCallback=None, title=_("Change Properties"),
+			self, parent, pageClass, closeCallback=None, createCallback=None, title=_("Change Properties"),
 			ID = wx.ID_ANY, size=wx.DefaultSize, pos=wx.DefaultPosition, 
 			style = wx.DEFAULT_DIALOG_STYLE|wx.RESIZE_BORDER|wx.MINIMIZE_BOX|wx.MAXIMIZE_BOX,
 		):
@@ -20,22 +20,33 @@ class PageDialog( wx.Dialog ):
 		sizer = wx.BoxSizer( wx.VERTICAL )
 		self.SetSizer(sizer)
 
-		self.page = pageClass( self )
-		sizer.Add(self.page, 1, flag=wx.ALL|wx.EXPAND, border=5)
+		# The page is built the first time the dialog is shown.
+		self.page = None
+		self.pageClass = pageClass
 		self.closeCallback = closeCallback
+		self.createCallback = createCallback
 				
 		self.Bind( wx.EVT_CLOSE, self.onCloseWindow )
 		self.Bind( wx.EVT_LEAVE_WINDOW, self.onLeaveWindow )
 	
+	def Show( self, show=True ):
+		if show and self.page is None:
+			self.page = self.pageClass( self )
+			self.GetSizer().Add(self.page, 1, flag=wx.ALL|wx.EXPAND, border=5)
+			self.Layout()
+			if self.createCallback:
+				self.createCallback( self.page )
+		return super().Show( show )
+	
 	def refresh( self ):
-		if self.page.IsShown():
+		if self.page is not None and self.page.IsShown():
 			try:
 				self.page.refresh()
 			except AttributeError:
 				pass
 
 	def commit( self ):
-		if self.page.IsShown():
+		if self.page is not None and self.page.IsShown():
 			try:
 				self.page.commit()
 			except AttributeError:
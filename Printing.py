@@ -9,7 +9,6 @@ import Primes
 from DNSManager import AutoWidthListCtrl
 from GetResults import GetResults, UnstartedRaceWrapper
 import Model
-from pdf import PDF
 from ReadSignOnSheet import SyncExcelLink
 import Version
 
@@ -223,16 +222,6 @@ class ChoosePrintCategoriesPodiumDialog( wx.Dialog ):
 
 #---------------------------------------------------------------------------------------------------------------------
 
-def getRaceCategories():
-	# Get all the categories available to print.
-	with UnstartedRaceWrapper():
-		with Model.LockRace() as race:
-			if race is None:
-				return []
-			categories = [ (c.fullname, c) for c in race.getCategories(startWaveOnly=False, publishOnly=True) if race.hasCategory(c) ]
-		categories.append( ('All', None) )
-	return categories
-
 #---------------------------------------------------------------------------------------------------------------------
 
 class CrossMgrPrintout( wx.Printout ):
@@ -433,6 +422,7 @@ class CrossMgrPrintoutPDF( CrossMgrPrintout ):
 		fname = Utils.RemoveDisallowedFilenameChars( fname ).replace( ' ', '-' )
 		
 		if not self.pdf:
+			from pdf import PDF	# fpdf is slow to import.
 			self.pdf = PDF( orientation = 'L' if self.orientation == wx.LANDSCAPE else 'P' )
 			self.pdf.set_font( 'Helvetica', '', 12 )	# Pick a font that is always available.
 			self.pdf.set_author( getpass.getuser() )
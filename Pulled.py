@@ -350,6 +350,7 @@ class Pulled( wx.Panel ):
 				continue
 			if rider.status == Pulled:
 				rider.status = Finisher
+				Model.journalRiderState( rider )
 				changed = True
 		
 		lapsToGoPulled = defaultdict( list )
@@ -368,6 +369,7 @@ class Pulled( wx.Panel ):
 				rider.status = Pulled
 				rider.pulledLapsToGo = lapsToGo
 				rider.pulledSequence = seq
+				Model.journalRiderState( rider )
 				changed = True
 
 		if changed:
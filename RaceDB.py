@@ -2,7 +2,6 @@ import re
 import os
 import wx
 import wx.dataview as dataview
-import requests
 import datetime
 import platform
 import configparser
@@ -169,6 +168,7 @@ def GetRaceDBEvents( url = None, date=None ):
 	if date:
 		url += date.strftime('/%Y-%m-%d')
 	url = AddUserPassword( url + '/' )
+	import requests
 	req = requests.get( url )
 	events = req.json()
 	return events
@@ -178,6 +178,7 @@ def GetEventCrossMgr( url, eventId, eventType ):
 	url = url.rstrip( '/' )
 	url += ('/EventMassStartCrossMgr','/EventTTCrossMgr')[eventType] + '/{}'.format(eventId)
 	url = AddUserPassword( url + '/' )
+	import requests
 	req = requests.get( url )
 	content_disposition = req.headers['content-disposition'].encode('latin-1').decode()
 	filename = content_disposition.split('=')[1].replace("'",'').replace('"','')
@@ -491,6 +492,7 @@ def getVerifyCrossMgrUrl( url=None ):
 
 def VerifyCrossMgr( url=None ):
 	url = getVerifyCrossMgrUrl( url )
+	import requests
 	response = requests.get( url )
 	return response.json()
 
@@ -504,6 +506,7 @@ def PostEventCrossMgr( url=None ):
 	credentials['user'], credentials['password'] = RaceDBUserPassword()
 	payload['credentials'] = credentials
 	
+	import requests
 	response = requests.post( url, json=payload )
 	# print( response.status_code, response.text )
 	return response.json()
@@ -0,0 +1,382 @@
+import wx
+import os
+import re
+import sys
+import pickle
+import datetime
+import threading
+from html import escape
+import Utils
+import Model
+import Flags
+import Version
+from GetResults import GetCategoryDetails, GetLapDetails, GetAnimationData
+from ReadSignOnSheet import ReportFields
+from TemplateSubstitute import TemplateSubstitute
+from Synchronizer import syncfunc
+from ResultsWorker import resultsWorker
+
+import locale
+try:
+	localDateFormat = locale.nl_langinfo( locale.D_FMT )
+	localTimeFormat = locale.nl_langinfo( locale.T_FMT )
+except Exception:
+	localDateFormat = '%b %d, %Y'
+	localTimeFormat = '%I:%M%p'
+
+now = datetime.datetime.now
+
+'''
+	Render the race results html at most once per race version.
+
+	The web server, ftp publish and html publish all read the rendered html from here.
+	The static inputs (html templates, course geometry and flags) are cached across race versions.
+	Requests from background threads are rendered in the results worker process from a snapshot
+	of the race, so the UI thread is not blocked (see ResultsWorker).
+'''
+
+lock = threading.RLock()
+
+templateCache = {}
+def getTemplate( fname, transform=None ):
+	# Return the contents of a template in the html folder, optionally transformed.  Only re-read if the file changes.
+	path = os.path.join( Utils.getHtmlFolder(), fname )
+	mtime = os.path.getmtime( path )
+	key = (path, transform)
+	with lock:
+		try:
+			mtimeCache, content = templateCache[key]
+			if mtimeCache == mtime:
+				return content
+		except KeyError:
+			pass
+
+	with open(path, encoding='utf8') as fp:
+		content = fp.read()
+	if transform:
+		content = transform( content )
+	with lock:
+		templateCache[key] = (mtime, content)
+	return content
+
+geoTrackCache = {}
+def getGeoTrackData( geoTrack ):
+	# Return the course coordinates, export points and altigraph.  Only recomputed if the track points change.
+	if geoTrack is None:
+		return None, None, None
+	with lock:
+		if geoTrackCache.get('geoTrack', None) is geoTrack and geoTrackCache.get('gpsPoints', None) is geoTrack.gpsPoints:
+			return geoTrackCache['data']
+
+	data = (geoTrack.asCoordinates(), geoTrack.asExportJson(), geoTrack.getAltigraph())
+	with lock:
+		geoTrackCache.update( geoTrack=geoTrack, gpsPoints=geoTrack.gpsPoints, data=data )
+	return data
+
+flagsCache = {}
+def getFlags( codes ):
+	iocs = frozenset( c[:3].upper() for c in codes )
+	with lock:
+		try:
+			return flagsCache[iocs]
+		except KeyError:
+			pass
+	flags = Flags.GetFlagBase64ForUCI( iocs )
+	with lock:
+		flagsCache[iocs] = flags
+	return flags
+
+#----------------------------------------------------------------------------------
+def replaceJsonVar( s, varName, value ):
+	return s.replace( '{} = null'.format(varName), '{} = {}'.format(varName, Utils.ToJson(value, separators=(',',':'))), 1 )
+
+# Code on web page required by Google Analytics.
+gaSnippet = '''
+<script>
+var gaNow = 1*new Date();
+setTimeout( function() {
+		(function(i,s,o,g,r,a,m){i['GoogleAnalyticsObject']=r;i[r]=i[r]||function(){
+		(i[r].q=i[r].q||[]).push(arguments)},i[r].l=gaNow;a=s.createElement(o),
+		m=s.getElementsByTagName(o)[0];a.async=1;a.src=g;m.parentNode.insertBefore(a,m)
+		})(window,document,'script','//www.google-analytics.com/analytics.js','ga');
+		ga('create', 'UA-XXXX-Y', 'auto'); ga('send', 'pageview');
+		console.log( 'Google Analytics: initialized' );
+	}, 3000 );
+</script>
+'''
+
+class HtmlRender:
+	'''
+		Renders the race html from the current Model.race.
+		MainWin derives from this.  The results worker process uses it without a MainWin.
+		Requires self.fileName, self.getEmail() and self.getGraphicBase64().
+	'''
+	reLeadingWhitespace = re.compile( '^[ \t]+', re.MULTILINE )
+	reComments = re.compile( '// .*$', re.MULTILINE )
+	reBlankLines = re.compile( '\n+' )
+	reTestCode = re.compile( r'/\*\(-\*/.*?/\*-\)\*/', re.MULTILINE )	# Use non-greedy match.
+	reRemoveTags = re.compile( r'\<html\>|\</html\>|\<body\>|\</body\>|\<head\>|\</head\>', re.I )
+	reFloatList = re.compile( r'([+-]?[0-9]+\.[0-9]+,\s*)+([+-]?[0-9]+\.[0-9]+)', re.MULTILINE )
+	reBoolList = re.compile( r'((true|false),\s*)+(true|false)', re.MULTILINE )
+	reTagTrailingWhitespace = re.compile( r'>\s+', re.MULTILINE|re.UNICODE )
+	
+	def cleanHtml( self, html ):
+		# Remove leading whitespace, comments, consecutive blank lines and test code to save space.
+		html = self.reLeadingWhitespace.sub( '', html )
+		html = self.reComments.sub( '', html )
+		html = self.reBlankLines.sub( '\n', html )
+		html = self.reTestCode.sub( '', html )
+		return html
+	
+	def sanitizeTemplate( self, template ):
+		# Sanitize the template into a safe json string.
+		template = self.reLeadingWhitespace.sub( '', template )
+		template = self.reComments.sub( '', template )
+		template = self.reBlankLines.sub( '\n', template )
+		template = template.replace( '<', '{-{' ).replace( '>', '}-}' )
+		return template
+	
+	def getBasePayload( self, publishOnly=True ):
+		race = Model.race
+		
+		payload = {}
+		payload['raceName'] = os.path.basename(self.fileName or '')[:-4]
+		iTeam = ReportFields.index('Team')
+		payload['infoFields'] = ReportFields[:iTeam] + ['Name'] + ReportFields[iTeam:]
+		
+		payload['organizer']		= getattr(race, 'organizer', '')
+		payload['reverseDirection']	= getattr(race, 'reverseDirection', False)
+		payload['finishTop']		= getattr(race, 'finishTop', False)
+		payload['isTimeTrial']		= race.isTimeTrial
+		payload['winAndOut']		= race.winAndOut
+		payload['rfid']				= race.enableJChipIntegration
+		payload['primes']			= getattr(race, 'primes', [])
+		payload['raceNameText']		= race.name
+		payload['raceDate']			= race.date
+		payload['raceScheduledStart']= race.date + ' ' + race.scheduledStart
+		payload['raceTimeZone']		= race.timezone
+		payload['raceAddress']      = ', '.join( n for n in [race.city, race.stateProv, race.country] if n )
+		payload['raceIsRunning']	= race.isRunning()
+		payload['raceIsUnstarted']	= race.isUnstarted()
+		payload['raceIsFinished']	= race.isFinished()
+		payload['lapDetails']		= GetLapDetails() if not race.hideDetails else {}
+		payload['hideDetails']		= race.hideDetails
+		payload['showCourseAnimation'] = race.showCourseAnimationInHtml
+		payload['licenseLinkTemplate'] = race.licenseLinkTemplate
+		payload['roadRaceFinishTimes'] = race.roadRaceFinishTimes
+		payload['estimateLapsDownFinishTime'] = race.estimateLapsDownFinishTime
+		payload['email']				= self.getEmail()
+		payload['version']				= Version.AppVerName
+		
+		notes = race.notes
+		if notes.lstrip()[:6].lower().startswith( '<html>' ):
+			notes = TemplateSubstitute( notes, race.getTemplateValues() )
+			notes = self.reRemoveTags.sub( '', notes )
+			notes = notes.replace('<', '{-{').replace( '>', '}-}' )
+			payload['raceNotes']	= notes
+		else:
+			notes = TemplateSubstitute( escape(notes), race.getTemplateValues() )
+			notes = self.reTagTrailingWhitespace.sub( '>', notes ).replace( '</table>', '</table><br/>' )
+			notes = notes.replace('<', '{-{').replace( '>', '}-}' ).replace('\n','{-{br/}-}')	# Replace angle brackets so they don't interfere with the regular html.
+			payload['raceNotes']	= notes
+		if race.startTime:
+			raceStartTime = (race.startTime - race.startTime.replace( hour=0, minute=0, second=0 )).total_seconds()
+			payload['raceStartTime']= raceStartTime
+		
+		tLastRaceTime = race.lastRaceTime()
+		tNow = now()
+		payload['timestamp']			= [tNow.ctime(), tLastRaceTime]
+		
+		payload['data']					= GetAnimationData( None, True )
+		payload['catDetails']			= GetCategoryDetails( True, publishOnly )
+		
+		return payload
+	
+	def addResultsToHtmlStr( self, html, isClean=False ):
+		if not isClean:
+			html = self.cleanHtml( html )
+		
+		payload = self.getBasePayload()		
+		race = Model.race
+		
+		year, month, day = [int(v) for v in race.date.split('-')]
+		timeComponents = [int(v) for v in race.scheduledStart.split(':')]
+		if len(timeComponents) < 3:
+			timeComponents.append( 0 )
+		hour, minute, second = timeComponents
+		raceTime = datetime.datetime( year, month, day, hour, minute, second )
+		
+		#------------------------------------------------------------------------
+		title = '{} - {} {} {}'.format( race.title, _('Starting'), raceTime.strftime(localTimeFormat), raceTime.strftime(localDateFormat) )
+		html = html.replace( 'CrossMgr Competition Results by Edward Sitarski', escape(title) )
+		if getattr(race, 'gaTrackingID', None):
+			html = html.replace( '<!-- Google Analytics -->', gaSnippet.replace('UA-XXXX-Y', race.gaTrackingID) )
+		if race.isRunning():
+			html = html.replace( '<!-- Meta -->', '''
+<meta http-equiv="Cache-Control" content="no-cache, no-store, must-revalidate"/>
+<meta http-equiv="Pragma" content="no-cache"/>
+<meta http-equiv="Expires" content="0"/>''' )
+		
+		#------------------------------------------------------------------------
+		courseCoordinates, gpsPoints, gpsAltigraph, totalElevationGain, isPointToPoint, lengthKm = None, None, None, None, None, None
+		geoTrack = getattr(race, 'geoTrack', None)
+		if geoTrack is not None:
+			courseCoordinates, gpsPoints, gpsAltigraph = getGeoTrackData( geoTrack )
+			totalElevationGain = geoTrack.totalElevationGainM
+			isPointToPoint = getattr( geoTrack, 'isPointToPoint', False )
+			lengthKm = geoTrack.lengthKm
+		
+		#------------------------------------------------------------------------
+		codes = []
+		if 'UCICode' in payload['infoFields']:
+			codes.extend( r['UCICode'] for r in payload['data'].values() if r.get('UCICode',None) )
+		if 'NatCode' in payload['infoFields']:
+			codes.extend( r['NatCode'] for r in payload['data'].values() if r.get('NatCode',None) )
+		payload['flags']				= getFlags( codes )
+		if gpsPoints:
+			payload['gpsPoints']		= gpsPoints
+		
+		def getSanitizedTemplate( fname ):
+			# The sanitized templates are cached.  Only the api key changes.
+			return getTemplate( fname, self.sanitizeTemplate ).replace( '{{api_key}}', race.googleMapsApiKey )
+		
+		# If a map is defined, add the course viewers.
+		if courseCoordinates:
+			payload['courseCoordinates'] = courseCoordinates
+			
+			if race.googleMapsApiKey:
+				# Add the course viewer template.
+				try:
+					payload['courseViewerTemplate'] = getSanitizedTemplate( 'CourseViewerTemplate.html' )
+				except Exception:
+					pass
+	
+		# Add the rider dashboard.
+		try:
+			payload['riderDashboard'] = getSanitizedTemplate( 'RiderDashboard.html' )
+		except Exception:
+			pass
+	
+		# Add the travel map if the riders have locations.
+		if race.googleMapsApiKey:
+			try:
+				excelLink = race.excelLink
+				if excelLink.hasField('City') and any(excelLink.hasField(f) for f in ('Prov','State','StateProv')):
+					try:
+						payload['travelMap'] = getSanitizedTemplate( 'TravelMap.html' )
+					except Exception:
+						pass
+			except Exception as e:
+				pass
+		
+		if totalElevationGain:
+			payload['gpsTotalElevationGain'] = totalElevationGain
+		if gpsAltigraph:
+			payload['gpsAltigraph'] = gpsAltigraph
+		if isPointToPoint:
+			payload['gpsIsPointToPoint'] = isPointToPoint
+		if lengthKm:
+			payload['lengthKm'] = lengthKm
+
+		html = replaceJsonVar( html, 'payload', payload )
+		graphicBase64 = self.getGraphicBase64()
+		if graphicBase64:
+			try:
+				iStart = html.index( 'src="data:image/png' )
+				iEnd = html.index( '"/>', iStart )
+				html = ''.join( [html[:iStart], 'src="{}"'.format(graphicBase64), html[iEnd+1:]] )
+			except ValueError:
+				pass
+				
+		# Clean up spurious decimal points.
+		def fixBigFloat( f ):
+			if len(f) > 6:
+				try:
+					d = f.split('.')[1]					# Get decimal part of the number.
+					max_precision = 5
+					if len(d) > max_precision:
+						f = '{val:.{pr}f}'.format(pr=max_precision, val=float(f)).rstrip('0')	# Reformat with a shorter decimal and remove trailing zeros.
+						if f.endswith('.'):
+							f += '0'		# Ensure a zero follows the decimal point (json format spec).
+				except IndexError:
+					# Number does not have a decimal point.
+					pass
+			return f
+			
+		def floatListRepl( m ):
+			return ','.join([fixBigFloat(f) for f in m.group().replace(',',' ').split()])
+			
+		html = self.reFloatList.sub( floatListRepl, html )
+		
+		# Convert true/false lists to 0/1.
+		def boolListRepl( m ):
+			return ','.join(['0' if f[:1] == 'f' else '1' for f in m.group().replace(',',' ').split() ])
+			
+		html = self.reBoolList.sub( boolListRepl, html )
+		
+		return html
+
+def getRaceVersion( race ):
+	return (id(race), race.lastChangedTime, getattr(Utils.mainWin, 'fileName', None))
+
+def renderHtml( render ):
+	# Render the race html for Model.race with the given HtmlRender.
+	return render.addResultsToHtmlStr( getTemplate('RaceAnimation.html', render.cleanHtml), isClean=True )
+
+@syncfunc
+def renderHtmlInProcess():
+	# Fallback if the results worker is not available.  Runs on the UI thread.
+	race = Model.race
+	if not race:
+		return None, None
+	return getRaceVersion( race ), renderHtml( Utils.mainWin )
+
+@syncfunc
+def getSnapshot( workerVersion ):
+	# Runs on the UI thread.  Return the race version, pickled race and render context for the results worker.
+	with Model.LockRace() as race:
+		if not race:
+			return None
+		version = getRaceVersion( race )
+		raceBytes = pickle.dumps( race, protocol=4 ) if version != workerVersion else None
+	mainWin = Utils.mainWin
+	context = {
+		'fileName':			mainWin.fileName,
+		'email':			mainWin.getEmail(),
+		'graphicBase64':	mainWin.getGraphicBase64(),
+	}
+	return version, raceBytes, context
+
+useResultsWorker = True		# Render in the results worker process when called from a background thread.
+
+htmlCache = {}
+def getCurrentHtml():
+	race = Model.race
+	if not race:
+		return None
+
+	with lock:
+		if htmlCache.get('version', None) == getRaceVersion( race ):
+			return htmlCache['html']
+
+	try:
+		html = None
+		if useResultsWorker and not wx.IsMainThread():
+			version, html = resultsWorker.renderHtml( getSnapshot )
+		if html is None:
+			version, html = renderHtmlInProcess()
+	except Exception as e:
+		Utils.logException( e, sys.exc_info() )
+		return None
+
+	if html is not None:
+		with lock:
+			htmlCache.update( version=version, html=html )
+	return html
+
+def reset():
+	with lock:
+		templateCache.clear()
+		geoTrackCache.clear()
+		flagsCache.clear()
+		htmlCache.clear()
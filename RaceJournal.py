@@ -0,0 +1,256 @@
+import os
+import json
+import pickle
+import datetime
+import threading
+
+import Utils
+
+#------------------------------------------------------------------------------------------------
+# Append-only journal of race edits.
+#
+# Each time add/delete and rider status change is appended to the journal as it happens.
+# The journal is compacted into the race file (.cmn) periodically in the background.
+#
+# Journal files are numbered by serial.  A race file with journalSerial=n contains all edits in journals before n.
+# To recover, load the race file, then replay all the journals with serial >= race.journalSerial.
+#
+# Records only describe the effect of an edit on a rider (or race start time).
+# Replaying them is idempotent, so edits made while a snapshot is being written can safely be replayed again.
+#
+
+lock = threading.RLock()
+fp = None
+fpKey = None				# (journal base name, serial) of the open journal.
+suspended = False			# Don't journal edits made by replay.
+batchDepth = 0				# While > 0, records are written but not flushed.
+compactThread = None
+
+def getJournalBase( fname ):
+	if fname.endswith('.cmn'):
+		fname = fname[:-4]
+	return fname + 'Journal'
+
+def getJournalFileName( fname, serial ):
+	return '{}{:06d}.txt'.format( getJournalBase(fname), serial )
+
+def getJournalFileNames( fname ):
+	# Return (serial, fileName) of all journals of this race file.
+	base = getJournalBase( fname )
+	dirName, prefix = os.path.split( base )
+	journals = []
+	try:
+		for f in os.listdir( dirName or '.' ):
+			if f.startswith(prefix) and f.endswith('.txt'):
+				try:
+					journals.append( (int(f[len(prefix):-4], 10), os.path.join(dirName, f)) )
+				except ValueError:
+					pass
+	except OSError:
+		pass
+	journals.sort()
+	return journals
+
+def close():
+	global fp, fpKey
+	with lock:
+		if fp:
+			try:
+				fp.close()
+			except Exception:
+				pass
+		fp = fpKey = None
+
+def write( race, *record ):
+	global fp, fpKey
+	if suspended or race is None:
+		return
+	fname = Utils.getFileName()
+	if not fname:
+		return
+
+	with lock:
+		key = (fname, race.journalSerial)
+		try:
+			if key != fpKey:
+				close()
+				fp = open( getJournalFileName(*key), 'a', encoding='utf8' )
+				fpKey = key
+			fp.write( json.dumps(record) + '\n' )
+			if not batchDepth:
+				fp.flush()		# Survives a program crash.  The journal is synced to disk when compacted.
+		except Exception as e:
+			Utils.writeLog( 'RaceJournal.write: "{}"'.format(e) )
+			close()
+
+class batch:
+	''' Flush the journal once at the end of a batch of edits instead of after every record. '''
+	def __enter__( self ):
+		global batchDepth
+		with lock:
+			batchDepth += 1
+		return self
+
+	def __exit__( self, type, value, traceback ):
+		global batchDepth
+		with lock:
+			batchDepth -= 1
+			if not batchDepth and fp:
+				try:
+					fp.flush()
+				except Exception as e:
+					Utils.writeLog( 'RaceJournal.batch: "{}"'.format(e) )
+					close()
+		return False
+
+def dtToStr( dt ):
+	return dt.isoformat() if dt else None
+
+def strToDt( s ):
+	return datetime.datetime.fromisoformat( s ) if s else None
+
+def applyRecord( race, record ):
+	op = record[0]
+	if op == 'add':
+		race.getRider( record[1] ).addTime( record[2] )
+	elif op == 'del':
+		if record[1] in race.riders:
+			race.riders[record[1]].deleteTime( record[2] )
+	elif op == 'first':
+		race.getRider( record[1] ).firstTime = record[2]
+	elif op == 'status':
+		rider = race.getRider( record[1] )
+		rider.status, rider.tStatus = record[2], record[3]
+	elif op == 'rider':
+		rider = race.getRider( record[1] )
+		rider.__dict__.clear()
+		rider.__setstate__( record[2] )
+	elif op == 'norider':
+		race.riders.pop( record[1], None )
+	elif op == 'start':
+		race.startTime, race.firstRecordedTime = strToDt(record[1]), strToDt(record[2])
+	else:
+		raise ValueError( 'unknown op: "{}"'.format(op) )
+
+def replay( race, fname ):
+	# Apply the journals newer than the race file.  Returns the number of records applied.
+	global suspended
+	count = 0
+	with lock:
+		suspended = True
+		try:
+			for serial, journalFileName in getJournalFileNames( fname ):
+				if serial < race.journalSerial:
+					continue
+				with open( journalFileName, 'r', encoding='utf8' ) as f:
+					for line in f:
+						try:
+							applyRecord( race, json.loads(line) )
+							count += 1
+						except Exception as e:
+							# Skip a partially written last line.
+							Utils.writeLog( 'RaceJournal.replay: "{}": {}'.format(journalFileName, e) )
+		finally:
+			suspended = False
+	if count:
+		race.resetAllCaches()
+		race.setChanged()
+	return count
+
+def removeJournals( fname, serialKeep ):
+	# Journals before serialKeep are in the race file.  Journals after serialKeep are left over from an older race with the same file name.
+	for serial, journalFileName in getJournalFileNames( fname ):
+		if serial != serialKeep:
+			try:
+				os.remove( journalFileName )
+			except OSError:
+				pass
+
+def rotate( race, fname ):
+	# Start a new journal.  All edits after this go into the new journal.
+	# A journal with the new serial may be left over from an older race with the same file name.
+	# Remove it so its records are not appended to and replayed with this race.
+	with lock:
+		close()
+		race.journalSerial += 1
+		try:
+			os.remove( getJournalFileName(fname, race.journalSerial) )
+		except OSError:
+			pass
+		return race.journalSerial
+
+def writeRaceFile( fname, serial, data ):
+	# Write the race file atomically, then remove the journals it includes.
+	fnameTmp = fname + '.tmp'
+	with open( fnameTmp, 'wb' ) as f:
+		f.write( data )
+		f.flush()
+		os.fsync( f.fileno() )
+	os.replace( fnameTmp, fname )
+	removeJournals( fname, serial )
+
+def snapshot( race, fname ):
+	# Write the full race file on the calling thread.
+	waitForCompaction()
+	serial = rotate( race, fname )
+	writeRaceFile( fname, serial, pickle.dumps(race, 4) )
+
+def isCompacting():
+	return compactThread is not None and compactThread.is_alive()
+
+def compactInBackground( race, fname ):
+	# Write the full race file in a background thread.
+	# The race is pickled in memory on the calling thread (fast), the slow file write and sync are done in the background.
+	# Edits made while writing go into the new journal.
+	global compactThread
+	if isCompacting():
+		return False
+
+	serial = rotate( race, fname )
+	lastChangedTime = race.lastChangedTime
+	data = pickle.dumps( race, 4 )
+
+	def compact():
+		try:
+			writeRaceFile( fname, serial, data )
+			if race.lastChangedTime == lastChangedTime:
+				race.isChangedFlag = False
+		except Exception as e:
+			# The journal is kept until the next successful snapshot, so no edits are lost.
+			Utils.writeLog( 'RaceJournal.compact: "{}": {}'.format(fname, e) )
+
+	compactThread = threading.Thread( target=compact, name='RaceJournalCompact' )
+	compactThread.daemon = True
+	compactThread.start()
+	return True
+
+def waitForCompaction():
+	if compactThread is not None:
+		compactThread.join()
+
+if __name__ == '__main__':
+	import tempfile
+	import Model
+	import RaceJournal		# Use the same module instance as Model.
+
+	fname = os.path.join( tempfile.mkdtemp(), 'JournalTest.cmn' )
+	Utils.getFileName = lambda: fname
+
+	race = Model.newRace()
+	race.startTime = datetime.datetime.now()
+	RaceJournal.snapshot( race, fname )
+	for i in range(10):
+		race.addTime( 100 + i % 3, 60.0 * (i+1) )
+	RaceJournal.compactInBackground( race, fname )
+	race.getRider( 101 ).setStatus( Model.Rider.DNF, 300.0 )
+	race.deleteTime( 100, 60.0 )
+	RaceJournal.waitForCompaction()
+	RaceJournal.close()
+
+	with open( fname, 'rb' ) as f:
+		raceRecovered = pickle.load( f )
+	print( 'replayed:', RaceJournal.replay(raceRecovered, fname) )
+	for num, rider in sorted( race.riders.items() ):
+		riderRecovered = raceRecovered.riders[num]
+		assert (rider.times, rider.status, rider.tStatus) == (riderRecovered.times, riderRecovered.status, riderRecovered.tStatus)
+	print( 'recovered:', sorted(raceRecovered.riders.values(), key=lambda r: r.num) )
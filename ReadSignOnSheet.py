@@ -4,8 +4,11 @@ import wx.lib.filebrowsebutton as filebrowse
 import wx.lib.scrolledpanel as scrolled
 import os
 import re
+import time
+import threading
 from html import escape
 import copy
+import itertools
 from io import StringIO
 import Utils
 import Model
@@ -571,8 +574,29 @@ def FixTagFormat( externalInfo ):
 				continue
 			edata[tagName] = fixTagFunc( tag )
 
+def NormalizeTag( tag ):
+	if isinstance(tag, float):
+		return f'{int(tag)}'
+	if isinstance(tag, int):
+		return f'{tag}'
+	return Utils.removeDiacritic( f'{tag}' ).strip().lstrip('0').upper()
+
+# Persistent tag index so that the tag->bib map is updated incrementally when the sheet changes.
+# tagRowCache maps bib -> (raw tags, normalized tags) so only changed rows are normalized again.
+tagIndexRace = None
+tagIndexKey = None
+tagIndexVersion = None
+tagRowCache = {}
+
+def ResetTagIndex():
+	global tagIndexRace, tagIndexKey, tagIndexVersion, tagRowCache
+	tagIndexRace = tagIndexKey = tagIndexVersion = None
+	tagRowCache = {}
+
 def GetTagNums( forceUpdate=False ):
 	# Get a dict that links chip tags to bib numbers.
+	global tagIndexRace, tagIndexKey, tagIndexVersion
+	
 	race = Model.race
 	if not race:
 		return {}
@@ -582,6 +606,7 @@ def GetTagNums( forceUpdate=False ):
 		# If no Excel link, tagNums is empty.
 		excelLink = race.excelLink
 	except Exception:
+		ResetTagIndex()
 		race.tagNums = {}
 		return race.tagNums
 		
@@ -590,40 +615,58 @@ def GetTagNums( forceUpdate=False ):
 		externalInfo = excelLink.read()
 	except Exception:
 		# If the external info cannot be retrieved, tagNums is empty.
+		ResetTagIndex()
 		race.tagNums = {}
 		return race.tagNums
 	
-	# If the file did not change and we are not forcing an update,
+	tagNums = getattr(race, 'tagNums', None)
+	
+	# If the sheet did not change and we are not forcing an update,
 	# return the existing tagNums as it hasn't changed.
-	if not (excelLink.readFromFile or forceUpdate):
-		if getattr(race, 'tagNums', None) is None:
-			race.tagNums = {}
-		return race.tagNums
+	if tagNums is not None and tagIndexVersion == infoVersion and not forceUpdate:
+		return tagNums
 		
 	# Get all tagName fields that exist in the spreadsheet.
-	tagNames = {tagName for tagName in TagFields if excelLink.hasField(tagName)}
+	tagNames = tuple( tagName for tagName in TagFields if excelLink.hasField(tagName) )
 	if not tagNames:
+		ResetTagIndex()
 		race.tagNums = {}		# No tag columns in the spreadsheet.
 		return race.tagNums
 	
-	# Create a dict of all tags to bib numbers.
-	tagNums = {}	
+	# Rebuild from scratch if the race was reset or the sheet or tag columns changed.
+	key = (excelLink.fileName, excelLink.sheetName, tagNames)
+	if tagNums is None or race is not tagIndexRace or key != tagIndexKey:
+		ResetTagIndex()
+		tagIndexRace, tagIndexKey = race, key
+		tagNums = {}
+	
+	# Diff the rows against the index.  Only rows whose tags changed are normalized and updated.
+	changed = {}
 	for num, edata in externalInfo.items():
-		for tagName in tagNames:
-			tag = edata.get(tagName, None)
-			if not tag:
+		raw = tuple( edata.get(tagName, None) for tagName in tagNames )
+		try:
+			if tagRowCache[num][0] == raw:
 				continue
-			
-			if isinstance(tag, float):
-				tag = f'{int(tag)}'
-			elif isinstance(tag, int):
-				tag = f'{tag}'
-			else:
-				tag = Utils.removeDiacritic( f'{tag}' ).strip().lstrip('0').upper()
-				
-			if tag:
+		except KeyError:
+			pass
+		changed[num] = (raw, [tag for tag in (NormalizeTag(tag) for tag in raw if tag) if tag])
+	removed = tagRowCache.keys() - externalInfo.keys()
+	
+	if changed or removed:
+		for num in itertools.chain(removed, changed.keys()):
+			try:
+				tagsOld = tagRowCache.pop(num)[1]
+			except KeyError:
+				continue
+			for tag in tagsOld:
+				if tagNums.get(tag, None) == num:
+					del tagNums[tag]
+		for num, (raw, tags) in changed.items():
+			tagRowCache[num] = (raw, tags)
+			for tag in tags:
 				tagNums[tag] = num
 	
+	tagIndexVersion = infoVersion
 	race.tagNums = tagNums
 	UnmatchedTagsUpdate( tagNums )
 	return race.tagNums
@@ -653,19 +696,64 @@ def UnmatchedTagsUpdate( tagNums=None ):
 		if missingTagsLen != len(race.missingTags):
 			race.setChanged()
 
+#-------------------------------------------------------------------------------------------
+# Watch the sign-on sheet in the background so reads don't stat the file on every call.
+class SignOnSheetWatcher:
+	def __init__( self, interval=1.0 ):
+		self.interval = interval
+		self.fileName = None
+		self.mtime = None
+		self.lock = threading.Lock()
+		self.thread = None
+	
+	def watch( self, fileName ):
+		mtime = os.path.getmtime( fileName )
+		with self.lock:
+			self.fileName, self.mtime = fileName, mtime
+			if not self.thread:
+				self.thread = threading.Thread( target=self.run, name='SignOnSheetWatcher', daemon=True )
+				self.thread.start()
+		return mtime
+	
+	def getmtime( self, fileName ):
+		# Return the last modification time seen by the watcher.
+		with self.lock:
+			if fileName == self.fileName and self.mtime is not None:
+				return self.mtime
+		return self.watch( fileName )
+	
+	def run( self ):
+		while True:
+			time.sleep( self.interval )
+			with self.lock:
+				fileName = self.fileName
+			try:
+				mtime = os.path.getmtime( fileName )
+			except Exception:
+				mtime = None
+			with self.lock:
+				if fileName == self.fileName:
+					self.mtime = mtime
+
+signOnSheetWatcher = SignOnSheetWatcher()
+
 #-------------------------------------------------------------------------------------------
 # Cache the Excel sheet so we don't have to re-read if it has not changed.
 stateCache = None
 infoCache = None
 errorCache = None
+infoVersion = 0			# Incremented every time the sheet is re-read.
 
 def ResetExcelLinkCache():
 	global stateCache
 	global infoCache
 	global errorCache
+	global infoVersion
 	stateCache = None
 	infoCache = None
 	errorCache = None
+	infoVersion += 1
+	ResetTagIndex()
 
 class ExcelLink:
 	OpenCode = 0
@@ -745,7 +833,7 @@ class ExcelLink:
 	def isSynced( self ):
 		global stateCache
 		try:
-			state = (os.path.getmtime(self.fileName), self.fileName, self.sheetName, self.fieldCol)
+			state = (signOnSheetWatcher.getmtime(self.fileName), self.fileName, self.sheetName, self.fieldCol)
 			return state == stateCache
 		except Exception:
 			return False
@@ -778,6 +866,7 @@ class ExcelLink:
 		global stateCache
 		global infoCache
 		global errorCache
+		global infoVersion
 		
 		self.readFromFile = False
 		if alwaysReturnCache and infoCache is not None:
@@ -785,7 +874,7 @@ class ExcelLink:
 
 		if stateCache and infoCache:
 			try:
-				state = (os.path.getmtime(self.fileName), self.fileName, self.sheetName, self.fieldCol)
+				state = (signOnSheetWatcher.getmtime(self.fileName), self.fileName, self.sheetName, self.fieldCol)
 				if state == stateCache:
 					return infoCache
 			except Exception:
@@ -945,15 +1034,10 @@ class ExcelLink:
 							)
 						)
 		
-		stateCache = (os.path.getmtime(self.fileName), self.fileName, self.sheetName, self.fieldCol)
+		stateCache = (signOnSheetWatcher.watch(self.fileName), self.fileName, self.sheetName, self.fieldCol)
 		infoCache = info
 		errorCache = errors
-		
-		# Clear the tagNums cache as it will be reset after reading the spreadsheet.
-		try:
-			Model.race.tagNums = None
-		except AttributeError:
-			pass
+		infoVersion += 1		# The tagNums index is updated from the changed rows after reading the spreadsheet.
 		
 		# Do not read certain properties or categories fields after the race has started to avoid overwriting local changes.
 		if Model.race and Model.race.startTime:
@@ -970,9 +1054,9 @@ class ExcelLink:
 				MatchingCategory.AddToMatchingCategory( bib, fields )
 			MatchingCategory.EpilogMatchingCategory()
 		
-		# Process all known tag nums from the new Excel sheet.
+		# Update the tag nums from the changed rows of the new Excel sheet.
 		# This also adds data from previously missing tags.
-		GetTagNums( True )
+		GetTagNums()
 		
 		try:
 			Model.race.resetAllCaches()
@@ -433,6 +433,7 @@ def DoImportTTStartTimes( race, excelLink, startTimesInTimeOfDay=False ):
 			if rider.firstTime != startTime:
 				rider.firstTime = startTime
 				changeCount += 1
+				Model.journalRiderState( rider )
 		
 		race.setChanged()
 		
@@ -108,16 +108,19 @@ def ReissueBibs( bibs, keepCategoryTheSame=True ):
 			# If the new bib exists and has a firstTime, this is actually the first time entered.
 			# Add it as a recorded time.
 			if race.isTimeTrial and riderNew.firstTime and riderNew.firstTime > riderOld.firstTime:
-				riderOld.times.append( riderNew.firstTime )
-				riderOld.times.sort()
+				riderOld.times = sorted( riderOld.times.tolist() + [riderNew.firstTime] )
 			del race.riders[bibOld]
 			race.riders[bibNew] = riderOld
+			Model.journalRace( race, 'norider', bibOld )
+			Model.journalRiderState( riderOld )
 		elif riderNew and not riderOld:
 			pass								# No pre-existing bibOld data.  The rider attributes will be picked up from the Excel sheet.
 		elif not riderNew and riderOld:
 			del race.riders[bibOld]				# No data on bibNew.  Just change the rider's bib number.
 			riderOld.num = bibNew
 			race.riders[bibNew] = riderOld
+			Model.journalRace( race, 'norider', bibOld )
+			Model.journalRiderState( riderOld )
 	
 	# Reset the race category sets.
 	for c, cSet in categorySets:
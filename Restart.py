@@ -29,7 +29,10 @@ def RestartAfterLap( race, lap, rfidDelay ):
 	# Remove any times after the restart time.
 	lastTime = { e.num:e.t for e in history[lap] }
 	for num, rider in race.riders.items():
-		del rider.times[bisect.bisect(rider.times, lastTime.get(num, 0.0)):]
+		iLast = bisect.bisect(rider.times, lastTime.get(num, 0.0))
+		if iLast < len(rider.times):
+			del rider.times[iLast:]
+			Model.journalRiderState( rider )
 		
 	try:
 		tRestart = history[lap][0].t
@@ -44,6 +47,7 @@ def RestartAfterLap( race, lap, rfidDelay ):
 	# Restart the race.  Adjust the race start time to compensate for the restart.
 	restartTime = datetime.datetime.now()
 	race.startTime = restartTime - datetime.timedelta(seconds=tRestart)
+	race.journalStartTime()
 	race.finishTime = None
 	if race.enableJChipIntegration:
 		race.rfidRestartTime = restartTime + datetime.timedelta( seconds=(rfidDelay or 0.0) )
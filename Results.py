@@ -529,10 +529,8 @@ class Results( wx.Panel ):
 					backgroundColourLabel[ (r,c) ] = self.blackColour
 				break
 
-		self.labelGrid.Set( textColour=textColourLabel, backgroundColour=backgroundColourLabel )
-		self.lapGrid.Set( textColour=textColourLap, backgroundColour=backgroundColourLap )
-		self.labelGrid.Reset()
-		self.lapGrid.Reset()
+		self.labelGrid.SetDiff( textColour=textColourLabel, backgroundColour=backgroundColourLabel )
+		self.lapGrid.SetDiff( textColour=textColourLap, backgroundColour=backgroundColourLap )
 			
 	def doNumDrilldown( self, event ):
 		self.doNumSelect( event )
@@ -851,10 +849,9 @@ class Results( wx.Panel ):
 		colnameLaps = colnames[iLabelMax:]
 		dataLaps = data[iLabelMax:]
 		
-		self.labelGrid.Set( data = dataLabels, colnames = colnamesLabels )
+		self.labelGrid.SetDiff( data = dataLabels, colnames = colnamesLabels )
 		self.labelGrid.SetLeftAlignCols( exportGrid.leftJustifyCols )
 		self.labelGrid.AutoSizeColumns( True )
-		self.labelGrid.Reset()
 		try:
 			iUCICodeCol = colnamesLabels.index( _('UCICode') )
 			self.labelGrid.SetColRenderer( iUCICodeCol, IOCCodeRenderer() )
@@ -866,9 +863,8 @@ class Results( wx.Panel ):
 		except ValueError:
 			pass
 		
-		self.lapGrid.Set( data = dataLaps, colnames = colnameLaps )
-		self.lapGrid.Reset()
-		self.lapGrid.AutoSizeColumns( self.lapGrid.GetNumberCols() < 100 )
+		self.lapGrid.SetDiff( data = dataLaps, colnames = colnameLaps )
+		self.lapGrid.AutoSizeColumnsLazy( self.lapGrid.GetNumberCols() < 100 )
 		
 		self.isEmpty = False
 		
@@ -0,0 +1,160 @@
+import sys
+import time
+import pickle
+import traceback
+import threading
+import multiprocessing
+import Utils
+import Model
+
+'''
+	Render the race html and write the Excel results in a separate process against a snapshot of the race.
+
+	The results code works on the global Model.race and the global memoize caches,
+	so it can't run on another thread while the UI thread is changing the race.
+	Instead, the UI thread pickles the race (the same as writing the race file) and the
+	worker process works from that snapshot.  The UI thread only pays for the pickle.
+
+	The worker keeps its race and its template, course and flag caches between requests.
+	A new snapshot is only sent when the race has changed.
+'''
+
+class RenderContext:
+	# Stands in for MainWin in the worker process.
+	def __init__( self, fileName=None, email='', graphicBase64=None ):
+		self.fileName = fileName
+		self.email = email
+		self.graphicBase64 = graphicBase64
+
+	def getEmail( self ):
+		return self.email
+
+	def getGraphicBase64( self ):
+		return self.graphicBase64
+
+def workerMain( conn ):
+	# Runs in the worker process.
+	import RaceHtml
+	from ExportGrid import ExportResultsExcel
+
+	class WorkerRender( RenderContext, RaceHtml.HtmlRender ):
+		pass
+
+	render = WorkerRender()
+	Utils.mainWin = render
+	tasks = {
+		'html':		lambda: RaceHtml.renderHtml( render ),
+		'excel':	ExportResultsExcel,
+	}
+	while True:
+		try:
+			task, args, raceBytes, context = conn.recv()
+		except (EOFError, OSError):
+			break
+
+		try:
+			if raceBytes is not None:
+				Model.setRace( pickle.loads(raceBytes) )
+			render.__dict__.update( context )
+			result, error = tasks[task]( *args ), None
+		except Exception:
+			# Send the traceback back so the gui process can log it.
+			result, error = None, traceback.format_exc()
+		conn.send( (result, error) )
+
+class ResultsWorker:
+	timeout = 60.0
+
+	def __init__( self ):
+		self.lock = threading.Lock()		# Serializes requests to the worker.
+		self.process = None
+		self.conn = None
+		self.raceVersion = None				# Version of the race snapshot in the worker.
+
+	def start( self ):
+		ctx = multiprocessing.get_context( 'spawn' )	# Never fork the gui process.
+		self.conn, connChild = ctx.Pipe()
+		self.process = ctx.Process( target=workerMain, args=(connChild,), name='ResultsWorker', daemon=True )
+		self.process.start()
+		connChild.close()
+		self.raceVersion = None
+
+	def stop( self ):
+		if self.process:
+			try:
+				self.conn.close()
+				self.process.join( 2.0 )
+				if self.process.is_alive():
+					self.process.terminate()
+			except Exception:
+				pass
+		self.process = self.conn = None
+		self.raceVersion = None				# A new worker has no race.
+
+	def run( self, task, getSnapshot, args=() ):
+		'''
+			Run a task in the worker process against a snapshot of the race.
+			getSnapshot( workerVersion ) returns (raceVersion, raceBytes, context), or None if there is no race.
+			raceBytes is None if the race version is workerVersion.
+			Returns (raceVersion, result).  result is None if the worker fails - the caller should do the task in-process.
+			Call from a background thread.
+		'''
+		with self.lock:
+			raceVersion = None
+			try:
+				if not self.process or not self.process.is_alive():
+					self.start()
+				snapshot = getSnapshot( self.raceVersion )
+				if snapshot is None:
+					return None, None
+				raceVersion, raceBytes, context = snapshot
+				if raceBytes is None and raceVersion != self.raceVersion:
+					# The worker doesn't have this version.  Get the race.
+					snapshot = getSnapshot( None )
+					if snapshot is None:
+						return None, None
+					raceVersion, raceBytes, context = snapshot
+				
+				self.conn.send( (task, args, raceBytes, context) )
+				if not self.conn.poll( self.timeout ):
+					raise TimeoutError( 'ResultsWorker: timeout' )
+				result, error = self.conn.recv()
+				if error:
+					Utils.writeLog( 'ResultsWorker: {} failed:\n{}'.format(task, error) )
+				
+				# Only record the version if the worker has the race.
+				if result is None:
+					self.raceVersion = None
+				elif raceBytes is not None:
+					self.raceVersion = raceVersion
+				return raceVersion, result
+			except Exception as e:
+				Utils.logException( e, sys.exc_info() )
+				self.stop()
+				return raceVersion, None
+
+	def renderHtml( self, getSnapshot ):
+		return self.run( 'html', getSnapshot )
+
+	def exportExcel( self, getSnapshot, xlFName ):
+		return self.run( 'excel', getSnapshot, (xlFName,) )
+
+resultsWorker = ResultsWorker()
+
+if __name__ == '__main__':
+	import os
+	race = Model.newRace()
+	race._populate()
+
+	t = time.perf_counter()
+	raceBytes = pickle.dumps( race, protocol=4 )
+	print( 'snapshot: {:.1f}ms {} bytes'.format( (time.perf_counter() - t)*1000.0, len(raceBytes) ) )
+
+	def getSnapshot( workerVersion ):
+		version = (id(race), race.lastChangedTime)
+		return version, (raceBytes if version != workerVersion else None), {'fileName':os.path.join('test','2024-01-01-Test-r1-.cmn')}
+
+	t = time.perf_counter()
+	version, html = resultsWorker.renderHtml( getSnapshot )
+	print( 'render: {:.1f}ms {} chars'.format( (time.perf_counter() - t)*1000.0, len(html or '') ) )
+	resultsWorker.stop()
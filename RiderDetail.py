@@ -131,6 +131,7 @@ class AdjustTimeDialog( wx.Dialog ):
 		self.rider.times = [rt for rt in self.rider.times if rt > 0.0]
 		self.rider.ttPenalty = self.penaltyTime.GetSeconds()
 		self.rider.ttNote = self.note.GetValue().strip()
+		Model.journalRiderState( self.rider )
 					
 		Model.race.setChanged()
 		Utils.refresh()
@@ -190,6 +191,7 @@ class ChangeOffsetDialog( wx.Dialog ):
 		
 		undo.pushState()
 		self.rider.times = [t + adjustTime for t in self.rider.times]
+		Model.journalRiderState( self.rider )
 		Model.race.setChanged()
 		self.EndModal( wx.ID_OK )
 
@@ -597,6 +599,7 @@ class RiderDetail( wx.Panel ):
 		if rider.autocorrectLaps:
 			if Utils.MessageOKCancel( self, _('Turn off Autocorrect first?'), _('Turn off Autocorrect') ):
 				rider.autocorrectLaps = False
+				Model.journalRiderState( rider )
 				race.setChanged()
 		
 		for rr in GetResults( race.getCategory(num) ):
@@ -814,6 +817,7 @@ class RiderDetail( wx.Panel ):
 			riderMerge = race.riders.get( newNum, None )
 			if rider and riderMerge:
 				rider.times = sorted( set(rider.times) | set(riderMerge.times) )
+				Model.journalRiderState( rider )
 		
 			if Utils.MessageYesNo( self, '{}\n\n{}'.format(_("Delete 'From' Rider"), newNum), _("Delete 'From' Rider") ):
 				race.deleteRider( newNum )
@@ -951,6 +955,7 @@ class RiderDetail( wx.Panel ):
 			rider = race.riders[num]
 			rider.autocorrectLaps = self.autocorrectLaps.GetValue()
 			rider.alwaysFilterMinPossibleLapTime = self.alwaysFilterMinPossibleLapTime.GetValue()
+			Model.journalRiderState( rider )
 			race.setChanged()
 		self.refresh()
 		wx.CallAfter( Utils.refreshForecastHistory )
@@ -1199,7 +1204,7 @@ class RiderDetail( wx.Panel ):
 		riderInfo['entries'] = GetEntriesForNum(riderInfo['category'], num) if rider.autocorrectLaps else rider.interpolate()
 		
 		if riderInfo != getattr(self, 'riderInfoCache', {}):
-			riderInfo['times'] = list(riderInfo['times'])		# Make a copy so we can compare to the original.
+			riderInfo['times'] = riderInfo['times'][:]			# Make a copy so we can compare to the original.
 			riderInfo['entries'] = list(riderInfo['entries'])	# Make a copy so we can compare to the original.
 			riderInfo['lapNote'] = riderInfo['lapNote'].copy()	# There don't change much, so make a copy.
 			self.riderInfoCache = riderInfo
@@ -1215,9 +1220,6 @@ class RiderDetail( wx.Panel ):
 		visibleRow = self.visibleRow
 		self.visibleRow = None
 
-		data = [ [] for c in range(len(self.colnames)) ]
-		self.grid.Set( data = data )
-		self.grid.Reset()
 		self.category.Clear()
 		self.autocorrectLaps.SetValue( True )
 		self.alwaysFilterMinPossibleLapTime.SetValue( True )
@@ -1246,6 +1248,7 @@ class RiderDetail( wx.Panel ):
 		with Model.LockRace() as race:
 		
 			if race is None or num is None:
+				self.grid.SetDiff( data = [ [] for c in range(len(self.colnames)) ] )
 				return
 				
 			try:
@@ -1292,6 +1295,7 @@ class RiderDetail( wx.Panel ):
 				
 			#--------------------------------------------------------------------------------------
 			if num not in race.riders:
+				self.grid.SetDiff( data = [ [] for c in range(len(self.colnames)) ] )
 				return
 				
 			rider = race.getRider( num )
@@ -1462,9 +1466,9 @@ class RiderDetail( wx.Panel ):
 					for i in range(len(self.colnames)):
 						backgroundColour[(r,i)] = highlightColour
 			
-			self.grid.Set( data=data, backgroundColour=backgroundColour, colnames=self.colnames )
+			# Only repaint the laps that changed.
+			self.grid.SetDiff( data=data, backgroundColour=backgroundColour, colnames=self.colnames )
 			self.grid.AutoSizeColumns( True )
-			self.grid.Reset()
 			
 			self.ganttChart.SetData( [ganttData], [num], Gantt.GetNowTime(), [ganttInterp], numTimeInfo = numTimeInfo )
 			self.lineGraph.SetData( [graphData], [[e.interp for e in entries]] )
@@ -1501,6 +1505,7 @@ class RiderDetail( wx.Panel ):
 
 			newValues = (rider.status, rider.tStatus, rider.relegatedPosition)
 			if oldValues != newValues:
+				Model.journalRiderState( rider )
 				race.setChanged()
 				wx.CallAfter( Utils.refresh )
 		
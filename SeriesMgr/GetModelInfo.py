@@ -2,10 +2,13 @@ import os
 import re
 import math
 import pickle
+import hashlib
 import datetime
+import tempfile
 import operator
 import itertools
 from collections import defaultdict, namedtuple
+from multiprocessing import Pool
 
 import trueskill
 
@@ -176,10 +179,20 @@ def toInt( n ):
 		return n
 
 def getRaceResultRet():
-	return { 'success':True, 'explanation':'success', 'raceResults':[], 'licenseLinkTemplate':None, 'isUCIDataride':False, 'pureTeam':False, 'resultsType':0 }
+	return { 'success':True, 'explanation':'success', 'raceResults':[], 'licenseLinkTemplate':None, 'isUCIDataride':False, 'pureTeam':False, 'resultsType':0, 'dependencies':[] }
+
+def getFileStamp( fileName ):
+	# Identify a version of a file by its path, modification time and size.
+	fileName = os.path.abspath( fileName )
+	try:
+		s = os.stat( fileName )
+		return (fileName, s.st_mtime_ns, s.st_size)
+	except OSError:
+		return (fileName, None, None)
 
 def ExtractRaceResultsExcel( raceFileName ):
 	ret = getRaceResultRet()
+	ret['dependencies'].append( getFileStamp(raceFileName) )
 	
 	if not os.path.exists( raceFileName ):
 		ret['success'] = False
@@ -358,11 +371,14 @@ def FixExcelSheetLocal( fileName, race ):
 
 def ExtractRaceResultsCrossMgr( raceFileName ):
 	ret = getRaceResultRet()
+	ret['dependencies'].append( getFileStamp(raceFileName) )
 	
 	try:
 		with open(raceFileName, 'rb') as fp, Model.LockRace() as race:
 			race = pickle.load( fp, encoding='latin1', errors='replace' )
 			FixExcelSheetLocal( raceFileName, race )
+			if getattr(race, 'excelLink', None) and race.excelLink.fileName:
+				ret['dependencies'].append( getFileStamp(race.excelLink.fileName) )
 			#isFinished = race.isFinished()
 			race.tagNums = None
 			race.resetAllCaches()
@@ -470,6 +486,59 @@ def ExtractRaceResults( fileName ):
 	else:
 		return ExtractRaceResultsExcel( fileName )
 
+#-----------------------------------------------------------------------
+# On-disk cache of extracted race results.
+# An entry is valid if the race file (and its linked Excel sheet) have the same path, modification time and size.
+#
+raceResultsCacheVersion = 1
+raceResultsCacheDir = None
+
+def getRaceResultsCacheDir():
+	global raceResultsCacheDir
+	if raceResultsCacheDir is None:
+		try:
+			raceResultsCacheDir = os.path.join( Utils.getHomeDir(), 'RaceResultsCache' )
+		except Exception:
+			raceResultsCacheDir = os.path.join( tempfile.gettempdir(), 'SeriesMgrRaceResultsCache' )
+		os.makedirs( raceResultsCacheDir, exist_ok=True )
+	return raceResultsCacheDir
+
+def getRaceResultsCacheFileName( fileName ):
+	return os.path.join( getRaceResultsCacheDir(), hashlib.sha1(os.path.abspath(fileName).encode()).hexdigest() + '.pkl' )
+
+def ReadRaceResultsCache( fileName ):
+	try:
+		with open(getRaceResultsCacheFileName(fileName), 'rb') as fp:
+			version, ret = pickle.load( fp )
+	except Exception:
+		return None
+	if version != raceResultsCacheVersion or not ret['dependencies'] or any(getFileStamp(d[0]) != d for d in ret['dependencies']):
+		return None
+	return ret
+
+def WriteRaceResultsCache( fileName, ret ):
+	if not ret['success'] or not ret['dependencies'] or ret['dependencies'][0][1] is None:
+		return
+	cacheFileName = getRaceResultsCacheFileName( fileName )
+	try:
+		with open(cacheFileName + '.tmp', 'wb') as fp:
+			pickle.dump( (raceResultsCacheVersion, ret), fp, 2 )
+		os.replace( cacheFileName + '.tmp', cacheFileName )
+	except Exception as e:
+		Utils.writeLog( 'WriteRaceResultsCache: "{}": {}'.format(fileName, e) )
+
+def ExtractRaceResultsCached( fileNames ):
+	# Extract the results of all races.  Races that have not changed are read from the cache.
+	# Changed races are extracted in parallel processes (CrossMgr extraction uses the global Model.race).
+	rets = [ReadRaceResultsCache(f) for f in fileNames]
+	iMissing = [i for i, ret in enumerate(rets) if ret is None]
+	if iMissing:
+		with Pool() as p:
+			for i, ret in zip(iMissing, p.map(ExtractRaceResults, [fileNames[i] for i in iMissing])):
+				WriteRaceResultsCache( fileNames[i], ret )
+				rets[i] = ret
+	return rets
+
 def AdjustForUpgrades( raceResults ):
 	upgradePaths = []
 	for path in SeriesModel.model.upgradePaths:
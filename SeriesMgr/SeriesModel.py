@@ -5,7 +5,6 @@ import operator
 import functools
 import datetime
 import threading
-from multiprocessing import Pool
 import GetModelInfo
 from FileTrie import FileTrie
 from io import StringIO
@@ -706,13 +705,8 @@ class SeriesModel:
 	@memoize
 	def _extractAllRaceResultsCore( self ):
 		with modelUpdateLock:	
-			# Extract all race results in parallel.  Arguments are the race info and this series.
-			if self.races:
-				# p_results = map( GetModelInfo.ExtractRaceResults, [r.fileName for r in self.races] )
-				with Pool() as p:
-					p_results = p.map( GetModelInfo.ExtractRaceResults, [r.fileName for r in self.races] )
-			else:
-				p_results = []
+			# Extract all race results in parallel.  Unchanged races are read from the cache.
+			p_results = GetModelInfo.ExtractRaceResultsCached( [r.fileName for r in self.races] )
 			
 			# Combine all results and record any errors.
 			raceResults = []
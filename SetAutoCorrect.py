@@ -67,6 +67,7 @@ class SetAutoCorrectDialog( wx.Dialog ):
 			for num, rider in race.riders.items():
 				if doAll or race.getCategory(num) in selectedCats:
 					rider.autocorrectLaps = action
+					Model.journalRiderState( rider )
 				race.setChanged()
 		Utils.refresh()
 		return True
@@ -21,10 +21,12 @@ def SetNoDataDNS():
 			if rider.status == NP:
 				if rider.times:
 					rider.status = Finisher
+					Model.journalRiderState( rider )
 					isChanged = True
 			elif rider.status == Finisher:
 				if not rider.times:
 					rider.status = NP
+					Model.journalRiderState( rider )
 					isChanged = True
 	
 	elif race.isFinished():
@@ -34,6 +36,7 @@ def SetNoDataDNS():
 				rider = race.getRider( num )
 				if rider.status == NP:
 					rider.status = Finisher if rider.times else DNS
+					Model.journalRiderState( rider )
 					isChanged = True
 
 	elif race.isUnstarted():
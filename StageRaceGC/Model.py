@@ -1,4 +1,5 @@
 import re
+import hashlib
 import operator
 from collections import defaultdict, namedtuple
 from ValueContext import ValueContext as VC
@@ -251,13 +252,30 @@ def scrub_header( h ):
 	h = reNonAlphaNum.sub( '', Utils.removeDiacritic(h) )
 	return header_sub.get(h, h)
 
-def readSheet( reader, sheet_name, header_fields ):
+#-----------------------------------------------------------------------
+# Caches kept across refreshes.
+# Parsed stage sheets are keyed by the content of the sheet.
+# The classification after a stage is keyed by the content of the registration and of every stage up to it,
+# so a change to a sheet only recomputes that stage and the stages after it.
+#
+stageSheetCache = {}
+stageGCCache = {}
+
+def getContentKey( *values ):
+	return hashlib.sha1( repr(values).encode() ).hexdigest()
+
+def pruneCache( cache, keys ):
+	# Only keep the entries used by the current workbook.
+	for k in set(cache.keys()) - set(keys):
+		del cache[k]
+
+def readSheet( reader, sheet_name, header_fields, rows=None ):
 	header_map = {}
 	content = []
 	errors = []
 	climb_categories = []
 	header_row = 0
-	for row_number, row in enumerate(reader.iter_list(sheet_name)):
+	for row_number, row in enumerate(reader.iter_list(sheet_name) if rows is None else rows):
 		if not row:
 			continue
 		
@@ -315,10 +333,13 @@ class Registration:
 		self.riders = []
 		self.bibToRider = {}
 		self.errors = []
+		self.content_key = None
 	
 	def read( self, reader ):
 		self.reset()
-		content, _, self.errors, header_row = readSheet( reader, self.sheet_name, ['name'] + list(Rider.Fields) )
+		rows = list( reader.iter_list(self.sheet_name) )
+		self.content_key = getContentKey( self.sheet_name, rows )
+		content, _, self.errors, header_row = readSheet( reader, self.sheet_name, ['name'] + list(Rider.Fields), rows )
 		for row in content:
 			try:
 				rider = Rider( **row )
@@ -354,6 +375,7 @@ class Stage:
 	def reset( self ):
 		self.results = []
 		self.errors = []
+		self.content_key = None
 		
 	def addResult( self, result ):
 		self.results.append( result )
@@ -380,7 +402,18 @@ class Stage:
 	
 	def read( self, reader ):
 		self.reset()
-		content, self.climb_categories, self.errors, header_row = readSheet( reader, self.sheet_name, Result.Fields )
+		rows = list( reader.iter_list(self.sheet_name) )
+		self.content_key = getContentKey( self.sheet_name, rows )
+		
+		# If this sheet has not changed, reuse the results parsed last time.
+		try:
+			results, self.climb_categories, errors = stageSheetCache[self.content_key]
+			self.results, self.errors = list(results), list(errors)
+			return self.errors
+		except KeyError:
+			pass
+		
+		content, self.climb_categories, self.errors, header_row = readSheet( reader, self.sheet_name, Result.Fields, rows )
 		for c in content:
 			self.addRow( c, header_row )
 		self.processDeferred()
@@ -389,6 +422,8 @@ class Stage:
 		if bad_categories:
 			self.errors.append( 'Unrecognized climb category (must be 4C, 3C, 2C, 1C or HC)' )
 		self.climb_categories = [max(min(c, 4), 0) for c in self.climb_categories]
+		
+		stageSheetCache[self.content_key] = (list(self.results), self.climb_categories, list(self.errors))
 		return self.errors
 	
 	def isRR( self ):
@@ -494,6 +529,130 @@ TeamClassification = namedtuple( 'TeamClassification', [
 	]
 )
 
+class StageGC:
+	# The cumulative classification state after a stage, built from the state after the previous stage.
+	def __init__( self, prev, stage, stageNum, bibToRider, all_teams ):
+		if prev:
+			self.retired_ic = list( prev.retired_ic )
+			self.retired = set( prev.retired )
+			self.team_retired = set( prev.team_retired )
+			self.bibs = set( prev.bibs )
+			self.total_time_with_bonus_plus_penalty = dict( prev.total_time_with_bonus_plus_penalty )
+			self.total_time_with_bonus_plus_penalty_plus_second_fraction = dict( prev.total_time_with_bonus_plus_penalty_plus_second_fraction )
+			self.sum_of_places = dict( prev.sum_of_places )
+		else:
+			self.retired_ic = []
+			self.retired = set()
+			self.team_retired = set()
+			self.bibs = set()
+			self.total_time_with_bonus_plus_penalty = {}
+			self.total_time_with_bonus_plus_penalty_plus_second_fraction = {}
+			self.sum_of_places = {}
+		
+		self.addStage( stage, stageNum )
+		self.individual_gc = self.getIndividualGC()
+		self.team_classification = self.getTeamClassification( stage, bibToRider, all_teams )
+	
+	def addStage( self, stage, stageNum ):
+		isTT = isinstance(stage, (StageITT, StageTTT))
+		isTTT = isinstance(stage, StageTTT)
+		self.last_stage_place = {}
+		for r in stage.results:
+			# Retired riders are not classified.  Their earlier times are kept, but never reported.
+			if not isinstance(r.place, int):
+				self.retired.add( r.bib )
+				self.retired_ic.append( IndividualClassification(stageNum, 0, 0, 0, 0, r.bib, 0) )
+				continue
+			if r.bib in self.retired:
+				continue
+			self.bibs.add( r.bib )
+			
+			time_with_bonus_plus_penalty = r.integerSeconds - r.bonus + r.penalty
+			time_with_bonus_plus_penalty_plus_second_fraction = r.time - r.bonus + r.penalty
+			
+			self.total_time_with_bonus_plus_penalty[r.bib] = self.total_time_with_bonus_plus_penalty.get(r.bib, 0.0) + time_with_bonus_plus_penalty
+			self.total_time_with_bonus_plus_penalty_plus_second_fraction[r.bib] = self.total_time_with_bonus_plus_penalty_plus_second_fraction.get(r.bib, 0.0) + \
+				(time_with_bonus_plus_penalty_plus_second_fraction if isTT else time_with_bonus_plus_penalty)
+			if not isTTT:
+				self.sum_of_places[r.bib] = self.sum_of_places.get(r.bib, 0) + r.place
+			
+			self.last_stage_place[r.bib] = r.place
+	
+	def getIndividualGC( self ):
+		ic = list( self.retired_ic )
+		for bib in self.bibs:
+			if bib in self.retired:
+				continue
+			ic.append( IndividualClassification(
+					0,
+					self.total_time_with_bonus_plus_penalty[bib],
+					self.total_time_with_bonus_plus_penalty_plus_second_fraction[bib],
+					self.sum_of_places.get(bib, 0),
+					self.last_stage_place.get(bib, 0),
+					bib,
+					0,	# Gap placeholder.
+				)
+			)
+
+		if ic:
+			# Sort to get the unique classification.
+			ic.sort( key = operator.attrgetter(
+					'retired_stage',
+					'total_time_with_bonus_plus_penalty',
+					'total_time_with_bonus_plus_penalty_plus_second_fraction',
+					'sum_of_places',
+					'last_stage_place',
+					'bib',
+				)
+			)
+			leaderTime = ic[0].total_time_with_bonus_plus_penalty
+			for i in range(1, len(ic)):
+				ic[i] = ic[i]._replace(gap=ic[i].total_time_with_bonus_plus_penalty-leaderTime)
+		return ic
+	
+	def getTeamClassification( self, stage, bibToRider, all_teams ):
+		sum_best_top_times = {team: VC() for team in all_teams}
+		sum_best_top_places = {team: VC() for team in all_teams}
+		best_place = {}
+		top_count = {team: 0 for team in all_teams}
+		
+		for r in stage.results:
+			rider = bibToRider.get(r.bib, None)
+			if not rider:
+				continue
+			if not isinstance(r.place, int):
+				self.team_retired.add( r.bib )
+			if r.bib in self.team_retired:
+				continue
+			
+			team = rider.team
+			if top_count[team] == 3:
+				continue
+				
+			if top_count[team] == 0:
+				best_place[team] = VC(r.place, (r.place, r.bib))
+			sum_best_top_times[team] += VC(r.integerSeconds, (r.integerSeconds, r.place, r.bib))
+			sum_best_top_places[team] += VC(r.place, (r.place, r.bib))
+			top_count[team] += 1
+		
+		team_classification = [
+			TeamClassification(sum_best_top_times[team], sum_best_top_places[team], best_place[team], team, 0)
+				for team in sum_best_top_times.keys() if top_count[team] == 3
+		]
+		
+		if team_classification:
+			team_classification.sort( key=operator.attrgetter(
+					'sum_best_top_times',
+					'sum_best_top_places',
+					'best_place',
+				)
+			)
+			leaderTime = team_classification[0].sum_best_top_times.value
+			for i in range(1, len(team_classification)):
+				gap = team_classification[i].sum_best_top_times.value -  leaderTime
+				team_classification[i] = team_classification[i]._replace(gap=gap)
+		return team_classification
+
 class Model:
 	def __init__( self ):
 		self.registration = Registration()
@@ -544,130 +703,35 @@ class Model:
 			
 			if callbackfunc:
 				callbackfunc( self.registration, self.stages )			
+		
+		pruneCache( stageSheetCache, [stage.content_key for stage in self.stages] )
 
-	def getIndividualGC( self, stageLast = None ):
+	def getStageClassifications( self ):
+		# Compute the individual and team classification after each stage.
+		# Each stage continues from the state after the previous stage.
+		# If the registration and the sheets up to a stage have not changed, the state comes from the cache.
 		self.all_teams = { r.team for r in self.registration.riders }
 		
-		stageLast = stageLast or self.stages[-1]
-		
-		# Get all retired riders.
-		stageLast.retired = set()
-		ic = []
+		keys = []
+		key = self.registration.content_key
+		state = None
 		for i, stage in enumerate(self.stages, 1):
-			for r in stage.results:
-				if not isinstance(r.place, int) and r not in stageLast.retired:
-					stageLast.retired.add( r.bib )
-					ic.append( IndividualClassification(i, 0, 0, 0, 0, r.bib, 0) )
-			if stage == stageLast:
-				break
-
-		# Calculate the classification criteria.
-		stageLast.bibs = set()
-		stageLast.total_time_without_bonus_or_penalty = defaultdict( float )
-		stageLast.total_time_with_bonus_plus_penalty = defaultdict( float )
-		stageLast.total_time_with_bonus_plus_penalty_plus_second_fraction = defaultdict( float )
-		stageLast.sum_of_places = defaultdict( int )
-		stageLast.last_stage_place = defaultdict( int )
-		for stage in self.stages:
-			for r in stage.results:
-				if r.bib in stageLast.retired:
-					continue
-				stageLast.bibs.add( r.bib )
-				
-				time_without_bonus_or_penalty = r.integerSeconds
-				time_with_bonus_plus_penalty = r.integerSeconds - r.bonus + r.penalty
-				time_with_bonus_plus_penalty_plus_second_fraction = r.time - r.bonus + r.penalty
-				
-				stageLast.total_time_without_bonus_or_penalty[r.bib] += time_without_bonus_or_penalty
-				stageLast.total_time_with_bonus_plus_penalty[r.bib] += time_with_bonus_plus_penalty
-				stageLast.total_time_with_bonus_plus_penalty_plus_second_fraction[r.bib] += \
-					time_with_bonus_plus_penalty_plus_second_fraction if isinstance(stage, (StageITT, StageTTT)) else time_with_bonus_plus_penalty
-				if not isinstance(stage, StageTTT):
-					stageLast.sum_of_places[r.bib] += r.place
-				
-				if stage == stageLast:
-					stageLast.last_stage_place[r.bib] = r.place
+			key = getContentKey( key, stage.content_key ) if key and stage.content_key else None
+			stateCached = stageGCCache.get( key, None ) if key else None
+			if stateCached:
+				state = stateCached
+			else:
+				state = StageGC( state, stage, i, self.registration.bibToRider, self.all_teams )
+				if key:
+					stageGCCache[key] = state
+			keys.append( key )
 			
-			if stage == stageLast:
-				break
-
-		# Populate the result.
-		for bib in stageLast.bibs:
-			ic.append( IndividualClassification(
-					0,
-					stageLast.total_time_with_bonus_plus_penalty[bib],
-					stageLast.total_time_with_bonus_plus_penalty_plus_second_fraction[bib],
-					stageLast.sum_of_places[bib],
-					stageLast.last_stage_place[bib],
-					bib,
-					0,	# Gap placeholder.
-				)
-			)
-
-		if ic:
-			# Sort to get the unique classification.
-			ic.sort( key = operator.attrgetter(
-					'retired_stage',
-					'total_time_with_bonus_plus_penalty',
-					'total_time_with_bonus_plus_penalty_plus_second_fraction',
-					'sum_of_places',
-					'last_stage_place',
-					'bib',
-				)
-			)
-			leaderTime = ic[0].total_time_with_bonus_plus_penalty
-			for i in range(1, len(ic)):
-				ic[i] = ic[i]._replace(gap=ic[i].total_time_with_bonus_plus_penalty-leaderTime)
-		
-		stageLast.individual_gc = ic
-		
-	def getTeamStageClassifications( self ):
-		self.retired = set()
-		
-		for stage in self.stages:
-			self.getIndividualGC( stage )
+			stage.retired = state.retired
+			stage.individual_gc = state.individual_gc
+			stage.team_classification = state.team_classification
 		
-			sum_best_top_times = {team: VC() for team in self.all_teams}
-			sum_best_top_places = {team: VC() for team in self.all_teams}
-			best_place = {}
-			top_count = {team: 0 for team in self.all_teams}
-			
-			for r in stage.results:
-				rider = self.registration.bibToRider.get(r.bib, None)
-				if not rider:
-					continue
-				if not isinstance(r.place, int):
-					self.retired.add( r.bib )
-				if r.bib in self.retired:
-					continue
-				
-				team = rider.team
-				if top_count[team] == 3:
-					continue
-					
-				if top_count[team] == 0:
-					best_place[team] = VC(r.place, (r.place, r.bib))
-				sum_best_top_times[team] += VC(r.integerSeconds, (r.integerSeconds, r.place, r.bib))
-				sum_best_top_places[team] += VC(r.place, (r.place, r.bib))
-				top_count[team] += 1
-			
-			stage.team_classification = [
-				TeamClassification(sum_best_top_times[team], sum_best_top_places[team], best_place[team], team, 0)
-					for team in sum_best_top_times.keys() if top_count[team] == 3
-			]
-			
-			if stage.team_classification:
-				stage.team_classification.sort( key=operator.attrgetter(
-						'sum_best_top_times',
-						'sum_best_top_places',
-						'best_place',
-					)
-				)
-				leaderTime = stage.team_classification[0].sum_best_top_times.value
-				for i in range(1, len(stage.team_classification)):
-					gap = stage.team_classification[i].sum_best_top_times.value -  leaderTime
-					stage.team_classification[i] = stage.team_classification[i]._replace(gap=gap)
-				
+		self.retired = state.team_retired if state else set()
+		pruneCache( stageGCCache, keys )
 		
 	def getTeamGC( self ):
 		self.team_gc = []
@@ -676,7 +740,7 @@ class Model:
 		if not self.stages:
 			return
 		
-		self.getTeamStageClassifications()
+		self.getStageClassifications()
 		
 		total_teams = len( self.all_teams )
 		
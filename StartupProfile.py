@@ -0,0 +1,98 @@
+import sys
+import time
+import builtins
+import threading
+from contextlib import contextmanager
+
+'''
+	Startup profile: run CrossMgr with --profile-startup to log the import time of each module
+	and the construction time of each page.
+
+	Import times are measured by wrapping __import__ on the main thread.
+	"self" is the time spent in the module itself, "cumulative" includes the modules it imports.
+	Pages that are built on first use are logged when they are built.
+'''
+
+class StartupProfile:
+	def __init__( self ):
+		self.enabled = False
+		self.tStart = None
+		self.importSave = None
+		self.stack = []				# Time spent in nested imports for each import in progress.
+		self.imports = {}			# name: (self, cumulative)
+		self.builds = []			# (name, seconds)
+		self.reported = False
+
+	def start( self ):
+		if self.enabled:
+			return
+		self.enabled = True
+		self.tStart = time.perf_counter()
+		self.importSave = builtins.__import__
+		builtins.__import__ = self.timedImport
+
+	def stopImports( self ):
+		if self.importSave:
+			builtins.__import__ = self.importSave
+			self.importSave = None
+
+	def timedImport( self, name, globals=None, locals=None, fromlist=(), level=0 ):
+		if level or name in sys.modules or threading.current_thread() is not threading.main_thread():
+			return self.importSave( name, globals, locals, fromlist, level )
+		self.stack.append( 0.0 )
+		t = time.perf_counter()
+		try:
+			return self.importSave( name, globals, locals, fromlist, level )
+		finally:
+			tCumulative = time.perf_counter() - t
+			tNested = self.stack.pop()
+			self.imports[name] = (tCumulative - tNested, tCumulative)
+			if self.stack:
+				self.stack[-1] += tCumulative
+
+	@contextmanager
+	def timer( self, name ):
+		''' Time the construction of a page or window. '''
+		if not self.enabled:
+			yield
+			return
+		t = time.perf_counter()
+		try:
+			yield
+		finally:
+			seconds = time.perf_counter() - t
+			self.builds.append( (name, seconds) )
+			if self.reported:
+				self.write( 'startup profile: build {:>8.1f}ms {}'.format(seconds*1000.0, name) )
+
+	def write( self, message ):
+		import Utils
+		Utils.writeLog( message )
+
+	def getReport( self, count=40 ):
+		lines = ['startup profile: {:.3f}s to ready'.format(time.perf_counter() - self.tStart)]
+		lines.append( 'imports (top {} by self time):'.format(count) )
+		lines.append( '{:>10} {:>10}  {}'.format('self ms', 'cum ms', 'module') )
+		for name, (tSelf, tCumulative) in sorted( self.imports.items(), key=lambda i: -i[1][0] )[:count]:
+			lines.append( '{:>10.1f} {:>10.1f}  {}'.format(tSelf*1000.0, tCumulative*1000.0, name) )
+		lines.append( 'builds:' )
+		for name, seconds in self.builds:
+			lines.append( '{:>10.1f}             {}'.format(seconds*1000.0, name) )
+		return '\n'.join( lines )
+
+	def report( self ):
+		''' Call when the main window is ready for input. '''
+		if not self.enabled or self.reported:
+			return
+		self.stopImports()
+		self.reported = True
+		self.write( self.getReport() )
+
+startupProfile = StartupProfile()
+
+if __name__ == '__main__':
+	startupProfile.start()
+	import json
+	with startupProfile.timer( 'decoder' ):
+		json.JSONDecoder()
+	print( startupProfile.getReport() )
@@ -7,7 +7,6 @@ import Utils
 from Utils				import logCall, logException
 import Model
 import ExportGrid
-from pdf import PDF
 import xlsxwriter
 
 from ReorderableGrid import ReorderableGrid
@@ -101,6 +100,7 @@ class TeamResults( wx.Panel ):
 		pdfFileName = os.path.splitext(fileName)[0] + '-TeamResults.pdf'
 		
 		try:
+			from pdf import PDF	# fpdf is slow to import.
 			pdf = PDF( orientation = 'P' )
 			pdf.set_font( 'Arial', '', 12 )
 			pdf.set_author( getpass.getuser() )
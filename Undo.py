@@ -1,62 +1,181 @@
 import Model
+import RaceJournal
 from Utils import updateUndoStatus
 from Utils import logCall
 import pickle
-import pickletools
+
+#------------------------------------------------------------------------------------------------
+# The race state is split into components: one per rider and one per race attribute.
+# Each undo step only stores the components that changed (before and after), so memory and
+# undo/redo are proportional to the size of the change, not the size of the race.
+#
+# Riders are only pickled when they change.  If the model knows which riders changed (Model.changedNums),
+# only those riders are checked.  Otherwise, all riders are compared with a cheap fingerprint.
+#
+
+def riderFingerprint( rider ):
+	return tuple( (k, tuple(v) if isinstance(v, list) else v) for k, v in rider.__getstate__().items() )
 
 class Undo:
+	maxBytes = 32*1024*1024		# Memory budget for the undo steps.  The oldest steps are dropped first.
+	excludeAttrs = {'riders', 'isChangedFlag', 'lastChangedTime', 'categoryCache', 'startOffsetCache', 'journalSerial'}
+
 	def __init__( self ):
 		self.clear()
 
 	def clear( self ):
-		self.undoStack = []
+		self.steps = []				# steps[i] = {key: (state i bytes, state i+1 bytes)}.  None means the component does not exist.
+		self.stepBytes = []
+		self.nStates = 0
+		self.cur = {}				# Components of state iCur.
+		self.iCur = None
 		self.iUndo = None
-	
+		self.riderCache = {}		# num: (fingerprint, bytes)
+
 	def getState( self ):
 		with Model.LockRace() as race:
 			if not race or race.isRunning():
 				return None
-			return pickletools.optimize( pickle.dumps(race, 2) )
-	
+
+			state = {}
+			for k, v in race.__dict__.items():
+				if k not in self.excludeAttrs:
+					b = pickle.dumps( v, 4 )
+					bCur = self.cur.get( k )
+					state[k] = bCur if bCur == b else b		# Share unchanged bytes.
+
+			changedNums, Model.changedNums = Model.changedNums, set()
+			if changedNums is not None and self.cur:
+				# Only check the riders that changed since the last state.
+				state.update( (k, b) for k, b in self.cur.items() if isinstance(k, tuple) )
+				for num in changedNums:
+					self.updateRider( state, num, race.riders.get(num, None) )
+				if len(self.riderCache) == len(race.riders):
+					return state
+			
+			# Check all the riders.
+			for num in [num for num in self.riderCache if num not in race.riders]:
+				del self.riderCache[num]
+				state.pop( ('rider', num), None )
+			for num, rider in race.riders.items():
+				self.updateRider( state, num, rider )
+			return state
+
+	def updateRider( self, state, num, rider ):
+		if rider is None:
+			self.riderCache.pop( num, None )
+			state.pop( ('rider', num), None )
+			return
+		fp = riderFingerprint( rider )
+		try:
+			fpCache, b = self.riderCache[num]
+			if fpCache != fp:
+				b = pickle.dumps( rider, 4 )
+		except KeyError:
+			b = pickle.dumps( rider, 4 )
+		self.riderCache[num] = (fp, b)
+		state[('rider', num)] = b
+
+	def getDelta( self, state ):
+		cur = self.cur
+		delta = {k:(cur.get(k), b) for k, b in state.items() if cur.get(k) != b}
+		delta.update( (k, (b, None)) for k, b in cur.items() if k not in state )
+		return delta
+
+	def trimSteps( self ):
+		while len(self.steps) > 1 and sum(self.stepBytes) > self.maxBytes:
+			self.steps.pop( 0 )
+			self.stepBytes.pop( 0 )
+			self.nStates -= 1
+			self.iCur -= 1
+
 	def pushState( self ):
 		''' Save the state of the model and remove any redo states. '''
 		if self.iUndo is not None:
-			del self.undoStack[self.iUndo+1:]
+			del self.steps[self.iUndo:]
+			del self.stepBytes[self.iUndo:]
+			self.nStates = self.iUndo + 1
 			self.iUndo = None
 			return False
-			
+
 		self.iUndo = None
 		sNew = self.getState()
-		if not sNew or (self.undoStack and self.undoStack[-1] == sNew):
+		if not sNew:
 			return False
-		
-		self.undoStack.append( sNew )
+
+		if self.nStates:
+			delta = self.getDelta( sNew )
+			if not delta:
+				return False
+			self.steps.append( delta )
+			self.stepBytes.append( sum(len(b0 or b'') + len(b1 or b'') for b0, b1 in delta.values()) )
+		self.cur = sNew
+		self.nStates += 1
+		self.iCur = self.nStates - 1
+		self.trimSteps()
 		updateUndoStatus()
 		return True
-		
+
 	def setState( self ):
 		if self.iUndo is None:
 			return
-		with Model.LockRace():
-			raceNew = pickle.loads( self.undoStack[self.iUndo] )
-			Model.setRace( raceNew )
+
+		# Collect the components that differ between the current state and the undo state.
+		changed = {}
+		while self.iCur > self.iUndo:
+			self.iCur -= 1
+			changed.update( (k, b0) for k, (b0, b1) in self.steps[self.iCur].items() )
+		while self.iCur < self.iUndo:
+			changed.update( (k, b1) for k, (b0, b1) in self.steps[self.iCur].items() )
+			self.iCur += 1
+
+		with Model.LockRace() as race:
+			for k, b in changed.items():
+				if b is None:
+					self.cur.pop( k, None )
+				else:
+					self.cur[k] = b
+
+				if isinstance(k, tuple):
+					num = k[1]
+					if b is None:
+						self.riderCache.pop( num, None )
+						race.riders.pop( num, None )
+						RaceJournal.write( race, 'norider', num )
+					else:
+						rider = race.riders[num] = pickle.loads( b )
+						self.riderCache[num] = (riderFingerprint(rider), b)
+						Model.journalRiderState( rider )
+				elif b is None:
+					try:
+						delattr( race, k )
+					except AttributeError:
+						pass
+				else:
+					setattr( race, k, pickle.loads(b) )
+
+			if 'startTime' in changed or 'firstRecordedTime' in changed:
+				race.journalStartTime()
+			race.resetAllCaches()
+			race.setChanged()
+			Model.changedNums = set()		# The current state matches the race.
 		updateUndoStatus()
 
 	def isUndo( self ):
 		if self.iUndo is not None:
 			return self.iUndo > 0
 		else:
-			return self.undoStack
+			return self.nStates > 0
 
 	def isRedo( self ):
-		return self.iUndo is not None and self.iUndo != len(self.undoStack) - 1
-	
+		return self.iUndo is not None and self.iUndo != self.nStates - 1
+
 	@logCall
 	def doUndo( self ):
 		if not self.isUndo():
 			return False
 		if self.iUndo is None:
-			iUndoStart = len(self.undoStack) - 1
+			iUndoStart = self.nStates - 1
 			self.pushState()
 			self.iUndo = iUndoStart
 		else:
@@ -9,16 +9,17 @@ import time
 import json
 import base64
 import urllib
+import hashlib
 import socket
 import datetime
 import traceback
 import threading
+import email.utils
 from urllib.parse import quote
 
 from urllib.request import url2pathname
 from queue import Queue
 
-from qrcode import QRCode
 from tornado.template import Template
 from ParseHtmlPayload import ParseHtmlPayload
 from http.server import BaseHTTPRequestHandler, HTTPServer, HTTPStatus
@@ -27,7 +28,7 @@ import Utils
 import Model
 import Version
 import WebReader
-from GetResults import GetResultsRAM, GetResultsBaseline, GetRaceName
+from GetResults import GetResultsRAM, GetResultsRAMSince, GetResultsBaseline, GetRaceName, EncodeRAMCompact
 from PhotoFinish		import okTakePhoto
 from Synchronizer import syncfunc
 from SendPhotoRequests import SendPhotoRequests
@@ -84,8 +85,8 @@ def gzipEncode( content ):
 def validContent( content ):
 	return content.strip().endswith( '</html>' )
 
-@syncfunc
 def getCurrentHtml():
+	# Rendered in the results worker process from a snapshot of the race.  Does not block the UI thread.
 	return Model.getCurrentHtml()
 	
 @syncfunc
@@ -113,9 +114,16 @@ class Generic:
 	def __init__( self, **kwargs ):
 		self.__dict__.update( kwargs )
 
+def getETag( content ):
+	return '"{}"'.format( hashlib.md5(content).hexdigest() )
+
 class ContentBuffer:
 	'''
 		Underscore functions require the lock before calling.
+		
+		Content is kept pre-rendered, with raw and gzip variants, an ETag and a Last-Modified time.
+		The current race html is rendered at most once per race change.  If there is already content,
+		it is rendered in a background thread and the previous version is served until it is ready.
 	'''
 	Unchanged = 0
 	Changed = 1
@@ -127,6 +135,61 @@ class ContentBuffer:
 		self.fnameRace = None
 		self.dirRace = None
 		self.lock = RLock()
+		self.version = 0				# Incremented when any content changes.
+		self.indexCache = {}
+		self.renderPending = set()
+		self.renderEvent = threading.Event()
+		self.renderThread = None
+	
+	def _setContent( self, cache, content, payload=None, lastModified=None ):
+		if payload is None:
+			result = ParseHtmlPayload( content=content )
+			payload = result['payload'] if result['success'] else {}
+		content = content.encode() if not isinstance(content, bytes) else content
+		if content == cache.get('content', None):
+			return False
+		cache['payload'] = payload
+		cache['content'] = content
+		cache['gzip_content'] = gzipEncode( content )
+		cache['etag'] = getETag( content )
+		cache['lastModified'] = lastModified or epochTime()
+		return True
+	
+	def _renderRace( self, fname ):
+		# Does not require the lock.  getCurrentHtml takes a snapshot of the race on the main thread.
+		if '_TTCountdown' in fname:
+			return getCurrentTTCountdownHtml()
+		elif '_TTStartList' in fname:
+			return getCurrentTTStartListHtml()
+		return getCurrentHtml()
+	
+	def _renderWorker( self ):
+		while True:
+			self.renderEvent.wait()
+			with self.lock:
+				self.renderEvent.clear()
+				pending, self.renderPending = self.renderPending, set()
+			
+			for fname, raceVersion in pending:
+				content = self._renderRace( fname )
+				if not content:
+					continue
+				result = ParseHtmlPayload( content=content )
+				with self.lock:
+					cache = self.fileCache.get( fname, None )
+					if cache is None:
+						continue
+					cache['raceVersion'] = raceVersion
+					if self._setContent( cache, content, result['payload'] if result['success'] else {} ):
+						cache['status'] = self.Changed
+						self.version += 1
+	
+	def _requestRender( self, fname, raceVersion ):
+		self.renderPending.add( (fname, raceVersion) )
+		if self.renderThread is None:
+			self.renderThread = threading.Thread( target=self._renderWorker, name='ContentRender', daemon=True )
+			self.renderThread.start()
+		self.renderEvent.set()
 	
 	def _updateFile( self, fname, forceUpdate=False ):
 		if not self.fnameRace:
@@ -144,23 +207,20 @@ class ContentBuffer:
 		
 		fnameFull = os.path.join( self.dirRace, fname )
 		if race and self.fnameRace and coreName(self.fnameRace) == coreName(fnameFull):
-			if forceUpdate or race.lastChangedTime > cache.get('mtime',0.0):
-				
-				if '_TTCountdown' in fname:
-					content = getCurrentTTCountdownHtml()
-				elif '_TTStartList' in fname:
-					content = getCurrentTTStartListHtml()
-				else:
-					content = getCurrentHtml()
-				
+			raceVersion = (id(race), race.lastChangedTime)
+			if forceUpdate or not cache.get('content', None):
+				content = self._renderRace( fname )
 				if content:
-					cache['mtime'] = epochTime()
-					result = ParseHtmlPayload( content=content )
-					cache['payload'] = result['payload'] if result['success'] else {}
-					cache['content'] = content.encode() if not isinstance(content, bytes) else content
-					cache['gzip_content'] = gzipEncode( content )
+					cache['raceVersion'] = raceVersion
+					if self._setContent( cache, content ):
+						self.version += 1
 					cache['status'] = self.Changed
 					self.fileCache[fname] = cache
+			elif cache.get('raceVersion', None) != raceVersion and cache.get('renderVersion', None) != raceVersion:
+				cache['renderVersion'] = raceVersion
+				self._requestRender( fname, raceVersion )
+			else:
+				cache['status'] = self.Unchanged
 			
 			return cache
 			
@@ -187,10 +247,8 @@ class ContentBuffer:
 			content = ''
 			
 		cache['mtime'] = mtime
-		result = ParseHtmlPayload( content=content )
-		cache['payload'] = result['payload'] if result['success'] else {}
-		cache['content'] = content.encode() if not isinstance(content, bytes) else content
-		cache['gzip_content'] = gzipEncode( cache['content'] )
+		if self._setContent( cache, content, lastModified=mtime ):
+			self.version += 1
 		self.fileCache[fname] = cache
 		return cache
 	
@@ -207,6 +265,8 @@ class ContentBuffer:
 		
 		with self.lock:
 			self.fileCache = {}
+			self.indexCache = {}
+			self.version += 1
 			self._updateFile( os.path.splitext(os.path.basename(fnameRace))[0] + '.html' )
 		
 			for f in glob.glob( os.path.join(self.dirRace, '*.html') ):
@@ -229,11 +289,40 @@ class ContentBuffer:
 		return cache
 	
 	def getContent( self, fname, checkForUpdate=True ):
+		return self.getContentInfo( fname, checkForUpdate )[:2]
+	
+	def getContentInfo( self, fname, checkForUpdate=True ):
+		# Returns content, gzip_content, etag, lastModified.
 		with self.lock:
 			cache = self._getCache( fname, checkForUpdate )
 			if cache:
-				return cache.get('content', ''), cache.get('gzip_content', None)
-			return '', None
+				return cache.get('content', ''), cache.get('gzip_content', None), cache.get('etag', None), cache.get('lastModified', None)
+			return '', None, None, None
+	
+	def getIndexContent( self, share=True ):
+		# Returns content, gzip_content, etag, lastModified of the index page.
+		# The index page is only rendered again if the content or the race header changes.
+		race = Model.race
+		if not race:
+			return '', None, None, None
+		
+		with self.lock:
+			# Check for changes in the race files.
+			for fname in self._getFiles():
+				self._getCache( fname, True )
+			
+			key = (self.version, race.organizer, race.headerImage)
+			cache = self.indexCache.get( share, {} )
+			if cache.get('key', None) != key:
+				info = self.getIndexInfo()
+				if not info:
+					return '', None, None, None
+				info['share'] = share
+				info.update( icons )
+				cache = {'key': key}
+				self._setContent( cache, indexTemplate.generate(**info), payload={} )
+				self.indexCache[share] = cache
+			return cache['content'], cache['gzip_content'], cache['etag'], cache['lastModified']
 		
 	def getIndexInfo( self ):
 		race = Model.race
@@ -311,6 +400,7 @@ def GetPreviousFileName():
 	return file
 	
 def getQRCodePage( urlPage ):
+	from qrcode import QRCode
 	qr = QRCode()
 	qr.add_data( urlPage )
 	qr.make()
@@ -360,12 +450,7 @@ function Draw() {
 	return result.getvalue().encode()
 
 def getIndexPage( share=True ):
-	info = contentBuffer.getIndexInfo()
-	if not info:
-		return ''
-	info['share'] = share
-	info.update( icons )
-	return indexTemplate.generate( **info )
+	return contentBuffer.getIndexContent( share )[0]
 
 #---------------------------------------------------------------------------
 
@@ -467,12 +552,28 @@ class CrossMgrHandler( BaseHTTPRequestHandler ):
 			self.send_error(501,'Error: {} {}\n{}'.format(self.path, e, traceback.format_exc()))
 			return
 	
+	def isNotModified( self, etag, lastModified ):
+		# Check the conditional GET headers.  If-None-Match takes precedence over If-Modified-Since.
+		ifNoneMatch = self.headers.get( 'If-None-Match', None )
+		if ifNoneMatch:
+			etags = [e.strip() for e in ifNoneMatch.split(',')]
+			return '*' in etags or etag in etags or 'W/' + etag in etags
+		
+		ifModifiedSince = self.headers.get( 'If-Modified-Since', None )
+		if ifModifiedSince and lastModified:
+			try:
+				return int(lastModified) <= email.utils.parsedate_to_datetime( ifModifiedSince ).timestamp()
+			except Exception:
+				pass
+		return False
+	
 	def do_GET(self):
 		up = urllib.parse.urlparse( self.path )
 		content, gzip_content = None,  None
+		etag, lastModified = None, None
 		try:
 			if up.path=='/':
-				content = getIndexPage()
+				content, gzip_content, etag, lastModified = contentBuffer.getIndexContent()
 				content_type = self.html_content
 				assert isinstance( content, bytes )
 			elif up.path=='/favicon.ico':
@@ -528,22 +629,40 @@ class CrossMgrHandler( BaseHTTPRequestHandler ):
 				
 				if file is None: 
 					file = url2pathname(os.path.basename(up.path))
-				content, gzip_content = contentBuffer.getContent( file )
+				content, gzip_content, etag, lastModified = contentBuffer.getContentInfo( file )
 				content_type = self.html_content
 				assert isinstance( content, bytes )
 		except Exception as e:
 			self.send_error(404,'Error: {} {}\n{}'.format(self.path, e, traceback.format_exc()))
 			return
 		
+		useGzip = gzip_content and 'Accept-Encoding' in self.headers and 'gzip' in self.headers['Accept-Encoding']
+		if etag and useGzip:
+			etag = etag[:-1] + '-gzip"'		# Each encoding needs its own etag.
+		
+		if etag and self.isNotModified( etag, lastModified ):
+			self.send_response( HTTPStatus.NOT_MODIFIED )
+			self.send_header( 'ETag', etag )
+			self.send_header( 'Cache-Control', 'no-cache' )
+			self.end_headers()
+			return
+		
 		self.send_response( 200 )
 		self.send_header('Content-Type',content_type)
 		if content_type == self.html_content:
-			if gzip_content and 'Accept-Encoding' in self.headers and 'gzip' in self.headers['Accept-Encoding']:
+			if useGzip:
 				content = gzip_content
 				self.send_header( 'Content-Encoding', 'gzip' )
-			self.send_header( 'Cache-Control', 'no-cache, no-store, must-revalidate' )
-			self.send_header( 'Pragma', 'no-cache' )
-			self.send_header( 'Expires', '0' )
+			if etag:
+				# Allow the browser to keep the page, but it must revalidate it on every request.
+				self.send_header( 'ETag', etag )
+				self.send_header( 'Last-Modified', email.utils.formatdate(lastModified, usegmt=True) )
+				self.send_header( 'Vary', 'Accept-Encoding' )
+				self.send_header( 'Cache-Control', 'no-cache' )
+			else:
+				self.send_header( 'Cache-Control', 'no-cache, no-store, must-revalidate' )
+				self.send_header( 'Pragma', 'no-cache' )
+				self.send_header( 'Expires', '0' )
 		self.send_header( 'Content-Length', len(content) )
 		self.end_headers()
 		self.wfile.write( content )
@@ -610,10 +729,31 @@ webThread.start()
 from websocket_server import WebsocketServer
 #-------------------------------------------------------------------
 
+wsCompactClients = set()		# Ids of clients that requested the compact ram encoding.
+
+def encodeRAM( ram, compact ):
+	return Utils.ToJson( EncodeRAMCompact(ram) if compact else ram ).encode()
+
 def message_received(client, server, message):
 	msg = json.loads( message )
 	if msg['cmd'] == 'send_baseline' and (msg['raceName'] == 'CurrentResults' or msg['raceName'] == GetRaceName()):
-		server.send_message( client, json.dumps(GetResultsBaseline()) )
+		compact = (msg.get('encoding', None) == 'compact')
+		if compact:
+			wsCompactClients.add( client['id'] )
+		else:
+			wsCompactClients.discard( client['id'] )
+		
+		# If the client has a version, try to resume from it with the recent rams rather than sending a new baseline.
+		rams = GetResultsRAMSince( GetRaceName(), msg['versionCount'] ) if msg.get('versionCount', None) is not None else None
+		if rams is not None:
+			for ram in rams:
+				server.send_message( client, encodeRAM(ram, compact) )
+		else:
+			server.send_message( client, json.dumps(GetResultsBaseline()) )
+
+def client_left(client, server):
+	if client:
+		wsCompactClients.discard( client['id'] )
 
 wsServer = None
 def WsServerLaunch():
@@ -622,6 +762,7 @@ def WsServerLaunch():
 		try:
 			wsServer = WebsocketServer( port=PORT_NUMBER + 1, host='' )
 			wsServer.set_fn_message_received( message_received )
+			wsServer.set_fn_client_left( client_left )
 			wsServer.run_forever()
 		except Exception:
 			wsServer = None
@@ -636,7 +777,19 @@ def WsQueueListener( q ):
 		if message.get('cmd', None) == 'exit':
 			keepGoing = False
 		elif wsServer and wsServer.hasClients():
-			wsServer.send_message_to_all( Utils.ToJson(message).encode() )
+			if message.get('cmd', None) == 'ram' and wsCompactClients:
+				# Send each client the encoding it requested.
+				encoded = {}
+				for handler, clientId in list(wsServer.clients.items()):
+					compact = clientId in wsCompactClients
+					if compact not in encoded:
+						encoded[compact] = encodeRAM( message, compact )
+					try:
+						handler.send_message( encoded[compact] )
+					except Exception:
+						pass
+			else:
+				wsServer.send_message_to_all( Utils.ToJson(message).encode() )
 		q.task_done()
 	
 	wsServer = None	